@@ -37,7 +37,12 @@ class RadiossWorkbench(Workbench):
         # コマンドリストの定義
         self.analysis_commands = [
             'Radioss_Analysis',
-            'Radioss_AnalysisProperties'
+            'Radioss_AnalysisProperties',
+            'Radioss_TimeStep',
+            'Radioss_MeshQuality',
+            'Radioss_Decomposition',
+            'Radioss_LodToggle',
+            'Radioss_Profiling'
         ]
         
         self.modeling_commands = [
@@ -45,13 +50,24 @@ class RadiossWorkbench(Workbench):
             'Radioss_Constraint',
             'Radioss_Load',
             'Radioss_Set',
+            'Radioss_CombineSets',
+            'Radioss_SelectSet',
             'Radioss_RigidBody',
-            'Radioss_Contact'
+            'Radioss_RigidBodyMass',
+            'Radioss_Contact',
+            'Radioss_ContactCheck',
+            'Radioss_AutoContact'
         ]
         
         self.io_commands = [
             'Radioss_Import',
             'Radioss_Export',
+            'Radioss_DOE',
+            'Radioss_Run',
+            'Radioss_Monitor',
+            'Radioss_LoadResults',
+            'Radioss_ResultFrame',
+            'Radioss_ConvertResults',
             'LsDyna_Import'
         ]
 
@@ -62,11 +78,27 @@ class RadiossWorkbench(Workbench):
         FreeCADGui.addCommand('Radioss_Constraint', RadiossCommands.RadiossConstraint())
         FreeCADGui.addCommand('Radioss_Load', RadiossCommands.RadiossLoad())
         FreeCADGui.addCommand('Radioss_Set', RadiossCommands.RadiossSet())
+        FreeCADGui.addCommand('Radioss_CombineSets', RadiossCommands.RadiossCombineSets())
+        FreeCADGui.addCommand('Radioss_SelectSet', RadiossCommands.RadiossSelectSet())
         FreeCADGui.addCommand('Radioss_RigidBody', RadiossCommands.RadiossRigidBody())
+        FreeCADGui.addCommand('Radioss_RigidBodyMass', RadiossCommands.RadiossRigidBodyMass())
         FreeCADGui.addCommand('Radioss_Contact', RadiossCommands.RadiossContact())
+        FreeCADGui.addCommand('Radioss_ContactCheck', RadiossCommands.RadiossContactCheck())
+        FreeCADGui.addCommand('Radioss_AutoContact', RadiossCommands.RadiossAutoContact())
         FreeCADGui.addCommand('Radioss_Export', RadiossCommands.RadiossExport())
+        FreeCADGui.addCommand('Radioss_DOE', RadiossCommands.RadiossDOE())
+        FreeCADGui.addCommand('Radioss_Run', RadiossCommands.RadiossRun())
+        FreeCADGui.addCommand('Radioss_Monitor', RadiossCommands.RadiossMonitor())
+        FreeCADGui.addCommand('Radioss_LoadResults', RadiossCommands.RadiossLoadResults())
+        FreeCADGui.addCommand('Radioss_ResultFrame', RadiossCommands.RadiossResultFrame())
+        FreeCADGui.addCommand('Radioss_ConvertResults', RadiossCommands.RadiossConvertResults())
         FreeCADGui.addCommand('Radioss_AnalysisProperties', RadiossCommands.RadiossAnalysisProperties())
         FreeCADGui.addCommand('LsDyna_Import', RadiossCommands.LsDynaImport())
+        FreeCADGui.addCommand('Radioss_LodToggle', RadiossCommands.RadiossLodToggle())
+        FreeCADGui.addCommand('Radioss_Profiling', RadiossCommands.RadiossProfiling())
+        FreeCADGui.addCommand('Radioss_TimeStep', RadiossCommands.RadiossTimeStepEstimate())
+        FreeCADGui.addCommand('Radioss_MeshQuality', RadiossCommands.RadiossMeshQuality())
+        FreeCADGui.addCommand('Radioss_Decomposition', RadiossCommands.RadiossDecomposition())
 
         # ツールバーの作成
         self.appendToolbar('Radioss Analysis', self.analysis_commands)
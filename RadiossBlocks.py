@@ -0,0 +1,59 @@
+"""Radiossデッキの大量データ行（節点・要素）を配列に変換する
+
+ワーカープロセスからも読み込めるよう、FreeCADには依存しない。
+"""
+import numpy as np
+
+# セクションキーワード -> (要素タイプ, 1行で読むフィールド数)
+BULK_SECTIONS = {
+    'NODE': ('NODE', 4),
+    'SHELL': ('SHELL', 5),
+    'SH3N': ('SH3N', 4),
+    'BRICK': ('SOLID', 9),
+    'TETRA4': ('SOLID', 5),
+}
+
+
+def bulk_kind(header):
+    """セクションヘッダーが配列化できるセクションなら(タイプ, フィールド数)を返す"""
+    if not header:
+        return None
+    fields = header.upper().split('/')
+    if len(fields) < 2:
+        return None
+    return BULK_SECTIONS.get(fields[1].strip())
+
+
+def header_id(header, position=2):
+    """セクションヘッダーのID（例: /SHELL/12 -> 12）"""
+    fields = header.split('/')
+    if len(fields) > position and fields[position].strip():
+        return int(fields[position])
+    return None
+
+
+def split_rows(lines, width):
+    """データ行を先頭widthフィールドの文字列表に分割（不足分は空）"""
+    rows = [line.replace(',', ' ').split()[:width] for line in lines]
+    if any(len(row) != width for row in rows):
+        rows = [row + [''] * (width - len(row)) for row in rows]
+    return rows
+
+
+def decode_block(kind, width, lines):
+    """ブロックを(ID配列, 値配列)に変換
+
+    節点は座標(n, 3)、要素は節点ID(n, width-1)（空欄・0は-1）を返す。
+    """
+    if not lines:
+        dtype = np.float64 if kind == 'NODE' else np.int64
+        return np.empty(0, dtype=np.int64), np.empty((0, 3 if kind == 'NODE' else width - 1), dtype=dtype)
+    table = np.array(split_rows(lines, width), dtype=object)
+    # 空欄は座標なら0、節点IDなら未使用(-1)
+    table[table == ''] = '0' if kind == 'NODE' else '-1'
+    ids = table[:, 0].astype(np.int64)
+    if kind == 'NODE':
+        return ids, table[:, 1:4].astype(np.float64)
+    conn = table[:, 1:].astype(np.int64)
+    conn[conn == 0] = -1
+    return ids, conn
@@ -3,14 +3,24 @@ import FreeCADGui
 import FemGui
 import Part
 import os
+import numpy as np
 from PySide2.QtWidgets import QFileDialog
 import ObjectsFem
+from collections import namedtuple
 from types import SimpleNamespace
 import Fem  # FemMeshのために追加
+import RadiossConnectors
+import RadiossCurves
+import RadiossMeshTools
+import RadiossNodeMerge
+import RadiossProfile
+import RadiossSets
+from RadiossMeshTools import lookup_by_id
 
 # from femtools.femutils import FemMesh の代わりに以下を使用
 FemMesh = Fem.FemMesh  # FemMeshクラスの取得
 
+
 class RadiossMaterial:
     def GetResources(self):
         return {'Pixmap': '',
@@ -84,6 +94,100 @@ class RadiossSet:
     def IsActive(self):
         return FemGui.getActiveAnalysis() is not None
 
+class RadiossCombineSets:
+    """選択したセットの和・積・差から新しいセットを作成"""
+    OPERATIONS = {
+        "Union": RadiossSets.IdSet.union,
+        "Intersection": RadiossSets.IdSet.intersection,
+        "Difference (first minus others)": RadiossSets.IdSet.difference,
+    }
+
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Combine Radioss Sets',
+                'ToolTip': 'Create a set from the union, intersection or difference of the selected sets'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QInputDialog
+        import RadiossModel
+        analysis = FemGui.getActiveAnalysis()
+        selection = [obj for obj in FreeCADGui.Selection.getSelection() if hasattr(obj, "SetType")]
+        if len(selection) < 2:
+            FreeCAD.Console.PrintError("Select at least two sets\n")
+            return
+        operation, ok = QInputDialog.getItem(None, "Combine Sets", "Operation:",
+                                             list(self.OPERATIONS), 0, False)
+        if not ok:
+            return
+        kinds, members = zip(*(RadiossModel.set_ids(obj) for obj in selection))
+        if len(set(kinds)) > 1:
+            FreeCAD.Console.PrintError("Cannot combine node sets with element sets\n")
+            return
+        result = self.OPERATIONS[operation](members[0], *members[1:])
+        set_obj = RadiossModel.make_set(FreeCAD.ActiveDocument, "CombinedSet", selection[0].SetType, result)
+        analysis.addObject(set_obj)
+        FreeCAD.Console.PrintMessage(f"{set_obj.Label}: {operation.split()[0].lower()} of "
+                                     f"{', '.join(obj.Label for obj in selection)}, {len(result)} members\n")
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+class RadiossSelectSet:
+    """箱・球・半空間・パート・面の法線で節点または要素を選び、セットを作成・更新"""
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Select Set by Geometry',
+                'ToolTip': 'Create or update a set from nodes or elements in a box, sphere, '
+                           'half-space, part or facing a direction'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QInputDialog
+        import RadiossSelection
+        analysis = FemGui.getActiveAnalysis()
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        text, ok = QInputDialog.getMultiLineText(
+            None, "Select Set",
+            "One condition per line (all must hold):\n"
+            "box x0 y0 z0 x1 y1 z1 | sphere cx cy cz r | plane px py pz nx ny nz\n"
+            "part id [id ...] | normal nx ny nz angle",
+            params.GetString("SelectionQuery", "box 0 0 0 10 10 10"))
+        if not ok:
+            return
+        try:
+            RadiossSelection.parse_queries(text)
+        except ValueError as e:
+            FreeCAD.Console.PrintError(f"{str(e)}\n")
+            return
+        params.SetString("SelectionQuery", text)
+        target, ok = QInputDialog.getItem(None, "Select Set", "Select:", ["Nodes", "Elements"], 0, False)
+        if not ok:
+            return
+        mode = 'all'
+        if target == "Elements":
+            mode, ok = QInputDialog.getItem(None, "Select Set", "Element nodes in the region:",
+                                            list(RadiossSelection.ELEMENT_MODES), 0, False)
+            if not ok:
+                return
+        name, ok = QInputDialog.getText(None, "Select Set", "Set name (existing sets are updated):",
+                                        text=params.GetString("SelectionSetName", "Selection"))
+        if not ok or not name:
+            return
+        params.SetString("SelectionSetName", name)
+        update, ok = QInputDialog.getItem(None, "Select Set", "Update existing set:",
+                                          list(RadiossSelection.UPDATE_MODES), 0, False)
+        if not ok:
+            return
+        try:
+            RadiossSelection.select_to_set(analysis, text, name, 'NODE' if target == "Nodes" else 'ELEM',
+                                           mode, update)
+        except ValueError as e:
+            FreeCAD.Console.PrintError(f"{str(e)}\n")
+            return
+        FreeCAD.ActiveDocument.recompute()
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
 class RadiossAnalysis:
     def GetResources(self):
         return {'Pixmap': '',
@@ -130,6 +234,12 @@ class RadiossAnalysisProperties:
                                  "Initial time step").TimeStep = 1.0e-6
             properties.addProperty("App::PropertyFloat", "DTScale", "Time", 
                                  "Time step scale factor").DTScale = 0.9
+            properties.addProperty("App::PropertyBool", "AutoTimeStep", "Time",
+                                 "Estimate the time step from the mesh on export").AutoTimeStep = False
+            properties.addProperty("App::PropertyBool", "MassScaling", "Time",
+                                 "Add nodal mass scaling to keep the time step above MinTimeStep").MassScaling = False
+            properties.addProperty("App::PropertyFloat", "MinTimeStep", "Time",
+                                 "Minimum time step for mass scaling").MinTimeStep = 0.0
             
             # 出力設定
             properties.addProperty("App::PropertyFloat", "PrintTime", "Output", 
@@ -175,201 +285,538 @@ class RadiossExport:
         # Engineファイルの名前を自動生成（拡張子をD00に変更）
         engine_filename = os.path.splitext(starter_filename[0])[0] + ".D00"
 
-        self.export_radioss_starter(analysis, starter_filename[0])
-        self.export_radioss_engine(analysis, engine_filename)
+        # 値の読み取りはここ（GUIスレッド）で済ませ、書き出しはバックグラウンドで実行
+        import RadiossTasks
+        context = RadiossTasks.TaskContext()
+        context.profiler = RadiossProfile.begin("Radioss export", starter_filename[0])
+        with RadiossProfile.stage("Reading analysis"):
+            model = self.snapshot(analysis)
+        check_quality = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss").GetBool(
+            "CheckQualityOnExport", True)
+
+        def finished(result):
+            self.apply_results(analysis, model)
+            FreeCAD.Console.PrintMessage(f"Exported {starter_filename[0]}\n")
+
+        RadiossTasks.run_task("Exporting Radioss deck",
+                              lambda context: self.export_files(model, starter_filename[0],
+                                                                engine_filename, context, check_quality),
+                              finished, context)
+
+    def snapshot(self, analysis):
+        """書き出しに使う解析の値（GUIスレッドで呼ぶ。RadiossModel.snapshot_analysis）"""
+        import RadiossModel
+        return RadiossModel.snapshot_analysis(analysis)
+
+    def apply_results(self, analysis, model):
+        """書き出し中に計算した剛体の質量特性をドキュメントに反映（GUIスレッドで呼ぶ）"""
+        import RadiossMassProperties
+        bodies = [body for body in model.rigid_bodies if body.auto]
+        if bodies:
+            RadiossMassProperties.apply_mass_properties(analysis.Document, bodies)
+
+    def export_files(self, model, starter_path, engine_path, context, check_quality=False):
+        """StarterとEngineを書き出し、キャンセル時は書きかけのファイルを削除
+
+        model: snapshotの戻り値（ワーカースレッドからはドキュメントに触れない）
+        check_quality: 書き出し前にメッシュ品質をレポートビューに出力する
+            （品質セットは作らない。セットはMesh Qualityコマンドで作る）
+        """
+        import RadiossModel
+        import RadiossTasks
+        if check_quality:
+            import RadiossQuality
+            if context is not None:
+                context.report("Checking mesh quality")
+            # 配列はキャッシュされ、続くprepare_exportでも同じものを使う
+            with RadiossProfile.stage("Mesh quality"):
+                RadiossQuality.report(RadiossQuality.check_arrays(
+                    [RadiossModel.snapshot_arrays(snapshot) for snapshot in model.meshes]))
+        try:
+            with RadiossProfile.stage("Starter deck"):
+                self.export_radioss_starter(model, starter_path, context)
+            with RadiossProfile.stage("Engine deck"):
+                self.export_radioss_engine(model, engine_path)
+        except RadiossTasks.TaskCancelled:
+            for path in (starter_path, engine_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+    def export_radioss_starter(self, model, filepath, context=None):
+        arrays = self.prepare_export(model, filepath, context)
+        if arrays is None:
+            return
+        with RadiossProfile.stage("Rigid body mass"):
+            self.compute_mass_properties(model)
 
-    def export_radioss_starter(self, analysis, filepath):
         with open(filepath, 'w') as f:
             # Write header
             f.write("/RADIOSS STARTER\n")
             f.write("# Generated by FreeCAD Radioss Workbench\n\n")
 
-            # Get mesh
-            mesh = None
-            for member in analysis.Group:
-                if member.isDerivedFrom("Fem::FemMeshObject"):
-                    mesh = member
-                    break
-
-            if not mesh:
-                FreeCAD.Console.PrintError("No mesh found in analysis!\n")
-                return
-
             # Write node definitions
-            f.write("/NODE\n")
-            for i, node in enumerate(mesh.FemMesh.Nodes, 1):
-                pos = mesh.FemMesh.Nodes[node]
-                f.write(f"{i:8d} {pos[0]:12.5E} {pos[1]:12.5E} {pos[2]:12.5E}\n")
+            with RadiossProfile.stage("Writing nodes"):
+                self.write_nodes(f, arrays, context)
 
             # Write element definitions
-            f.write("\n/ELEMENT/SHELL\n")
-            for i, elem in enumerate(mesh.FemMesh.Volumes, 1):
-                nodes = mesh.FemMesh.getElementNodes(elem)
-                node_str = " ".join([f"{n:8d}" for n in nodes])
-                f.write(f"{i:8d} {1:8d} {node_str}\n")
+            with RadiossProfile.stage("Writing elements"):
+                self.write_elements(f, arrays, context)
+
+            # パートとプロパティ（プロパティID = パートID）
+            with RadiossProfile.stage("Writing parts"):
+                self.write_parts(f)
+                self.write_properties(f)
             
+            # バネ・ビーム・RBE2などの結合要素
+            with RadiossProfile.stage("Writing connectors"):
+                self.write_connectors(f, model, context)
+
             # 剛体の出力
-            self.write_rbodies(f, analysis)
+            with RadiossProfile.stage("Writing rigid bodies"):
+                self.write_rbodies(f, model)
             
             # 接触の出力
-            self.write_contacts(f, analysis)
+            with RadiossProfile.stage("Writing contacts"):
+                self.write_contacts(f, model)
             
             # Write sets
-            self.write_sets(f, analysis)
+            with RadiossProfile.stage("Writing sets"):
+                self.write_sets(f, model)
 
             # Write materials
-            self.write_materials(f, analysis)
+            with RadiossProfile.stage("Writing materials"):
+                self.write_materials(f, model)
 
             # Write constraints
-            self.write_constraints(f, analysis)
+            with RadiossProfile.stage("Writing constraints"):
+                self.write_constraints(f, model)
 
-            # Write loads
-            self.write_loads(f, analysis)
+            # 荷重曲線と荷重
+            with RadiossProfile.stage("Writing functions"):
+                self.write_functions(f, model, context)
+            with RadiossProfile.stage("Writing loads"):
+                self.write_loads(f, model)
 
             f.write("\n/END\n")
-    
-    
-    def write_rbodies(self, f, analysis):
-        """剛体データの出力"""
-        f.write("\n# Rigid Bodies\n")
-        for obj in analysis.Group:
-            if hasattr(obj, 'RBodyName'):
-                f.write("/RBODY/LAGMUL\n")  # LAGMULタイプの剛体として出力
-                f.write(f"{obj.RBodyName}")
-                
-                # ノードセット参照
-                if obj.NodeSet:
-                    f.write(f" {obj.NodeSet.Name}")
-                
-                # 質量と重心
-                f.write(f" {obj.Mass:12.5E}")
-                com = obj.CenterOfMass
-                f.write(f" {com.x:12.5E} {com.y:12.5E} {com.z:12.5E}")
-                
-                # 慣性モーメント
-                inertia = obj.Inertia
-                f.write(f" {inertia.x:12.5E} {inertia.y:12.5E} {inertia.z:12.5E}")
-                
-                # 拘束条件
-                constraints = []
-                if obj.FixX: constraints.append(1)
-                if obj.FixY: constraints.append(2)
-                if obj.FixZ: constraints.append(3)
-                if obj.FixRX: constraints.append(4)
-                if obj.FixRY: constraints.append(5)
-                if obj.FixRZ: constraints.append(6)
-                if constraints:
-                    f.write(" " + " ".join(map(str, constraints)))
-                
-                f.write("\n")
 
-    def write_contacts(self, f, analysis):
+    def prepare_export(self, model, filepath, context=None):
+        """全メッシュを配列にまとめ、書き出し用のIDを決める（メッシュが無ければNone）"""
+        import RadiossModel
+        import RadiossRenumber
+
+        # 全メッシュ（パートごとのメッシュを含む）を1つの配列にまとめる
+        with RadiossProfile.stage("Collecting mesh"):
+            arrays = RadiossModel.merge_meshes(model.meshes)
+        if len(arrays.node_ids) == 0:
+            FreeCAD.Console.PrintError("No mesh found in analysis!\n")
+            return None
+
+        # 節点グループのIDは書き出しごとに1から振る
+        self.group_count = 0
+        self.parts = self.part_table(model, arrays)
+
+        # 節点・要素IDを1から詰め直し（設定により帯幅を小さくする順に並べ替え）
+        method = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss").GetString(
+            "ExportRenumber", "Compact")
+        if context is not None:
+            context.report("Renumbering")
+        with RadiossProfile.stage("Renumbering"):
+            self.numbering = RadiossRenumber.renumber(arrays, method)
+            map_path = os.path.splitext(filepath)[0] + "_idmap.npz"
+            RadiossRenumber.save_maps(map_path, self.numbering.nodes, self.numbering.elements)
+        FreeCAD.Console.PrintLog(f"Renumbering ({method}): bandwidth {self.numbering.bandwidth_before} -> "
+                                 f"{self.numbering.bandwidth_after}, id map saved to {map_path}\n")
+        return arrays
+
+    def export_mesh_include(self, model, filepath, context=None):
+        """変化しない部分（節点・要素・パート・剛体・セット・拘束・荷重）をインクルードファイルに出力
+
+        パートが参照するプロパティ・材料や接触のカードは、このファイルを#includeする
+        親デッキに書く（write_properties, write_materials）。
+        """
+        arrays = self.prepare_export(model, filepath, context)
+        if arrays is None:
+            return False
+        self.compute_mass_properties(model)
+        with open(filepath, 'w') as f:
+            f.write("# Mesh include generated by FreeCAD Radioss Workbench\n")
+            self.write_nodes(f, arrays, context)
+            self.write_elements(f, arrays, context)
+            self.write_parts(f)
+            self.write_connectors(f, model, context)
+            self.write_rbodies(f, model)
+            self.write_sets(f, model)
+            self.write_constraints(f, model)
+            self.write_functions(f, model, context)
+            self.write_loads(f, model)
+        return True
+
+    def part_table(self, model, arrays):
+        """書き出す要素のパート -> shell/solid（パートIDの配列）, mat（材料ID）, thickness（シェルの厚さ）
+
+        write_elementsと同じくパート0はパート1にする。材料と厚さはメッシュのパート表から
+        引き、無ければ最初の材料と既定の厚さを使う。
+        """
+        default_thickness = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss").GetFloat(
+            "DefaultShellThickness", 1.0)
+        material_ids = {card.id for card in model.material_cards}
+        default_mat = model.material_cards[0].id if model.material_cards else 0
+        part_mat, part_thickness = {}, {}
+        for snapshot in model.meshes:
+            for part_id, mat_id in zip(snapshot.part_ids.tolist(), snapshot.part_mat.tolist()):
+                part_mat[part_id] = mat_id if mat_id in material_ids else default_mat
+            for part_id, thickness in zip(snapshot.part_ids.tolist(), snapshot.part_thickness.tolist()):
+                if thickness > 0.0:
+                    part_thickness[part_id] = thickness
+
+        def used(kind):
+            parts = getattr(arrays, kind + '_parts', np.zeros(len(getattr(arrays, kind + '_ids')), dtype=np.int64))
+            return np.unique(np.where(parts > 0, parts, 1))
+
+        shell, solid = used('shell'), used('solid')
+        both = np.intersect1d(shell, solid)
+        if len(both):
+            FreeCAD.Console.PrintWarning(f"Parts {both.tolist()} contain shells and solids; "
+                                         f"only the shell property is written\n")
+            solid = np.setdiff1d(solid, both)
+        return SimpleNamespace(
+            shell=shell, solid=solid,
+            mat={part_id: part_mat.get(part_id, default_mat) for part_id in np.union1d(shell, solid).tolist()},
+            thickness={part_id: part_thickness.get(part_id, default_thickness) for part_id in shell.tolist()})
+
+    def write_parts(self, f):
+        """書き出す要素のパートを/PART（プロパティID = パートID、材料ID）として出力"""
+        f.write("\n# Parts\n")
+        for part_id, mat_id in sorted(self.parts.mat.items()):
+            f.write(f"/PART/{part_id}\nPART_{part_id}\n"
+                    f"#  prop_ID    mat_ID\n{part_id:10d}{mat_id:10d}\n")
+
+    def write_properties(self, f, thickness=None):
+        """/PROP/SHELLと/PROP/SOLIDを出力（thickness: パートID -> 厚さで既定値を置き換える）"""
+        thickness = {**self.parts.thickness, **(thickness or {})}
+        f.write("\n# Properties\n")
+        for part_id in self.parts.shell.tolist():
+            # Ishell=24（QEPH）、hm/hf/hrは既定値、積分点5
+            f.write(f"/PROP/SHELL/{part_id}\nPROP_{part_id}\n"
+                    f"#   Ishell    Ismstr     Ish3n\n{24:10d}{0:10d}{0:10d}\n"
+                    f"#                 hm                  hf                  hr\n"
+                    f"{0.0:20.6E}{0.0:20.6E}{0.0:20.6E}\n"
+                    f"#        N   Istrain               Thick\n{5:10d}{0:10d}{thickness[part_id]:20.6E}\n")
+        for part_id in self.parts.solid.tolist():
+            # Isolid=14（HA8）
+            f.write(f"/PROP/SOLID/{part_id}\nPROP_{part_id}\n"
+                    f"#   Isolid    Ismstr\n{14:10d}{0:10d}\n")
+
+    def compute_mass_properties(self, model):
+        """質量特性を自動計算する剛体の値をmodelの中で更新（ドキュメントへはapply_resultsで反映）"""
+        if any(body.auto for body in model.rigid_bodies):
+            import RadiossMassProperties
+            RadiossMassProperties.compute_mass_properties(model)
+
+    def write_table(self, f, rows, fmt, context=None, stage=None, chunk=100000):
+        """配列の各行をfmtで書き出す（chunk行ごとに進捗を報告）"""
+        for start in range(0, len(rows), chunk):
+            block = rows[start:start + chunk].tolist()
+            f.write("".join(fmt % tuple(row) for row in block))
+            if context is not None:
+                context.report(stage, lines=start + len(block))
+
+    def write_nodes(self, f, arrays, context=None):
+        """新しい節点IDの順に節点を出力"""
+        numbering = self.numbering
+        rows = np.column_stack([np.arange(1, len(numbering.node_order) + 1),
+                                arrays.coords[numbering.node_order]])
+        f.write("/NODE\n")
+        self.write_table(f, rows, "%10d %19.11E %19.11E %19.11E\n", context, "Writing nodes")
+
+    def write_elements(self, f, arrays, context=None):
+        """パートごとに/SHELL, /SH3N, /BRICK, /TETRA4として要素を出力"""
+        numbering = self.numbering
+        new_node = np.empty(len(arrays.node_ids), dtype=np.int64)
+        new_node[numbering.node_order] = np.arange(1, len(arrays.node_ids) + 1)
+        shell_parts = getattr(arrays, 'shell_parts', np.zeros(len(arrays.shell_ids), dtype=np.int64))
+        solid_parts = getattr(arrays, 'solid_parts', np.zeros(len(arrays.solid_ids), dtype=np.int64))
+
+        first_id = 1
+        for conn, parts, order, kinds in (
+                (arrays.shells, shell_parts, numbering.shell_order,
+                 (('SHELL', 4), ('SH3N', 3))),
+                (arrays.solids, solid_parts, numbering.solid_order,
+                 (('BRICK', 8), ('TETRA4', 4)))):
+            if len(order) == 0:
+                continue
+            conn = conn[order]
+            parts = np.where(parts[order] > 0, parts[order], 1)
+            second = RadiossMeshTools.is_triangle(conn) if kinds[0][0] == 'SHELL' else conn[:, 4] < 0
+            elem_ids = np.arange(first_id, first_id + len(order))
+            first_id += len(order)
+            # 並べ替え済みなので(パート, 種類)の変わり目でセクションを分ける
+            key = parts * 2 + second
+            bounds = np.flatnonzero(np.diff(key)) + 1
+            for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(key)]])):
+                keyword, width = kinds[int(second[start])]
+                f.write(f"/{keyword}/{parts[start]}\n")
+                rows = np.column_stack([elem_ids[start:end], new_node[conn[start:end, :width]]])
+                self.write_table(f, rows, "%10d" + " %10d" * width + "\n", context, "Writing elements")
+
+    def write_connectors(self, f, model, context=None):
+        """結合要素の表を/SPRING, /BEAM（パートごと）と/RBE2, /RBE3, /RBODY（1つずつ）で出力
+
+        節点IDは書き出し用のIDに変換し、メッシュに無い節点を参照する要素は警告して除く。
+        バネ・ビームの要素IDはメッシュの要素の後に続けて振る。
+        スポット溶接は2節点の剛体結合（/RBE2）として出力する。
+        """
+        tables = model.connectors
+        if not any(len(table) for table in tables.values()):
+            return
+        f.write("\n# Connectors\n")
+        numbering = getattr(self, 'numbering', None)
+        if numbering is not None:
+            to_new = numbering.nodes.to_new
+            next_id = len(numbering.elements) + 1
+        else:
+            to_new = lambda ids: np.asarray(ids, dtype=np.int64)
+            next_id = None
+
+        def report_skipped(table, keep):
+            skipped = len(keep) - int(keep.sum())
+            if skipped:
+                FreeCAD.Console.PrintWarning(f"{table.kind}: {skipped} connectors reference nodes "
+                                             f"not found in the mesh and are skipped\n")
+
+        for kind, width in (('SPRING', 2), ('BEAM', 3)):
+            table = tables[kind]
+            if not len(table):
+                continue
+            conn = table.padded(width)
+            new = to_new(conn)
+            keep = ~((conn > 0) & (new < 0)).any(axis=1)
+            report_skipped(table, keep)
+            if not keep.any():
+                continue
+            parts = np.where(table.parts[keep] > 0, table.parts[keep], 1)
+            order = np.argsort(parts, kind='stable')
+            parts = parts[order]
+            conn = np.maximum(new[keep][order], 0)  # 未使用の節点は0
+            if next_id is not None:
+                elem_ids = np.arange(next_id, next_id + len(parts))
+                next_id += len(parts)
+            else:
+                elem_ids = table.ids[keep][order]
+            bounds = np.flatnonzero(np.diff(parts)) + 1
+            for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(parts)]])):
+                f.write(f"/{kind}/{parts[start]}\n")
+                self.write_table(f, np.column_stack([elem_ids[start:end], conn[start:end]]),
+                                 "%10d" + " %10d" * width + "\n", context, "Writing connectors")
+
+        # スポット溶接のIDはRBE2のIDと重ならないようにずらす
+        rbe2_max = int(tables['RBE2'].ids.max()) if len(tables['RBE2']) else 0
+        cards = {'RBE2': RadiossConnectors.rbe2_card, 'RBE3': RadiossConnectors.rbe3_card,
+                 'RBODY': RadiossConnectors.rbody_card}
+        for kind, keyword, id_offset in (('RBE2', 'RBE2', 0), ('SPOTWELD', 'RBE2', rbe2_max),
+                                         ('RBE3', 'RBE3', 0), ('RBODY', 'RBODY', 0)):
+            table = tables[kind]
+            if not len(table):
+                continue
+            new = to_new(table.nodes)
+            keep = np.ones(len(table), dtype=bool)
+            keep[np.searchsorted(table.offsets, np.flatnonzero(new < 0), side='right') - 1] = False
+            report_skipped(table, keep)
+            offsets, new = table.offsets.tolist(), new.tolist()
+            blocks = []
+            for pos in np.flatnonzero(keep).tolist():
+                old_id = int(table.ids[pos])
+                elem_id = old_id + id_offset
+                nodes = new[offsets[pos]:offsets[pos + 1]]
+                # 主節点はカードに、従節点は節点グループに書く
+                group_id = self.new_group_id()
+                blocks.append(RadiossConnectors.node_group_card(group_id, f"{keyword}_{elem_id}", nodes[1:]))
+                blocks.append(cards[keyword](elem_id, table.title(old_id) or f"{kind}_{old_id}",
+                                             nodes[0], group_id))
+            f.write("".join(blocks))
+
+    def new_group_id(self):
+        """書き出す/GRNOD/NODEの新しいID"""
+        self.group_count = getattr(self, 'group_count', 0) + 1
+        return self.group_count
+
+    def write_rbodies(self, f, model):
+        """剛体（RadiossRigidBody）を/RBODYとして出力
+
+        主節点は重心に新しい節点として作り、ノードセットの節点を/GRNOD/NODEで
+        従節点にする。質量特性を自動計算した剛体はその値が節点の質量を含むので、
+        ICoG=4（従節点の質量を数えない）とする。それ以外は質量・慣性を主節点に加える。
+        拘束条件は主節点の/BCSとして出力する。
+        """
+        if not model.rigid_bodies:
+            return
+        f.write("\n# Rigid Bodies\n")
+        first_node = len(self.numbering.node_order) + 1
+        table = model.connectors['RBODY']
+        first_id = int(table.ids.max()) + 1 if len(table) else 1
+
+        # 主節点（メッシュの節点の後に続けて番号を振る）
+        f.write("/NODE\n")
+        for k, body in enumerate(model.rigid_bodies):
+            f.write(f"{first_node + k:10d}" + "".join(f" {value:19.11E}" for value in body.center) + "\n")
+
+        blocks = []
+        for k, body in enumerate(model.rigid_bodies):
+            main = first_node + k
+            group_id = self.new_group_id()
+            members = self.map_ids(body.members, 'NODE', body.rbody_name)
+            blocks.append(RadiossConnectors.node_group_card(group_id, f"{body.rbody_name}_nodes", members))
+            # 慣性（Ixx Iyy Izz Ixy Iyz Ixz）
+            inertia = body.tensor if len(body.tensor) == 6 else list(body.inertia) + [0.0, 0.0, 0.0]
+            blocks.append(RadiossConnectors.rbody_card(first_id + k, body.rbody_name, main, group_id,
+                                                       body.mass, inertia, 4 if body.auto else 1))
+            if body.fixes:
+                fixed = "".join('1' if dof in body.fixes else '0' for dof in range(1, 7))
+                group_id = self.new_group_id()
+                blocks.append(RadiossConnectors.node_group_card(group_id, f"{body.rbody_name}_main", [main]))
+                blocks.append(f"/BCS/{first_id + k}\n{body.rbody_name}_fix\n"
+                              f"{fixed[:3] + ' ' + fixed[3:]:>10s}{0:10d}{group_id:10d}\n")
+        f.write("".join(blocks))
+
+    def write_contacts(self, f, model):
         """接触データの出力"""
         f.write("\n# Contacts\n")
-        for obj in analysis.Group:
-            if hasattr(obj, 'ContactName'):
-                f.write(f"/INTER/{obj.ContactType}\n")
-                f.write(f"{obj.ContactName}")
-                
-                # スレーブ/マスターセット参照
-                if obj.SlaveSet:
-                    f.write(f" {obj.SlaveSet.Name}")
-                if obj.MasterSet:
-                    f.write(f" {obj.MasterSet.Name}")
-                
-                # 接触パラメータ
-                f.write(f" {obj.Gap:12.5E}")
-                f.write(f" {obj.Friction:12.5E}")
-                f.write(f" {obj.Stiffness:12.5E}")
-                f.write(f" {obj.Damping:12.5E}")
-                
-                f.write("\n")
-    
-    
-    def write_sets(self, f, analysis):
+        for contact in model.contacts:
+            f.write(f"/INTER/{contact.contact_type}\n")
+            f.write(f"{contact.contact_name}")
+
+            # スレーブ/マスターセット参照
+            if contact.slave:
+                f.write(f" {contact.slave}")
+            if contact.master:
+                f.write(f" {contact.master}")
+
+            # 接触パラメータ
+            f.write(f" {contact.gap:12.5E}")
+            f.write(f" {contact.friction:12.5E}")
+            f.write(f" {contact.stiffness:12.5E}")
+            f.write(f" {contact.damping:12.5E}")
+
+            f.write("\n")
+
+
+    def write_sets(self, f, model):
         f.write("\n# Sets\n")
-        for member in analysis.Group:
-            if hasattr(member, "SetType"):
-                f.write(f"/SET/{member.SetType}\n")
-                f.write(f"{member.Name}\n")
-                # Get node or element IDs from references
-                ids = self.get_ids_from_references(member.References)
-                # Write IDs in groups of 8
-                for i in range(0, len(ids), 8):
-                    f.write(" ".join(f"{id:8d}" for id in ids[i:i+8]) + "\n")
-
-    def write_materials(self, f, analysis):
+        numbering = getattr(self, 'numbering', None)
+        for member in model.sets:
+            f.write(f"/SET/{member.set_type}\n")
+            f.write(f"{member.name}\n")
+            # メンバーのIDを書き出し用のIDに変換
+            ids = member.ids
+            if numbering is not None:
+                ids, missing = ids.map(numbering.nodes if member.kind == 'NODE' else numbering.elements)
+                if missing:
+                    FreeCAD.Console.PrintWarning(f"{member.name}: {missing} ids not found in the mesh\n")
+            # 連続したIDはRANGE行、残りは1行に8個
+            f.write("".join(RadiossSets.format_lines(ids)))
+
+    def map_ids(self, ids, kind, name):
+        """旧ID -> 書き出し用の新ID（メッシュに無いIDは警告して除く）"""
+        numbering = getattr(self, 'numbering', None)
+        ids = np.asarray(ids, dtype=np.int64)
+        if numbering is None or not len(ids):
+            return ids.tolist()
+        mapped = (numbering.nodes if kind == 'NODE' else numbering.elements).to_new(ids)
+        missing = int((mapped < 0).sum())
+        if missing:
+            FreeCAD.Console.PrintWarning(f"{name}: {missing} ids not found in the mesh\n")
+        return mapped[mapped >= 0].tolist()
+
+    def write_materials(self, f, model):
+        """材料を/MAT/LAWxx/<ID>として出力（タイトル / 密度 / E nu / 則の係数、parse_materialと同じ並び）
+
+        LAW0は密度だけ、LAW1は弾性定数まで書く。それ以外はLAW2（a b n）とし、
+        a = 降伏応力、b = 硬化係数、n = 1（線形硬化）とする。LAW36は応力-ひずみ
+        曲線を持たないので、同じ2直線の硬化になるLAW2として書く。
+        """
+        import RadiossModel
         f.write("\n# Materials\n")
-        for member in analysis.Group:
-            if member.isDerivedFrom("App::MaterialObjectPython"):
-                mat = member.Material
-                f.write(f"/MAT/{mat.get('RadiossType', 'LAW2')}\n")
-                f.write(f"{member.Name}\n")
-                # Write material properties
-                f.write(f"{float(mat['YoungsModulus'].split()[0]):12.5E} ")  # E
-                f.write(f"{float(mat['PoissonRatio']):12.5E} ")              # nu
-                f.write(f"{float(mat['Density'].split()[0]):12.5E} ")        # rho
-                f.write(f"{float(mat['YieldStrength'].split()[0]):12.5E} ")  # yield stress
-                f.write(f"{float(mat.get('HardeningParam', '0.0')):12.5E}\n")  # hardening parameter
-
-    def write_constraints(self, f, analysis):
+        for member in model.material_cards:
+            mat = member.card
+            law = mat.get('RadiossType', 'LAW2')
+            if law not in ('LAW0', 'LAW1', 'LAW2'):
+                FreeCAD.Console.PrintLog(f"{member.name}: {law} written as LAW2 (bilinear hardening)\n")
+                law = 'LAW2'
+            # 材料定数（デッキの単位系に換算）
+            f.write(f"/MAT/{law}/{member.id}\n{member.name}\n"
+                    f"#              RHO_I\n{RadiossModel.material_value(mat, 'Density'):20.6E}\n")
+            if law == 'LAW0':
+                continue
+            f.write(f"#                  E                  nu\n"
+                    f"{RadiossModel.material_value(mat, 'YoungsModulus'):20.6E}"
+                    f"{RadiossModel.material_value(mat, 'PoissonRatio'):20.6E}\n")
+            if law == 'LAW2':
+                f.write(f"#                  a                   b                   n\n"
+                        f"{RadiossModel.material_value(mat, 'YieldStrength'):20.6E}"
+                        f"{RadiossModel.material_value(mat, 'HardeningParam'):20.6E}{1.0:20.6E}\n")
+
+    def write_constraints(self, f, model):
         f.write("\n# Boundary Conditions\n")
-        for member in analysis.Group:
-            if member.isDerivedFrom("Fem::ConstraintFixed"):
-                f.write("/BOUND/FIXED\n")
-                f.write(f"{member.Name}\n")
-                # Get node set for the constraint
-                nodes = self.get_constrained_nodes(member)
-                for i in range(0, len(nodes), 8):
-                    f.write(" ".join(f"{node:8d}" for node in nodes[i:i+8]) + "\n")
-
-    def write_loads(self, f, analysis):
+        for member in model.constraints:
+            f.write("/BOUND/FIXED\n")
+            f.write(f"{member.name}\n")
+            # 拘束の参照節点（書き出し用のID）
+            nodes = self.map_ids(member.nodes, 'NODE', member.name)
+            for i in range(0, len(nodes), 8):
+                f.write(" ".join(f"{node:8d}" for node in nodes[i:i+8]) + "\n")
+
+    def write_functions(self, f, model, context=None):
+        """解析内の曲線表の全曲線を/FUNCTとして出力"""
+        curves = model.curves
+        if not len(curves):
+            return
+        f.write("\n# Functions\n")
+        for curve_id in curves.ids.tolist():
+            x, y = curves.curve(curve_id)
+            f.write(f"/FUNCT/{curve_id}\n{curves.name(curve_id)}\n")
+            f.write("#                  X                   Y\n")
+            self.write_table(f, np.column_stack([x, y]), "%20.10E%20.10E\n", context, "Writing functions")
+
+    def write_loads(self, f, model):
+        """荷重を/CLOADとして出力（1方向成分ごとに1枚、節点は/GRNOD/NODE）
+
+        Fem::ConstraintForceのForceは参照節点の合計なので、節点あたりの値を
+        Fscale_yにする。時間関数の無い荷重には一定値1の/FUNCTを作って参照する。
+        """
+        if not model.loads:
+            return
         f.write("\n# Loads\n")
-        for member in analysis.Group:
-            if member.isDerivedFrom("Fem::ConstraintForce"):
-                f.write("/LOAD/FORCE\n")
-                f.write(f"{member.Name}\n")
-                # Write force magnitude and direction
-                f.write(f"{member.Force:12.5E} ")
-                f.write(f"{member.DirectionVector.x:12.5E} ")
-                f.write(f"{member.DirectionVector.y:12.5E} ")
-                f.write(f"{member.DirectionVector.z:12.5E}\n")
-                # Get nodes where force is applied
-                nodes = self.get_force_nodes(member)
-                for i in range(0, len(nodes), 8):
-                    f.write(" ".join(f"{node:8d}" for node in nodes[i:i+8]) + "\n")
-
-    def get_ids_from_references(self, references):
-        # Helper method to get IDs from references
-        ids = []
-        for ref in references:
-            # Add logic to extract IDs based on reference type
-            pass
-        return ids
-
-    def get_constrained_nodes(self, constraint):
-        # Helper method to get nodes for constraint
-        nodes = []
-        # Add logic to get constrained nodes
-        return nodes
-
-    def get_force_nodes(self, force):
-        # Helper method to get nodes for force
-        nodes = []
-        # Add logic to get force application nodes
-        return nodes
+        curve_ids = model.curves.ids if len(model.curves) else np.empty(0, dtype=np.int64)
+        constant_id = int(curve_ids.max(initial=0)) + 1
+        if any(member.curve_id <= 0 for member in model.loads):
+            f.write(f"/FUNCT/{constant_id}\nCONSTANT\n{0.0:20.10E}{1.0:20.10E}\n{1.0:20.10E}{1.0:20.10E}\n")
+        load_id = 0
+        for member in model.loads:
+            nodes = self.map_ids(member.nodes, 'NODE', member.name)
+            direction = np.asarray(member.direction, dtype=np.float64)
+            length = float(np.linalg.norm(direction))
+            if not nodes or length == 0.0:
+                FreeCAD.Console.PrintWarning(f"{member.name}: no nodes or direction, load skipped\n")
+                continue
+            group_id = self.new_group_id()
+            f.write(RadiossConnectors.node_group_card(group_id, f"{member.name}_nodes", nodes))
+            curve_id = member.curve_id if member.curve_id > 0 else constant_id
+            scale = member.force / len(nodes) * direction / length
+            for axis, value in zip("XYZ", scale.tolist()):
+                if value == 0.0:
+                    continue
+                load_id += 1
+                f.write(f"/CLOAD/{load_id}\n{member.name}\n"
+                        f"#  funct_IDT       Dir   skew_ID sensor_ID  grnod_ID            Ascale_x            Fscale_y\n"
+                        f"{curve_id:10d}{axis:>10s}{0:10d}{0:10d}{group_id:10d}{1.0:20.6E}{value:20.6E}\n")
 
     def IsActive(self):
         return FemGui.getActiveAnalysis() is not None
     
-    def export_radioss_engine(self, analysis, filepath):
-        # 解析プロパティの取得
-        properties = None
-        for obj in analysis.Group:
-            if obj.Name.startswith("RadiossProperties"):
-                properties = obj
-                break
-
+    def export_radioss_engine(self, model, filepath):
+        # 解析プロパティ（snapshotで読み取った値）
+        properties = model.properties
         if not properties:
             FreeCAD.Console.PrintWarning("No analysis properties found. Using defaults.\n")
             return
@@ -383,9 +830,17 @@ class RadiossExport:
             f.write("/RUN/1\n")
             f.write(f"{properties.TerminationTime:12.5E}\n")
             
-            # タイムステップ制御
+            # タイムステップ制御（/DTの行は Δt_sca Δt_min。AutoTimeStepの推定値は報告だけ）
+            if properties.AutoTimeStep:
+                import RadiossTimeStep
+                RadiossTimeStep.report(
+                    RadiossTimeStep.estimate_meshes(model.meshes, model.materials), properties.DTScale)
             f.write("/DT\n")
-            f.write(f"{properties.TimeStep:12.5E} {properties.DTScale:12.5E}\n")
+            f.write(f"{properties.DTScale:12.5E} {0.0:12.5E}\n")
+            if properties.MassScaling and properties.MinTimeStep > 0.0:
+                # 節点時間増分をMinTimeStep以上に保つ質量スケーリング
+                f.write("/DT/NODA/CST\n")
+                f.write(f"{properties.DTScale:12.5E} {properties.MinTimeStep:12.5E}\n")
             
             # 出力制御
             f.write("/PRINT/-1\n")
@@ -431,6 +886,297 @@ class RadiossExport:
 
 
 
+class RadiossTimeStepEstimate:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Estimate Time Step',
+                'ToolTip': 'Estimate the critical time step from the mesh and materials'}
+
+    def Activated(self):
+        import RadiossTimeStep
+        analysis = FemGui.getActiveAnalysis()
+        properties = None
+        for obj in analysis.Group:
+            if obj.Name.startswith("RadiossProperties"):
+                properties = obj
+                break
+
+        result = RadiossTimeStep.estimate_and_report(analysis, properties)
+        if result is not None and properties is not None:
+            properties.TimeStep = result.dt_min
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+
+class RadiossMeshQuality:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Check Mesh Quality',
+                'ToolTip': 'Check aspect ratio, warpage, skew, Jacobian and length of all elements'}
+
+    def Activated(self):
+        import RadiossQuality
+        analysis = FemGui.getActiveAnalysis()
+        if RadiossQuality.check_and_report(analysis) is not None:
+            FreeCAD.ActiveDocument.recompute()
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+
+class RadiossDecomposition:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Preview Domain Decomposition',
+                'ToolTip': 'Split the model into MPI domains and show the estimated load balance'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QInputDialog
+        import RadiossDecomposition
+        analysis = FemGui.getActiveAnalysis()
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        domains, ok = QInputDialog.getInt(None, "Domain Decomposition", "Number of domains (-np):",
+                                          params.GetInt("DecompositionDomains", 32), 1, 4096)
+        if not ok:
+            return
+        params.SetInt("DecompositionDomains", domains)
+        RadiossDecomposition.preview(analysis, domains)
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+
+class RadiossRun:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Run OpenRadioss',
+                'ToolTip': 'Queue exported decks and run starter and engine on the local machine'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QFileDialog
+        import RadiossRunManager
+        filenames = QFileDialog.getOpenFileNames(None, "Run Radioss Decks", None,
+                                                 "Radioss Starter (*.rad);;DOE Manifest (*_doe.json)")
+        if filenames[0]:
+            RadiossRunManager.submit_decks(filenames[0])
+
+    def IsActive(self):
+        return True
+
+
+class RadiossMonitor:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Monitor Radioss Run',
+                'ToolTip': 'Follow an engine listing (.out) and plot time step, energies and errors live'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QFileDialog
+        import RadiossListing
+        filename = QFileDialog.getOpenFileName(None, "Monitor Radioss Engine Listing",
+                                               None, "Radioss Engine Listing (*.out)")
+        if filename[0]:
+            RadiossListing.make_monitor_panel(filename[0])
+
+    def IsActive(self):
+        return True
+
+
+class RadiossLoadResults:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Load Radioss Results',
+                'ToolTip': 'Open animation files (A001...) and attach them to the analysis mesh'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QFileDialog
+        import RadiossModel
+        import RadiossResults
+        analysis = FemGui.getActiveAnalysis()
+        meshes = RadiossModel.mesh_objects(analysis)
+        if not meshes:
+            FreeCAD.Console.PrintError("No mesh found in analysis!\n")
+            return
+        filename = QFileDialog.getOpenFileName(None, "Load Radioss Animation", None,
+                                               "Radioss Animation (*A[0-9][0-9][0-9]*);;All Files (*)")
+        if not filename[0]:
+            return
+        try:
+            RadiossResults.attach_results(filename[0], meshes[0], analysis)
+            FreeCAD.ActiveDocument.recompute()
+        except (OSError, RadiossResults.AnimFormatError) as e:
+            FreeCAD.Console.PrintError(f"Error loading results: {str(e)}\n")
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+
+class RadiossConvertResults:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Convert Radioss Results',
+                'ToolTip': 'Convert animation files to a compressed VTU series (.pvd) or VTKHDF file'}
+
+    def Activated(self):
+        import RadiossConvert
+        import RadiossResults
+        import RadiossTasks
+        filename = QFileDialog.getOpenFileName(None, "Convert Radioss Animation", None,
+                                               "Radioss Animation (*A[0-9][0-9][0-9]*);;All Files (*)")
+        if not filename[0]:
+            return
+        output = QFileDialog.getSaveFileName(None, "Save Converted Results", None,
+                                             "VTU Series (*.pvd);;VTKHDF (*.vtkhdf)")
+        if not output[0]:
+            return
+
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        workers = params.GetInt("ConvertWorkers", 0) or None
+        level = params.GetInt("ConvertCompressionLevel", 6)
+        total = sum(os.path.getsize(p) for p in RadiossResults.animation_files(filename[0]))
+        RadiossTasks.run_task("Converting Radioss results",
+                              lambda context: RadiossConvert.convert(filename[0], output[0], workers,
+                                                                     level, context),
+                              lambda stats: FreeCAD.Console.PrintMessage(RadiossConvert.format_stats(stats)),
+                              RadiossTasks.TaskContext(total))
+
+    def IsActive(self):
+        return True
+
+
+class RadiossResultFrame:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Select Result Frame',
+                'ToolTip': 'Load another animation frame into the selected Radioss result'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QInputDialog
+        import RadiossResults
+        result_obj = self.result_object()
+        if result_obj is None:
+            FreeCAD.Console.PrintWarning("No Radioss result found\n")
+            return
+        frame, ok = QInputDialog.getInt(None, "Result Frame", f"Frame (0-{result_obj.FrameCount - 1}):",
+                                        result_obj.Frame, 0, max(result_obj.FrameCount - 1, 0))
+        if ok:
+            RadiossResults.show_frame(result_obj, frame)
+            FreeCAD.ActiveDocument.recompute()
+
+    def result_object(self):
+        selection = [obj for obj in FreeCADGui.Selection.getSelection() if hasattr(obj, "ResultFile")]
+        if selection:
+            return selection[0]
+        results = [obj for obj in FreeCAD.ActiveDocument.Objects if hasattr(obj, "ResultFile")]
+        return results[-1] if results else None
+
+    def IsActive(self):
+        return FreeCAD.ActiveDocument is not None
+
+
+class RadiossDOE:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Export Parameter Study',
+                'ToolTip': 'Write a shared mesh include and one small deck per parameter variant'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QInputDialog
+        import RadiossDOE
+        import RadiossTasks
+        analysis = FemGui.getActiveAnalysis()
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        text, ok = QInputDialog.getMultiLineText(
+            None, "Parameter Study",
+            "One parameter per line: kind [target=name] low high [levels]\n"
+            f"Kinds: {', '.join(RadiossDOE.KINDS)}",
+            params.GetString("DOEParameters", "Friction 0.1 0.3 3\nDTScale 0.6 0.9 2"))
+        if not ok:
+            return
+        try:
+            parameters = RadiossDOE.parse_parameters(text)
+        except ValueError as e:
+            FreeCAD.Console.PrintError(f"{str(e)}\n")
+            return
+        if not parameters:
+            return
+        params.SetString("DOEParameters", text)
+        method, ok = QInputDialog.getItem(None, "Parameter Study", "Method:",
+                                          list(RadiossDOE.METHODS), 0, False)
+        if not ok:
+            return
+        samples = None
+        if method == "Latin hypercube":
+            samples, ok = QInputDialog.getInt(None, "Parameter Study", "Number of variants:",
+                                              params.GetInt("DOESamples", 20), 1, 100000)
+            if not ok:
+                return
+            params.SetInt("DOESamples", samples)
+        filename = QFileDialog.getSaveFileName(None, "Export Parameter Study", None,
+                                               "Radioss Starter (*.rad)")
+        if not filename[0]:
+            return
+
+        base = os.path.splitext(filename[0])[0]
+        exporter = RadiossExport()
+        model = exporter.snapshot(analysis)
+
+        def finished(path):
+            if path:
+                exporter.apply_results(analysis, model)
+                FreeCAD.Console.PrintMessage(f"Wrote DOE manifest {path}\n")
+
+        RadiossTasks.run_task("Exporting parameter study",
+                              lambda context: RadiossDOE.export_doe(model, base, parameters, method,
+                                                                    samples, context=context),
+                              finished)
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+
+class RadiossLodToggle:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Toggle Level of Detail',
+                'ToolTip': 'Switch large meshes between a decimated proxy and full detail'}
+
+    def Activated(self):
+        import RadiossLod
+        doc = FreeCAD.ActiveDocument
+        if RadiossLod.is_enabled(doc):
+            RadiossLod.disable_lod(doc)
+            return
+
+        # プロキシが無いメッシュはバックグラウンドで作成（ドキュメントに保存される）
+        missing = [obj for obj in doc.Objects
+                   if obj.isDerivedFrom("Fem::FemMeshObject") and not getattr(obj, "LodProxy", None)]
+        if missing:
+            RadiossLod.build_lod_proxies(missing)
+        else:
+            RadiossLod.enable_lod(doc)
+
+    def IsActive(self):
+        return FreeCAD.ActiveDocument is not None
+
+
+class RadiossProfiling:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Profile Import/Export',
+                'ToolTip': 'Time each import/export stage and write a report to the Report view and a JSON file',
+                'Checkable': RadiossProfile.enabled()}
+
+    def Activated(self, checked=None):
+        enabled = not RadiossProfile.enabled() if checked is None else bool(checked)
+        FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss").SetBool("ProfileCommands", enabled)
+        FreeCAD.Console.PrintMessage(f"Import/export profiling {'enabled' if enabled else 'disabled'}\n")
+
+    def IsActive(self):
+        return True
+
+
 class RadiossImport:
     def GetResources(self):
         return {'Pixmap': '',
@@ -453,44 +1199,132 @@ class RadiossImport:
         self.import_radioss(analysis, filename[0])
 
     def import_radioss(self, analysis, filepath):
-        """RadiossファイルをインポートしてFreeCADオブジェクトを作成"""
-        FreeCAD.Console.PrintLog(f"Importing Radioss file: {filepath}\n")
-        try:
-            print(f"Reading file: {filepath}\n")
-            with open(filepath, 'r') as f:
-                lines = f.readlines()
+        """RadiossファイルをインポートしてFreeCADオブジェクトを作成
 
-            print(f"Parsing {len(lines)} lines\n")
-            # パーサーの初期化
-            parser = RadiossFileParser()
-            model_data = parser.parse(lines)
-
-            # パース結果の確認
-            print(f"Parsed data summary:\n")
-            print(f"Nodes: {len(model_data.nodes)}\n")
-            print(f"Elements: {len(model_data.elements)}\n")
-            print(f"Materials: {len(model_data.materials)}\n")
-
-            # FreeCADオブジェクトの作成
-            self.create_freecad_objects(analysis, model_data)
+        読み込み・解析・FemMeshの構築はバックグラウンドで行い、
+        ドキュメントへの反映のみGUIスレッドで実行する。
+        """
+        import RadiossTasks
+        FreeCAD.Console.PrintLog(f"Importing Radioss file: {filepath}\n")
+        if self.use_pipeline(filepath):
+            work = lambda context: self.read_radioss_pipelined(filepath, context)
+        else:
+            work = lambda context: self.read_radioss(filepath, context)
+        context = RadiossTasks.TaskContext(os.path.getsize(filepath))
+        context.profiler = RadiossProfile.begin("Radioss import", filepath)
+        RadiossTasks.run_task("Importing Radioss model", work,
+                              lambda model_data: self.populate_document(analysis, model_data),
+                              context)
+
+    def read_radioss(self, filepath, context):
+        """ファイルを解析してFemMeshを構築（ワーカースレッド）"""
+        FreeCAD.Console.PrintLog(f"Reading file: {filepath}\n")
+        context.report("Reading")
+        with RadiossProfile.stage("Reading"), open(filepath, 'r') as f:
+            lines = f.readlines()
 
-            FreeCAD.ActiveDocument.recompute()
-            
+        FreeCAD.Console.PrintLog(f"Parsing {len(lines)} lines\n")
+        # パーサーの初期化
+        parser = RadiossFileParser()
+        with RadiossProfile.stage("Parsing"):
+            model_data = parser.parse(lines, context)
+
+        # 重複節点の検出・併合（メッシュを作る前に要素の節点IDを置き換える）
+        if model_data.nodes:
+            with RadiossProfile.stage("Checking nodes"):
+                RadiossNodeMerge.check_model(model_data, context=context)
+
+        # FemMeshの構築（ドキュメントオブジェクトには触れない）
+        if model_data.nodes and model_data.elements:
+            context.report("Building mesh")
+            with RadiossProfile.stage("Building mesh"):
+                if self.get_part_mesh_mode() == "Objects" and len(model_data.tables.part_ids):
+                    model_data.part_meshes = {
+                        part_id: self.build_femmesh(model_data.nodes, model_data.elements,
+                                                    elem_ids.tolist(), context)
+                        for part_id, elem_ids in self.split_by_part(model_data.tables).items()}
+                else:
+                    model_data.femmesh = self.build_femmesh(model_data.nodes, model_data.elements,
+                                                            context=context)
+        return model_data
+
+    def read_radioss_pipelined(self, filepath, context):
+        """読み込み・解析・メッシュ構築を並行して実行（ワーカースレッド）"""
+        import RadiossPipeline
+        parser = RadiossFileParser()
+        check = RadiossNodeMerge.settings()[0] != 'Off'
+        with RadiossProfile.stage("Pipelined read, parse and mesh"):
+            mesh, elem_ids, elem_types, elem_parts = RadiossPipeline.run_import(filepath, parser,
+                                                                                context=context,
+                                                                                keep_nodes=check)
+        parser.resolve_connectors()
+        if check:
+            # メッシュは構築済みなので報告のみ（併合はuse_pipelineで通常のインポートにする）
+            with RadiossProfile.stage("Checking nodes"):
+                RadiossNodeMerge.check_model(parser, parser.node_arrays, context)
+            parser.node_arrays = None
+        with RadiossProfile.stage("Part tables"):
+            parser.tables = parser.build_tables(elem_ids, elem_types, elem_parts)
+        parser.femmesh = mesh
+        return parser
+
+    def populate_document(self, analysis, model_data):
+        """解析結果からFreeCADオブジェクトを作成（GUIスレッド）"""
+        try:
+            with RadiossProfile.stage("Creating objects"):
+                self.create_freecad_objects(analysis, model_data)
+            with RadiossProfile.stage("Recompute"):
+                FreeCAD.ActiveDocument.recompute()
         except Exception as e:
             FreeCAD.Console.PrintError(f"Import error: {str(e)}\n")
 
+    def use_pipeline(self, filepath):
+        """大きなファイルはパイプラインインポートを使う（パートごとのメッシュオブジェクト以外）"""
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        if self.get_part_mesh_mode() == "Objects":
+            return False
+        if RadiossNodeMerge.settings()[0] == 'Merge':
+            # 併合はメッシュを作る前に全節点が必要
+            return False
+        return os.path.getsize(filepath) >= params.GetInt("PipelineMinBytes", 50 * 1024 * 1024)
+
     def create_freecad_objects(self, analysis, model_data):
         """パースしたデータからFreeCADオブジェクトを作成"""
-        print(f"Creating FreeCAD objects\n")
         FreeCAD.Console.PrintLog(f"Creating FreeCAD objects\n")
         try:
-            # メッシュの作成
-            if model_data.nodes and model_data.elements:
-                mesh = self.create_mesh(model_data.nodes, model_data.elements)
+            # メッシュの作成（構築済みのFemMeshがあればそれを使う）
+            part_meshes = getattr(model_data, 'part_meshes', None)
+            femmesh = getattr(model_data, 'femmesh', None)
+            if part_meshes or (model_data.nodes and model_data.elements and femmesh is None
+                               and self.get_part_mesh_mode() == "Objects"
+                               and len(model_data.tables.part_ids)):
+                for mesh in self.create_part_meshes(model_data.nodes, model_data.elements,
+                                                    model_data.tables, part_meshes):
+                    analysis.addObject(mesh)
+            elif femmesh is not None or (model_data.nodes and model_data.elements):
+                mesh = self.create_mesh(model_data.nodes, model_data.elements, model_data.tables,
+                                        femmesh)
                 analysis.addObject(mesh)
 
+            with RadiossProfile.stage("Model objects"):
+                self.create_model_objects(analysis, model_data)
+
+        except Exception as e:
+            FreeCAD.Console.PrintError(f"Error creating objects: {str(e)}\n")
+
+    def create_model_objects(self, analysis, model_data):
+        """メッシュ以外のオブジェクト（材料・セット・境界条件・荷重）を作成"""
+        try:
+            # 荷重曲線の表（1つのオブジェクトにまとめる）
+            if len(model_data.curves):
+                analysis.addObject(RadiossCurves.make_curve_table(FreeCAD.ActiveDocument, model_data.curves))
+
+            # バネ・ビーム・剛体などは種類ごとに1つのオブジェクト
+            for obj in RadiossConnectors.make_connector_objects(FreeCAD.ActiveDocument, model_data.connectors):
+                analysis.addObject(obj)
+
             # 材料の作成
-            for mat in model_data.materials:
+            for mat in model_data.materials.values():
                 material = self.create_material(mat)
                 analysis.addObject(material)
 
@@ -512,74 +1346,64 @@ class RadiossImport:
         except Exception as e:
             FreeCAD.Console.PrintError(f"Error creating objects: {str(e)}\n")
 
-    def create_mesh(self, nodes, elements):
-        """メッシュオブジェクトの作成"""
-        try:
-            # メッシュオブジェクトの作成
-            mesh_obj = ObjectsFem.makeMeshGmsh(FreeCAD.ActiveDocument, 'FEMMesh')
-            
-            # 新しいFemMeshオブジェクトの作成
-            mesh = FemMesh()
+    def get_part_mesh_mode(self):
+        """パートごとのメッシュ作成方法を設定から取得（Groups / Objects / Single）"""
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        return params.GetString("PartMeshMode", "Groups")
+
+    def build_femmesh(self, nodes, elements, elem_ids=None, context=None):
+        """FemMeshを構築（elem_ids指定時はその要素と参照ノードのみ）"""
+        mesh = FemMesh()
+        if elem_ids is not None:
+            elements = {elem_id: elements[elem_id] for elem_id in elem_ids}
+            used = set()
+            for elem in elements.values():
+                used.update(elem.nodes)
+            nodes = {node_id: nodes[node_id] for node_id in sorted(used) if node_id in nodes}
 
-            # ノードの追加
-            FreeCAD.Console.PrintLog(f"Adding {len(nodes)} nodes to mesh\n")
-            for node_id, coords in nodes.items():
+        # ノードの追加
+        FreeCAD.Console.PrintLog(f"Adding {len(nodes)} nodes to mesh\n")
+        with RadiossProfile.stage("Adding nodes"):
+            for count, (node_id, coords) in enumerate(nodes.items()):
+                if context is not None and count % 10000 == 0:
+                    context.report(nodes=count)
                 try:
                     mesh.addNode(coords[0], coords[1], coords[2], node_id)
                 except Exception as e:
                     FreeCAD.Console.PrintError(f"Error adding node {node_id}: {str(e)}\n")
 
-            # 要素の追加
-            shellcount = 0
-            FreeCAD.Console.PrintLog(f"Adding {len(elements)} elements to mesh\n")
-            for elem_id, elem in elements.items():
+        # 要素の追加
+        FreeCAD.Console.PrintLog(f"Adding {len(elements)} elements to mesh\n")
+        with RadiossProfile.stage("Adding elements"):
+            for count, (elem_id, elem) in enumerate(elements.items()):
+                if context is not None and count % 10000 == 0:
+                    context.report(elements=count)
                 try:
                     if elem.type == 'SHELL' and len(elem.nodes) >= 4:
                         mesh.addFace(elem.nodes, elem_id)
-                        shellcount += 1
                     elif elem.type == 'SH3N' and len(elem.nodes) >= 3:
                         # 3節点シェル要素
                         mesh.addFace(elem.nodes, elem_id)
-                        shellcount += 1
                     elif elem.type == "SOLID":
-                        if len(elem.nodes) == 8:
-                            # mesh.addVolume(elem.nodes, elem_id)
-                            pass
-                        elif len(elem.nodes) == 4:
-                            # 4節点四面体要素
-                            # mesh.addVolume(elem.nodes, elem_id)
-                            pass
+                        # 6面体と4面体（/TETRA4、縮退した/BRICK）
+                        volume = RadiossMeshTools.volume_nodes(elem.nodes)
+                        if volume is not None:
+                            mesh.addVolume(volume, elem_id)
                 except Exception as e:
                     FreeCAD.Console.PrintError(f"Error adding element {elem_id}: {str(e)}\n")
-            print(shellcount)
-            # メッシュをオブジェクトに設定
-            mesh_obj.FemMesh = mesh
+        return mesh
 
-            # シェル要素の厚さを設定
-            if hasattr(self, 'properties'):
-                for elem_id, elem in elements.items():
-                    if elem.type == "SHELL" and hasattr(elem, 'property'):
-                        try:
-                            thickness = self.get_shell_thickness(elem.property)
-                            if thickness:
-                                # 要素グループを作成して厚さを設定
-                                group_name = f"ShellThickness_{thickness}"
-                                if not hasattr(mesh_obj, group_name):
-                                    mesh_obj.addProperty("App::PropertyFloat", group_name, "Shell Thickness", 
-                                                       "Shell thickness for element group")
-                                    setattr(mesh_obj, group_name, thickness)
-                                # 要素をグループに追加
-                                if not hasattr(mesh_obj, f"{group_name}_elements"):
-                                    mesh_obj.addProperty("App::PropertyIntegerList", f"{group_name}_elements", 
-                                                       "Shell Thickness", "Elements in thickness group")
-                                getattr(mesh_obj, f"{group_name}_elements").append(elem_id)
-                        except Exception as e:
-                            FreeCAD.Console.PrintError(f"Error setting shell thickness for element {elem_id}: {str(e)}\n")
-
-            # メッシュの表示を更新
-            mesh_obj.ViewObject.DisplayMode = "Faces & Wireframe"
-            mesh_obj.ViewObject.BackfaceCulling = False
-            FreeCAD.ActiveDocument.recompute()
+    def create_mesh(self, nodes, elements, tables=None, mesh=None):
+        """メッシュオブジェクトの作成（meshは構築済みのFemMesh）"""
+        try:
+            # メッシュオブジェクトの作成
+            mesh_obj = ObjectsFem.makeMeshGmsh(FreeCAD.ActiveDocument, 'FEMMesh')
+            
+            # 新しいFemMeshオブジェクトの作成
+            if mesh is None:
+                mesh = self.build_femmesh(nodes, elements)
+            element_count = len(tables.elem_ids) if tables is not None else len(elements)
+            self.finish_mesh(mesh_obj, mesh, tables, element_count)
                 
             FreeCAD.Console.PrintLog("Mesh creation completed\n")
             return mesh_obj
@@ -588,40 +1412,144 @@ class RadiossImport:
             FreeCAD.Console.PrintError(f"Error creating mesh: {str(e)}\n")
             return None
 
-    def get_shell_thickness(self, prop_id):
-        """シェル要素の厚さを取得"""
-        for prop in self.properties:
-            if prop.id == prop_id and prop.type == "SHELL":
-                return prop.thickness
-        return None
+    def finish_mesh(self, mesh_obj, mesh, tables, element_count):
+        """パートグループ・パート表・表示設定をメッシュオブジェクトに適用"""
+        # パートごとの要素グループ
+        if tables is not None and self.get_part_mesh_mode() == "Groups":
+            with RadiossProfile.stage("Part groups"):
+                self.add_part_groups(mesh, tables)
+
+        # メッシュをオブジェクトに設定
+        with RadiossProfile.stage("Assigning FemMesh"):
+            mesh_obj.FemMesh = mesh
+
+        # パート -> プロパティ -> 材料の表をメッシュに保存し、シェル厚さを設定
+        if tables is not None:
+            with RadiossProfile.stage("Part tables"):
+                self.set_part_tables(mesh_obj, tables)
+
+        # メッシュの表示を更新
+        with RadiossProfile.stage("View update"):
+            mesh_obj.ViewObject.DisplayMode = "Faces & Wireframe"
+            mesh_obj.ViewObject.BackfaceCulling = False
+        with RadiossProfile.stage("Recompute"):
+            FreeCAD.ActiveDocument.recompute()
+        with RadiossProfile.stage("Level of detail"):
+            self.setup_lod([mesh_obj], element_count)
+
+    def split_by_part(self, tables):
+        """メッシュに追加されるシェル・ソリッド要素をパートごとに分割 -> {part_id: elem_ids}"""
+        mask = np.isin(tables.elem_type, MESH_ELEMENT_TYPES)
+        elem_part = tables.elem_part[mask]
+        order = np.argsort(elem_part, kind='stable')
+        part_ids, starts = np.unique(elem_part[order], return_index=True)
+        return dict(zip(part_ids.tolist(), np.split(tables.elem_ids[mask][order], starts[1:])))
+
+    def add_part_groups(self, mesh, tables):
+        """パートごとにFemMeshの要素グループ（PART_<id>）を作成"""
+        add_part_groups(mesh, tables.elem_ids, tables.elem_type, tables.elem_part)
+
+    def create_part_meshes(self, nodes, elements, tables, part_meshes=None):
+        """パートごとに独立したメッシュオブジェクトを作成（part_meshesは構築済みのFemMesh）"""
+        names = dict(zip(tables.part_ids.tolist(), tables.part_names))
+        mesh_objs = []
+        for part_id, elem_ids in self.split_by_part(tables).items():
+            try:
+                mesh_obj = ObjectsFem.makeMeshGmsh(FreeCAD.ActiveDocument, f"FEMMesh_Part{part_id}")
+                mesh_obj.Label = names.get(part_id, f"Part_{part_id}")
+                if part_meshes and part_id in part_meshes:
+                    mesh = part_meshes[part_id]
+                else:
+                    mesh = self.build_femmesh(nodes, elements, elem_ids.tolist())
+                add_part_groups(mesh, elem_ids, lookup_by_id(tables.elem_ids, tables.elem_type, elem_ids, ''),
+                                np.full(len(elem_ids), part_id))
+                mesh_obj.FemMesh = mesh
+                self.set_part_table_properties(mesh_obj, tables, tables.part_ids == part_id)
+                mesh_obj.ViewObject.DisplayMode = "Faces & Wireframe"
+                mesh_obj.ViewObject.BackfaceCulling = False
+                mesh_objs.append(mesh_obj)
+            except Exception as e:
+                FreeCAD.Console.PrintError(f"Error creating mesh for part {part_id}: {str(e)}\n")
+        FreeCAD.ActiveDocument.recompute()
+        self.setup_lod(mesh_objs, len(elements))
+        FreeCAD.Console.PrintLog(f"Created {len(mesh_objs)} part meshes\n")
+        return mesh_objs
+
+    def setup_lod(self, mesh_objs, element_count):
+        """要素数が多い場合はLODプロキシを作成して詳細度表示を有効化"""
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        if element_count < params.GetInt("LodElementThreshold", 500000):
+            return
+        import RadiossLod
+        try:
+            RadiossLod.build_lod_proxies(mesh_objs)
+        except Exception as e:
+            FreeCAD.Console.PrintError(f"Error creating LOD proxy: {str(e)}\n")
+
+    def set_part_table_properties(self, mesh_obj, tables, mask):
+        """パートID・プロパティID・材料ID・厚さの表をメッシュオブジェクトに設定"""
+        part_thickness = lookup_by_id(tables.prop_ids, tables.prop_thickness, tables.part_prop, 0.0)
+        for name, values, doc in (
+                ("PartIds", tables.part_ids, "Radioss part ids"),
+                ("PartPropIds", tables.part_prop, "Property id of each part"),
+                ("PartMatIds", tables.part_mat, "Material id of each part")):
+            if not hasattr(mesh_obj, name):
+                mesh_obj.addProperty("App::PropertyIntegerList", name, "Radioss", doc)
+            setattr(mesh_obj, name, values[mask].tolist())
+        if not hasattr(mesh_obj, "PartThickness"):
+            mesh_obj.addProperty("App::PropertyFloatList", "PartThickness", "Radioss",
+                                 "Shell thickness of each part")
+        mesh_obj.PartThickness = part_thickness[mask].tolist()
+
+    def set_part_tables(self, mesh_obj, tables):
+        """パート表と厚さごとの要素グループをメッシュオブジェクトのプロパティに設定"""
+        self.set_part_table_properties(mesh_obj, tables, np.ones(len(tables.part_ids), dtype=bool))
+
+        # シェル要素の厚さを設定（厚さごとに要素をまとめて一括設定）
+        thickness = tables.elem_thickness
+        valid = np.isfinite(thickness) & (thickness > 0.0)
+        for value in np.unique(thickness[valid]):
+            group_name = f"ShellThickness_{value:g}".replace('.', '_').replace('-', '_')
+            try:
+                mesh_obj.addProperty("App::PropertyFloat", group_name, "Shell Thickness",
+                                     "Shell thickness for element group")
+                setattr(mesh_obj, group_name, float(value))
+                mesh_obj.addProperty("App::PropertyIntegerList", f"{group_name}_elements",
+                                     "Shell Thickness", "Elements in thickness group")
+                setattr(mesh_obj, f"{group_name}_elements",
+                        tables.elem_ids[valid & (thickness == value)].tolist())
+            except Exception as e:
+                FreeCAD.Console.PrintError(f"Error setting shell thickness {value}: {str(e)}\n")
 
     def create_material(self, mat_data):
         """材料プロパティオブジェクトを作成"""
         material = ObjectsFem.makeMaterialSolid(FreeCAD.ActiveDocument, mat_data.name)
-        material.Material = {
+        values = {
             'Name': mat_data.name,
             'YoungsModulus': f"{mat_data.E} MPa",
             'PoissonRatio': str(mat_data.nu),
-            'Density': f"{mat_data.rho} kg/m^3",
+            'Density': f"{mat_data.rho} t/mm^3",
             'RadiossType': mat_data.type
         }
 
-        # オプションのプロパティ
+        # オプションのプロパティ（Materialは取得するたびにコピーが返るので、まとめて代入する）
         if hasattr(mat_data, 'yield_stress'):
-            material.Material['YieldStrength'] = f"{mat_data.yield_stress} MPa"
+            values['YieldStrength'] = f"{mat_data.yield_stress} MPa"
         if hasattr(mat_data, 'hardening'):
-            material.Material['HardeningParam'] = str(mat_data.hardening)
+            values['HardeningParam'] = str(mat_data.hardening)
+        material.Material = values
+
+        # パートから参照されるRadioss材料ID
+        material.addProperty("App::PropertyInteger", "MaterialId", "Radioss", "Radioss material id")
+        material.MaterialId = mat_data.id
 
         return material
 
     def create_set(self, set_data):
         """セットオブジェクトを作成"""
-        set_obj = FreeCAD.ActiveDocument.addObject("App::FeaturePython", f"Set_{set_data.name}")
-        set_obj.addProperty("App::PropertyString", "SetType", "Radioss", "Type of set")
-        set_obj.SetType = set_data.type
-        set_obj.addProperty("App::PropertyIntegerList", "Members", "Radioss", "Set members")
-        set_obj.Members = set_data.members
-        return set_obj
+        import RadiossModel
+        return RadiossModel.make_set(FreeCAD.ActiveDocument, f"Set_{set_data.name}",
+                                     set_data.type, set_data.members)
 
     def create_constraint(self, const_data):
         """境界条件オブジェクトを作成"""
@@ -637,6 +1565,7 @@ class RadiossImport:
         force = ObjectsFem.makeConstraintForce(FreeCAD.ActiveDocument, f"Force_{load_data.id}")
         force.Force = load_data.magnitude
         force.DirectionVector = FreeCAD.Vector(*load_data.direction)
+        set_load_curve(force, getattr(load_data, 'curve', 0))
         # 参照ノードの設定
         if hasattr(load_data, 'nodes'):
             force.References = [(FreeCAD.ActiveDocument.FEMMesh, 'Node' + str(n)) for n in load_data.nodes]
@@ -645,131 +1574,332 @@ class RadiossImport:
     def IsActive(self):
         return FreeCAD.ActiveDocument is not None
 
+# FemMeshに追加する要素タイプ（シェルは面、ソリッドは体積のグループに入れる）
+MESH_ELEMENT_TYPES = ('SHELL', 'SH3N', 'SOLID')
+
+
+def add_part_groups(mesh, elem_ids, elem_types, elem_parts):
+    """要素をパートごとのFemMeshの要素グループ（PART_<id>）に入れる
+
+    グループは要素の種類ごとなので、ソリッドを含むパートには同じ名前の"Volume"の
+    グループも作る（RadiossMeshTools.group_part_idsは名前で読む）。
+    """
+    elem_ids = np.asarray(elem_ids, dtype=np.int64)
+    elem_types = np.asarray(elem_types)
+    elem_parts = np.asarray(elem_parts, dtype=np.int64)
+    for group_type, selected in (("Face", np.isin(elem_types, ('SHELL', 'SH3N'))),
+                                 ("Volume", elem_types == 'SOLID')):
+        order = np.argsort(elem_parts[selected], kind='stable')
+        ids, parts = elem_ids[selected][order], elem_parts[selected][order]
+        part_ids, starts = np.unique(parts, return_index=True)
+        for part_id, group_ids in zip(part_ids.tolist(), np.split(ids, starts[1:])):
+            try:
+                # 面のグループはIDをパートIDにする（体積のグループは自動）
+                group = mesh.addGroup(f"PART_{part_id}", group_type, part_id if group_type == "Face" else -1)
+                mesh.addGroupElements(group, group_ids.tolist())
+            except Exception as e:
+                FreeCAD.Console.PrintError(f"Error creating group for part {part_id}: {str(e)}\n")
+
+
+def set_load_curve(load_obj, curve_id):
+    """荷重オブジェクトに時間関数（曲線表のID）を設定（0は一定値）"""
+    if not curve_id:
+        return
+    if not hasattr(load_obj, 'CurveId'):
+        load_obj.addProperty("App::PropertyInteger", "CurveId", "Radioss", "Load curve (/FUNCT id)")
+    load_obj.CurveId = int(curve_id)
+
+
+# セクションヘッダーの解析結果（例: /PROP/SHELL/3 -> ('PROP', 'SHELL', 3)）
+SectionHeader = namedtuple('SectionHeader', ['keyword', 'subkeyword', 'id'])
+
+
+def bind_line(method, *args):
+    """データ行だけを引数にとる解析関数 method(line, *args) を作る
+
+    partialのキーワード引数や*argsの展開は1行ごとの呼び出しが遅いので、
+    引数が2つまでなら直接呼ぶ関数にする。
+    """
+    if not args:
+        return method
+    if len(args) == 1:
+        first, = args
+        return lambda line: method(line, first)
+    if len(args) == 2:
+        first, second = args
+        return lambda line: method(line, first, second)
+    return lambda line: method(line, *args)
+
+
 class RadiossFileParser:
+    # 材料則の別名 -> LAW番号
+    MATERIAL_ALIASES = {
+        'VOID': 'LAW0',
+        'ELAST': 'LAW1',
+        'PLAS_JOHNS': 'LAW2',
+        'PLAS_TAB': 'LAW36',
+    }
+
+    # (キーワード, サブキーワード) -> ヘッダーからデータ行の解析関数を作る関数
+    # サブキーワードがNoneの登録はそのキーワードの全てのセクションに使う
+    SECTION_HANDLERS = {
+        ('NODE', None): lambda parser, header: parser.parse_node,
+        ('SHELL', None): lambda parser, header: bind_line(parser.parse_element, "SHELL", header.id),
+        ('SH3N', None): lambda parser, header: bind_line(parser.parse_element, "SH3N", header.id),
+        ('BRICK', None): lambda parser, header: bind_line(parser.parse_element, "SOLID", header.id),
+        ('TETRA4', None): lambda parser, header: bind_line(parser.parse_element, "SOLID", header.id),
+        ('PART', None): lambda parser, header: bind_line(parser.parse_part, header.id),
+        ('PROP', 'SHELL'): lambda parser, header: bind_line(parser.parse_property, "SHELL", header.id),
+        ('PROP', 'SOLID'): lambda parser, header: bind_line(parser.parse_property, "SOLID", header.id),
+        ('MAT', None): lambda parser, header: bind_line(parser.parse_material, header.subkeyword,
+                                                        parser.material_id(header)),
+        ('SET', None): lambda parser, header: RadiossSets.SetSection(parser.sets, header.subkeyword or header.keyword),
+        ('BOUNDARY', None): lambda parser, header: parser.parse_constraint,
+        ('LOAD', None): lambda parser, header: parser.parse_load,
+        ('CLOAD', None): lambda parser, header: bind_line(parser.parse_cload, header.id),
+        ('FUNCT', None): lambda parser, header: RadiossCurves.FunctSection(parser.curves, header.id),
+        ('SPRING', None): lambda parser, header: RadiossConnectors.ElementSection(
+            parser.connectors['SPRING'], 2, header.id),
+        ('BEAM', None): lambda parser, header: RadiossConnectors.ElementSection(
+            parser.connectors['BEAM'], 3, header.id),
+        ('GRNOD', 'NODE'): lambda parser, header: RadiossConnectors.NodeGroupSection(parser.node_groups, header.id),
+        ('RBE2', None): lambda parser, header: RadiossConnectors.RigidSection(parser.rigid_sections, 'RBE2',
+                                                                             header.id),
+        ('RBE3', None): lambda parser, header: RadiossConnectors.RigidSection(parser.rigid_sections, 'RBE3',
+                                                                             header.id),
+        ('RBODY', None): lambda parser, header: RadiossConnectors.RigidSection(parser.rigid_sections, 'RBODY',
+                                                                              header.id),
+    }
+
+    @classmethod
+    def register_section(cls, keyword, subkeyword=None):
+        """セクションの解析関数を登録するデコレーター
+
+        登録する関数は(parser, header)を受け取り、データ行1行を引数にとる関数を返す。
+        返す関数がclose()を持っていれば、セクションの終わりに呼ぶ。
+        """
+        def decorator(factory):
+            cls.SECTION_HANDLERS[(keyword.upper(), subkeyword.upper() if subkeyword else None)] = factory
+            return factory
+        return decorator
+
     def __init__(self):
         self.nodes = {}
+        self.duplicate_node_ids = []  # 2回以上定義された節点ID（最後の定義を残す）
         self.elements = {}
-        self.materials = []
+        self.parts = {}       # part_id -> (prop_id, mat_id)
+        self.properties = {}  # prop_id -> シェル厚さ、積分点数など
+        self.materials = {}   # mat_id -> 材料定数
         self.sets = []
         self.constraints = []
         self.loads = []
-        self.properties = []  # プロパティリストを追加
+        self.curves = RadiossCurves.CurveTable()  # /FUNCT
+        self.connectors = RadiossConnectors.connector_tables()  # /SPRING, /BEAM, /RBE2, ...
+        self.node_groups = {}     # /GRNOD/NODE: ID -> 節点ID配列
+        self.rigid_sections = []  # 節点グループの解決待ちの/RBE2, /RBE3, /RBODY
+        self.cloads = []          # 節点グループの解決待ちの/CLOAD
+        self.tables = None
         self.current_section = None
         self.current_subsection = None
+        self.header = None
+        self.section_handler = None
+        self.section_line = 0
 
-    def parse(self, lines):
-        """Radiossファイルを解析"""
+    def parse(self, lines, context=None):
+        """Radiossファイルを解析（contextがあれば進捗報告とキャンセル確認）"""
+        done_bytes = 0
         try:
-            for line in lines:
+            for count, line in enumerate(lines):
+                if context is not None:
+                    done_bytes += len(line)
+                    if count % 10000 == 0:
+                        context.report("Parsing", bytes=done_bytes, lines=count)
                 line = line.strip()
                 if not line or line.startswith('#'):
                     continue
 
                 if line.startswith('/'):
-                    self.current_section = line
+                    self.start_section(line)
                     FreeCAD.Console.PrintLog(f"Found section: {line}\n")
                     continue
 
+                handler = self.section_handler
+                if handler is None:
+                    continue
                 try:
-                    self.parse_section(line)
+                    handler(line)
                 except Exception as e:
                     FreeCAD.Console.PrintWarning(f"Warning: Failed to parse line: {line}\nError: {str(e)}\n")
+                self.section_line += 1
+            self.close_section()
 
         except Exception as e:
             FreeCAD.Console.PrintError(f"Parse error: {str(e)}\n")
-            
+
+        self.resolve_connectors()
+        # パート -> プロパティ -> 材料の参照表を作成
+        self.tables = self.build_tables()
+
         # パース結果のサマリーを出力
-        shellcount = 0
-        for elem_id, elem in self.elements.items():
-            if elem.type == "SHELL":
-                shellcount += 1
-        print(shellcount)
         FreeCAD.Console.PrintLog(f"Parse completed:\n")
         FreeCAD.Console.PrintLog(f"  Nodes: {len(self.nodes)}\n")
         FreeCAD.Console.PrintLog(f"  Elements: {len(self.elements)}\n")
+        FreeCAD.Console.PrintLog(f"  Parts: {len(self.parts)}\n")
         FreeCAD.Console.PrintLog(f"  Materials: {len(self.materials)}\n")
         FreeCAD.Console.PrintLog(f"  Properties: {len(self.properties)}\n")
         FreeCAD.Console.PrintLog(f"  Sets: {len(self.sets)}\n")
         FreeCAD.Console.PrintLog(f"  Constraints: {len(self.constraints)}\n")
         FreeCAD.Console.PrintLog(f"  Loads: {len(self.loads)}\n")
+        FreeCAD.Console.PrintLog(f"  Curves: {len(self.curves)}\n")
+        for kind, table in self.connectors.items():
+            if len(table):
+                FreeCAD.Console.PrintLog(f"  {kind}: {len(table)}\n")
             
         return self
 
-    def parse_section(self, line):
-        """セクションごとの解析"""
-        if not self.current_section:
+    def resolve_connectors(self):
+        """/RBE2, /RBE3, /RBODYの従節点と/CLOADの節点を節点グループから決める（全セクションの解析後に呼ぶ）"""
+        RadiossConnectors.resolve_rigid_sections(self.connectors, self.rigid_sections, self.node_groups)
+        self.rigid_sections = []
+        self.resolve_cloads()
+
+    def resolve_cloads(self):
+        """/CLOADを荷重にまとめる
+
+        同じタイトル・節点グループ・時間関数の方向成分を1つの荷重（合計の大きさと
+        単位方向ベクトル）に戻す（write_loadsの逆）。
+        """
+        merged = {}
+        for load_id, title, curve_id, axis, group_id, scale in self.cloads:
+            key = (title, group_id, curve_id)
+            if key not in merged:
+                merged[key] = [load_id, np.zeros(3)]
+            merged[key][1]["XYZ".index(axis)] += scale
+        self.cloads = []
+        for (title, group_id, curve_id), (load_id, vector) in merged.items():
+            nodes = self.node_groups.get(group_id)
+            if nodes is None:
+                FreeCAD.Console.PrintWarning(f"CLOAD {load_id}: node group {group_id} not found\n")
+                continue
+            length = float(np.linalg.norm(vector))
+            load = SimpleNamespace(id=load_id, magnitude=length * len(nodes),
+                                   direction=(vector / length if length > 0.0 else vector).tolist(),
+                                   nodes=[int(n) for n in nodes])
+            if curve_id > 0:
+                load.curve = curve_id
+            self.loads.append(load)
+
+    def parse_section_lines(self, header, lines):
+        """1セクション分のデータ行を解析（パイプラインインポート用）"""
+        self.start_section(header)
+        handler = self.section_handler
+        if handler is None:
             return
+        for line in lines:
+            try:
+                handler(line)
+            except Exception as e:
+                FreeCAD.Console.PrintWarning(f"Warning: Failed to parse line: {line}\nError: {str(e)}\n")
+            self.section_line += 1
+        self.close_section()
+
+    @staticmethod
+    def parse_header(line):
+        """セクションヘッダー -> SectionHeader
+
+        キーワードの後の最初の数値をID、それより前の最初の文字列をサブキーワードとする
+        （/SHELL/12 -> ('SHELL', None, 12), /MAT/LAW2/5 -> ('MAT', 'LAW2', 5),
+        /SET/NODE -> ('SET', 'NODE', None)）。
+        """
+        fields = [field.strip() for field in line.strip().upper().split('/')[1:]]
+        keyword = fields[0] if fields else ""
+        subkeyword = None
+        section_id = None
+        for field in fields[1:]:
+            if field.isdigit():
+                section_id = int(field)
+                break
+            if subkeyword is None and field:
+                subkeyword = field
+        return SectionHeader(keyword, subkeyword, section_id)
+
+    def start_section(self, line):
+        """ヘッダー行を1回だけ解析し、このセクションのデータ行の解析関数を決める"""
+        self.close_section()
+        self.current_section = line
+        self.section_line = 0
+        self.header = self.parse_header(line)
+        handlers = self.SECTION_HANDLERS
+        factory = (handlers.get((self.header.keyword, self.header.subkeyword))
+                   or handlers.get((self.header.keyword, None)))
+        self.section_handler = factory(self, self.header) if factory is not None else None
+
+    def close_section(self):
+        """セクションの終わり（行を貯めてまとめて変換する解析関数の終了処理）"""
+        close = getattr(self.section_handler, 'close', None)
+        self.section_handler = None
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Failed to parse section {self.current_section}\n"
+                                         f"Error: {str(e)}\n")
 
-        # セクション名を正規化
-        section = self.current_section.upper()
-        
-        FreeCAD.Console.PrintLog(f"Parsing section: {section}, line: {line}\n")
-
-        if section.startswith('/NODE'):
-            self.parse_node(line)
-        elif section.startswith('/SHELL'):
-            prop_id = self.current_section.split('/')[2]
-            self.parse_element(line, "SHELL", prop_id)
-        elif section.startswith('/SH3N'):
-            prop_id = self.current_section.split('/')[2]
-            self.parse_element(line, "SH3N", prop_id)
-        elif section.startswith('/BRICK'):
-            prop_id = self.current_section.split('/')[2]
-            self.parse_element(line, "SOLID", prop_id)
-        elif section.startswith('/PART/'):
-            prop_id = self.current_section.split('/')[2]
-            mat_id = 1
-            self.parse_property(line, "SHELL", prop_id, mat_id)
-        elif section.startswith('/PROP/SHELL'):
-            prop_id = self.current_section.split('/')[3]
-            mat_id = 1
-            self.parse_property(line, "SHELL", prop_id, mat_id)
-        elif section.startswith('/PROP/SOLID'):
-            prop_id = self.current_section.split('/')[3]
-            mat_id = 1
-            self.parse_property(line, "SOLID", prop_id, mat_id)
-        elif section.startswith('/MAT/'):
-            self.parse_material(line)
-        elif section.startswith('/SET/'):
-            self.parse_set(line)
-        elif section.startswith('/BOUNDARY'):
-            self.parse_constraint(line)
-        elif section.startswith('/LOAD'):
-            self.parse_load(line)
-
-    def parse_property(self, line, prop_type, prop_id, mat_id):
+    def parse_section(self, line):
+        """現在のセクションのデータ行を1行解析"""
+        if self.section_handler is not None:
+            self.section_handler(line)
+
+    def parse_part(self, line, part_id):
+        """パートデータの解析（1行目: タイトル, 2行目: prop_ID mat_ID）"""
+        if self.section_line == 0:
+            self.parts[part_id] = SimpleNamespace(id=part_id, name=line, prop=0, mat=0)
+            return
+        if self.section_line != 1 or part_id not in self.parts:
+            return
+        data = self.clean_data(line)
+        try:
+            part = self.parts[part_id]
+            part.prop = int(data[0])
+            part.mat = int(data[1])
+            FreeCAD.Console.PrintLog(f"Parsed part {part_id}: prop {part.prop}, mat {part.mat}\n")
+        except (ValueError, IndexError) as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Invalid part data: {line}\nError: {str(e)}\n")
+
+    def parse_property(self, line, prop_type, prop_id):
         """プロパティデータの解析"""
+        if self.section_line == 0:
+            self.properties[prop_id] = SimpleNamespace(
+                id=prop_id,
+                name=line,
+                type=prop_type,
+                thickness=0.0,
+                integration_points=0
+            )
+            return
+        prop = self.properties.get(prop_id)
+        if prop is None:
+            return
         data = self.clean_data(line)
-        if len(data) >= 3:  # ID + 材料ID + 厚さ/その他のパラメータ
-            try:
-                # prop_id = int(data[0])
-                # mat_id = int(data[1])
-                
-                prop = SimpleNamespace(
-                    id=prop_id,
-                    type=prop_type,
-                    material=mat_id
-                )
-
-                if prop_type == "SHELL":
-                    prop.thickness = 1.0
-                    # prop.thickness = float(data[2])
-                elif prop_type == "SOLID":
-                    # SOLIDプロパティの追加パラメータがあれば設定
-                    pass
-
-                self.properties.append(prop)
-                FreeCAD.Console.PrintLog(f"Parsed property {prop_id}: {prop_type}\n")
-            except (ValueError, IndexError) as e:
-                FreeCAD.Console.PrintWarning(f"Warning: Invalid property data: {line}\nError: {str(e)}\n")
-
-    def parse_element(self, line, elem_type, prop_id):
+        try:
+            if prop_type == "SHELL" and self.section_line == 3:
+                # N Istrain Thick Ashear Ithick Iplas
+                prop.integration_points = int(data[0])
+                prop.thickness = float(data[2])
+            elif prop_type == "SOLID" and self.section_line == 1:
+                # Isolid Ismstr Icpre Itetra4 Itetra10 Imass Iframe
+                prop.formulation = int(data[0])
+            FreeCAD.Console.PrintLog(f"Parsed property {prop_id}: {prop_type}\n")
+        except (ValueError, IndexError) as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Invalid property data: {line}\nError: {str(e)}\n")
+
+    def parse_element(self, line, elem_type, part_id):
         """要素データの解析"""
         data = self.clean_data(line)
         if len(data) >= 3:  # ID + ノード
             try:
                 elem_id = int(data[0])
-                # prop_id = int(data[1])
                 nodes = []
                 if elem_type == 'SHELL':
                     for node_str in data[1:5]:
@@ -786,7 +1916,7 @@ class RadiossFileParser:
                 if nodes:
                     self.elements[elem_id] = SimpleNamespace(
                         id=elem_id,
-                        property=prop_id,
+                        part=part_id,
                         nodes=nodes,
                         type=elem_type
                     )
@@ -794,6 +1924,48 @@ class RadiossFileParser:
             except (ValueError, IndexError) as e:
                 FreeCAD.Console.PrintWarning(f"Warning: Invalid element data: {line}\nError: {str(e)}\n")
 
+    def build_tables(self, elem_ids=None, elem_type=None, elem_part=None):
+        """パート・プロパティ・材料のid表を配列化し、要素ごとの属性を一括で解決
+
+        要素配列を渡さない場合はself.elementsから作成する。
+        """
+        part_ids = np.array(list(self.parts.keys()), dtype=np.int64)
+        part_prop = np.array([p.prop for p in self.parts.values()], dtype=np.int64)
+        part_mat = np.array([p.mat for p in self.parts.values()], dtype=np.int64)
+        prop_ids = np.array(list(self.properties.keys()), dtype=np.int64)
+        prop_thickness = np.array([p.thickness for p in self.properties.values()], dtype=np.float64)
+        mat_ids = np.array(list(self.materials.keys()), dtype=np.int64)
+        mat_rho = np.array([m.rho for m in self.materials.values()], dtype=np.float64)
+
+        if elem_ids is None:
+            elem_ids = np.fromiter(self.elements.keys(), dtype=np.int64, count=len(self.elements))
+            elem_type = np.array([e.type for e in self.elements.values()], dtype=str)
+            elem_part = np.fromiter((e.part or 0 for e in self.elements.values()),
+                                    dtype=np.int64, count=len(self.elements))
+        elem_prop = lookup_by_id(part_ids, part_prop, elem_part, -1)
+        # /PARTが無い旧形式のデッキではヘッダーIDをプロパティIDとして扱う
+        legacy = elem_prop < 0
+        elem_prop[legacy] = elem_part[legacy]
+        elem_mat = lookup_by_id(part_ids, part_mat, elem_part, 0)
+
+        return SimpleNamespace(
+            part_ids=part_ids,
+            part_names=[p.name for p in self.parts.values()],
+            part_prop=part_prop,
+            part_mat=part_mat,
+            prop_ids=prop_ids,
+            prop_thickness=prop_thickness,
+            mat_ids=mat_ids,
+            mat_rho=mat_rho,
+            elem_ids=elem_ids,
+            elem_type=elem_type,
+            elem_part=elem_part,
+            elem_prop=elem_prop,
+            elem_mat=elem_mat,
+            elem_thickness=lookup_by_id(prop_ids, prop_thickness, elem_prop, np.nan),
+            elem_rho=lookup_by_id(mat_ids, mat_rho, elem_mat, np.nan)
+        )
+
     def clean_data(self, line):
         """データ行をクリーンアップして分割"""
         # カンマまたは空白で分割
@@ -812,47 +1984,49 @@ class RadiossFileParser:
             try:
                 node_id = int(data[0])
                 coords = [float(x) for x in data[1:4]]
+                if node_id in self.nodes:
+                    self.duplicate_node_ids.append(node_id)
                 self.nodes[node_id] = coords
                 FreeCAD.Console.PrintLog(f"Parsed node {node_id}: {coords}\n")
             except (ValueError, IndexError) as e:
                 FreeCAD.Console.PrintWarning(f"Warning: Invalid node data: {line}\nError: {str(e)}\n")
 
-    def parse_material(self, line):
-        """材料データの解析"""
-        data = self.clean_data(line)
-        if len(data) >= 5:  # 最低限必要なデータ数
-            try:
-                mat = SimpleNamespace(
-                    name=data[0],
-                    type=data[1],
-                    E=float(data[2]),
-                    nu=float(data[3]),
-                    rho=float(data[4])
-                )
-                
-                # オプションのプロパティ
-                if len(data) > 5:
-                    mat.yield_stress = float(data[5])
-                if len(data) > 6:
-                    mat.hardening = float(data[6])
-                    
-                self.materials.append(mat)
-            except (ValueError, IndexError):
-                FreeCAD.Console.PrintWarning(f"Warning: Invalid material data: {line}\n")
-
-    def parse_set(self, line):
-        """セットデータの解析"""
+    def material_id(self, header):
+        """材料ID（ヘッダーにIDが無ければセクションの開始時に1度だけ新しいIDを決める）"""
+        if header.id is not None:
+            return header.id
+        return max(self.materials, default=0) + 1
+
+    def parse_material(self, line, law, mat_id):
+        """材料データの解析（タイトル / 密度 / E nu / 降伏応力など）"""
+        if self.section_line == 0:
+            self.materials[mat_id] = SimpleNamespace(
+                id=mat_id,
+                name=line,
+                type=self.MATERIAL_ALIASES.get(law, law),
+                E=0.0,
+                nu=0.0,
+                rho=0.0
+            )
+            return
+        mat = self.materials.get(mat_id)
+        if mat is None:
+            return
         data = self.clean_data(line)
-        if len(data) >= 2:  # 名前 + 要素
-            try:
-                set_data = SimpleNamespace(
-                    name=data[0],
-                    type=self.current_section.split('/')[1],
-                    members=[int(x) for x in data[1:] if x]
-                )
-                self.sets.append(set_data)
-            except (ValueError, IndexError):
-                FreeCAD.Console.PrintWarning(f"Warning: Invalid set data: {line}\n")
+        try:
+            if self.section_line == 1:
+                mat.rho = float(data[0])
+            elif self.section_line == 2:
+                mat.E = float(data[0])
+                mat.nu = float(data[1])
+            elif self.section_line == 3 and mat.type == 'LAW2':
+                # LAW2: a b n ... (a = 初期降伏応力, b = 硬化係数)
+                # LAW36の3行目はNfunct Fsmooth Fcut Chardなので降伏応力は読まない
+                mat.yield_stress = float(data[0])
+                if len(data) > 1:
+                    mat.hardening = float(data[1])
+        except (ValueError, IndexError):
+            FreeCAD.Console.PrintWarning(f"Warning: Invalid material data: {line}\n")
 
     def parse_constraint(self, line):
         """境界条件データの解析"""
@@ -872,16 +2046,36 @@ class RadiossFileParser:
     def parse_load(self, line):
         """荷重データの解析"""
         data = self.clean_data(line)
-        if len(data) >= 5:  # ID + 大きさ + 方向(x,y,z)
+        if len(data) >= 5:  # ID + 大きさ + 方向(x,y,z) [+ 時間関数ID]
             try:
-                self.loads.append(SimpleNamespace(
+                load = SimpleNamespace(
                     id=int(data[0]),
                     magnitude=float(data[1]),
                     direction=[float(x) for x in data[2:5]]
-                ))
+                )
+                if len(data) > 5 and int(data[5]) > 0:
+                    load.curve = int(data[5])
+                self.loads.append(load)
             except (ValueError, IndexError):
                 FreeCAD.Console.PrintWarning(f"Warning: Invalid load data: {line}\n")
 
+    def parse_cload(self, line, load_id):
+        """/CLOADの解析（1行目: タイトル, 2行目: funct_IDT Dir skew_ID sensor_ID grnod_ID Ascale_x Fscale_y）"""
+        if self.section_line == 0:
+            self.cload_title = line
+            return
+        if self.section_line != 1:
+            return
+        fields = RadiossConnectors.fixed_fields(line, (10, 10, 10, 10, 10, 20, 20))
+        try:
+            axis = fields[1].upper()
+            if axis not in ("X", "Y", "Z"):
+                raise ValueError(f"unsupported direction {fields[1]!r}")
+            self.cloads.append((load_id, self.cload_title, int(fields[0] or 0), axis, int(fields[4]),
+                                float(fields[6] or 1.0) * float(fields[5] or 1.0)))
+        except (ValueError, IndexError) as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Invalid load data: {line}\nError: {str(e)}\n")
+
 
 class RadiossRigidBody:
     def GetResources(self):
@@ -905,6 +2099,8 @@ class RadiossRigidBody:
                             "Mass of rigid body").Mass = 1.0
             rbody.addProperty("App::PropertyVector", "Inertia", "RBody", 
                             "Inertia tensor").Inertia = FreeCAD.Vector(1,1,1)
+            rbody.addProperty("App::PropertyBool", "AutoMassProperties", "RBody",
+                            "Compute mass, center of mass and inertia from the node set on export").AutoMassProperties = True
             
             # 運動制御
             rbody.addProperty("App::PropertyBool", "FixX", "Motion", 
@@ -925,6 +2121,36 @@ class RadiossRigidBody:
     def IsActive(self):
         return FemGui.getActiveAnalysis() is not None
 
+class RadiossRigidBodyMass:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Compute Rigid Body Mass',
+                'ToolTip': 'Compute mass, center of mass and inertia of all rigid bodies from their node sets'}
+
+    def Activated(self):
+        import RadiossMassProperties
+        import RadiossModel
+        import RadiossTasks
+        analysis = FemGui.getActiveAnalysis()
+        model = RadiossModel.snapshot_analysis(analysis)
+        if not model.rigid_bodies:
+            FreeCAD.Console.PrintWarning("No rigid bodies found in the analysis\n")
+            return
+        doc = analysis.Document
+
+        # 節点質量の計算はバックグラウンド、プロパティの設定はGUIスレッドで行う
+        def finished(bodies):
+            RadiossMassProperties.apply_mass_properties(doc, bodies)
+            FreeCAD.Console.PrintMessage(f"Updated mass properties of {len(bodies)} rigid bodies\n")
+            doc.recompute()
+
+        RadiossTasks.run_task("Computing rigid body mass",
+                              lambda context: RadiossMassProperties.compute_mass_properties(model, False),
+                              finished)
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
 class RadiossContact:
     def GetResources(self):
         return {'Pixmap': '',
@@ -932,36 +2158,53 @@ class RadiossContact:
                 'ToolTip': 'Create a contact definition'}
 
     def Activated(self):
+        import RadiossContacts
         analysis = FemGui.getActiveAnalysis()
         if analysis:
-            contact = FreeCAD.ActiveDocument.addObject("App::FeaturePython", "RadiossContact")
-            
-            # 接触の基本プロパティ
-            contact.addProperty("App::PropertyString", "ContactName", "Contact", 
-                              "Name of contact").ContactName = "Contact1"
-            contact.addProperty("App::PropertyEnumeration", "ContactType", "Contact", 
-                              "Type of contact")
-            contact.ContactType = ["TYPE7", "TYPE11", "TYPE19"]
-            contact.addProperty("App::PropertyLink", "SlaveSet", "Contact", 
-                              "Slave node/segment set")
-            contact.addProperty("App::PropertyLink", "MasterSet", "Contact", 
-                              "Master node/segment set")
-            
-            # 接触パラメータ
-            contact.addProperty("App::PropertyFloat", "Gap", "Parameters", 
-                              "Initial gap").Gap = 0.0
-            contact.addProperty("App::PropertyFloat", "Friction", "Parameters", 
-                              "Friction coefficient").Friction = 0.0
-            contact.addProperty("App::PropertyFloat", "Stiffness", "Parameters", 
-                              "Contact stiffness").Stiffness = 0.0
-            contact.addProperty("App::PropertyFloat", "Damping", "Parameters", 
-                              "Contact damping").Damping = 0.0
-            
+            contact = RadiossContacts.make_contact(FreeCAD.ActiveDocument)
             analysis.addObject(contact)
 
     def IsActive(self):
         return FemGui.getActiveAnalysis() is not None
 
+class RadiossAutoContact:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Detect Contacts',
+                'ToolTip': 'Detect parts within a tolerance of each other and create contacts for them'}
+
+    def Activated(self):
+        from PySide2.QtWidgets import QInputDialog
+        import RadiossContacts
+        analysis = FemGui.getActiveAnalysis()
+        params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Radioss")
+        tolerance, ok = QInputDialog.getDouble(None, "Detect Contacts", "Tolerance (mm):",
+                                               params.GetFloat("AutoContactTolerance", 2.0), 0.0, 1.0e6, 3)
+        if not ok:
+            return
+        params.SetFloat("AutoContactTolerance", tolerance)
+        created = RadiossContacts.auto_contacts(analysis, tolerance)
+        FreeCAD.Console.PrintMessage(f"Created {len(created)} contacts\n")
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
+class RadiossContactCheck:
+    def GetResources(self):
+        return {'Pixmap': '',
+                'MenuText': 'Check Contacts',
+                'ToolTip': 'Check contacts for initial penetrations and suggest a gap'}
+
+    def Activated(self):
+        import RadiossContacts
+        analysis = FemGui.getActiveAnalysis()
+        results = RadiossContacts.check_contacts(analysis)
+        if not results:
+            FreeCAD.Console.PrintWarning("No contacts with slave and master sets found in the analysis\n")
+
+    def IsActive(self):
+        return FemGui.getActiveAnalysis() is not None
+
 class LsDynaImport:
     def GetResources(self):
         return {'Pixmap': '',
@@ -984,12 +2227,39 @@ class LsDynaImport:
         self.import_lsdyna(analysis, filename[0])
 
     def import_lsdyna(self, analysis, filepath):
-        """LS-DYNAファイルをインポートしてRadiossモデルに変換"""
+        """LS-DYNAファイルをインポートしてRadiossモデルに変換
+
+        解析とFemMeshの構築はバックグラウンドで行い、変換結果の反映はGUIスレッドで実行する。
+        """
+        import RadiossTasks
+        context = RadiossTasks.TaskContext(os.path.getsize(filepath))
+        context.profiler = RadiossProfile.begin("LS-DYNA import", filepath)
+        RadiossTasks.run_task("Importing LS-DYNA model",
+                              lambda context: self.read_lsdyna(filepath, context),
+                              lambda model_data: self.populate_document(analysis, model_data),
+                              context)
+
+    def read_lsdyna(self, filepath, context):
+        """ファイルを解析してFemMeshを構築（ワーカースレッド）"""
+        parser = LsDynaParser()
+        with RadiossProfile.stage("Reading and parsing"):
+            model_data = parser.parse_file(filepath, context)
+        if model_data.nodes:
+            with RadiossProfile.stage("Checking nodes"):
+                RadiossNodeMerge.check_model(model_data, context=context)
+        if model_data.nodes and model_data.elements:
+            context.report("Building mesh")
+            with RadiossProfile.stage("Building mesh"):
+                model_data.femmesh = self.build_femmesh(model_data.nodes, model_data.elements, context)
+        return model_data
+
+    def populate_document(self, analysis, model_data):
+        """変換結果をドキュメントに反映（GUIスレッド）"""
         try:
-            parser = LsDynaParser()
-            model_data = parser.parse_file(filepath)
-            self.convert_to_radioss(analysis, model_data)
-            FreeCAD.ActiveDocument.recompute()
+            with RadiossProfile.stage("Creating objects"):
+                self.convert_to_radioss(analysis, model_data)
+            with RadiossProfile.stage("Recompute"):
+                FreeCAD.ActiveDocument.recompute()
         except Exception as e:
             FreeCAD.Console.PrintError(f"Import error: {str(e)}\n")
 
@@ -997,12 +2267,21 @@ class LsDynaImport:
         """LS-DYNAデータをRadiossオブジェクトに変換"""
         # メッシュの変換
         if dyna_data.nodes and dyna_data.elements:
-            mesh = self.create_mesh(dyna_data.nodes, dyna_data.elements)
+            mesh = self.create_mesh(dyna_data.nodes, dyna_data.elements,
+                                    getattr(dyna_data, 'femmesh', None))
             analysis.addObject(mesh)
 
+        # 荷重曲線の表
+        if len(dyna_data.curves):
+            analysis.addObject(RadiossCurves.make_curve_table(FreeCAD.ActiveDocument, dyna_data.curves))
+
+        # ビーム・離散要素・スポット溶接・節点剛体
+        for obj in RadiossConnectors.make_connector_objects(FreeCAD.ActiveDocument, dyna_data.connectors):
+            analysis.addObject(obj)
+
         # 材料の変換
         for mat in dyna_data.materials:
-            radioss_mat = self.convert_material(mat)
+            radioss_mat = self.create_material(mat)
             analysis.addObject(radioss_mat)
 
         # 境界条件の変換
@@ -1020,22 +2299,40 @@ class LsDynaImport:
             radioss_contact = self.convert_contact(contact)
             analysis.addObject(radioss_contact)
 
-    def create_mesh(self, nodes, elements):
-        """LS-DYNAメッシュデータからFEMメッシュを作成"""
-        mesh_obj = ObjectsFem.makeMeshGmsh(FreeCAD.ActiveDocument, 'FEMMesh')
-        mesh = mesh_obj.FemMesh
+    def build_femmesh(self, nodes, elements, context=None):
+        """LS-DYNAメッシュデータからFemMeshを構築"""
+        mesh = FemMesh()
 
         # ノードの追加
-        for node_id, coords in nodes.items():
-            mesh.addNode(coords[0], coords[1], coords[2], node_id)
+        with RadiossProfile.stage("Adding nodes"):
+            for count, (node_id, coords) in enumerate(nodes.items()):
+                if context is not None and count % 10000 == 0:
+                    context.report(nodes=count)
+                mesh.addNode(coords[0], coords[1], coords[2], node_id)
 
         # 要素の追加
-        for elem_id, elem_data in elements.items():
-            if elem_data.type == "SHELL":
-                mesh.addFace4Node(*elem_data.nodes, elem_id)
-            elif elem_data.type == "SOLID":
-                mesh.addVolume8Node(*elem_data.nodes, elem_id)
-
+        with RadiossProfile.stage("Adding elements"):
+            for count, (elem_id, elem_data) in enumerate(elements.items()):
+                if context is not None and count % 10000 == 0:
+                    context.report(elements=count)
+                if elem_data.type == "SHELL":
+                    mesh.addFace(elem_data.nodes[:4], elem_id)
+                elif elem_data.type == "SOLID":
+                    volume = RadiossMeshTools.volume_nodes(elem_data.nodes[:8])
+                    if volume is not None:
+                        mesh.addVolume(volume, elem_id)
+
+        return mesh
+
+    def create_mesh(self, nodes, elements, mesh=None):
+        """LS-DYNAメッシュデータからFEMメッシュを作成（meshは構築済みのFemMesh）"""
+        mesh_obj = ObjectsFem.makeMeshGmsh(FreeCAD.ActiveDocument, 'FEMMesh')
+        if mesh is None:
+            mesh = self.build_femmesh(nodes, elements)
+        # パートごとの要素グループ（書き出しで/SHELL/<part>などに戻す）
+        add_part_groups(mesh, list(elements.keys()), [elem.type for elem in elements.values()],
+                        [getattr(elem, 'part', 0) for elem in elements.values()])
+        mesh_obj.FemMesh = mesh
         return mesh_obj
 
     def create_material(self, dyna_mat):
@@ -1050,19 +2347,20 @@ class LsDynaImport:
         }
 
         # 基本的な材料プロパティの設定
-        mat.Material = {
+        values = {
             'Name': dyna_mat.name,
             'YoungsModulus': f"{dyna_mat.E} MPa",
             'PoissonRatio': str(dyna_mat.nu),
-            'Density': f"{dyna_mat.rho} kg/m^3",
+            'Density': f"{dyna_mat.rho} t/mm^3",
             'RadiossType': material_mapping.get(dyna_mat.type, 'LAW2')
         }
 
         # 降伏応力と硬化パラメータの設定
         if hasattr(dyna_mat, 'yield_stress'):
-            mat.Material['YieldStrength'] = f"{dyna_mat.yield_stress} MPa"
+            values['YieldStrength'] = f"{dyna_mat.yield_stress} MPa"
         if hasattr(dyna_mat, 'tangent_modulus'):
-            mat.Material['HardeningParam'] = str(dyna_mat.tangent_modulus)
+            values['HardeningParam'] = str(dyna_mat.tangent_modulus)
+        mat.Material = values
 
         return mat
 
@@ -1085,6 +2383,7 @@ class LsDynaImport:
             load.Force = dyna_load.magnitude
         if hasattr(dyna_load, 'direction'):
             load.DirectionVector = FreeCAD.Vector(*dyna_load.direction)
+        set_load_curve(load, getattr(dyna_load, 'curve', 0))
         
         # 荷重適用ノードの設定
         if hasattr(dyna_load, 'nodes'):
@@ -1094,28 +2393,25 @@ class LsDynaImport:
 
     def convert_contact(self, dyna_contact):
         """LS-DYNA接触をRadioss接触に変換"""
-        contact = FreeCAD.ActiveDocument.addObject("App::FeaturePython", f"RadiossContact_{dyna_contact.id}")
-        
+        import RadiossContacts
         # 接触タイプの変換マッピング
         contact_mapping = {
             'AUTOMATIC_SURFACE_TO_SURFACE': 'TYPE7',
             'TIED_SURFACE_TO_SURFACE': 'TYPE2',
             'NODES_TO_SURFACE': 'TYPE11'
         }
-        
-        # 基本プロパティの設定
-        contact.addProperty("App::PropertyString", "ContactName", "Contact", "Name of contact")
-        contact.ContactName = f"Contact_{dyna_contact.id}"
-        
-        contact.addProperty("App::PropertyEnumeration", "ContactType", "Contact", "Type of contact")
-        contact.ContactType = ["TYPE7", "TYPE11", "TYPE19"]
-        contact.ContactType = contact_mapping.get(dyna_contact.type, 'TYPE7')
-        
-        # 接触パラメータの設定
+        contact_type = contact_mapping.get(dyna_contact.type, 'TYPE7')
+        if contact_type not in ("TYPE7", "TYPE11", "TYPE19"):
+            FreeCAD.Console.PrintWarning(f"Contact {dyna_contact.id}: {dyna_contact.type} is imported as TYPE7\n")
+            contact_type = 'TYPE7'
+
+        # 接触オブジェクトの作成はRadiossContactsと共通（全プロパティを持たせる）
+        contact = RadiossContacts.make_contact(
+            FreeCAD.ActiveDocument, f"RadiossContact_{dyna_contact.id}",
+            contact_name=f"Contact_{dyna_contact.id}", contact_type=contact_type)
         if hasattr(dyna_contact, 'static_friction'):
-            contact.addProperty("App::PropertyFloat", "Friction", "Parameters", "Friction coefficient")
             contact.Friction = dyna_contact.static_friction
-        
+
         return contact
 
     def IsActive(self):
@@ -1126,25 +2422,37 @@ class LsDynaParser:
     """LS-DYNAキーワードファイルのパーサー"""
     def __init__(self):
         self.nodes = {}
+        self.duplicate_node_ids = []
         self.elements = {}
         self.materials = []
         self.boundary_conditions = []
         self.loads = []
         self.contacts = []
+        self.curves = RadiossCurves.CurveTable()  # *DEFINE_CURVE
+        self.connectors = RadiossConnectors.connector_tables()
+        self.node_sets = {}          # *SET_NODE: SID -> 節点ID配列
+        self.rigid_body_cards = []   # *CONSTRAINED_NODAL_RIGID_BODY（ノードセットは最後に解決）
+        self.section = None          # 行を貯めてまとめて変換するキーワードの解析関数
         self.current_keyword = None
 
-    def parse_file(self, filepath):
-        """LS-DYNAファイルを解析"""
+    def parse_file(self, filepath, context=None):
+        """LS-DYNAファイルを解析（contextがあれば進捗報告とキャンセル確認）"""
         with open(filepath, 'r') as f:
             lines = f.readlines()
 
-        for line in lines:
+        done_bytes = 0
+        for count, line in enumerate(lines):
+            if context is not None:
+                done_bytes += len(line)
+                if count % 10000 == 0:
+                    context.report("Parsing", bytes=done_bytes, lines=count)
             line = line.strip()
             if not line or line.startswith('$'):  # コメントをスキップ
                 continue
 
             if line.startswith('*'):
                 self.current_keyword = line[1:].strip().upper()
+                self.start_keyword()
                 continue
 
             try:
@@ -1152,8 +2460,44 @@ class LsDynaParser:
             except Exception as e:
                 FreeCAD.Console.PrintWarning(f"Warning: Failed to parse line: {line}\nError: {str(e)}\n")
 
+        self.close_section()
+        RadiossConnectors.resolve_rigid_bodies(self.connectors['RBODY'], self.rigid_body_cards, self.node_sets)
         return self
 
+    def start_keyword(self):
+        """キーワードの切り替わり（曲線・1次元要素などは行を貯めてキーワードの終わりで変換する）"""
+        self.close_section()
+        keyword = self.current_keyword
+        options = keyword.split('_')
+        if keyword in ('DEFINE_CURVE', 'DEFINE_CURVE_TITLE'):
+            self.section = RadiossCurves.DefineCurveSection(self.curves, title=keyword.endswith('_TITLE'))
+        elif keyword.startswith('ELEMENT_BEAM'):
+            self.section = RadiossConnectors.ElementSection(
+                self.connectors['BEAM'], 3, part_column=True, cards=RadiossConnectors.element_cards(keyword))
+        elif keyword.startswith('ELEMENT_DISCRETE'):
+            self.section = RadiossConnectors.ElementSection(
+                self.connectors['SPRING'], 2, part_column=True, cards=RadiossConnectors.element_cards(keyword))
+        elif keyword.startswith('CONSTRAINED_SPOTWELD'):
+            self.section = RadiossConnectors.SpotweldSection(self.connectors['SPOTWELD'],
+                                                             with_id=keyword.endswith('_ID'))
+        elif keyword.startswith('CONSTRAINED_NODAL_RIGID_BODY'):
+            self.section = RadiossConnectors.NodalRigidBodySection(
+                self.rigid_body_cards, title='TITLE' in options[4:],
+                single=any(option != 'TITLE' for option in options[4:]))
+        elif keyword.startswith('SET_NODE'):
+            self.section = RadiossConnectors.NodeSetSection(self.node_sets, title='TITLE' in options,
+                                                            generate='GENERATE' in options)
+
+    def close_section(self):
+        if self.section is None:
+            return
+        section, self.section = self.section, None
+        try:
+            section.close()
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Failed to parse *{self.current_keyword}\n"
+                                         f"Error: {str(e)}\n")
+
     def clean_data(self, line):
         """データ行をクリーンアップして分割"""
         # カンマまたは空白で分割
@@ -1170,7 +2514,9 @@ class LsDynaParser:
         if not self.current_keyword:
             return
 
-        if self.current_keyword.startswith('NODE'):
+        if self.section is not None:
+            self.section(line)
+        elif self.current_keyword.startswith('NODE'):
             self.parse_node(line)
         elif self.current_keyword.startswith('ELEMENT'):
             self.parse_element(line)
@@ -1190,6 +2536,8 @@ class LsDynaParser:
             try:
                 node_id = int(data[0])
                 coords = [float(x) for x in data[1:4]]
+                if node_id in self.nodes:
+                    self.duplicate_node_ids.append(node_id)
                 self.nodes[node_id] = coords
             except (ValueError, IndexError):
                 FreeCAD.Console.PrintWarning(f"Warning: Invalid node data: {line}\n")
@@ -1206,7 +2554,7 @@ class LsDynaParser:
                     if node_str:
                         nodes.append(int(node_str))
                 if nodes:
-                    self.elements[elem_id] = SimpleNamespace(type=elem_type, nodes=nodes)
+                    self.elements[elem_id] = SimpleNamespace(type=elem_type, nodes=nodes, part=int(data[1]))
             except (ValueError, IndexError):
                 FreeCAD.Console.PrintWarning(f"Warning: Invalid element data: {line}\n")
 
@@ -1250,18 +2598,21 @@ class LsDynaParser:
     def parse_load(self, line):
         """荷重データの解析"""
         data = self.clean_data(line)
-        if len(data) >= 6:  # ID + ノード + 大きさ + 方向(x,y,z)
+        if len(data) >= 6:  # ID + ノード + 大きさ + 方向(x,y,z) [+ 曲線ID]
             try:
                 load_id = int(data[0])
                 nodes = [int(data[1])]
                 magnitude = float(data[2])
                 direction = [float(x) for x in data[3:6]]
-                self.loads.append(SimpleNamespace(
+                load = SimpleNamespace(
                     id=load_id,
                     nodes=nodes,
                     magnitude=magnitude,
                     direction=direction
-                ))
+                )
+                if len(data) > 6 and int(data[6]) > 0:
+                    load.curve = int(data[6])
+                self.loads.append(load)
             except (ValueError, IndexError):
                 FreeCAD.Console.PrintWarning(f"Warning: Invalid load data: {line}\n")
 
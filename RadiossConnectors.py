@@ -0,0 +1,475 @@
+"""1次元要素・結合要素（バネ、ビーム、スポット溶接、RBE2/RBE3、剛体）の表
+
+数万個のスポット溶接や剛体を個別のFreeCADオブジェクトにせず、種類ごとに
+1つの表（ConnectorTable）にまとめて持つ。各要素の節点は1本の配列に連結し、
+要素ごとの開始位置（offsets）で区切る（RBE2や剛体は節点数が要素ごとに違う）。
+
+ドキュメントには種類ごとに1つのオブジェクト（ConnectorProxy）として保存する。
+
+デッキの/RBE2, /RBE3, /RBODYは主節点（RBE3は従属節点）をカードに書き、従節点は
+/GRNOD/NODEの節点グループで参照する。
+"""
+import base64
+import io
+
+import FreeCAD
+import numpy as np
+
+import RadiossBlocks
+
+# 種類 -> (ドキュメント内のオブジェクト名, 固定の節点数（Noneは可変）)
+KINDS = {
+    'SPRING': ("RadiossSprings", 2),
+    'BEAM': ("RadiossBeams", 3),
+    'SPOTWELD': ("RadiossSpotwelds", 2),
+    'RBE2': ("RadiossRBE2", None),
+    'RBE3': ("RadiossRBE3", None),
+    'RBODY': ("RadiossRigidBodies", None),
+}
+
+# 拘束する自由度（Trarot: 並進3桁 + 空白 + 回転3桁）
+TRAROT_ALL = "   111 111"
+TRAROT_TRANSLATION = "   111 000"
+
+# LS-DYNAの*ELEMENT_BEAM/*ELEMENT_DISCRETEで要素ごとにカードが1枚増えるオプション
+ELEMENT_CARD_OPTIONS = ('THICKNESS', 'SCALAR', 'SCALR', 'SECTION', 'PID', 'OFFSET',
+                        'ORIENTATION', 'WARPAGE', 'ELBOW', 'LCO')
+
+
+class ConnectorTable:
+    """1種類の結合要素の表（ID・パート・連結した節点ID）"""
+    def __init__(self, kind):
+        self.kind = kind
+        self.ids = np.empty(0, dtype=np.int64)
+        self.parts = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.nodes = np.empty(0, dtype=np.int64)
+        self.titles = {}  # タイトルのある要素だけ id -> タイトル
+        self._pending = []
+
+    def __len__(self):
+        self._consolidate()
+        return len(self.ids)
+
+    def add(self, elem_id, part, nodes, title=""):
+        """要素を1つ追加（RBE2・剛体など節点数が可変のもの）"""
+        nodes = np.asarray(nodes, dtype=np.int64).ravel()
+        self._pending.append((np.array([elem_id], dtype=np.int64), np.array([part], dtype=np.int64),
+                              np.array([len(nodes)], dtype=np.int64), nodes))
+        if title:
+            self.titles[int(elem_id)] = title
+
+    def add_rows(self, ids, parts, conn):
+        """固定幅の接続表(n, w)をまとめて追加（0以下の節点IDは未使用として除く）"""
+        ids = np.asarray(ids, dtype=np.int64)
+        conn = np.asarray(conn, dtype=np.int64).reshape(len(ids), -1)
+        parts = np.broadcast_to(np.asarray(parts, dtype=np.int64), ids.shape)
+        used = conn > 0
+        self._pending.append((ids, np.array(parts), used.sum(axis=1), conn[used]))
+
+    def _consolidate(self):
+        """追加分を連結し、ID順に並べる（同じIDは後から追加したものを残す）"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        ids = np.concatenate([self.ids] + [p[0] for p in pending])
+        parts = np.concatenate([self.parts] + [p[1] for p in pending])
+        counts = np.concatenate([np.diff(self.offsets)] + [p[2] for p in pending])
+        nodes = np.concatenate([self.nodes] + [p[3] for p in pending])
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        last = np.append(sorted_ids[1:] != sorted_ids[:-1], True)
+        order = order[last]
+        counts = counts[order]
+        self.ids = ids[order]
+        self.parts = parts[order]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        # 要素ごとの節点の並びを新しい順に集める
+        self.nodes = nodes[np.repeat(starts[order] - self.offsets[:-1], counts)
+                           + np.arange(self.offsets[-1])]
+
+    def node_counts(self):
+        self._consolidate()
+        return np.diff(self.offsets)
+
+    def connectivity(self, position):
+        """position番目の要素の節点ID（先頭が主節点）"""
+        self._consolidate()
+        return self.nodes[self.offsets[position]:self.offsets[position + 1]]
+
+    def padded(self, width):
+        """(n, width)の接続表（足りない節点は-1、多い分は切り捨て）"""
+        self._consolidate()
+        counts = np.minimum(np.diff(self.offsets), width)
+        table = np.full((len(self.ids), width), -1, dtype=np.int64)
+        rows = np.repeat(np.arange(len(self.ids)), counts)
+        columns = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        table[rows, columns] = self.nodes[np.repeat(self.offsets[:-1], counts) + columns]
+        return table
+
+    def title(self, elem_id):
+        return self.titles.get(int(elem_id), "")
+
+    def merge(self, other):
+        other._consolidate()
+        self._pending.append((other.ids, other.parts, np.diff(other.offsets), other.nodes))
+        self.titles.update(other.titles)
+        return self
+
+    def to_bytes(self):
+        """npz形式のバイト列"""
+        self._consolidate()
+        titled = np.array(sorted(self.titles), dtype=np.int64)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, ids=self.ids, parts=self.parts, offsets=self.offsets,
+                            nodes=self.nodes, title_ids=titled,
+                            titles=np.array([self.titles[i] for i in titled.tolist()], dtype=str))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, kind, data):
+        table = cls(kind)
+        with np.load(io.BytesIO(data)) as arrays:
+            table.ids = arrays['ids']
+            table.parts = arrays['parts']
+            table.offsets = arrays['offsets']
+            table.nodes = arrays['nodes']
+            table.titles = {int(i): str(t) for i, t in zip(arrays['title_ids'], arrays['titles'])}
+        return table
+
+
+def connector_tables():
+    """種類 -> 空の表"""
+    return {kind: ConnectorTable(kind) for kind in KINDS}
+
+
+def int_rows(lines, width):
+    """データ行 -> 先頭widthフィールドの整数表（空欄は0）"""
+    if not lines:
+        return np.empty((0, width), dtype=np.int64)
+    table = np.array(RadiossBlocks.split_rows(lines, width), dtype=object)
+    table[table == ''] = '0'
+    return table.astype(np.int64)
+
+
+def int_values(lines):
+    """数値だけのデータ行 -> 整数の1次元配列（整数でない値があればValueError）"""
+    if not lines:
+        return np.empty(0, dtype=np.int64)
+    return np.array(" ".join(lines).replace(',', ' ').split(), dtype=np.int64)
+
+
+def fixed_fields(line, widths):
+    """固定幅のカード行 -> フィールドの文字列のリスト（カンマ区切りなら自由形式）
+
+    解析時に行頭の空白が除かれているので、1つ目のフィールドは右詰めだったとして戻す。
+    """
+    if ',' in line:
+        fields = [field.strip() for field in line.split(',')]
+        return (fields + [''] * len(widths))[:len(widths)]
+    first = line.split(None, 1)[0] if line.strip() else ""
+    line = " " * max(widths[0] - len(first), 0) + line
+    fields, start = [], 0
+    for width in widths:
+        fields.append(line[start:start + width].strip())
+        start += width
+    return fields
+
+
+def _int(text):
+    return int(text) if text else 0
+
+
+def node_group_card(group_id, title, nodes):
+    """/GRNOD/NODEカード（1行に10個）"""
+    nodes = list(nodes)
+    return (f"/GRNOD/NODE/{group_id}\n{title}\n"
+            + "".join("".join(f"{n:10d}" for n in nodes[k:k + 10]) + "\n" for k in range(0, len(nodes), 10)))
+
+
+def rbe2_card(elem_id, title, main, group_id):
+    """/RBE2カード（node_IDm Trarot Iskew grnd_ID Iflag）"""
+    return f"/RBE2/{elem_id}\n{title}\n{main:10d}{TRAROT_ALL}{0:10d}{group_id:10d}{0:10d}\n"
+
+
+def rbe3_card(elem_id, title, dependent, group_id, weight=1.0):
+    """/RBE3カード（node_IDd Trarot Iskew I_modif、Trarot_Ref Wt_i grnd_IDi）"""
+    return (f"/RBE3/{elem_id}\n{title}\n{dependent:10d}{TRAROT_ALL}{0:10d}{0:10d}\n"
+            f"{TRAROT_TRANSLATION}{weight:20.6E}{group_id:10d}\n")
+
+
+def rbody_card(body_id, title, main, group_id, mass=0.0, inertia=(0.0,) * 6, icog=1):
+    """/RBODYカード
+
+    node_ID sens_ID Skew_ID Ispher Mass grnd_ID Ikrem ICoG surf_ID、
+    Jxx Jyy Jzz、Jxy Jyz Jxz。質量と慣性は主節点に加える値。
+    """
+    jxx, jyy, jzz, jxy, jyz, jxz = inertia
+    return (f"/RBODY/{body_id}\n{title}\n"
+            f"{main:10d}{0:10d}{0:10d}{0:10d}{mass:20.6E}{group_id:10d}{0:10d}{icog:10d}{0:10d}\n"
+            f"{jxx:20.6E}{jyy:20.6E}{jzz:20.6E}\n{jxy:20.6E}{jyz:20.6E}{jxz:20.6E}\n")
+
+
+class ElementSection:
+    """固定幅の要素行（ID [パート] 節点...）の解析
+
+    行は貯めておき、セクションの終わり（close）でまとめて配列に変換する。
+    part_columnがTrueなら2列目がパート（LS-DYNA）、Falseならヘッダーのpartを使う。
+    """
+    def __init__(self, table, nodes, part=None, part_column=False, cards=1):
+        self.table = table
+        self.nodes = nodes
+        self.part = part or 0
+        self.part_column = part_column
+        self.cards = cards
+        self.lines = []
+
+    def __call__(self, line):
+        self.lines.append(line)
+
+    def close(self):
+        lines = self.lines[::self.cards] if self.cards > 1 else self.lines
+        width = 1 + int(self.part_column) + self.nodes
+        rows = int_rows(lines, width)
+        parts = rows[:, 1] if self.part_column else self.part
+        self.table.add_rows(rows[:, 0], parts, rows[:, width - self.nodes:])
+
+
+class NodeGroupSection:
+    """/GRNOD/NODE/<id>の解析（1行目: タイトル、以降: 節点ID）"""
+    def __init__(self, groups, group_id):
+        self.groups = groups
+        self.group_id = group_id
+        self.title = None
+        self.lines = []
+
+    def __call__(self, line):
+        if self.title is None:
+            self.title = line
+        else:
+            self.lines.append(line)
+
+    def close(self):
+        if self.group_id is None:
+            FreeCAD.Console.PrintWarning("/GRNOD/NODE without id ignored\n")
+            return
+        try:
+            nodes = int_values(self.lines)
+        except ValueError as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Invalid node id in /GRNOD/NODE/{self.group_id}, "
+                                         f"group ignored\nError: {str(e)}\n")
+            return
+        self.groups[self.group_id] = nodes[nodes > 0]
+
+
+class RigidSection:
+    """/RBE2, /RBE3, /RBODYの解析（1行目: タイトル、以降: カード）
+
+    主節点（RBE3は従属節点）はカード1の1つ目のフィールド、従節点はカードの
+    grnd_ID（RBE3は2枚目以降のカードのgrnd_IDi）の節点グループ。グループは後で
+    定義されてもよいので、ファイルの終わりにresolve_rigid_sectionsで節点を決める。
+    """
+    def __init__(self, pending, kind, elem_id):
+        self.pending = pending
+        self.kind = kind
+        self.elem_id = elem_id
+        self.title = None
+        self.lines = []
+
+    def __call__(self, line):
+        if self.title is None:
+            self.title = line
+        else:
+            self.lines.append(line)
+
+    def close(self):
+        if not self.lines:
+            return
+        if self.elem_id is None:
+            FreeCAD.Console.PrintWarning(f"/{self.kind} without id ignored\n")
+            return
+        if self.kind == 'RBE2':
+            fields = fixed_fields(self.lines[0], (10, 10, 10, 10, 10))
+            main, group_ids = _int(fields[0]), [_int(fields[3])]
+        elif self.kind == 'RBODY':
+            fields = fixed_fields(self.lines[0], (10, 10, 10, 10, 20, 10, 10, 10, 10))
+            main, group_ids = _int(fields[0]), [_int(fields[5])]
+        else:
+            # Trarot_Refは空白を含むので、grnd_IDiは行の最後の値
+            main = _int(fixed_fields(self.lines[0], (10,))[0])
+            group_ids = [int(line.replace(',', ' ').split()[-1]) for line in self.lines[1:]]
+        self.pending.append((self.kind, self.elem_id, main, group_ids, self.title or ""))
+
+
+def resolve_rigid_sections(tables, pending, groups):
+    """/RBE2, /RBE3, /RBODYを主節点 + 節点グループの節点として表に登録"""
+    for kind, elem_id, main, group_ids, title in pending:
+        missing = [group_id for group_id in group_ids if group_id not in groups]
+        if missing:
+            FreeCAD.Console.PrintWarning(f"/{kind}/{elem_id}: node group {missing} not found\n")
+        if main <= 0:
+            FreeCAD.Console.PrintWarning(f"/{kind}/{elem_id}: no main node, ignored\n")
+            continue
+        found = [groups[group_id] for group_id in group_ids if group_id in groups]
+        nodes = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        tables[kind].add(elem_id, 0, np.concatenate([[main], nodes[nodes != main]]), title)
+
+
+class SpotweldSection:
+    """*CONSTRAINED_SPOTWELD(_ID)の解析（_IDでは各溶接の前にIDのカード）"""
+    def __init__(self, table, with_id=False):
+        self.table = table
+        self.with_id = with_id
+        self.lines = []
+
+    def __call__(self, line):
+        self.lines.append(line)
+
+    def close(self):
+        if self.with_id:
+            ids = int_rows(self.lines[0::2], 1)[:, 0]
+            conn = int_rows(self.lines[1::2], 2)[:len(ids)]
+            ids = ids[:len(conn)]
+        else:
+            conn = int_rows(self.lines, 2)
+            first = int(self.table.ids.max()) + 1 if len(self.table) else 1
+            ids = np.arange(first, first + len(conn))
+        self.table.add_rows(ids, 0, conn)
+
+
+class NodeSetSection:
+    """*SET_NODE(_LIST)(_TITLE/_GENERATE)の解析（カード1: SID、以降: 節点ID）"""
+    def __init__(self, node_sets, title=False, generate=False):
+        self.node_sets = node_sets
+        self.title = "" if title else None
+        self.generate = generate
+        self.set_id = None
+        self.lines = []
+
+    def __call__(self, line):
+        if self.title == "":
+            self.title = line
+        elif self.set_id is None:
+            self.set_id = int(line.replace(',', ' ').split()[0])
+        else:
+            self.lines.append(line)
+
+    def close(self):
+        if self.set_id is None:
+            return
+        try:
+            values = int_values(self.lines)
+        except ValueError as e:
+            FreeCAD.Console.PrintWarning(f"Warning: Invalid node id in node set {self.set_id}, "
+                                         f"set ignored\nError: {str(e)}\n")
+            return
+        if self.generate:
+            # (開始, 終了)の組を範囲に展開
+            ranges = values[:len(values) // 2 * 2].reshape(-1, 2)
+            ranges = ranges[(ranges[:, 0] > 0) & (ranges[:, 1] >= ranges[:, 0])]
+            values = (np.concatenate([np.arange(a, b + 1) for a, b in ranges.tolist()])
+                      if len(ranges) else np.empty(0, dtype=np.int64))
+        self.node_sets[self.set_id] = values[values > 0]
+
+
+class NodalRigidBodySection:
+    """*CONSTRAINED_NODAL_RIGID_BODY(_TITLE/_INERTIA/_SPC)の解析
+
+    カード1: PID CID NSID PNODE ...。従節点はNSIDのノードセットなので、
+    ファイルの終わりでresolve()を呼んで節点を決める。
+    """
+    def __init__(self, pending, title=False, single=False):
+        self.pending = pending
+        self.titled = title   # _TITLEでは各剛体の前にタイトルのカード
+        self.single = single  # _INERTIAなどは2枚目以降が剛体の追加カード
+        self.title = None
+        self.count = 0
+
+    def __call__(self, line):
+        if self.single and self.count:
+            return
+        if self.titled and self.title is None:
+            self.title = line
+            return
+        pid, _, nsid, pnode = int_rows([line], 4)[0].tolist()
+        self.pending.append((pid, nsid, pnode, self.title or ""))
+        self.title = None
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+def resolve_rigid_bodies(table, pending, node_sets):
+    """*CONSTRAINED_NODAL_RIGID_BODYをRBODY（主節点 + ノードセットの節点）として登録
+
+    PNODEが0のときはノードセットの最初の節点を主節点にする。
+    """
+    for pid, nsid, pnode, title in pending:
+        nodes = node_sets.get(nsid)
+        if nodes is None:
+            FreeCAD.Console.PrintWarning(f"Rigid body {pid}: node set {nsid} not found\n")
+            continue
+        if pnode > 0:
+            nodes = np.concatenate([[pnode], nodes[nodes != pnode]])
+        table.add(pid, 0, nodes, title)
+
+
+def element_cards(keyword):
+    """*ELEMENT_BEAM_THICKNESSなどの、要素1つあたりのカード数"""
+    return 1 + sum(option in ELEMENT_CARD_OPTIONS for option in keyword.split('_')[2:])
+
+
+class ConnectorProxy:
+    """ドキュメント内の1種類の結合要素の表（npzのバイト列として保存）"""
+    def __init__(self, obj, table):
+        obj.Proxy = self
+        self.table = table
+        self.update_properties(obj)
+
+    def update_properties(self, obj):
+        for name, kind, doc in (("ConnectorType", "App::PropertyString", "Connector type"),
+                                ("Count", "App::PropertyInteger", "Number of connectors"),
+                                ("NodeCount", "App::PropertyInteger", "Total number of connected nodes")):
+            if not hasattr(obj, name):
+                obj.addProperty(kind, name, "Connectors", doc)
+        obj.ConnectorType = self.table.kind
+        obj.Count = len(self.table)
+        obj.NodeCount = int(len(self.table.nodes))
+
+    def execute(self, obj):
+        pass
+
+    def dumps(self):
+        return {'kind': self.table.kind,
+                'table': base64.b64encode(self.table.to_bytes()).decode('ascii')}
+
+    def loads(self, state):
+        if state:
+            self.table = ConnectorTable.from_bytes(state['kind'], base64.b64decode(state['table']))
+
+    __getstate__ = dumps
+    __setstate__ = loads
+
+
+def make_connector_objects(doc, tables):
+    """空でない種類ごとに1つのオブジェクトを作成 -> オブジェクトのリスト"""
+    objects = []
+    for kind, table in tables.items():
+        if len(table):
+            obj = doc.addObject("App::FeaturePython", KINDS[kind][0])
+            ConnectorProxy(obj, table)
+            objects.append(obj)
+    return objects
+
+
+def analysis_connectors(analysis):
+    """解析内の結合要素を種類ごとにまとめた表"""
+    tables = connector_tables()
+    for obj in analysis.Group:
+        proxy = getattr(obj, "Proxy", None)
+        if isinstance(proxy, ConnectorProxy):
+            tables[proxy.table.kind].merge(proxy.table)
+    return tables
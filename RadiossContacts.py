@@ -0,0 +1,386 @@
+"""接触定義（RadiossContact）の事前チェックと自動検出
+
+事前チェックはスレーブ節点とマスターセグメントの初期距離を空間インデックスで調べ、
+初期貫通・最小距離と/INTER/TYPE7に設定すべきGapを報告する。
+自動検出はパートの包含箱で候補ペアを絞り（ブロードフェーズ）、
+節点とセグメントの距離で接近しているパートの組を求める（ナローフェーズ）。
+"""
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossMeshTools
+import RadiossModel
+import RadiossSpatialIndex
+from RadiossMeshTools import lookup_by_id
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+
+def contacts(analysis):
+    return [obj for obj in analysis.Group if hasattr(obj, 'ContactType')]
+
+
+def node_rows(arrays, node_ids):
+    """節点ID配列 -> 座標配列の行番号（存在しない節点は除く）"""
+    rows = lookup_by_id(arrays.node_ids, np.arange(len(arrays.node_ids)), node_ids, -1)
+    return np.unique(rows[rows >= 0])
+
+
+def nodal_thickness(arrays):
+    """節点ごとの接続シェルの最大厚さ（シェルが無ければ0）"""
+    thickness = np.zeros(len(arrays.node_ids))
+    if len(arrays.shells) and hasattr(arrays, 'shell_thickness'):
+        used = arrays.shells >= 0
+        values = np.broadcast_to(arrays.shell_thickness[:, None], arrays.shells.shape)[used]
+        np.maximum.at(thickness, arrays.shells[used], values)
+    return thickness
+
+
+def set_nodes(arrays, set_obj):
+    """セットの節点行番号（要素セットなら要素の節点）"""
+    kind, ids = RadiossModel.set_members(set_obj)
+    if kind == 'NODE':
+        return node_rows(arrays, ids)
+    conn = np.concatenate([arrays.shells[np.isin(arrays.shell_ids, ids)].ravel(),
+                           arrays.solids[np.isin(arrays.solid_ids, ids)].ravel()])
+    return np.unique(conn[conn >= 0])
+
+
+def set_segments(arrays, set_obj):
+    """セットの面セグメント（行番号、幅4）と厚さ
+
+    要素セットはシェル要素とソリッド要素の外表面、節点セットは
+    すべての節点がセットに含まれるシェル要素と外表面を使う。
+    """
+    kind, ids = RadiossModel.set_members(set_obj)
+    shell_thickness = getattr(arrays, 'shell_thickness', np.zeros(len(arrays.shells)))
+    if kind == 'NODE':
+        # 末尾の要素は空欄（-1）用で常にTrue
+        in_set = np.zeros(len(arrays.node_ids) + 1, dtype=bool)
+        in_set[node_rows(arrays, ids)] = True
+        in_set[-1] = True
+        shell_mask = np.all(in_set[arrays.shells], axis=1)
+        skin = RadiossMeshTools.solid_skin_faces(arrays.solids)
+        skin = skin[np.all(in_set[skin], axis=1)]
+    else:
+        shell_mask = np.isin(arrays.shell_ids, ids)
+        skin = RadiossMeshTools.solid_skin_faces(arrays.solids[np.isin(arrays.solid_ids, ids)])
+    faces = np.concatenate([arrays.shells[shell_mask], skin])
+    thickness = np.concatenate([shell_thickness[shell_mask], np.zeros(len(skin))])
+    return faces, thickness
+
+
+def search_distance(arrays, faces, gap, thickness):
+    """検索距離（ギャップまたは厚さの何倍か、どちらも無ければセグメント寸法から）"""
+    factor = FreeCAD.ParamGet(PARAMS).GetFloat("ContactSearchFactor", 2.0)
+    base = max(gap, float(thickness.max()) if len(thickness) else 0.0)
+    if base <= 0.0 and len(faces):
+        points = arrays.coords[RadiossMeshTools.closed_shells(faces)[0]]
+        base = 0.1 * float(np.median((points.max(axis=1) - points.min(axis=1)).max(axis=1)))
+    return factor * max(base, 1.0e-9)
+
+
+def check_contact(arrays, contact, thickness=None):
+    """1つの接触定義の事前チェック"""
+    if thickness is None:
+        thickness = nodal_thickness(arrays)
+    slave = set_nodes(arrays, contact.SlaveSet)
+    faces, face_thickness = set_segments(arrays, contact.MasterSet)
+    gap = float(getattr(contact, 'Gap', 0.0))
+    search = search_distance(arrays, faces, gap, np.concatenate([face_thickness, thickness[slave]]))
+    result = RadiossSpatialIndex.contact_precheck(
+        arrays.coords, slave, faces, search, gap=gap,
+        node_thickness=thickness, face_thickness=face_thickness)
+    result.segments = len(faces)
+    result.search = search
+    result.suggested_gap = RadiossSpatialIndex.suggested_gap(
+        result.min_distance, float(result.gap.max()) if len(result.gap) else gap)
+    result.penetrating_ids = arrays.node_ids[slave[result.penetrating]]
+    return result
+
+
+def format_report(contact, result):
+    lines = [f"Contact {contact.ContactName} ({contact.ContactType}): "
+             f"{len(result.slave_rows)} slave nodes, {result.segments} master segments, "
+             f"{result.pairs} pairs within {result.search:.4g}"]
+    if np.isfinite(result.min_distance):
+        lines.append(f"  Minimum distance: {result.min_distance:.4g}")
+    else:
+        lines.append(f"  No master segment within {result.search:.4g}")
+    lines.append(f"  Initial penetrations: {len(result.penetrating_ids)}")
+    if len(result.penetrating_ids):
+        shown = " ".join(str(n) for n in result.penetrating_ids[:20].tolist())
+        lines.append(f"  Nodes: {shown}{' ...' if len(result.penetrating_ids) > 20 else ''}")
+    lines.append(f"  Suggested Gap: {result.suggested_gap:.4g}")
+    return "\n".join(lines) + "\n"
+
+
+def check_contacts(analysis, highlight=True):
+    """解析内の全接触定義をチェックし、結果を接触オブジェクトに記録"""
+    # 古いファイルやLS-DYNAから取り込んだ接触はセットのプロパティを持たないことがある
+    items = [c for c in contacts(analysis)
+             if getattr(c, 'SlaveSet', None) is not None and getattr(c, 'MasterSet', None) is not None]
+    if not items:
+        return []
+    arrays = RadiossModel.merged_arrays(analysis, properties=True)
+    thickness = nodal_thickness(arrays)
+    results = []
+    penetrating = []
+    for contact in items:
+        result = check_contact(arrays, contact, thickness)
+        for name, doc in (("SuggestedGap", "Gap without initial penetration (contact pre-check)"),
+                          ("InitialPenetrations", "Slave nodes closer than the gap (contact pre-check)")):
+            if not hasattr(contact, name):
+                kind = "App::PropertyFloat" if name == "SuggestedGap" else "App::PropertyInteger"
+                contact.addProperty(kind, name, "Check", doc)
+        contact.SuggestedGap = result.suggested_gap
+        contact.InitialPenetrations = len(result.penetrating_ids)
+        if len(result.penetrating_ids):
+            FreeCAD.Console.PrintWarning(format_report(contact, result))
+        else:
+            FreeCAD.Console.PrintMessage(format_report(contact, result))
+        penetrating.append(result.penetrating_ids)
+        results.append(SimpleNamespace(contact=contact, result=result))
+
+    if highlight and FreeCAD.GuiUp:
+        highlight_nodes(arrays.meshes, np.unique(np.concatenate(penetrating)))
+    return results
+
+
+def highlight_nodes(meshes, node_ids):
+    """貫通節点をメッシュの表示で強調"""
+    for mesh_obj in meshes:
+        view = getattr(mesh_obj, "ViewObject", None)
+        if view is None or not hasattr(view, "HighlightedNodes"):
+            continue
+        nodes = np.fromiter(mesh_obj.FemMesh.Nodes.keys(), dtype=np.int64)
+        view.HighlightedNodes = node_ids[np.isin(node_ids, nodes)].tolist()
+
+
+def make_contact(doc, name="RadiossContact", contact_name="Contact1", contact_type="TYPE7",
+                 slave=None, master=None, gap=0.0):
+    """接触オブジェクトを作成"""
+    contact = doc.addObject("App::FeaturePython", name)
+
+    # 接触の基本プロパティ
+    contact.addProperty("App::PropertyString", "ContactName", "Contact",
+                        "Name of contact").ContactName = contact_name
+    contact.addProperty("App::PropertyEnumeration", "ContactType", "Contact",
+                        "Type of contact")
+    contact.ContactType = ["TYPE7", "TYPE11", "TYPE19"]
+    contact.ContactType = contact_type
+    contact.addProperty("App::PropertyLink", "SlaveSet", "Contact",
+                        "Slave node/segment set").SlaveSet = slave
+    contact.addProperty("App::PropertyLink", "MasterSet", "Contact",
+                        "Master node/segment set").MasterSet = master
+
+    # 接触パラメータ
+    contact.addProperty("App::PropertyFloat", "Gap", "Parameters",
+                        "Initial gap").Gap = gap
+    contact.addProperty("App::PropertyFloat", "Friction", "Parameters",
+                        "Friction coefficient").Friction = 0.0
+    contact.addProperty("App::PropertyFloat", "Stiffness", "Parameters",
+                        "Contact stiffness").Stiffness = 0.0
+    contact.addProperty("App::PropertyFloat", "Damping", "Parameters",
+                        "Contact damping").Damping = 0.0
+    return contact
+
+
+def part_faces(arrays):
+    """パートごとの面セグメント -> (面配列, パートID, 要素ID)
+
+    ソリッドはパートごとに外表面を取り出す（隣のパートとの境界面も残す）。
+    """
+    faces = [arrays.shells]
+    parts = [arrays.shell_parts]
+    elems = [arrays.shell_ids]
+    for part_id in np.unique(arrays.solid_parts):
+        mask = arrays.solid_parts == part_id
+        skin = RadiossMeshTools.solid_skin_faces(arrays.solids[mask])
+        faces.append(skin)
+        parts.append(np.full(len(skin), part_id, dtype=np.int64))
+        elems.append(np.full(len(skin), -1, dtype=np.int64))
+    faces = RadiossMeshTools.closed_shells(np.concatenate(faces))[0]
+    return faces, np.concatenate(parts), np.concatenate(elems)
+
+
+def part_node_entries(faces, face_parts):
+    """面セグメントの節点の(行番号, パートID)の組（パート境界の節点は複数回現れる）"""
+    rows = faces.ravel()
+    parts = np.repeat(face_parts, faces.shape[1])
+    entries = np.unique(np.stack([parts, rows], axis=1), axis=0)
+    return entries[:, 1], entries[:, 0]
+
+
+def part_boxes(coords, rows, parts):
+    """パートごとの包含箱 -> (パートID, 最小, 最大)"""
+    part_ids, inverse = np.unique(parts, return_inverse=True)
+    lo = np.full((len(part_ids), 3), np.inf)
+    hi = np.full((len(part_ids), 3), -np.inf)
+    np.minimum.at(lo, inverse, coords[rows])
+    np.maximum.at(hi, inverse, coords[rows])
+    return part_ids, lo, hi
+
+
+def overlapping_boxes(lo, hi):
+    """包含箱の重なる組 -> (i, j) i < j
+
+    箱を一様格子のセルに登録し、同じセルに入った箱どうしだけを比べる。
+    """
+    count = len(lo)
+    if count < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    size = (hi - lo).max(axis=1)
+    cell_size = max(float(np.median(size)), float(size.max()) / 64.0, 1.0e-9)
+    grid = RadiossSpatialIndex.CellGrid(lo.min(axis=0), hi.max(axis=0), cell_size)
+    boxes, keys = grid.box_cells(lo, hi)
+    order = np.lexsort((boxes, keys))
+    boxes, keys = boxes[order], keys[order]
+
+    # 同じセル内の後ろの箱すべてと組にする
+    group_end = np.searchsorted(keys, keys, side='right')
+    position = np.arange(len(keys))
+    counts = group_end - position - 1
+    first = np.repeat(boxes, counts)
+    second = boxes[RadiossSpatialIndex.expand_ranges(position + 1, counts)]
+    pairs = np.unique(np.stack([np.minimum(first, second), np.maximum(first, second)], axis=1), axis=0)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    overlap = np.all((lo[pairs[:, 0]] <= hi[pairs[:, 1]]) & (lo[pairs[:, 1]] <= hi[pairs[:, 0]]), axis=1)
+    return pairs[overlap, 0], pairs[overlap, 1]
+
+
+def free_edge_entries(faces, face_parts):
+    """パートごとの自由辺（1つの面にしか使われない辺）上の節点 -> (パートID, 行番号)の組"""
+    edges = np.stack([faces, np.roll(faces, -1, axis=1)], axis=2).reshape(-1, 2)
+    edge_parts = np.repeat(face_parts, faces.shape[1])
+    valid = edges[:, 0] != edges[:, 1]  # 3角形の縮退辺
+    edges, edge_parts = np.sort(edges[valid], axis=1), edge_parts[valid]
+    keys, counts = np.unique(np.column_stack([edge_parts, edges]), axis=0, return_counts=True)
+    free = keys[counts == 1]
+    return np.unique(np.concatenate([free[:, [0, 1]], free[:, [0, 2]]]), axis=0)
+
+
+def detect_contacts(arrays, tolerance):
+    """距離tolerance以内で接近しているパートの組を検出
+
+    戻り値は組ごとのSimpleNamespace（slave, master, type, nodes, min_distance）のリスト。
+    マスターはセグメントの平均寸法が大きい（粗い）方のパート。
+    接近している節点がすべて両パートの自由辺上にあればTYPE11（辺-辺）、それ以外はTYPE7。
+    """
+    faces, face_parts, _ = part_faces(arrays)
+    if len(faces) == 0:
+        return []
+    rows, parts = part_node_entries(faces, face_parts)
+    part_ids, lo, hi = part_boxes(arrays.coords, rows, parts)
+
+    # ブロードフェーズ: 許容距離だけ広げた包含箱の重なり
+    first, second = overlapping_boxes(lo - 0.5 * tolerance, hi + 0.5 * tolerance)
+    if len(first) == 0:
+        return []
+    scale = int(part_ids.max()) + 1
+    candidate_keys = part_ids[first] * scale + part_ids[second]
+    involved = np.unique(np.concatenate([part_ids[first], part_ids[second]]))
+
+    # ナローフェーズ: 候補パートの節点とセグメントの距離
+    face_mask = np.isin(face_parts, involved)
+    entry_mask = np.isin(parts, involved)
+    index = RadiossSpatialIndex.SegmentIndex(arrays.coords, faces[face_mask], margin=tolerance)
+    rows, parts = rows[entry_mask], parts[entry_mask]
+    query, segments, distance = index.query_pairs(rows)
+    node_part = parts[query]
+    seg_part = face_parts[face_mask][segments]
+    pair_lo, pair_hi = np.minimum(node_part, seg_part), np.maximum(node_part, seg_part)
+    keys = pair_lo * scale + pair_hi
+    keep = (node_part != seg_part) & np.isin(keys, candidate_keys)
+    keys, distance = keys[keep], distance[keep]
+    node_keys = node_part[keep] * (len(arrays.node_ids) + 1) + rows[query[keep]]
+    if len(keys) == 0:
+        return []
+
+    # 平均セグメント寸法（粗い方をマスターにする）
+    area = RadiossMeshTools.quad_areas(arrays.coords[faces])
+    size_sum = np.bincount(np.searchsorted(part_ids, face_parts), weights=np.sqrt(area),
+                           minlength=len(part_ids))
+    size_count = np.bincount(np.searchsorted(part_ids, face_parts), minlength=len(part_ids))
+    mean_size = size_sum / np.maximum(size_count, 1)
+
+    free = free_edge_entries(faces, face_parts)
+    free_keys = free[:, 0] * (len(arrays.node_ids) + 1) + free[:, 1]
+    on_edge = np.isin(node_keys, free_keys)
+
+    pair_keys, inverse = np.unique(keys, return_inverse=True)
+    min_distance = np.full(len(pair_keys), np.inf)
+    np.minimum.at(min_distance, inverse, distance)
+    node_count = np.bincount(np.unique(np.column_stack([inverse, node_keys]), axis=0)[:, 0],
+                             minlength=len(pair_keys))
+    edge_only = np.bincount(inverse, weights=~on_edge, minlength=len(pair_keys)) == 0
+
+    proposals = []
+    for k, key in enumerate(pair_keys.tolist()):
+        a, b = divmod(key, scale)
+        size_a = mean_size[np.searchsorted(part_ids, a)]
+        size_b = mean_size[np.searchsorted(part_ids, b)]
+        slave, master = (a, b) if size_a < size_b or (size_a == size_b and a > b) else (b, a)
+        proposals.append(SimpleNamespace(
+            slave=int(slave), master=int(master),
+            type="TYPE11" if edge_only[k] else "TYPE7",
+            nodes=int(node_count[k]), min_distance=float(min_distance[k])))
+    return proposals
+
+
+def part_members(arrays, part_id):
+    """パートの節点IDと要素ID"""
+    shells = arrays.shell_parts == part_id
+    solids = arrays.solid_parts == part_id
+    conn = np.concatenate([arrays.shells[shells].ravel(), arrays.solids[solids].ravel()])
+    nodes = arrays.node_ids[np.unique(conn[conn >= 0])]
+    elems = np.concatenate([arrays.shell_ids[shells], arrays.solid_ids[solids]])
+    return nodes, elems
+
+
+def create_contacts(analysis, proposals, arrays):
+    """検出した組の接触とスレーブ/マスターセットを一括作成（既にある組は除く）"""
+    doc = analysis.Document
+    existing = {c.AutoPartPair for c in contacts(analysis) if hasattr(c, "AutoPartPair")}
+    created = []
+    doc.openTransaction("Auto contacts")
+    try:
+        for proposal in proposals:
+            pair = f"{proposal.slave}-{proposal.master}"
+            if pair in existing:
+                continue
+            slave_nodes, _ = part_members(arrays, proposal.slave)
+            _, master_elems = part_members(arrays, proposal.master)
+            slave = RadiossModel.make_set(doc, f"AutoSlave_{pair}", "NODE", slave_nodes)
+            master = RadiossModel.make_set(doc, f"AutoMaster_{pair}", "ELEM", master_elems)
+            contact = make_contact(doc, f"AutoContact_{pair}", f"Auto_{pair}",
+                                   proposal.type, slave, master)
+            contact.addProperty("App::PropertyString", "AutoPartPair", "Check",
+                                "Slave-master part ids of an auto-detected contact")
+            contact.AutoPartPair = pair
+            analysis.addObjects([slave, master, contact])
+            created.append(contact)
+    finally:
+        doc.commitTransaction()
+    doc.recompute()
+    return created
+
+
+def format_proposals(proposals):
+    lines = [f"{'Slave':>8} {'Master':>8} {'Type':>7} {'Nodes':>8} {'MinDist':>12}"]
+    for p in proposals:
+        lines.append(f"{p.slave:8d} {p.master:8d} {p.type:>7} {p.nodes:8d} {p.min_distance:12.4E}")
+    return "\n".join(lines) + "\n"
+
+
+def auto_contacts(analysis, tolerance):
+    """パート間の接触を検出して接触オブジェクトを作成"""
+    arrays = RadiossModel.merged_arrays(analysis)
+    proposals = detect_contacts(arrays, tolerance)
+    if not proposals:
+        return []
+    FreeCAD.Console.PrintMessage(f"Found {len(proposals)} contact pairs within {tolerance:g}\n")
+    FreeCAD.Console.PrintMessage(format_proposals(proposals))
+    return create_contacts(analysis, proposals, arrays)
@@ -0,0 +1,315 @@
+"""アニメーション結果（A00x）をParaViewなどで読める時系列ファイルに変換
+
+出力形式は拡張子で選ぶ。
+  .pvd    : フレームごとの.vtu（zlib圧縮のバイナリ）と、それをまとめる.pvd
+  .vtkhdf : VTKHDF（HDF5、h5pyが必要）。形状は1回だけ書き、フィールドは
+            フレームごとに追記する（チャンク・gzip圧縮）
+フレームの読み込みとフィールドの変換（.vtuでは圧縮も）はプロセスプールで
+並列に行い、書き込みは順番に行う。形状は最初のフレームのもので、
+節点・要素IDは書き出し時の対応（<デッキ名>_idmap.npz）で元のIDに戻す。
+"""
+import os
+import time
+import zlib
+from collections import deque
+from types import SimpleNamespace
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+import RadiossResults
+
+# VTKのセルタイプ
+VTK_TRIANGLE, VTK_QUAD, VTK_HEXAHEDRON = 5, 9, 12
+
+# .vtuの圧縮ブロックの大きさ（バイト）
+BLOCK_SIZE = 1 << 20
+
+
+def field_name(text):
+    """フィールド名をファイル形式で使える名前に（空白は_）"""
+    name = "_".join(text.replace("/", " ").split())
+    return name or "Field"
+
+
+def topology(frame):
+    """最初のフレームのセル（3角形・4角形・6面体）-> (offsets, connectivity, types)"""
+    facets = np.asarray(frame.array('facets'), dtype=np.int64) if frame.has('facets') \
+        else np.empty((0, 4), dtype=np.int64)
+    solids = np.asarray(frame.array('solids'), dtype=np.int64) if frame.has('solids') \
+        else np.empty((0, 8), dtype=np.int64)
+    tri = facets[:, 3] == facets[:, 2]
+    sizes = np.concatenate([np.where(tri, 3, 4), np.full(len(solids), 8)])
+    keep = np.concatenate([np.ones((len(facets), 3), dtype=bool), ~tri[:, None]], axis=1)
+    connectivity = np.concatenate([facets[keep], solids.ravel()])
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    types = np.concatenate([np.where(tri, VTK_TRIANGLE, VTK_QUAD),
+                            np.full(len(solids), VTK_HEXAHEDRON)]).astype(np.uint8)
+    return offsets, connectivity, types
+
+
+def frame_fields(path, reference_path):
+    """1フレームの節点・セルのフィールド -> ({名前: 配列}, {名前: 配列})
+
+    セルのフィールドはシェル -> ソリッドの順で、無い側はNaNで埋める。
+    """
+    frame = RadiossResults.AnimFrame(path)
+    reference = RadiossResults.AnimFrame(reference_path)
+    point_data = {"Displacement": (np.asarray(frame.array('coords'), dtype=np.float32)
+                                   - np.asarray(reference.array('coords'), dtype=np.float32))}
+    for block, names in (('node_vector', frame.node_vectors), ('node_scalar', frame.node_scalars)):
+        for i, name in enumerate(names):
+            point_data[field_name(name)] = np.asarray(frame.array(block)[i], dtype=np.float32)
+
+    cell_data = {}
+    counts = (frame.facet_count, frame.solid_count)
+
+    def add_cell(name, values, side):
+        values = np.asarray(values, dtype=np.float32)
+        if name not in cell_data:
+            shape = (sum(counts),) + values.shape[1:]
+            cell_data[name] = np.full(shape, np.nan, dtype=np.float32)
+        start = 0 if side == 0 else counts[0]
+        cell_data[name][start:start + len(values)] = values
+
+    for side, (scalars, tensors, kind, equivalent) in enumerate((
+            (frame.facet_scalars, frame.facet_tensors, 'facet', RadiossResults.von_mises_2d),
+            (frame.solid_scalars, frame.solid_tensors, 'solid', RadiossResults.von_mises_3d))):
+        for i, name in enumerate(scalars):
+            add_cell(field_name(name), frame.array(f'{kind}_scalar')[i], side)
+        for i, name in enumerate(tensors):
+            tensor = np.asarray(frame.array(f'{kind}_tensor')[i], dtype=np.float32)
+            add_cell(field_name(name), tensor, side)
+            if "STRESS" in name.upper():
+                add_cell(field_name(name) + "_vonMises", equivalent(tensor.astype(float)), side)
+    return point_data, cell_data
+
+
+def compress_array(values, level=6):
+    """配列をvtkZLibDataCompressor（UInt64ヘッダー）の形式に圧縮"""
+    raw = np.ascontiguousarray(values).tobytes()
+    blocks = [zlib.compress(raw[i:i + BLOCK_SIZE], level) for i in range(0, len(raw), BLOCK_SIZE)] or \
+        [zlib.compress(b"", level)]
+    last = len(raw) - BLOCK_SIZE * (len(blocks) - 1) if raw else 0
+    header = np.array([len(blocks), BLOCK_SIZE, last] + [len(b) for b in blocks], dtype=np.uint64)
+    return header.tobytes() + b"".join(blocks)
+
+
+def _vtu_payload(path, reference_path, level):
+    """ワーカー: 1フレームを読み、フィールドを圧縮して返す"""
+    point_data, cell_data = frame_fields(path, reference_path)
+    raw = sum(v.nbytes for v in point_data.values()) + sum(v.nbytes for v in cell_data.values())
+    encode = {name: (values.dtype, values.shape, compress_array(values, level))
+              for name, values in point_data.items()}
+    cells = {name: (values.dtype, values.shape, compress_array(values, level))
+             for name, values in cell_data.items()}
+    return encode, cells, raw
+
+
+def _hdf_payload(path, reference_path, level):
+    """ワーカー: 1フレームを読み、フィールドを返す（圧縮はh5pyで行う）"""
+    point_data, cell_data = frame_fields(path, reference_path)
+    raw = sum(v.nbytes for v in point_data.values()) + sum(v.nbytes for v in cell_data.values())
+    return point_data, cell_data, raw
+
+
+VTK_TYPES = {np.dtype(np.float32): "Float32", np.dtype(np.float64): "Float64",
+             np.dtype(np.int64): "Int64", np.dtype(np.uint8): "UInt8"}
+
+
+def _vtu_array(name, dtype, shape, offset):
+    components = int(np.prod(shape[1:])) if len(shape) > 1 else 1
+    return (f'<DataArray type="{VTK_TYPES[np.dtype(dtype)]}" Name={quoteattr(name)} '
+            f'NumberOfComponents="{components}" format="appended" offset="{offset}"/>\n')
+
+
+def write_vtu(path, point_count, cell_count, points, cells, point_data, cell_data):
+    """圧縮済みの配列から.vtuを書く（(dtype, shape, bytes)の組）"""
+    arrays = []
+    xml = ['<?xml version="1.0"?>\n',
+           '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" '
+           'header_type="UInt64" compressor="vtkZLibDataCompressor">\n<UnstructuredGrid>\n',
+           f'<Piece NumberOfPoints="{point_count}" NumberOfCells="{cell_count}">\n']
+    offset = 0
+
+    def add(name, item):
+        nonlocal offset
+        text = _vtu_array(name, item[0], item[1], offset)
+        arrays.append(item[2])
+        offset += len(item[2])
+        return text
+
+    for section, items in (("PointData", point_data), ("CellData", cell_data)):
+        xml.append(f"<{section}>\n")
+        xml.extend(add(name, item) for name, item in items.items())
+        xml.append(f"</{section}>\n")
+    xml.append("<Points>\n" + add("Points", points) + "</Points>\n<Cells>\n")
+    xml.extend(add(name, cells[name]) for name in ("connectivity", "offsets", "types"))
+    xml.append('</Cells>\n</Piece>\n</UnstructuredGrid>\n<AppendedData encoding="raw">\n_')
+    with open(path, 'wb') as f:
+        f.write("".join(xml).encode())
+        for data in arrays:
+            f.write(data)
+        f.write(b"\n</AppendedData>\n</VTKFile>\n")
+    return os.path.getsize(path)
+
+
+def _ordered_results(function, items, workers):
+    """function(*item)の結果を順番に返す（先読みはワーカー数の2倍まで）"""
+    if workers <= 1:
+        for item in items:
+            yield function(*item)
+        return
+    import RadiossPipeline
+    with RadiossPipeline.make_executor(workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(function, *item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        for future in pending:
+            yield future.result()
+
+
+def convert(path, output, workers=None, level=6, context=None, idmap_path=None):
+    """アニメーション結果を変換 -> 処理の統計（フレーム数・入出力のバイト数・MB/s）
+
+    context: RadiossTasks.TaskContext（進捗の報告とキャンセル）
+    """
+    results = RadiossResults.AnimResults(path, idmap_path)
+    workers = workers or os.cpu_count() or 1
+    files = [frame.path for frame in results.frames]
+    reference = files[0]
+    first = results.frames[0]
+    offsets, connectivity, types = topology(first)
+    element_ids = np.concatenate([
+        np.asarray(first.array('facet_ids'), dtype=np.int64) if first.has('facet_ids')
+        else np.arange(1, first.facet_count + 1),
+        np.asarray(first.array('solid_ids'), dtype=np.int64) if first.has('solid_ids')
+        else np.arange(first.facet_count + 1, first.facet_count + first.solid_count + 1)])
+    idmap_path = idmap_path or RadiossResults.find_idmap(reference)
+    if idmap_path is not None:
+        import RadiossRenumber
+        _, elements = RadiossRenumber.load_maps(idmap_path)
+        old = elements.to_old(element_ids)
+        element_ids = np.where(old >= 0, old, element_ids)
+
+    start = time.perf_counter()
+    kind = os.path.splitext(output)[1].lower()
+    if kind in ('.vtkhdf', '.hdf', '.hdf5', '.h5'):
+        stats = _convert_hdf(results, files, output, workers, level, context,
+                             offsets, connectivity, types, element_ids)
+    else:
+        stats = _convert_vtu(results, files, output, workers, level, context,
+                             offsets, connectivity, types, element_ids)
+    stats.seconds = time.perf_counter() - start
+    stats.mb_per_second = stats.input_bytes / 1.0e6 / max(stats.seconds, 1.0e-9)
+    return stats
+
+
+def _convert_vtu(results, files, output, workers, level, context,
+                 offsets, connectivity, types, element_ids):
+    base = os.path.splitext(output)[0]
+    directory = base + "_frames"
+    os.makedirs(directory, exist_ok=True)
+    first = results.frames[0]
+
+    # 形状は1回だけ圧縮して全フレームのファイルで使う
+    def packed(values):
+        return (values.dtype, values.shape, compress_array(values, level))
+    cells = {"connectivity": packed(connectivity), "offsets": packed(offsets[1:]), "types": packed(types)}
+    points = packed(results.reference.astype(np.float32))
+    ids = {"NodeID": packed(results.node_ids), "ElementID": packed(element_ids)}
+    cell_count = len(types)
+
+    stats = SimpleNamespace(frames=0, input_bytes=0, field_bytes=0, output_bytes=0, output=output)
+    entries = []
+    items = [(path, files[0], level) for path in files]
+    for i, (point_data, cell_data, raw) in enumerate(_ordered_results(_vtu_payload, items, workers)):
+        name = os.path.join(directory, f"{os.path.basename(base)}_{i:04d}.vtu")
+        point_data["NodeID"] = ids["NodeID"]
+        cell_data["ElementID"] = ids["ElementID"]
+        stats.output_bytes += write_vtu(name, first.node_count, cell_count, points, cells,
+                                        point_data, cell_data)
+        stats.input_bytes += os.path.getsize(files[i])
+        stats.field_bytes += raw
+        stats.frames += 1
+        entries.append(f'<DataSet timestep="{results.times[i]:.9g}" part="0" '
+                       f'file={quoteattr(os.path.relpath(name, os.path.dirname(output) or "."))}/>\n')
+        if context is not None:
+            context.report("Converting frames", frames=stats.frames, bytes=stats.input_bytes)
+    with open(output, 'w') as f:
+        f.write('<?xml version="1.0"?>\n<VTKFile type="Collection" version="0.1">\n<Collection>\n')
+        f.writelines(entries)
+        f.write('</Collection>\n</VTKFile>\n')
+    return stats
+
+
+def _convert_hdf(results, files, output, workers, level, context,
+                 offsets, connectivity, types, element_ids):
+    try:
+        import h5py
+    except ImportError:
+        raise RuntimeError("VTKHDF output requires h5py; use a .pvd file instead")
+
+    first = results.frames[0]
+    node_count, cell_count, steps = first.node_count, len(types), len(files)
+    stats = SimpleNamespace(frames=0, input_bytes=0, field_bytes=0, output_bytes=0, output=output)
+    with h5py.File(output, 'w') as f:
+        root = f.create_group("VTKHDF")
+        root.attrs["Version"] = (2, 0)
+        root.attrs.create("Type", np.bytes_("UnstructuredGrid"))
+        compression = dict(compression="gzip", compression_opts=level, shuffle=True)
+        root.create_dataset("NumberOfPoints", data=[node_count])
+        root.create_dataset("NumberOfCells", data=[cell_count])
+        root.create_dataset("NumberOfConnectivityIds", data=[len(connectivity)])
+        root.create_dataset("Points", data=results.reference, chunks=True, **compression)
+        root.create_dataset("Offsets", data=offsets, chunks=True, **compression)
+        root.create_dataset("Connectivity", data=connectivity, chunks=True, **compression)
+        root.create_dataset("Types", data=types, chunks=True, **compression)
+
+        step_group = root.create_group("Steps")
+        step_group.attrs["NSteps"] = steps
+        step_group.create_dataset("Values", data=results.times)
+        for name in ("PartOffsets", "PointOffsets", "CellOffsets", "ConnectivityIdOffsets"):
+            step_group.create_dataset(name, data=np.zeros(steps, dtype=np.int64))
+        step_group.create_dataset("NumberOfParts", data=np.ones(steps, dtype=np.int64))
+
+        groups = {"PointData": (root.create_group("PointData"), node_count,
+                                step_group.create_group("PointDataOffsets")),
+                  "CellData": (root.create_group("CellData"), cell_count,
+                               step_group.create_group("CellDataOffsets"))}
+        # IDは時間によらないので、オフセット0を全ステップで使う
+        for section, name, values in (("PointData", "NodeID", results.node_ids),
+                                      ("CellData", "ElementID", element_ids)):
+            group, _, offset_group = groups[section]
+            group.create_dataset(name, data=values, chunks=True, **compression)
+            offset_group.create_dataset(name, data=np.zeros(steps, dtype=np.int64))
+
+        items = [(path, files[0], level) for path in files]
+        for i, (point_data, cell_data, raw) in enumerate(_ordered_results(_hdf_payload, items, workers)):
+            for section, data in (("PointData", point_data), ("CellData", cell_data)):
+                group, count, offset_group = groups[section]
+                for name, values in data.items():
+                    if name not in group:
+                        rows = min(count, max(1, (1 << 20) // max(values[0].nbytes, 1)))
+                        group.create_dataset(name, shape=(0,) + values.shape[1:],
+                                             maxshape=(None,) + values.shape[1:], dtype=values.dtype,
+                                             chunks=(rows,) + values.shape[1:], **compression)
+                        offset_group.create_dataset(name, data=np.arange(steps, dtype=np.int64) * count)
+                    dataset = group[name]
+                    dataset.resize(dataset.shape[0] + count, axis=0)
+                    dataset[-count:] = values
+            stats.input_bytes += os.path.getsize(files[i])
+            stats.field_bytes += raw
+            stats.frames += 1
+            if context is not None:
+                context.report("Converting frames", frames=stats.frames, bytes=stats.input_bytes)
+    stats.output_bytes = os.path.getsize(output)
+    return stats
+
+
+def format_stats(stats):
+    return (f"Converted {stats.frames} frames to {stats.output}: {stats.input_bytes / 1.0e6:.1f} MB in "
+            f"{stats.seconds:.1f} s ({stats.mb_per_second:.1f} MB/s), "
+            f"{stats.output_bytes / 1.0e6:.1f} MB written\n")
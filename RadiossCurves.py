@@ -0,0 +1,314 @@
+"""荷重曲線（/FUNCT, *DEFINE_CURVE）の表と再サンプリング・フィルタ
+
+全曲線の点は1組の配列（x, y）に連結し、曲線ごとの開始位置（offsets）で
+区切って持つ。点ごとのPythonオブジェクトを作らないので、10万点の曲線も
+そのまま読み込み・保存・書き出しできる。
+
+ドキュメントには曲線表オブジェクト（CurveTableProxy）1つとして保存し、
+荷重はCurveIdプロパティで曲線を参照する。
+"""
+import base64
+import io
+
+import FreeCAD
+import numpy as np
+
+
+class CurveTable:
+    """曲線ID -> (x, y) の表"""
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.names = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self._pending = []
+
+    def __len__(self):
+        self._consolidate()
+        return len(self.ids)
+
+    def __contains__(self, curve_id):
+        return self.index(curve_id) is not None
+
+    def add(self, curve_id, x, y, name=""):
+        """曲線を追加（同じIDがあれば置き換え）"""
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        if len(x) != len(y):
+            raise ValueError(f"Curve {curve_id}: {len(x)} abscissas but {len(y)} ordinates")
+        self._pending.append((int(curve_id), name, x, y))
+
+    def _consolidate(self):
+        """追加された曲線を連結配列にまとめる（追加のたびに連結し直さない）"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        curves = {int(i): (n, self.x[a:b], self.y[a:b])
+                  for i, n, a, b in zip(self.ids.tolist(), self.names,
+                                        self.offsets[:-1].tolist(), self.offsets[1:].tolist())}
+        for curve_id, name, x, y in pending:
+            curves[curve_id] = (name, x, y)
+        ids = sorted(curves)
+        lengths = np.array([len(curves[i][1]) for i in ids], dtype=np.int64)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.names = [curves[i][0] for i in ids]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.x = np.concatenate([curves[i][1] for i in ids]) if ids else np.empty(0)
+        self.y = np.concatenate([curves[i][2] for i in ids]) if ids else np.empty(0)
+
+    def index(self, curve_id):
+        self._consolidate()
+        pos = np.searchsorted(self.ids, curve_id)
+        if pos < len(self.ids) and self.ids[pos] == curve_id:
+            return int(pos)
+        return None
+
+    def curve(self, curve_id):
+        """(x, y)（連結配列のビュー）。無ければKeyError"""
+        pos = self.index(curve_id)
+        if pos is None:
+            raise KeyError(f"Curve {curve_id} not found")
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return self.x[start:end], self.y[start:end]
+
+    def name(self, curve_id):
+        pos = self.index(curve_id)
+        return self.names[pos] if pos is not None else ""
+
+    def evaluate(self, curve_id, t):
+        """曲線の線形補間値（範囲外は端の値）"""
+        x, y = self.curve(curve_id)
+        return np.interp(t, x, y)
+
+    def merge(self, other):
+        """別の表の曲線を追加（同じIDはotherを優先）"""
+        other._consolidate()
+        for i, curve_id in enumerate(other.ids.tolist()):
+            start, end = other.offsets[i], other.offsets[i + 1]
+            self.add(curve_id, other.x[start:end], other.y[start:end], other.names[i])
+        return self
+
+    def to_bytes(self):
+        """npz形式のバイト列"""
+        self._consolidate()
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, ids=self.ids, offsets=self.offsets, x=self.x, y=self.y,
+                            names=np.array(self.names, dtype=str))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        table = cls()
+        with np.load(io.BytesIO(data)) as arrays:
+            table.ids = arrays['ids']
+            table.offsets = arrays['offsets']
+            table.x = arrays['x']
+            table.y = arrays['y']
+            table.names = [str(n) for n in arrays['names']]
+        return table
+
+
+def parse_values(lines):
+    """数値だけのデータ行 -> 1次元配列（行ごとのリストを作らずにまとめて変換）
+
+    数値でない値があればValueError。
+    """
+    if not lines:
+        return np.empty(0)
+    text = " ".join(lines).replace(',', ' ')
+    if 'D' in text or 'd' in text:
+        text = text.replace('D', 'E').replace('d', 'E')
+    return np.array(text.split(), dtype=np.float64)
+
+
+def curve_values(lines, curve_id):
+    """曲線のデータ行の値（数値でない値があれば警告してNone）"""
+    try:
+        return parse_values(lines)
+    except ValueError as e:
+        FreeCAD.Console.PrintWarning(f"Warning: Invalid data in curve {curve_id}, curve ignored\n"
+                                     f"Error: {str(e)}\n")
+        return None
+
+
+def xy_pairs(values, curve_id):
+    """(x1 y1 x2 y2 ...) -> (x, y)。奇数個なら最後の値を捨てて警告"""
+    if len(values) % 2:
+        FreeCAD.Console.PrintWarning(f"Curve {curve_id}: odd number of values, last one ignored\n")
+        values = values[:-1]
+    pairs = values.reshape(-1, 2)
+    return pairs[:, 0].copy(), pairs[:, 1].copy()
+
+
+class FunctSection:
+    """/FUNCT/<id>セクションのデータ行の解析（1行目: タイトル、以降: x y）
+
+    行は貯めておき、セクションの終わり（close）でまとめて配列に変換する。
+    """
+    def __init__(self, table, curve_id):
+        self.table = table
+        self.curve_id = curve_id
+        self.title = None
+        self.lines = []
+
+    def __call__(self, line):
+        if self.title is None:
+            self.title = line
+        else:
+            self.lines.append(line)
+
+    def close(self):
+        if self.curve_id is None:
+            FreeCAD.Console.PrintWarning("/FUNCT without id ignored\n")
+            return
+        values = curve_values(self.lines, self.curve_id)
+        if values is None:
+            return
+        x, y = xy_pairs(values, self.curve_id)
+        self.table.add(self.curve_id, x, y, self.title or f"FUNCT_{self.curve_id}")
+
+
+class DefineCurveSection:
+    """*DEFINE_CURVE(_TITLE)のデータ行の解析
+
+    カード1: LCID SIDR SFA SFO OFFA OFFO DATTYP、以降: A1 O1。
+    x = SFA * A + OFFA, y = SFO * O + OFFO として登録する。
+    """
+    def __init__(self, table, title=False):
+        self.table = table
+        self.title = "" if title else None
+        self.card = None
+        self.lines = []
+
+    def __call__(self, line):
+        if self.title == "":
+            self.title = line
+        elif self.card is None:
+            self.card = line.replace(',', ' ').split()
+        else:
+            self.lines.append(line)
+
+    def close(self):
+        if not self.card:
+            return
+        card = self.card + [''] * (6 - len(self.card))
+        curve_id = int(card[0])
+        sfa, sfo, offa, offo = (float(v) if v else d for v, d in zip(card[2:6], (1.0, 1.0, 0.0, 0.0)))
+        sfa = sfa or 1.0  # 0は既定値（1.0）
+        sfo = sfo or 1.0
+        values = curve_values(self.lines, curve_id)
+        if values is None:
+            return
+        x, y = xy_pairs(values, curve_id)
+        self.table.add(curve_id, sfa * x + offa, sfo * y + offo, self.title or f"CURVE_{curve_id}")
+
+
+def resample(x, y, new_x):
+    """線形補間で新しい横軸の値に再サンプリング"""
+    return np.interp(new_x, x, y)
+
+
+def resample_uniform(x, y, step=None, count=None):
+    """等間隔に再サンプリング -> (new_x, new_y)（stepかcountのどちらかを指定）"""
+    if len(x) == 0:
+        return np.empty(0), np.empty(0)
+    if step is not None:
+        new_x = np.arange(x[0], x[-1] + 0.5 * step, step)
+    else:
+        new_x = np.linspace(x[0], x[-1], count or len(x))
+    return new_x, np.interp(new_x, x, y)
+
+
+def moving_average(y, window):
+    """中心移動平均（端は使える点だけで平均）"""
+    y = np.asarray(y, dtype=np.float64)
+    if window <= 1 or len(y) == 0:
+        return y.copy()
+    half = window // 2
+    cumulative = np.concatenate([[0.0], np.cumsum(y)])
+    index = np.arange(len(y))
+    start = np.maximum(index - half, 0)
+    end = np.minimum(index + half + 1, len(y))
+    return (cumulative[end] - cumulative[start]) / (end - start)
+
+
+def cfc_filter(x, y, cfc):
+    """SAE J211のCFCフィルタ（2次バターワースを前後2回）
+
+    横軸は等間隔であること（resample_uniformで揃える）。scipyがあればlfilterを使い、
+    無ければ漸化式をそのまま計算する。どちらも初期状態は0（先頭より前の入出力を0とする）。
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) < 3:
+        return y.copy()
+    dt = (x[-1] - x[0]) / (len(x) - 1)
+    wd = 2.0 * np.pi * cfc * 2.0775
+    wa = np.sin(wd * dt / 2.0) / np.cos(wd * dt / 2.0)
+    denominator = 1.0 + np.sqrt(2.0) * wa + wa * wa
+    a0 = wa * wa / denominator
+    b1 = -2.0 * (wa * wa - 1.0) / denominator
+    b2 = (-1.0 + np.sqrt(2.0) * wa - wa * wa) / denominator
+    numerator = np.array([a0, 2.0 * a0, a0])
+    feedback = np.array([1.0, -b1, -b2])
+    try:
+        from scipy.signal import lfilter
+    except ImportError:
+        lfilter = None
+
+    def run(values):
+        if lfilter is not None:
+            return lfilter(numerator, feedback, values)
+        values = np.concatenate([np.zeros(2), values])
+        out = np.zeros(len(values))
+        for i in range(2, len(values)):
+            out[i] = (a0 * values[i] + 2.0 * a0 * values[i - 1] + a0 * values[i - 2]
+                      + b1 * out[i - 1] + b2 * out[i - 2])
+        return out[2:]
+
+    return run(run(y)[::-1])[::-1]
+
+
+class CurveTableProxy:
+    """ドキュメント内の曲線表（npzのバイト列として保存）"""
+    def __init__(self, obj, table):
+        obj.Proxy = self
+        self.table = table
+        self.update_properties(obj)
+
+    def update_properties(self, obj):
+        for name, kind, doc in (("CurveIds", "App::PropertyIntegerList", "Curve ids"),
+                                ("PointCount", "App::PropertyInteger", "Total number of points")):
+            if not hasattr(obj, name):
+                obj.addProperty(kind, name, "Curves", doc)
+        obj.CurveIds = self.table.ids.tolist() if len(self.table) else []
+        obj.PointCount = int(len(self.table.x))
+
+    def execute(self, obj):
+        pass
+
+    def dumps(self):
+        return {'table': base64.b64encode(self.table.to_bytes()).decode('ascii')}
+
+    def loads(self, state):
+        self.table = CurveTable.from_bytes(base64.b64decode(state['table'])) if state else CurveTable()
+
+    __getstate__ = dumps
+    __setstate__ = loads
+
+
+def make_curve_table(doc, table, name="RadiossCurves"):
+    """曲線表オブジェクトを作成"""
+    obj = doc.addObject("App::FeaturePython", name)
+    CurveTableProxy(obj, table)
+    return obj
+
+
+def analysis_curves(analysis):
+    """解析内の全曲線表をまとめた表"""
+    table = CurveTable()
+    for obj in analysis.Group:
+        proxy = getattr(obj, "Proxy", None)
+        if isinstance(proxy, CurveTableProxy):
+            table.merge(proxy.table)
+    return table
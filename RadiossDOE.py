@@ -0,0 +1,217 @@
+"""パラメータスタディ（実験計画）用のデッキ一式の書き出し
+
+メッシュなど変化しない部分は<名前>_mesh.incとして1回だけ書き、各水準の
+組み合わせ（バリアント）ごとに、それを#includeする小さなStarterデッキと
+Engineデッキを並列に書き出す。全バリアントの値とファイルはマニフェスト
+（<名前>_doe.json）にまとめ、実行マネージャーやクラスタのスクリプトから使う。
+
+書き出しはGUIスレッドで読み取った解析の値（RadiossModel.snapshot_analysis）
+だけを使い、バリアントの値はその一部を差し替えた複製として既存の書き出し
+処理に渡す。ドキュメントのオブジェクトは読みも書き換えもしない。
+"""
+import copy
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# 変化させられるパラメータ
+KINDS = ("Friction", "YieldStrength", "DTScale", "Thickness")
+METHODS = ("Full factorial", "Latin hypercube")
+
+
+class Parameter:
+    """1つのパラメータの範囲（targetはオブジェクト名またはパートID、Noneなら全て）"""
+    def __init__(self, kind, low, high, levels=3, target=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown DOE parameter {kind}")
+        self.kind = kind
+        self.low = float(low)
+        self.high = float(high)
+        self.levels = max(int(levels), 1)
+        self.target = target
+
+    @property
+    def name(self):
+        return self.kind if self.target in (None, "") else f"{self.kind}[{self.target}]"
+
+    def record(self):
+        return {'name': self.name, 'kind': self.kind, 'target': self.target,
+                'low': self.low, 'high': self.high, 'levels': self.levels}
+
+
+def parse_parameters(text):
+    """1行1パラメータの指定（種類 [対象=名前] 下限 上限 [水準数]）を解析"""
+    parameters = []
+    for line in text.splitlines():
+        fields = line.split('#')[0].split()
+        if not fields:
+            continue
+        target = None
+        if len(fields) > 1 and '=' in fields[1]:
+            target = fields.pop(1).split('=', 1)[1]
+        if len(fields) not in (3, 4):
+            raise ValueError(f"Cannot read DOE parameter line: {line.strip()}")
+        parameters.append(Parameter(fields[0], *fields[1:], target=target))
+    return parameters
+
+
+def full_factorial(parameters):
+    """全水準の組み合わせ -> (バリアント数, パラメータ数)の配列"""
+    axes = [np.linspace(p.low, p.high, p.levels) for p in parameters]
+    grids = np.meshgrid(*axes, indexing='ij')
+    return np.stack([g.ravel() for g in grids], axis=1)
+
+
+def latin_hypercube(parameters, samples, seed=None):
+    """ラテン超方格サンプリング（各パラメータの範囲を等分した各区間から1点ずつ）"""
+    rng = np.random.default_rng(seed)
+    strata = np.stack([rng.permutation(samples) for _ in parameters], axis=1)
+    unit = (strata + rng.random((samples, len(parameters)))) / samples
+    low = np.array([p.low for p in parameters])
+    high = np.array([p.high for p in parameters])
+    return low + unit * (high - low)
+
+
+def design(parameters, method, samples=None, seed=None):
+    if method == "Latin hypercube":
+        return latin_hypercube(parameters, samples or 10, seed)
+    return full_factorial(parameters)
+
+
+def _matches(parameter, record):
+    return parameter.target in (None, "") or parameter.target in (record.name, record.label)
+
+
+def _replace(record, **values):
+    record = copy.copy(record)
+    record.__dict__.update(values)
+    return record
+
+
+def variant_model(model, parameters, values, time_step=None):
+    """バリアントの値を反映した解析の値の複製（元のスナップショットは変更しない）"""
+    contacts, materials = [], []
+    for contact in model.contacts:
+        for parameter, value in zip(parameters, values):
+            if parameter.kind == "Friction" and _matches(parameter, contact):
+                contact = _replace(contact, friction=float(value))
+        contacts.append(contact)
+    for material in model.material_cards:
+        for parameter, value in zip(parameters, values):
+            if parameter.kind == "YieldStrength" and _matches(parameter, material):
+                material = _replace(material, card=dict(material.card, YieldStrength=f"{value} MPa"))
+        materials.append(material)
+    properties = model.properties
+    if properties is not None:
+        overrides = {}
+        for parameter, value in zip(parameters, values):
+            if parameter.kind == "DTScale":
+                overrides['DTScale'] = float(value)
+        if time_step is not None:
+            # 時間増分の推定はバリアントごとに繰り返さない
+            overrides['AutoTimeStep'] = False
+            overrides['TimeStep'] = time_step
+        properties = _replace(properties, **overrides)
+    return _replace(model, contacts=contacts, material_cards=materials, properties=properties)
+
+
+def variant_thickness(parameters, values, parts):
+    """厚さのパラメータの値 -> {パートID: 厚さ}（parts: 書き出すシェルのパートID）"""
+    thickness = {}
+    for parameter, value in zip(parameters, values):
+        if parameter.kind != "Thickness":
+            continue
+        for part_id in parts:
+            if parameter.target in (None, "") or str(parameter.target) == str(part_id):
+                thickness[part_id] = float(value)
+    return thickness
+
+
+def write_variant(exporter, model, parameters, values, index, base, include, time_step):
+    """1バリアントのStarter/Engineデッキを書き出し -> マニフェストの項目"""
+    starter = f"{base}_{index:04d}.rad"
+    engine = f"{base}_{index:04d}.D00"
+    view = variant_model(model, parameters, values, time_step)
+    with open(starter, 'w') as f:
+        f.write("/RADIOSS STARTER\n")
+        f.write(f"# DOE variant {index}: " +
+                ", ".join(f"{p.name}={v:.6g}" for p, v in zip(parameters, values)) + "\n\n")
+        f.write(f"#include {os.path.basename(include)}\n")
+        # インクルードの/PARTが参照するプロパティ（厚さはバリアントの値）
+        exporter.write_properties(f, variant_thickness(parameters, values, exporter.parts.shell.tolist()))
+        exporter.write_contacts(f, view)
+        exporter.write_materials(f, view)
+        f.write("\n/END\n")
+    exporter.export_radioss_engine(view, engine)
+    return {'id': index, 'starter': os.path.basename(starter), 'engine': os.path.basename(engine),
+            'values': {p.name: float(v) for p, v in zip(parameters, values)}}
+
+
+def export_doe(model, base, parameters, method="Full factorial", samples=None, seed=None,
+               workers=None, context=None):
+    """メッシュのインクルードと全バリアントのデッキ、マニフェストを書き出し
+
+    model: RadiossExport.snapshotで読み取った解析の値
+    base: 出力ファイルの共通の名前（拡張子なし）
+    戻り値: マニフェストのパス
+    """
+    from RadiossCommands import RadiossExport
+    import RadiossTimeStep
+
+    table = design(parameters, method, samples, seed)
+    exporter = RadiossExport()
+    include = f"{base}_mesh.inc"
+    if context is not None:
+        context.report("Writing mesh include")
+    if not exporter.export_mesh_include(model, include, context):
+        return None
+
+    # 自動時間増分の推定と報告は1回だけにする（バリアントのデッキには書かない）
+    time_step = None
+    properties = model.properties
+    if properties is not None and properties.AutoTimeStep:
+        result = RadiossTimeStep.report(RadiossTimeStep.estimate_meshes(model.meshes, model.materials),
+                                        properties.DTScale)
+        time_step = result.dt_min if result is not None else properties.TimeStep
+
+    workers = workers or FreeCAD.ParamGet(PARAMS).GetInt("DOEWorkers", min(8, os.cpu_count() or 1))
+    with ThreadPoolExecutor(max(workers, 1)) as pool:
+        futures = [pool.submit(write_variant, exporter, model, parameters, row, i + 1, base,
+                               include, time_step)
+                   for i, row in enumerate(table)]
+        variants = []
+        for future in futures:
+            variants.append(future.result())
+            if context is not None:
+                context.report("Writing variants", variants=len(variants))
+
+    manifest = {
+        'analysis': model.name,
+        'method': method,
+        'seed': seed,
+        'mesh_include': os.path.basename(include),
+        'idmap': os.path.basename(f"{base}_mesh_idmap.npz"),
+        'parameters': [p.record() for p in parameters],
+        'variants': variants,
+    }
+    path = f"{base}_doe.json"
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return path
+
+
+def load_manifest(path):
+    """マニフェストを読み、デッキのパスを絶対パスにする"""
+    with open(path) as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(os.path.abspath(path))
+    for variant in manifest['variants']:
+        variant['starter'] = os.path.join(directory, variant['starter'])
+        variant['engine'] = os.path.join(directory, variant['engine'])
+    return manifest
@@ -0,0 +1,182 @@
+"""OpenRadioss MPI実行（-np N）の領域分割プレビュー
+
+要素の重心を重み付きの再帰座標二分割（RCB）でN個の領域に分け、
+領域ごとの計算コスト・要素数・境界節点数と負荷の偏りを見積もる。
+コストは要素タイプごとの重み（設定で変更可能）で、時間増分による
+重み付けを有効にすると臨界時間増分の小さい要素ほど重くする。
+"""
+import colorsys
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossMeshTools
+import RadiossModel
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# 要素タイプごとの1サイクルあたりの相対コスト
+TYPE_WEIGHTS = {'SHELL': 1.0, 'SH3N': 0.6, 'BRICK': 1.6, 'TETRA': 0.5}
+
+
+def type_weights():
+    params = FreeCAD.ParamGet(PARAMS)
+    return {kind: params.GetFloat(f"DecompositionWeight{kind}", weight)
+            for kind, weight in TYPE_WEIGHTS.items()}
+
+
+def element_centroids(arrays):
+    """全要素（シェル、ソリッドの順）の重心とタイプ"""
+    shells, tri = RadiossMeshTools.closed_shells(arrays.shells)
+    tetra = arrays.solids[:, 4] < 0 if len(arrays.solids) else np.zeros(0, dtype=bool)
+    centroids = []
+    for conn in (shells, arrays.solids):
+        valid = conn >= 0
+        points = arrays.coords[np.maximum(conn, 0)] * valid[:, :, None]
+        centroids.append(points.sum(axis=1) / np.maximum(valid.sum(axis=1), 1)[:, None])
+    kinds = np.concatenate([np.where(tri, 'SH3N', 'SHELL'), np.where(tetra, 'TETRA', 'BRICK')])
+    return np.concatenate(centroids).reshape(-1, 3), kinds
+
+
+def rcb(points, weights, domains):
+    """重み付き再帰座標二分割 -> 点ごとの領域番号（0からdomains-1）
+
+    各段階で範囲の最も長い軸に沿って並べ、領域数の比で重みを分ける
+    （領域数が2のべき乗でなくてもよい）。
+    """
+    result = np.zeros(len(points), dtype=np.int64)
+    stack = [(np.arange(len(points)), 0, domains)]
+    while stack:
+        index, first, count = stack.pop()
+        if count <= 1 or len(index) == 0:
+            result[index] = first
+            continue
+        left = count // 2
+        subset = points[index]
+        axis = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+        order = index[np.argsort(subset[:, axis], kind='stable')]
+        cumulative = np.cumsum(weights[order])
+        split = int(np.searchsorted(cumulative, cumulative[-1] * left / count))
+        split = min(max(split, 1), len(order) - 1) if len(order) > 1 else len(order)
+        stack.append((order[:split], first, left))
+        stack.append((order[split:], first + left, count - left))
+    return result
+
+
+def interface_nodes(conn_list, domain_list, node_count):
+    """2つ以上の領域の要素に使われる節点の数（領域ごと）と全体の数"""
+    pairs = []
+    for conn, domain in zip(conn_list, domain_list):
+        if len(conn) == 0:
+            continue
+        valid = conn >= 0
+        pairs.append(np.stack([conn[valid], np.broadcast_to(domain[:, None], conn.shape)[valid]], axis=1))
+    if not pairs:
+        return np.zeros(0, dtype=np.int64), 0
+    pairs = np.concatenate(pairs)
+    keys = np.unique(pairs[:, 0] * (int(pairs[:, 1].max()) + 1) + pairs[:, 1])
+    nodes, domains = np.divmod(keys, int(pairs[:, 1].max()) + 1)
+    shared = np.bincount(nodes, minlength=node_count) > 1
+    return np.bincount(domains[shared[nodes]]), int(shared.sum())
+
+
+def decompose(arrays, domains, dt=None):
+    """要素を領域に分け、領域ごとのコストなどを求める
+
+    dt: 要素ごとの臨界時間増分（シェル、ソリッドの順）。与えた場合は
+    最小値との比（dt_min / dt）でコストを重くする。
+    """
+    centroids, kinds = element_centroids(arrays)
+    weights = np.zeros(len(kinds))
+    for kind, weight in type_weights().items():
+        weights[kinds == kind] = weight
+    if dt is not None:
+        valid = np.isfinite(dt) & (dt > 0.0)
+        if valid.any():
+            weights[valid] *= dt[valid].min() / dt[valid]
+
+    domain = rcb(centroids, weights, domains)
+    shell_count = len(arrays.shells)
+    cost = np.bincount(domain, weights=weights, minlength=domains)
+    per_domain, shared = interface_nodes(
+        (arrays.shells, arrays.solids), (domain[:shell_count], domain[shell_count:]),
+        len(arrays.node_ids))
+    interface = np.zeros(domains, dtype=np.int64)
+    interface[:len(per_domain)] = per_domain
+    return SimpleNamespace(
+        domains=domains,
+        shell_domain=domain[:shell_count],
+        solid_domain=domain[shell_count:],
+        cost=cost,
+        elements=np.bincount(domain, minlength=domains),
+        interface=interface,
+        shared_nodes=shared,
+        imbalance=float(cost.max() / cost.mean()) if cost.sum() > 0 else 1.0,
+    )
+
+
+def element_time_steps(arrays):
+    """properties=Trueでまとめた配列から要素ごとの臨界時間増分"""
+    import RadiossTimeStep
+    props = SimpleNamespace(
+        shell=SimpleNamespace(E=arrays.shell_E, nu=arrays.shell_nu, rho=arrays.shell_rho),
+        solid=SimpleNamespace(E=arrays.solid_E, nu=arrays.solid_nu, rho=arrays.solid_rho))
+    return RadiossTimeStep.element_time_steps(arrays, props)[2]
+
+
+def format_report(result):
+    lines = [f"Decomposition into {result.domains} domains: imbalance {result.imbalance:.3f} "
+             f"(max / mean cost), {result.shared_nodes} interface nodes",
+             f"{'Domain':>6} {'Elements':>10} {'Cost':>12} {'Interface':>10}"]
+    for d in range(result.domains):
+        lines.append(f"{d + 1:6d} {result.elements[d]:10d} {result.cost[d]:12.1f} {result.interface[d]:10d}")
+    return "\n".join(lines) + "\n"
+
+
+def domain_colors(count):
+    """領域ごとに色相を変えた色"""
+    return [colorsys.hsv_to_rgb((0.61803 * d) % 1.0, 0.65, 0.95) for d in range(count)]
+
+
+def show_domains(analysis, arrays, result):
+    """領域ごとの外表面をMesh::Featureとして色分け表示（Decompositionグループ）"""
+    import Mesh
+
+    doc = analysis.Document
+    group = doc.getObject("Decomposition")
+    if group is None:
+        group = doc.addObject("App::DocumentObjectGroup", "Decomposition")
+    for obj in list(group.Group):
+        doc.removeObject(obj.Name)
+
+    colors = domain_colors(result.domains)
+    for d in range(result.domains):
+        shells = arrays.shells[result.shell_domain == d]
+        solids = arrays.solids[result.solid_domain == d]
+        triangles = RadiossMeshTools.triangulate(
+            np.concatenate([shells, RadiossMeshTools.solid_skin_faces(solids)]))
+        if len(triangles) == 0:
+            continue
+        obj = doc.addObject("Mesh::Feature", f"Domain{d + 1:03d}")
+        obj.Mesh = Mesh.Mesh(arrays.coords[triangles].reshape(-1, 3).tolist())
+        group.addObject(obj)
+        if FreeCAD.GuiUp:
+            obj.ViewObject.ShapeColor = colors[d]
+    doc.recompute()
+    return group
+
+
+def preview(analysis, domains, show=True):
+    """解析のメッシュを領域分割してレポートし、色分け表示する"""
+    dt_weighting = FreeCAD.ParamGet(PARAMS).GetBool("DecompositionTimeStepWeight", False)
+    arrays = RadiossModel.merged_arrays(analysis, properties=dt_weighting)
+    if len(arrays.shells) + len(arrays.solids) == 0:
+        FreeCAD.Console.PrintWarning("No shell or solid elements to decompose\n")
+        return None
+    dt = element_time_steps(arrays) if dt_weighting else None
+    result = decompose(arrays, domains, dt)
+    FreeCAD.Console.PrintMessage(format_report(result))
+    if show:
+        show_domains(analysis, arrays, result)
+    return result
@@ -0,0 +1,291 @@
+"""OpenRadioss Engineの出力リスト（<ラン名>_0001.out）の逐次読み込みと監視
+
+ListingTailはファイルの読み込み位置を覚えておき、追記された分だけを
+読んでサイクル行（サイクル・時刻・時間増分・エネルギー誤差・各エネルギー・
+質量誤差）を解析する。値は容量固定のリングバッファに入れるので、
+数GBのリストでもメモリ使用量は一定になる。
+"""
+import itertools
+import os
+import re
+import time
+
+import numpy as np
+
+# サイクル行の列（Engineリストの並び）
+FIELDS = ("cycle", "time", "dt", "energy_error", "internal_energy",
+          "kinetic_energy", "rotational_energy", "external_work", "mass_error")
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[EeDd][-+]?\d+)?"
+# 例:  1000  0.1000E-02  0.1000E-05 SHELL   1234  -0.1%  12.34  56.78  0.000  69.00  0.1234E-04
+CYCLE_LINE = re.compile(
+    rf"^\s*(\d+)\s+({_NUMBER})\s+({_NUMBER})\s+[A-Za-z][\w-]*\s+\d+\s+({_NUMBER})\s*%"
+    rf"\s+({_NUMBER})\s+({_NUMBER})\s+({_NUMBER})\s+({_NUMBER})(?:\s+({_NUMBER}))?")
+CYCLE_LINES = re.compile(r"^" + CYCLE_LINE.pattern[1:].replace(r"\s", r"[ \t]") + r"[^\n]*$", re.MULTILINE)
+# 例:  *** ERROR ... / ** WARNING ... / ERROR TERMINATION
+# （列見出しの「CYCLE ... ERROR  I-ENERGY ...」は行頭がWARNING/ERRORではないので除く）
+MESSAGE_LINE = re.compile(r"^[ \t]*(?:\*+[ \t]*)?(?:WARNING|ERROR)\b[^\n]*$", re.MULTILINE)
+NORMAL_TERMINATION = "NORMAL TERMINATION"
+ERROR_TERMINATION = "ERROR TERMINATION"
+
+# 1回のpollで読む最大バイト数（GUIを止めないため）
+READ_CHUNK = 8 * 1024 * 1024
+
+
+def _float(text):
+    return float(text.replace('D', 'E').replace('d', 'E'))
+
+
+def parse_cycle_lines(text):
+    """複数行のテキスト中の全サイクル行 -> (行数, len(FIELDS))の配列
+
+    行ごとのループを避け、正規表現の検索と数値変換をまとめて行う。
+    """
+    if re.search(r"\d[Dd][-+]\d", text):
+        text = re.sub(r"(\d)[Dd]([-+]\d)", r"\1E\2", text)
+    matches = CYCLE_LINES.findall(text)
+    if not matches:
+        return np.empty((0, len(FIELDS)))
+    # 省略された列（質量誤差）は0として、まとめて変換する
+    values = [value or "0" for value in itertools.chain.from_iterable(matches)]
+    try:
+        return np.array(values, dtype=np.float64).reshape(-1, len(FIELDS))
+    except ValueError:
+        # 変換できない値を含む行だけを除く
+        import FreeCAD
+        rows = []
+        for row in matches:
+            try:
+                rows.append([float(value or "0") for value in row])
+            except ValueError:
+                FreeCAD.Console.PrintWarning(f"Listing: skipped cycle line with bad values {row}\n")
+        return np.array(rows, dtype=np.float64).reshape(-1, len(FIELDS))
+
+
+def parse_cycle_line(line):
+    """サイクル行 -> FIELDSの順の値のタプル（サイクル行でなければNone）"""
+    match = CYCLE_LINE.match(line)
+    if match is None:
+        return None
+    values = match.groups()
+    return (int(values[0]),) + tuple(_float(v) if v is not None else 0.0 for v in values[1:])
+
+
+class RingBuffer:
+    """容量固定の行列（古い行から上書き）"""
+    def __init__(self, capacity, width):
+        self.data = np.zeros((capacity, width))
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.data.shape[1])
+        capacity = len(self.data)
+        if len(rows) >= capacity:
+            self.data[:] = rows[-capacity:]
+            self.start, self.count = 0, capacity
+            return
+        end = (self.start + self.count) % capacity
+        first = min(len(rows), capacity - end)
+        self.data[end:end + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        overflow = max(self.count + len(rows) - capacity, 0)
+        self.start = (self.start + overflow) % capacity
+        self.count = min(self.count + len(rows), capacity)
+
+    def values(self):
+        """古い順の行（コピー）"""
+        return np.roll(self.data, -self.start, axis=0)[:self.count]
+
+    def last(self):
+        return self.data[(self.start + self.count - 1) % len(self.data)] if self.count else None
+
+
+class ListingTail:
+    """追記されるリストファイルの逐次読み込み
+
+    ファイルが短くなった（再実行で作り直された）場合は最初から読み直す。
+    """
+    def __init__(self, path, capacity=20000):
+        self.path = path
+        self.offset = 0
+        self.pending = b""
+        self.history = RingBuffer(capacity, len(FIELDS))
+        self.lines = 0
+        self.status = None
+        self.messages = []
+
+    def reset(self):
+        self.offset = 0
+        self.pending = b""
+        self.history = RingBuffer(len(self.history.data), len(FIELDS))
+        self.lines = 0
+        self.status = None
+        self.messages = []
+
+    def poll(self, max_bytes=READ_CHUNK):
+        """追記分を読んで新しいサイクル行の数を返す（ファイルが無ければ0）"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        if size < self.offset:
+            self.reset()
+        if size == self.offset:
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, max_bytes))
+        self.offset += len(data)
+
+        # 完結した行だけを解析し、末尾の書きかけの行は次回に回す
+        data = self.pending + data
+        cut = data.rfind(b"\n") + 1
+        self.pending = data[cut:] if len(data) - cut <= 65536 else b""  # 改行の無い異常な行は捨てる
+        text = data[:cut].decode('latin-1')
+        self.lines += text.count("\n")
+        if NORMAL_TERMINATION in text:
+            self.status = "Normal termination"
+        elif ERROR_TERMINATION in text:
+            self.status = "Error termination"
+        if "WARNING" in text or "ERROR" in text:
+            self.messages = (self.messages + MESSAGE_LINE.findall(text))[-50:]
+
+        rows = parse_cycle_lines(text)
+        if len(rows):
+            self.history.extend(rows)
+        return len(rows)
+
+    def poll_all(self):
+        """ファイルの末尾まで読む"""
+        total = 0
+        while True:
+            offset = self.offset
+            total += self.poll()
+            if self.offset == offset:
+                return total
+
+    def series(self, name):
+        """FIELDSの1列（古い順）"""
+        return self.history.values()[:, FIELDS.index(name)]
+
+    def latest(self):
+        """最新のサイクル行 {列名: 値}"""
+        row = self.history.last()
+        return None if row is None else dict(zip(FIELDS, row))
+
+
+def listing_path(deck_path, run_number=1):
+    """デッキのパスから推定したEngineリストのパス（<名前>_0001.out）"""
+    root = os.path.splitext(deck_path)[0]
+    if re.search(r"_\d{4}$", root):
+        root = root[:-5]
+    return f"{root}_{run_number:04d}.out"
+
+
+# 表示するグラフ: (タイトル, [(列名, 凡例)], x列)
+PLOTS = (
+    ("Time step", [("dt", "dt")], "cycle"),
+    ("Energy", [("internal_energy", "Internal"), ("kinetic_energy", "Kinetic"),
+                ("external_work", "External work")], "time"),
+    ("Error", [("energy_error", "Energy error %"), ("mass_error", "Mass error")], "time"),
+)
+
+
+def make_monitor_panel(path, interval=1000):
+    """リストを監視して時間増分・エネルギー・誤差を描くドックウィジェット"""
+    import FreeCADGui
+    from PySide2 import QtCore, QtGui, QtWidgets
+
+    colors = [QtGui.QColor(31, 119, 180), QtGui.QColor(214, 39, 40), QtGui.QColor(44, 160, 44)]
+
+    class PlotWidget(QtWidgets.QWidget):
+        """折れ線グラフ（依存ライブラリを増やさないようQPainterで描く）"""
+        def __init__(self, title, curves, x_name, parent=None):
+            super().__init__(parent)
+            self.title, self.curves, self.x_name = title, curves, x_name
+            self.data = None
+            self.setMinimumHeight(140)
+
+        def paintEvent(self, event):
+            painter = QtGui.QPainter(self)
+            painter.fillRect(self.rect(), QtCore.Qt.white)
+            rect = self.rect().adjusted(50, 18, -10, -18)
+            painter.setPen(QtCore.Qt.black)
+            painter.drawText(self.rect().adjusted(4, 2, 0, 0), QtCore.Qt.AlignTop, self.title)
+            painter.drawRect(rect)
+            if self.data is None or len(self.data[self.x_name]) < 2:
+                return
+            x = self.data[self.x_name]
+            ys = [self.data[name] for name, _ in self.curves]
+            x0, x1 = x.min(), x.max()
+            y0 = min(y.min() for y in ys)
+            y1 = max(y.max() for y in ys)
+            if x1 <= x0:
+                return
+            if y1 <= y0:
+                y1 = y0 + 1.0
+            painter.drawText(4, rect.top() + 10, f"{y1:.3g}")
+            painter.drawText(4, rect.bottom(), f"{y0:.3g}")
+            painter.drawText(rect.left(), rect.bottom() + 14, f"{x0:.3g}")
+            painter.drawText(rect.right() - 50, rect.bottom() + 14, f"{x1:.3g}")
+            # 描画点は幅のピクセル数程度に間引く
+            step = max(len(x) // max(rect.width(), 1), 1)
+            px = rect.left() + (x[::step] - x0) / (x1 - x0) * rect.width()
+            for i, ((_, label), y) in enumerate(zip(self.curves, ys)):
+                py = rect.bottom() - (y[::step] - y0) / (y1 - y0) * rect.height()
+                painter.setPen(QtGui.QPen(colors[i % len(colors)], 1.5))
+                painter.drawPolyline(QtGui.QPolygonF([QtCore.QPointF(a, b) for a, b in zip(px, py)]))
+                painter.drawText(rect.right() - 120, rect.top() + 14 * (i + 1), label)
+
+    class MonitorPanel(QtWidgets.QDockWidget):
+        def __init__(self):
+            super().__init__(f"Radioss Monitor - {os.path.basename(path)}")
+            self.tail = ListingTail(path)
+            widget = QtWidgets.QWidget()
+            layout = QtWidgets.QVBoxLayout(widget)
+            self.label = QtWidgets.QLabel("Waiting for listing...")
+            layout.addWidget(self.label)
+            self.plots = [PlotWidget(*spec) for spec in PLOTS]
+            for plot in self.plots:
+                layout.addWidget(plot)
+            self.setWidget(widget)
+            self.timer = QtCore.QTimer(self)
+            self.timer.timeout.connect(self.update_view)
+            self.timer.start(interval)
+
+        def update_view(self):
+            # 大きなリストに追いつくまでは1回の更新で読む時間を区切る
+            status = self.tail.status
+            deadline = time.perf_counter() + 0.3
+            new = 0
+            while time.perf_counter() < deadline:
+                offset = self.tail.offset
+                new += self.tail.poll()
+                if self.tail.offset == offset:
+                    break
+            if new == 0 and self.tail.status == status:
+                return
+            latest = self.tail.latest()
+            if latest is not None:
+                text = (f"Cycle {int(latest['cycle'])}  Time {latest['time']:.5E}  dt {latest['dt']:.4E}  "
+                        f"Energy error {latest['energy_error']:.1f}%  Mass error {latest['mass_error']:.3E}")
+                self.label.setText(text + (f"\n{self.tail.status}" if self.tail.status else ""))
+                data = {name: self.tail.series(name) for name in FIELDS}
+                for plot in self.plots:
+                    plot.data = data
+                    plot.update()
+            if self.tail.status is not None:
+                self.timer.setInterval(max(interval, 5000))
+
+        def closeEvent(self, event):
+            self.timer.stop()
+            super().closeEvent(event)
+
+    panel = MonitorPanel()
+    panel.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+    FreeCADGui.getMainWindow().addDockWidget(QtCore.Qt.RightDockWidgetArea, panel)
+    return panel
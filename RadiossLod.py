@@ -0,0 +1,257 @@
+"""大規模メッシュ用の詳細度（LOD）表示
+
+プロキシ（外表面を間引いたMesh）は配列のキャッシュからワーカースレッドで作り、
+ドキュメントへの反映だけをGUIスレッドで行う。LOD表示の有効・無効はプロキシの
+LodEnabledプロパティに保存し、ドキュメントを開き直したときにビュープロバイダー
+（attach）から切り替えを再開する。
+"""
+import FreeCAD
+import FreeCADGui
+import numpy as np
+
+import RadiossMeshTools
+import RadiossModel
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# ドキュメント名 -> LodController（センサーを保持するため）
+_controllers = {}
+_observer = None
+
+
+def proxy_mesh(arrays, reduction):
+    """外表面の3角形を間引いたMesh -> (Mesh, 元の3角形数)。面が無ければNone
+
+    ドキュメントには触れないのでワーカースレッドで実行できる。
+    """
+    import Mesh
+
+    triangles = RadiossMeshTools.skin_triangles(arrays)
+    if len(triangles) == 0:
+        return None
+    mesh = Mesh.Mesh(arrays.coords[triangles].reshape(-1, 3).tolist())
+    if reduction > 0.0:
+        # 許容誤差はモデルサイズの0.1%
+        low, high = RadiossMeshTools.bounding_box(arrays.coords)
+        mesh.decimate(float(np.linalg.norm(high - low)) * 1.0e-3, reduction)
+    return mesh, len(triangles)
+
+
+def attach_proxy(mesh_obj, mesh, triangle_count):
+    """プロキシのオブジェクト（Mesh::FeaturePython）を作成・更新してリンク（GUIスレッド）"""
+    doc = mesh_obj.Document
+    proxy = getattr(mesh_obj, "LodProxy", None)
+    if proxy is not None and not hasattr(proxy, "LodEnabled"):
+        # 以前の版で作った復元できないプロキシ（Mesh::Feature）は作り直す
+        doc.removeObject(proxy.Name)
+        proxy = None
+    if proxy is None:
+        proxy = doc.addObject("Mesh::FeaturePython", f"{mesh_obj.Name}_LOD")
+        proxy.addProperty("App::PropertyBool", "LodEnabled", "Radioss", "Restore level of detail on open")
+        proxy.Label = f"{mesh_obj.Label} (LOD)"
+        if FreeCAD.GuiUp:
+            ViewProviderLodProxy(proxy.ViewObject)
+    proxy.Mesh = mesh
+    if not hasattr(mesh_obj, "LodProxy"):
+        mesh_obj.addProperty("App::PropertyLink", "LodProxy", "Radioss", "Decimated display proxy")
+    mesh_obj.LodProxy = proxy
+    FreeCAD.Console.PrintLog(f"LOD proxy for {mesh_obj.Name}: {triangle_count} -> "
+                             f"{mesh.CountFacets} facets\n")
+    return proxy
+
+
+def create_lod_proxy(mesh_obj, reduction=None):
+    """メッシュのプロキシを同期的に作成（GUIスレッド）"""
+    if reduction is None:
+        reduction = FreeCAD.ParamGet(PARAMS).GetFloat("LodReduction", 0.9)
+    result = proxy_mesh(RadiossModel.mesh_arrays(mesh_obj), reduction)
+    return attach_proxy(mesh_obj, *result) if result is not None else None
+
+
+def build_lod_proxies(mesh_objs, enable=True, reduction=None):
+    """プロキシをバックグラウンドで作成し、終わったらLOD表示を有効化
+
+    FemMeshの読み取りはここ（GUIスレッド）で済ませ、配列の作成と間引きは
+    ワーカーで行う。
+    """
+    import RadiossTasks
+
+    if not mesh_objs:
+        return None
+    if reduction is None:
+        reduction = FreeCAD.ParamGet(PARAMS).GetFloat("LodReduction", 0.9)
+    doc = mesh_objs[0].Document
+    snapshots = [RadiossModel.mesh_snapshot(obj) for obj in mesh_objs]
+
+    def work(context):
+        results = []
+        for count, snapshot in enumerate(snapshots):
+            context.report("Building LOD proxies", meshes=count)
+            results.append(proxy_mesh(RadiossModel.snapshot_arrays(snapshot), reduction))
+        return results
+
+    def finished(results):
+        for snapshot, result in zip(snapshots, results):
+            mesh_obj = doc.getObject(snapshot.name)
+            if mesh_obj is not None and result is not None:
+                attach_proxy(mesh_obj, *result)
+        doc.recompute()
+        if enable:
+            enable_lod(doc)
+
+    return RadiossTasks.run_task("Building LOD proxies", work, finished)
+
+
+def lod_meshes(doc):
+    """LODプロキシを持つメッシュオブジェクトの一覧"""
+    return [obj for obj in doc.Objects
+            if obj.isDerivedFrom("Fem::FemMeshObject") and getattr(obj, "LodProxy", None)]
+
+
+def show_detail(mesh_obj, detail):
+    """詳細メッシュとプロキシの表示を切り替え"""
+    if mesh_obj.ViewObject.Visibility != detail:
+        mesh_obj.ViewObject.Visibility = detail
+    if mesh_obj.LodProxy.ViewObject.Visibility == detail:
+        mesh_obj.LodProxy.ViewObject.Visibility = not detail
+
+
+class LodController:
+    """カメラのズームと選択に応じて詳細メッシュとプロキシを切り替える"""
+    def __init__(self, gui_doc):
+        from pivy import coin
+
+        self.doc = gui_doc.Document
+        self.view = gui_doc.ActiveView
+        self.zoom_ratio = FreeCAD.ParamGet(PARAMS).GetFloat("LodZoomRatio", 0.25)
+        self.selected = set()
+        self.zoomed = False
+        self.sensor = coin.SoNodeSensor(self.camera_changed, None)
+        self.camera = self.view.getCameraNode()
+        self.sensor.attach(self.camera)
+        FreeCADGui.Selection.addObserver(self)
+
+    def detach(self):
+        self.sensor.detach()
+        FreeCADGui.Selection.removeObserver(self)
+
+    def view_size(self):
+        """カメラが写している範囲の高さ"""
+        if hasattr(self.camera, "heightAngle"):
+            angle = self.camera.heightAngle.getValue()
+            return 2.0 * self.camera.focalDistance.getValue() * np.tan(angle / 2.0)
+        return self.camera.height.getValue()
+
+    def camera_changed(self, data, sensor):
+        try:
+            self.update()
+        except Exception as e:
+            FreeCAD.Console.PrintError(f"LOD update error: {str(e)}\n")
+
+    def update(self):
+        """表示範囲がモデルに対して十分小さいときだけ詳細メッシュを表示"""
+        meshes = lod_meshes(self.doc)
+        if not meshes:
+            return
+        diagonal = max(obj.LodProxy.Mesh.BoundBox.DiagonalLength for obj in meshes)
+        self.zoomed = self.view_size() < self.zoom_ratio * diagonal
+        for obj in meshes:
+            show_detail(obj, self.zoomed or obj.Name in self.selected)
+
+    # 選択オブザーバー: 選択したパートは詳細表示
+    def addSelection(self, doc, obj, sub, pnt):
+        if doc != self.doc.Name:
+            return
+        for mesh_obj in lod_meshes(self.doc):
+            if obj in (mesh_obj.Name, mesh_obj.LodProxy.Name):
+                self.selected.add(mesh_obj.Name)
+                show_detail(mesh_obj, True)
+
+    def removeSelection(self, doc, obj, sub):
+        self.clearSelection(doc)
+
+    def clearSelection(self, doc):
+        if doc != self.doc.Name:
+            return
+        self.selected = set()
+        self.update()
+
+
+class ViewProviderLodProxy:
+    """プロキシのビュープロバイダー（ドキュメントを開いたときにLOD表示を再開する）"""
+    def __init__(self, vobj):
+        vobj.Proxy = self
+
+    def attach(self, vobj):
+        obj = vobj.Object
+        if getattr(obj, "LodEnabled", False):
+            # 復元中は3Dビューがまだ無いので、イベントループに戻ってから有効化
+            from PySide2 import QtCore
+            name = obj.Document.Name
+            QtCore.QTimer.singleShot(0, lambda: restore_lod(name))
+
+    def dumps(self):
+        return None
+
+    def loads(self, state):
+        return None
+
+    __getstate__ = dumps
+    __setstate__ = loads
+
+
+class _DocumentObserver:
+    """閉じたドキュメントのコントローラーを破棄（同じ名前で開き直したときのため）"""
+    def slotDeletedDocument(self, doc):
+        controller = _controllers.pop(doc.Name, None)
+        if controller:
+            try:
+                controller.detach()
+            except Exception as e:
+                FreeCAD.Console.PrintLog(f"LOD controller detach: {str(e)}\n")
+
+
+def set_enabled_flag(doc, enabled):
+    for obj in lod_meshes(doc):
+        if hasattr(obj.LodProxy, "LodEnabled") and obj.LodProxy.LodEnabled != enabled:
+            obj.LodProxy.LodEnabled = enabled
+
+
+def enable_lod(doc):
+    """ドキュメントのLOD表示を有効化"""
+    global _observer
+    if _observer is None:
+        _observer = _DocumentObserver()
+        FreeCAD.addDocumentObserver(_observer)
+    if doc.Name not in _controllers:
+        _controllers[doc.Name] = LodController(FreeCADGui.getDocument(doc.Name))
+    set_enabled_flag(doc, True)
+    _controllers[doc.Name].update()
+
+
+def restore_lod(doc_name):
+    """開き直したドキュメントのLOD表示を再開"""
+    try:
+        doc = FreeCAD.getDocument(doc_name)
+    except Exception:
+        return
+    if doc_name in _controllers or FreeCADGui.getDocument(doc_name).ActiveView is None:
+        return
+    try:
+        enable_lod(doc)
+    except Exception as e:
+        FreeCAD.Console.PrintError(f"LOD restore error: {str(e)}\n")
+
+
+def disable_lod(doc):
+    """LOD表示を無効化して全メッシュを詳細表示"""
+    controller = _controllers.pop(doc.Name, None)
+    if controller:
+        controller.detach()
+    set_enabled_flag(doc, False)
+    for obj in lod_meshes(doc):
+        show_detail(obj, True)
+
+
+def is_enabled(doc):
+    return doc.Name in _controllers
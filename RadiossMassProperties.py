@@ -0,0 +1,144 @@
+"""節点集中質量と剛体（RadiossRigidBody）の質量特性
+
+要素の質量（シェル: rho*t*A, ソリッド: rho*V）を節点に等分配し、
+剛体ごとの質量・重心・慣性テンソルを全剛体まとめて計算する。
+"""
+import copy
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossModel
+import RadiossMeshTools
+
+
+def element_nodal_masses(arrays, props):
+    """1つのメッシュの節点集中質量（arrays.node_idsの順）"""
+    shell = RadiossMeshTools.shell_geometry(arrays.coords, arrays.shells)
+    solid = RadiossMeshTools.solid_geometry(arrays.coords, arrays.solids)
+    shell_mass = np.nan_to_num(props.shell.rho * props.shell.thickness * shell.area)
+    solid_mass = np.nan_to_num(props.solid.rho * np.abs(solid.volume))
+
+    masses = np.zeros(len(arrays.node_ids))
+    for conn, mass, corners in (
+            (RadiossMeshTools.closed_shells(arrays.shells)[0], shell_mass,
+             np.where(shell.triangle, 3, 4)),
+            (arrays.solids, solid_mass, np.where(solid.tetra, 4, 8))):
+        if len(conn) == 0:
+            continue
+        share = mass / corners
+        # 3角形の4番目（3番目と同じ節点）と4面体の空欄には分配しない
+        used = conn >= 0
+        if conn.shape[1] == 4:
+            used[:, 3] &= corners == 4
+        rows = np.broadcast_to(share[:, None], conn.shape)[used]
+        masses += np.bincount(conn[used], weights=rows, minlength=len(masses))
+    return masses
+
+
+def nodal_masses(snapshots, materials):
+    """メッシュのスナップショットの節点集中質量 -> (節点ID, 座標, 質量)
+
+    パートごとのメッシュで共有される節点は同じIDとして合算する。ドキュメント
+    には触れないのでワーカースレッドから呼べる。
+    """
+    ids, coords, masses = [], [], []
+    for snapshot in snapshots:
+        arrays = RadiossModel.snapshot_arrays(snapshot)
+        props = RadiossModel.element_properties(snapshot, arrays, materials)
+        ids.append(arrays.node_ids)
+        coords.append(arrays.coords)
+        masses.append(element_nodal_masses(arrays, props))
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, 3)), np.empty(0)
+
+    node_ids, first, inverse = np.unique(np.concatenate(ids), return_index=True, return_inverse=True)
+    total = np.bincount(inverse, weights=np.concatenate(masses), minlength=len(node_ids))
+    return node_ids, np.concatenate(coords)[first], total
+
+
+def rigid_body_properties(node_ids, coords, masses, members):
+    """剛体ごとの質量・重心・重心まわりの慣性テンソルを一括計算
+
+    members: 剛体ごとの節点ID配列のリスト
+    """
+    count = len(members)
+    lengths = np.array([len(m) for m in members], dtype=np.int64)
+    member_ids = np.concatenate(members).astype(np.int64) if count else np.empty(0, dtype=np.int64)
+    body = np.repeat(np.arange(count), lengths)
+
+    # 節点IDから行番号へ（存在しない節点は質量0）
+    pos = np.clip(np.searchsorted(node_ids, member_ids), 0, max(len(node_ids) - 1, 0))
+    found = node_ids[pos] == member_ids if len(node_ids) else np.zeros(len(member_ids), dtype=bool)
+    weight = np.where(found, masses[pos] if len(masses) else 0.0, 0.0)
+    x = coords[pos] if len(coords) else np.zeros((len(member_ids), 3))
+
+    mass = np.bincount(body, weights=weight, minlength=count)
+    first = np.stack([np.bincount(body, weights=weight * x[:, k], minlength=count) for k in range(3)],
+                     axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center = np.where(mass[:, None] > 0.0, first / mass[:, None], 0.0)
+
+    second = np.empty((count, 3, 3))
+    for k in range(3):
+        for l in range(k, 3):
+            second[:, k, l] = second[:, l, k] = np.bincount(
+                body, weights=weight * x[:, k] * x[:, l], minlength=count)
+    # 重心まわりの2次モーメント -> 慣性テンソル I = tr(Q) E - Q
+    central = second - mass[:, None, None] * center[:, :, None] * center[:, None, :]
+    inertia = np.trace(central, axis1=1, axis2=2)[:, None, None] * np.eye(3) - central
+    return SimpleNamespace(mass=mass, center=center, inertia=inertia,
+                           missing=np.bincount(body, weights=~found, minlength=count).astype(int))
+
+
+def compute_mass_properties(model, auto_only=True):
+    """剛体の質量・重心・慣性を節点質量から計算（ワーカースレッドから呼べる）
+
+    model: RadiossModel.snapshot_analysisの戻り値。計算した剛体の記録は
+    model.rigid_bodiesの中で置き換え、ドキュメントへの反映は
+    apply_mass_propertiesでGUIスレッドから行う。
+    auto_only: AutoMassPropertiesの剛体だけを計算する
+    戻り値: 更新した剛体の記録のリスト
+    """
+    targets = [i for i, body in enumerate(model.rigid_bodies) if body.auto or not auto_only]
+    if not targets:
+        return []
+    node_ids, coords, masses = nodal_masses(model.meshes, model.materials)
+    result = rigid_body_properties(node_ids, coords, masses,
+                                   [model.rigid_bodies[i].members for i in targets])
+
+    updated = []
+    for k, i in enumerate(targets):
+        body = copy.copy(model.rigid_bodies[i])
+        if result.mass[k] <= 0.0:
+            FreeCAD.Console.PrintWarning(f"Rigid body {body.rbody_name}: no mass found for its node set\n")
+            continue
+        tensor = result.inertia[k]
+        body.mass = float(result.mass[k])
+        body.center = tuple(result.center[k].tolist())
+        body.inertia = tuple(np.diag(tensor).tolist())
+        body.tensor = [float(tensor[0, 0]), float(tensor[1, 1]), float(tensor[2, 2]),
+                       float(tensor[0, 1]), float(tensor[1, 2]), float(tensor[0, 2])]
+        model.rigid_bodies[i] = body
+        updated.append(body)
+        if result.missing[k]:
+            FreeCAD.Console.PrintWarning(f"Rigid body {body.rbody_name}: "
+                                         f"{result.missing[k]} nodes not found in the mesh\n")
+        FreeCAD.Console.PrintLog(f"Rigid body {body.rbody_name}: mass {body.mass:12.5E}\n")
+    return updated
+
+
+def apply_mass_properties(doc, bodies):
+    """計算した質量特性を剛体オブジェクトのプロパティに設定（GUIスレッドで呼ぶ）"""
+    for body in bodies:
+        rbody = doc.getObject(body.name)
+        if rbody is None:
+            continue
+        rbody.Mass = body.mass
+        rbody.CenterOfMass = FreeCAD.Vector(*body.center)
+        rbody.Inertia = FreeCAD.Vector(*body.inertia)
+        if not hasattr(rbody, "InertiaTensor"):
+            rbody.addProperty("App::PropertyFloatList", "InertiaTensor", "RBody",
+                              "Inertia tensor (Ixx Iyy Izz Ixy Iyz Ixz)")
+        rbody.InertiaTensor = body.tensor
@@ -0,0 +1,252 @@
+"""FemMeshをNumPy配列として扱うためのユーティリティ"""
+from types import SimpleNamespace
+
+import numpy as np
+
+# 6面体（Radioss /BRICK, SMDS共通の節点順）と4面体の面の節点順
+HEXA_FACES = np.array([[0, 3, 2, 1], [4, 5, 6, 7], [0, 1, 5, 4],
+                       [1, 2, 6, 5], [2, 3, 7, 6], [3, 0, 4, 7]])
+TETRA_FACES = np.array([[0, 2, 1, 1], [0, 1, 3, 3], [1, 2, 3, 3], [0, 3, 2, 2]])
+
+
+def lookup_by_id(table_ids, table_values, query_ids, default):
+    """id配列をキーとする表をベクトル化して引く（見つからない場合はdefault）"""
+    table_ids = np.asarray(table_ids, dtype=np.int64)
+    table_values = np.asarray(table_values)
+    query_ids = np.asarray(query_ids, dtype=np.int64)
+    result = np.full(len(query_ids), default, dtype=table_values.dtype)
+    if len(table_ids) == 0 or len(query_ids) == 0:
+        return result
+    order = np.argsort(table_ids, kind='stable')
+    sorted_ids = table_ids[order]
+    pos = np.clip(np.searchsorted(sorted_ids, query_ids), 0, len(sorted_ids) - 1)
+    found = sorted_ids[pos] == query_ids
+    result[found] = table_values[order[pos[found]]]
+    return result
+
+
+def _element_table(femmesh, elem_ids, width):
+    """要素IDのリストから節点ID配列（幅width、不足分は-1）を作成"""
+    conn = np.full((len(elem_ids), width), -1, dtype=np.int64)
+    for row, elem_id in enumerate(elem_ids):
+        nodes = femmesh.getElementNodes(elem_id)[:width]
+        conn[row, :len(nodes)] = nodes
+    return np.asarray(elem_ids, dtype=np.int64), conn
+
+
+def to_index(node_ids, conn):
+    """節点ID配列を座標配列の行番号に変換（-1はそのまま）"""
+    index = np.full(conn.shape, -1, dtype=np.int64)
+    valid = conn >= 0
+    index[valid] = np.searchsorted(node_ids, conn[valid])
+    return index
+
+
+def femmesh_arrays(femmesh):
+    """FemMeshから節点座標とシェル/ソリッド要素の接続配列を取得"""
+    nodes = femmesh.Nodes
+    node_ids = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+    coords = np.array([(v.x, v.y, v.z) for v in nodes.values()], dtype=np.float64).reshape(-1, 3)
+    order = np.argsort(node_ids, kind='stable')
+    node_ids, coords = node_ids[order], coords[order]
+
+    shell_ids, shells = _element_table(femmesh, femmesh.Faces, 4)
+    solid_ids, solids = _element_table(femmesh, femmesh.Volumes, 8)
+    return SimpleNamespace(
+        node_ids=node_ids,
+        coords=coords,
+        shell_ids=shell_ids,
+        shells=to_index(node_ids, shells),
+        solid_ids=solid_ids,
+        solids=to_index(node_ids, solids)
+    )
+
+
+def parser_arrays(nodes, elements):
+    """パーサーの節点・要素辞書からfemmesh_arraysと同じ形の配列を作成"""
+    node_ids = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+    coords = np.array(list(nodes.values()), dtype=np.float64).reshape(-1, 3)
+    order = np.argsort(node_ids, kind='stable')
+    node_ids, coords = node_ids[order], coords[order]
+
+    tables = {}
+    for kind, types, width in (('shell', ('SHELL', 'SH3N'), 4), ('solid', ('SOLID',), 8)):
+        selected = [(elem_id, elem.nodes) for elem_id, elem in elements.items() if elem.type in types]
+        conn = np.full((len(selected), width), -1, dtype=np.int64)
+        for row, (_, elem_nodes) in enumerate(selected):
+            conn[row, :min(len(elem_nodes), width)] = elem_nodes[:width]
+        tables[kind] = (np.array([e[0] for e in selected], dtype=np.int64), to_index(node_ids, conn))
+    return SimpleNamespace(
+        node_ids=node_ids,
+        coords=coords,
+        shell_ids=tables['shell'][0],
+        shells=tables['shell'][1],
+        solid_ids=tables['solid'][0],
+        solids=tables['solid'][1]
+    )
+
+
+def volume_nodes(nodes):
+    """ソリッド要素の節点 -> FemMesh.addVolumeに渡す節点（6面体8個か4面体4個、それ以外はNone）
+
+    未使用(-1)を除き、節点が4つに縮退した6面体（/BRICKで書いた4面体）は4面体にする。
+    """
+    nodes = [n for n in nodes if n >= 0]
+    unique = list(dict.fromkeys(nodes))
+    if len(unique) == 4:
+        return unique
+    if len(nodes) == 8:
+        return nodes
+    return None
+
+
+def is_triangle(shells):
+    """3節点シェル（4番目が空、または3番目と4番目が同じ節点）の判定"""
+    return (shells[:, 3] < 0) | (shells[:, 3] == shells[:, 2])
+
+
+def triangulate(faces):
+    """4角形/3角形の面配列を3角形の配列に分割"""
+    if len(faces) == 0:
+        return np.empty((0, 3), dtype=np.int64)
+    quads = faces[~is_triangle(faces)]
+    return np.concatenate([faces[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+
+
+def solid_skin_faces(solids, return_owner=False):
+    """ソリッド要素の外表面（1要素にしか属さない面）を抽出
+
+    return_owner=Trueなら(面, 面を持つ要素の行番号)を返す。面は外向きの節点順。
+    """
+    if len(solids) == 0:
+        empty = np.empty((0, 4), dtype=np.int64)
+        return (empty, np.empty(0, dtype=np.int64)) if return_owner else empty
+    tetra = solids[:, 4] < 0
+    faces = np.concatenate([
+        solids[~tetra][:, HEXA_FACES].reshape(-1, 4),
+        solids[tetra][:, TETRA_FACES].reshape(-1, 4),
+    ])
+    # 縮退面（重複節点）を含めて、節点集合で面を同一視する
+    keys = np.sort(faces, axis=1)
+    _, first, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+    skin = first[counts == 1]
+    if not return_owner:
+        return faces[skin]
+    owners = np.concatenate([np.repeat(np.flatnonzero(~tetra), len(HEXA_FACES)),
+                             np.repeat(np.flatnonzero(tetra), len(TETRA_FACES))])
+    return faces[skin], owners[skin]
+
+
+def skin_triangles(arrays):
+    """シェル要素とソリッド外表面から表示用の3角形（節点行番号）を作成"""
+    faces = np.concatenate([arrays.shells, solid_skin_faces(arrays.solids)])
+    return triangulate(faces)
+
+
+def bounding_box(coords):
+    """座標配列の(最小, 最大)"""
+    if len(coords) == 0:
+        return np.zeros(3), np.zeros(3)
+    return coords.min(axis=0), coords.max(axis=0)
+
+
+def group_part_ids(femmesh, elem_ids):
+    """PART_<id>要素グループから要素ごとのパートIDを取得（どのグループにも無ければ0）"""
+    elem_ids = np.asarray(elem_ids, dtype=np.int64)
+    parts = np.zeros(len(elem_ids), dtype=np.int64)
+    if len(elem_ids) == 0:
+        return parts
+    order = np.argsort(elem_ids, kind='stable')
+    sorted_ids = elem_ids[order]
+    for group in femmesh.Groups:
+        name = femmesh.getGroupName(group)
+        if not name.startswith("PART_"):
+            continue
+        members = np.asarray(femmesh.getGroupElements(group), dtype=np.int64)
+        pos = np.clip(np.searchsorted(sorted_ids, members), 0, len(sorted_ids) - 1)
+        hit = sorted_ids[pos] == members
+        parts[order[pos[hit]]] = int(name[5:])
+    return parts
+
+
+def _norm(vectors):
+    return np.sqrt(np.einsum('...i,...i->...', vectors, vectors))
+
+
+def quad_areas(points):
+    """4角形（4点目が3点目と同じなら3角形）の面積 points: (..., 4, 3)"""
+    diagonal1 = points[..., 2, :] - points[..., 0, :]
+    diagonal2 = points[..., 3, :] - points[..., 1, :]
+    return 0.5 * _norm(np.cross(diagonal1, diagonal2))
+
+
+def closed_shells(shells):
+    """3角形の4番目の節点を3番目で埋めたシェル接続配列"""
+    conn = shells.copy()
+    tri = is_triangle(conn)
+    conn[tri, 3] = conn[tri, 2]
+    return conn, tri
+
+
+def shell_geometry(coords, shells):
+    """シェル要素の面積と特性長さ（4角形: 面積/最大辺長, 3角形: 2*面積/最大辺長）"""
+    conn, tri = closed_shells(shells)
+    points = coords[conn]
+    area = quad_areas(points)
+    sides = _norm(points[:, [1, 2, 3, 0]] - points)
+    length = np.where(tri, 2.0, 1.0) * area / np.maximum(sides.max(axis=1), 1.0e-300)
+    return SimpleNamespace(area=area, length=length, triangle=tri)
+
+
+def tetra_volumes(a, b, c, d):
+    """4面体の符号付き体積"""
+    return np.einsum('ij,ij->i', a - d, np.cross(b - d, c - d)) / 6.0
+
+
+def solid_geometry(coords, solids):
+    """ソリッド要素の体積と特性長さ（6面体: 体積/最大面積, 4面体: 3*体積/最大面積）"""
+    count = len(solids)
+    volume = np.zeros(count)
+    length = np.zeros(count)
+    tetra = solids[:, 4] < 0 if count else np.zeros(0, dtype=bool)
+
+    hexa = ~tetra
+    if hexa.any():
+        points = coords[solids[hexa]]
+        # 対角線0-6まわりの6つの4面体に分割
+        volume[hexa] = sum(
+            tetra_volumes(points[:, 0], points[:, i], points[:, j], points[:, 6])
+            for i, j in ((2, 1), (3, 2), (7, 3), (4, 7), (5, 4), (1, 5)))
+        max_face = quad_areas(points[:, HEXA_FACES]).max(axis=1)
+        length[hexa] = np.abs(volume[hexa]) / np.maximum(max_face, 1.0e-300)
+    if tetra.any():
+        points = coords[solids[tetra][:, :4]]
+        volume[tetra] = np.abs(tetra_volumes(points[:, 0], points[:, 1], points[:, 2], points[:, 3]))
+        max_face = quad_areas(points[:, TETRA_FACES]).max(axis=1)
+        length[tetra] = 3.0 * volume[tetra] / np.maximum(max_face, 1.0e-300)
+    return SimpleNamespace(volume=volume, length=length, tetra=tetra)
+
+
+def merge_arrays(arrays_list):
+    """複数メッシュの配列データを結合（同じ節点IDは最初の座標を使う）
+
+    shell_*/solid_*の要素ごとの配列（shell_partsなど）は要素の順に連結する。
+    """
+    if not arrays_list:
+        empty = np.empty(0, dtype=np.int64)
+        return SimpleNamespace(node_ids=empty, coords=np.empty((0, 3)), shell_ids=empty,
+                               shells=np.empty((0, 4), dtype=np.int64),
+                               solid_ids=empty, solids=np.empty((0, 8), dtype=np.int64))
+    node_ids, first = np.unique(np.concatenate([a.node_ids for a in arrays_list]), return_index=True)
+    coords = np.concatenate([a.coords for a in arrays_list])[first]
+
+    merged = SimpleNamespace(node_ids=node_ids, coords=coords)
+    for kind in ('shell', 'solid'):
+        # 各メッシュの行番号 -> 節点ID -> 結合後の行番号
+        conn = [np.where(getattr(a, kind + 's') >= 0, a.node_ids[getattr(a, kind + 's')], -1)
+                for a in arrays_list]
+        setattr(merged, kind + 's', to_index(node_ids, np.concatenate(conn)))
+        for name in vars(arrays_list[0]):
+            if name.startswith(kind + '_') and all(hasattr(a, name) for a in arrays_list):
+                setattr(merged, name, np.concatenate([getattr(a, name) for a in arrays_list]))
+    return merged
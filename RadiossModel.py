@@ -0,0 +1,380 @@
+"""解析オブジェクト（メッシュ・材料・セット）から配列データを取得する
+
+材料定数・質量はデッキと同じ単位系（mm, t, s。応力はMPa、密度はt/mm^3）に換算する。
+"""
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossMeshTools
+from RadiossMeshTools import lookup_by_id
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# メッシュオブジェクトごとの配列のキャッシュ（FemMeshが変わったら破棄する）
+_mesh_cache = OrderedDict()  # (ドキュメント名, オブジェクト名) -> 配列
+_generations = {}            # 同じキー -> FemMeshの変更回数
+_observer = None
+
+
+# デッキの単位系（mm, t, s）での材料定数の単位
+DECK_UNITS = {'YoungsModulus': 'MPa', 'Density': 't/mm^3', 'YieldStrength': 'MPa'}
+
+
+def deck_value(text, unit=None, default=0.0):
+    """'7800 kg/m^3'のような文字列をデッキの単位系（mm, t, s）の値に変換
+
+    単位なし（または次元の違う単位）の値はデッキの単位系の値とみなしてそのまま使う。
+    """
+    if text is None:
+        return default
+    try:
+        number = float(str(text).split()[0])
+    except (ValueError, IndexError):
+        number = default
+    if unit is None:
+        return number
+    try:
+        quantity = FreeCAD.Units.Quantity(str(text))
+        reference = FreeCAD.Units.Quantity(f"1 {unit}")
+    except Exception:
+        return number
+    if quantity.Unit != reference.Unit:
+        return number
+    return quantity.Value / reference.Value
+
+
+def material_value(material, name, default=0.0):
+    """材料の辞書の値（デッキの単位系）"""
+    return deck_value(material.get(name), DECK_UNITS.get(name), default)
+
+
+def material_constants(material_obj):
+    """材料オブジェクトのE, nu, rho, 降伏応力（デッキの単位系: MPa, t/mm^3）"""
+    mat = material_obj.Material
+    return SimpleNamespace(
+        E=material_value(mat, 'YoungsModulus'),
+        nu=material_value(mat, 'PoissonRatio'),
+        rho=material_value(mat, 'Density'),
+        yield_stress=material_value(mat, 'YieldStrength')
+    )
+
+
+def analysis_materials(analysis):
+    """解析内の材料オブジェクト -> (材料ID配列, E, nu, rho配列, 既定材料)"""
+    materials = [obj for obj in analysis.Group if obj.isDerivedFrom("App::MaterialObjectPython")]
+    ids = np.array([getattr(obj, "MaterialId", 0) for obj in materials], dtype=np.int64)
+    constants = [material_constants(obj) for obj in materials]
+    table = SimpleNamespace(
+        ids=ids,
+        E=np.array([c.E for c in constants], dtype=np.float64),
+        nu=np.array([c.nu for c in constants], dtype=np.float64),
+        rho=np.array([c.rho for c in constants], dtype=np.float64),
+        default=constants[0] if constants else None
+    )
+    return table
+
+
+def mesh_objects(analysis):
+    """解析内のFemMeshオブジェクト（パートごとのメッシュを含む）"""
+    return [obj for obj in analysis.Group if obj.isDerivedFrom("Fem::FemMeshObject")]
+
+
+class _MeshObserver:
+    """FemMeshの変更、オブジェクト・ドキュメントの削除でキャッシュを破棄"""
+    def slotChangedObject(self, obj, prop):
+        if prop == "FemMesh":
+            _invalidate((obj.Document.Name, obj.Name))
+
+    def slotDeletedObject(self, obj):
+        _invalidate((obj.Document.Name, obj.Name))
+
+    def slotDeletedDocument(self, doc):
+        for key in [key for key in _generations if key[0] == doc.Name]:
+            _invalidate(key)
+
+
+def _invalidate(key):
+    _generations[key] = _generations.get(key, 0) + 1
+    _mesh_cache.pop(key, None)
+
+
+def _store(key, generation, arrays):
+    """作成中にFemMeshが変わっていなければキャッシュに入れる（節点数の合計で上限）"""
+    if _generations.get(key, 0) != generation:
+        return
+    _mesh_cache[key] = arrays
+    limit = FreeCAD.ParamGet(PARAMS).GetInt("ArrayCacheNodes", 20000000)
+    while len(_mesh_cache) > 1 and sum(len(a.node_ids) for a in _mesh_cache.values()) > limit:
+        _mesh_cache.popitem(last=False)
+
+
+def _watch():
+    """FemMeshの変更を監視するオブザーバーを登録（初回のみ）"""
+    global _observer
+    if _observer is None and hasattr(FreeCAD, "addDocumentObserver"):
+        _observer = _MeshObserver()
+        FreeCAD.addDocumentObserver(_observer)
+
+
+def mesh_generation(mesh_obj):
+    """(ドキュメント名, オブジェクト名, FemMeshの変更回数)（FemMeshが変わらなければ同じ値）"""
+    _watch()
+    key = (mesh_obj.Document.Name, mesh_obj.Name)
+    return key + (_generations.get(key, 0),)
+
+
+def mesh_snapshot(mesh_obj):
+    """メッシュオブジェクトから必要な値を読み取る（GUIスレッドで呼ぶ）
+
+    配列がキャッシュに無ければFemMeshの複製を持ち、配列はsnapshot_arraysで
+    （ワーカースレッドからでも）作る。パート表もここで読んでおく。
+    """
+    _watch()
+    key = (mesh_obj.Document.Name, mesh_obj.Name)
+    arrays = _mesh_cache.get(key)
+    if arrays is not None:
+        _mesh_cache.move_to_end(key)
+    return SimpleNamespace(
+        key=key,
+        name=mesh_obj.Name,
+        generation=_generations.get(key, 0),
+        arrays=arrays,
+        femmesh=mesh_obj.FemMesh if arrays is None else None,  # プロパティの値は複製
+        part_ids=np.array(getattr(mesh_obj, "PartIds", []), dtype=np.int64),
+        part_mat=np.array(getattr(mesh_obj, "PartMatIds", []), dtype=np.int64),
+        part_thickness=np.array(getattr(mesh_obj, "PartThickness", []), dtype=np.float64),
+    )
+
+
+def snapshot_arrays(snapshot):
+    """スナップショットの配列（femmesh_arraysの形とshell_parts/solid_parts）
+
+    ドキュメントには触れないのでワーカースレッドから呼べる。返す配列は
+    キャッシュと共有するので書き換えないこと。
+    """
+    if snapshot.arrays is None:
+        femmesh = snapshot.femmesh
+        arrays = RadiossMeshTools.femmesh_arrays(femmesh)
+        arrays.shell_parts = RadiossMeshTools.group_part_ids(femmesh, arrays.shell_ids)
+        arrays.solid_parts = RadiossMeshTools.group_part_ids(femmesh, arrays.solid_ids)
+        _store(snapshot.key, snapshot.generation, arrays)
+        snapshot.arrays = arrays
+        snapshot.femmesh = None
+    return snapshot.arrays
+
+
+def mesh_snapshots(analysis):
+    return [mesh_snapshot(obj) for obj in mesh_objects(analysis)]
+
+
+def mesh_arrays(mesh_obj):
+    """メッシュオブジェクトの配列（キャッシュがあれば再利用）"""
+    return snapshot_arrays(mesh_snapshot(mesh_obj))
+
+
+def element_properties(snapshot, arrays, materials):
+    """シェル・ソリッド要素ごとのE, nu, rho, 厚さを解決
+
+    パートIDはPART_<id>要素グループ（arrays.shell_parts/solid_parts）、材料と
+    厚さはメッシュのパート表（スナップショットのPartIds/PartMatIds/PartThickness）
+    から引く。見つからない要素には解析内の最初の材料と既定の厚さを使う。
+    """
+    default_thickness = FreeCAD.ParamGet(PARAMS).GetFloat("DefaultShellThickness", 1.0)
+    part_ids, part_mat, part_thickness = snapshot.part_ids, snapshot.part_mat, snapshot.part_thickness
+    default = materials.default or SimpleNamespace(E=np.nan, nu=0.0, rho=np.nan)
+
+    def resolve(parts):
+        mat_ids = lookup_by_id(part_ids, part_mat, parts, -1)
+        values = SimpleNamespace(part=parts, material=mat_ids)
+        for name in ('E', 'nu', 'rho'):
+            setattr(values, name, lookup_by_id(materials.ids, getattr(materials, name), mat_ids,
+                                               getattr(default, name)))
+        thickness = lookup_by_id(part_ids, part_thickness, parts, default_thickness)
+        thickness[~(thickness > 0.0)] = default_thickness
+        values.thickness = thickness
+        return values
+
+    return SimpleNamespace(shell=resolve(arrays.shell_parts), solid=resolve(arrays.solid_parts))
+
+
+def merge_meshes(snapshots, materials=None):
+    """メッシュのスナップショットを1つの配列データにまとめる（同じ節点IDは1つにする）
+
+    要素のパートIDはshell_parts/solid_parts、materialsを渡せば材料定数と
+    厚さもshell_E, shell_thicknessなどとして付ける。ドキュメントには触れない
+    のでワーカースレッドから呼べる。
+    """
+    parts = []
+    for snapshot in snapshots:
+        # キャッシュの配列は共有なので、要素ごとの配列を足すときは浅いコピーにする
+        arrays = SimpleNamespace(**vars(snapshot_arrays(snapshot)))
+        if materials is not None:
+            props = element_properties(snapshot, arrays, materials)
+            for kind in ('shell', 'solid'):
+                for name, values in vars(getattr(props, kind)).items():
+                    setattr(arrays, f"{kind}_{name}s" if name == 'part' else f"{kind}_{name}", values)
+        arrays.shell_mesh = np.full(len(arrays.shell_ids), len(parts), dtype=np.int64)
+        arrays.solid_mesh = np.full(len(arrays.solid_ids), len(parts), dtype=np.int64)
+        parts.append(arrays)
+    return RadiossMeshTools.merge_arrays(parts)
+
+
+def merged_arrays(analysis, properties=False):
+    """解析内の全メッシュを1つの配列データにまとめる（merge_meshesを参照）"""
+    materials = analysis_materials(analysis) if properties else None
+    merged = merge_meshes(mesh_snapshots(analysis), materials)
+    merged.meshes = mesh_objects(analysis)
+    return merged
+
+
+def set_members(set_obj):
+    """セットオブジェクトの(種類, ID配列)。種類は'NODE'または'ELEM'"""
+    kind, ids = set_ids(set_obj)
+    return kind, ids.ids
+
+
+def set_ids(set_obj):
+    """セットオブジェクトの(種類, IdSet)。範囲で保存したメンバーも展開する"""
+    import RadiossSets
+    if set_obj is None:
+        return None, RadiossSets.IdSet()
+    set_type = getattr(set_obj, "SetType", "NODE").upper()
+    kind = 'NODE' if set_type in ('NODE', 'GRNOD') else 'ELEM'
+    members = RadiossSets.IdSet(getattr(set_obj, "Members", []))
+    ranges = getattr(set_obj, "MemberRanges", [])
+    if len(ranges):
+        members = members | RadiossSets.decode(ranges)
+    return kind, members
+
+
+def store_members(set_obj, members):
+    """セットのメンバーを保存（連続したIDが多ければ範囲[開始, 終了, ...]で保存）"""
+    import RadiossSets
+    if not isinstance(members, RadiossSets.IdSet):
+        members = RadiossSets.IdSet(members)
+    ranges = RadiossSets.encode(members)
+    if not hasattr(set_obj, "Members"):
+        set_obj.addProperty("App::PropertyIntegerList", "Members", "Radioss", "Set members")
+    if ranges is not None and not hasattr(set_obj, "MemberRanges"):
+        set_obj.addProperty("App::PropertyIntegerList", "MemberRanges", "Radioss",
+                            "Set members as [first, last] id ranges")
+    if ranges is not None:
+        set_obj.Members = []
+        set_obj.MemberRanges = ranges.tolist()
+    else:
+        set_obj.Members = members.ids.tolist()
+        if hasattr(set_obj, "MemberRanges"):
+            set_obj.MemberRanges = []
+
+
+def make_set(doc, name, set_type, members):
+    """メンバーIDを持つセットオブジェクトを作成"""
+    set_obj = doc.addObject("App::FeaturePython", name)
+    set_obj.addProperty("App::PropertyString", "SetType", "Radioss", "Type of set")
+    set_obj.SetType = set_type
+    store_members(set_obj, members)
+    return set_obj
+
+
+def reference_ids(references, prefix='Node'):
+    """参照のサブ要素名（Node12など）から節点IDを取得"""
+    ids = []
+    for ref in references:
+        subs = ref[1] if len(ref) > 1 else ()
+        if isinstance(subs, str):
+            subs = (subs,)
+        for sub in subs:
+            if sub.startswith(prefix) and sub[len(prefix):].isdigit():
+                ids.append(int(sub[len(prefix):]))
+    return np.array(ids, dtype=np.int64)
+
+
+def analysis_properties(analysis):
+    """解析プロパティ（RadiossProperties）のオブジェクト（無ければNone）"""
+    for obj in analysis.Group:
+        if obj.Name.startswith("RadiossProperties"):
+            return obj
+    return None
+
+
+# Engineデッキに書く解析プロパティ（無いものは書き出し時の既定値を使う）
+ENGINE_PROPERTIES = {
+    'TerminationTime': 1.0, 'TimeStep': 1.0e-6, 'AutoTimeStep': False, 'DTScale': 0.9,
+    'MassScaling': False, 'MinTimeStep': 0.0, 'PrintTime': 0.001, 'StressOutput': True,
+    'StrainOutput': True, 'DisplacementOutput': True, 'Damping': 0.0,
+    'TimeIntegration': 'Central_Difference',
+}
+RIGID_BODY_FIXES = ('FixX', 'FixY', 'FixZ', 'FixRX', 'FixRY', 'FixRZ')
+
+
+def _vector(vector):
+    return (float(vector.x), float(vector.y), float(vector.z))
+
+
+def _link_name(obj):
+    return obj.Name if obj else None
+
+
+def snapshot_analysis(analysis):
+    """書き出しに必要な値を解析から読み取る（GUIスレッドで呼ぶ）
+
+    戻り値はドキュメントのオブジェクトを参照しないので、書き出しのワーカー
+    スレッドはこれだけを使う。メッシュの配列はsnapshot_arraysで作る。
+    """
+    import RadiossConnectors
+    import RadiossCurves
+    model = SimpleNamespace(
+        name=analysis.Name,
+        meshes=mesh_snapshots(analysis),
+        materials=analysis_materials(analysis),
+        connectors=RadiossConnectors.analysis_connectors(analysis),
+        curves=RadiossCurves.analysis_curves(analysis),
+        material_cards=[], rigid_bodies=[], contacts=[], sets=[], constraints=[], loads=[],
+        properties=None,
+    )
+    for obj in analysis.Group:
+        label = getattr(obj, "Label", obj.Name)
+        if obj.isDerivedFrom("App::MaterialObjectPython"):
+            model.material_cards.append(SimpleNamespace(name=obj.Name, label=label, card=dict(obj.Material),
+                                                        id=int(getattr(obj, "MaterialId", 0))))
+        elif obj.isDerivedFrom("Fem::ConstraintFixed"):
+            model.constraints.append(SimpleNamespace(name=obj.Name, nodes=reference_ids(obj.References)))
+        elif obj.isDerivedFrom("Fem::ConstraintForce"):
+            model.loads.append(SimpleNamespace(
+                name=obj.Name, force=float(obj.Force), direction=_vector(obj.DirectionVector),
+                curve_id=int(getattr(obj, 'CurveId', 0)), nodes=reference_ids(obj.References)))
+        elif hasattr(obj, 'RBodyName'):
+            model.rigid_bodies.append(SimpleNamespace(
+                name=obj.Name, rbody_name=obj.RBodyName,
+                node_set=obj.NodeSet.Name if obj.NodeSet else None, members=set_members(obj.NodeSet)[1],
+                auto=bool(getattr(obj, 'AutoMassProperties', False)),
+                mass=float(obj.Mass), center=_vector(obj.CenterOfMass), inertia=_vector(obj.Inertia),
+                tensor=list(getattr(obj, 'InertiaTensor', [])),
+                fixes=[dof + 1 for dof, name in enumerate(RIGID_BODY_FIXES) if getattr(obj, name)]))
+        elif hasattr(obj, 'ContactName'):
+            model.contacts.append(SimpleNamespace(
+                name=obj.Name, label=label, contact_type=obj.ContactType, contact_name=obj.ContactName,
+                slave=_link_name(getattr(obj, 'SlaveSet', None)),
+                master=_link_name(getattr(obj, 'MasterSet', None)),
+                gap=float(getattr(obj, 'Gap', 0.0)), friction=float(getattr(obj, 'Friction', 0.0)),
+                stiffness=float(getattr(obj, 'Stiffness', 0.0)), damping=float(getattr(obj, 'Damping', 0.0))))
+        elif hasattr(obj, "SetType"):
+            # メンバーが無ければ参照の節点を使う
+            kind, ids = set_ids(obj)
+            if not len(ids) and hasattr(obj, "References"):
+                import RadiossSets
+                ids = RadiossSets.IdSet(reference_ids(obj.References))
+            model.sets.append(SimpleNamespace(name=obj.Name, set_type=obj.SetType, kind=kind, ids=ids))
+        if obj.Name.startswith("RadiossProperties") and model.properties is None:
+            model.properties = SimpleNamespace(**{name: getattr(obj, name, default)
+                                                  for name, default in ENGINE_PROPERTIES.items()})
+    # MaterialIdの無い材料（ワークベンチで作った材料）には使われていないIDを振る
+    next_id = max((card.id for card in model.material_cards), default=0)
+    for card in model.material_cards:
+        if card.id <= 0:
+            next_id += 1
+            card.id = next_id
+    return model
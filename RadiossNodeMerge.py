@@ -0,0 +1,277 @@
+"""インポート時の重複節点の検出と併合
+
+- 重複ID: 同じ節点IDが2回以上定義されたもの（パーサーは最後の定義を残す）
+- 一致節点: IDは違うが座標が許容誤差以内のもの
+
+一致節点は一様格子（空間ハッシュ）で検出する。セル幅を2*許容誤差より大きく
+とり、同じセルに入った節点どうしだけを比べる。セル境界をまたぐ組はセル幅の
+半分だけずらした格子で拾うが、ずらす格子に入れるのは境界から許容誤差以内の
+節点だけなので、ソートは実質1回、他は節点数に比例する処理で済む。
+
+併合では一致節点の組をつないだグループごとに最小IDの節点を残し、要素・
+結合要素・節点セット・境界条件・荷重の節点IDを旧ID -> 新IDの表で配列のまま
+置き換える。組をつないでまとめるので、鎖状につながった節点は許容誤差より
+離れていても同じ節点になる。
+"""
+from itertools import chain, product
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossMeshTools
+import RadiossSets
+import RadiossSpatialIndex
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# Off（調べない）/ Report（報告のみ）/ Merge（併合する）
+MODES = ('Off', 'Report', 'Merge')
+
+# 報告に並べるIDや組の数
+REPORT_LIMIT = 10
+
+
+def settings():
+    """設定 -> (モード, 許容誤差)"""
+    params = FreeCAD.ParamGet(PARAMS)
+    mode = params.GetString("NodeMergeMode", "Report")
+    if mode not in MODES:
+        mode = "Report"
+    return mode, params.GetFloat("NodeMergeTolerance", 1.0e-6)
+
+
+class NodeMap:
+    """併合で消える節点ID -> 残す節点ID"""
+    def __init__(self, old=None, new=None):
+        old = np.asarray(old if old is not None else [], dtype=np.int64)
+        new = np.asarray(new if new is not None else [], dtype=np.int64)
+        order = np.argsort(old)
+        self.old = old[order]
+        self.new = new[order]
+
+    def __len__(self):
+        return len(self.old)
+
+    def apply(self, ids):
+        """ID配列を置き換えた新しい配列（表に無いIDはそのまま）"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.old) or not ids.size:
+            return ids.copy()
+        pos = np.clip(np.searchsorted(self.old, ids), 0, len(self.old) - 1)
+        hit = self.old[pos] == ids
+        out = ids.copy()
+        out[hit] = self.new[pos[hit]]
+        return out
+
+
+def node_arrays(nodes):
+    """節点の辞書 -> (ID昇順の配列, 座標(n, 3))"""
+    ids = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+    coords = np.array(list(nodes.values()), dtype=np.float64).reshape(-1, 3)
+    order = np.argsort(ids, kind='stable')
+    return ids[order], coords[order]
+
+
+def _same_cell_pairs(rows, keys):
+    """同じセルキーの行どうしの組(first, second)（first < second）"""
+    order = np.argsort(keys)
+    keys, rows = keys[order], rows[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    lengths = np.diff(np.concatenate([starts, [len(keys)]]))
+    # 2個以上入ったセルの各位置から、同じセルの後ろの位置すべてと組にする
+    multi = lengths > 1
+    position = RadiossSpatialIndex.expand_ranges(starts[multi], lengths[multi])
+    run_end = np.repeat(starts[multi] + lengths[multi], lengths[multi])
+    counts = run_end - position - 1
+    first = rows[np.repeat(position, counts)]
+    second = rows[RadiossSpatialIndex.expand_ranges(position + 1, counts)]
+    return np.minimum(first, second), np.maximum(first, second)
+
+
+def coincident_pairs(coords, tolerance, cell_size=None):
+    """距離がtolerance以下の節点の組 -> (first行, second行, 距離)（first < second、重複なし）"""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    if len(coords) < 2 or tolerance < 0.0:
+        return empty
+    lo, hi = RadiossMeshTools.bounding_box(coords)
+    if cell_size is None:
+        # 節点間隔の半分程度: 1セルにほぼ1節点で、境界付近の節点も少ない
+        cell_size = RadiossSpatialIndex.default_cell_size(coords) / 4.0
+    cell_size = max(float(cell_size), 2.0 * tolerance * (1.0 + 1.0e-6),
+                    float((hi - lo).max()) / 1.0e6, 1.0e-300)
+    # 格子状に並んだ節点がセル境界に揃わないよう、原点を半端な量ずらす
+    scaled = (coords - lo) / cell_size + 0.381966
+    cells = np.floor(scaled)
+    fraction = scaled - cells
+    margin = tolerance / cell_size * (1.0 + 1.0e-9)
+    near = (fraction <= margin) | (fraction >= 1.0 - margin)
+    cells = cells.astype(np.int64)
+    dims = cells.max(axis=0) + 2
+
+    firsts, seconds = [], []
+    for shift in product((False, True), repeat=3):
+        shift = np.array(shift)
+        if shift.any():
+            # ずらした軸のすべてでセル境界の近くにある節点だけ
+            rows = np.flatnonzero(near[:, shift].all(axis=1))
+            if len(rows) < 2:
+                continue
+            ijk = np.floor(scaled[rows] + 0.5 * shift).astype(np.int64)
+        else:
+            rows = np.arange(len(coords), dtype=np.int64)
+            ijk = cells
+        keys = (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+        first, second = _same_cell_pairs(rows, keys)
+        firsts.append(first)
+        seconds.append(second)
+
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    distance = RadiossMeshTools._norm(coords[second] - coords[first])
+    close = distance <= tolerance
+    first, second, distance = first[close], second[close], distance[close]
+    if not len(first):
+        return empty
+    _, keep = np.unique(first * len(coords) + second, return_index=True)
+    return first[keep], second[keep], distance[keep]
+
+
+def representatives(first, second):
+    """組でつながった行のグループ -> (行, グループ内の最小行)"""
+    rows = np.unique(np.concatenate([first, second]))
+    a = np.searchsorted(rows, first)
+    b = np.searchsorted(rows, second)
+    label = np.arange(len(rows))
+    while True:
+        low = np.minimum(label[a], label[b])
+        if np.array_equal(label[a], low) and np.array_equal(label[b], low):
+            break
+        np.minimum.at(label, a, low)
+        np.minimum.at(label, b, low)
+        label = label[label]
+    return rows, rows[label]
+
+
+def find_coincident(ids, coords, tolerance):
+    """一致節点の検出 -> 結果（組のID・距離と併合用のNodeMap）
+
+    idsは昇順であること（グループ内の最小行が最小IDになる）。
+    """
+    first, second, distance = coincident_pairs(coords, tolerance)
+    rows, reps = representatives(first, second)
+    moved = rows != reps
+    return SimpleNamespace(first=ids[first], second=ids[second], distance=distance,
+                           tolerance=tolerance, node_map=NodeMap(ids[rows[moved]], ids[reps[moved]]))
+
+
+def merge_elements(elements, node_map):
+    """要素（id -> 節点リストを持つオブジェクト）の節点IDを置き換え
+
+    -> (変更した要素数, 異なる節点の数が減った要素のID)
+    """
+    if not len(node_map) or not elements:
+        return 0, []
+    keys = list(elements)
+    counts = np.fromiter((len(elements[k].nodes) for k in keys), dtype=np.int64, count=len(keys))
+    flat = np.fromiter(chain.from_iterable(elements[k].nodes for k in keys), dtype=np.int64,
+                       count=int(counts.sum()))
+    hit = RadiossSets.sorted_isin(flat, node_map.old)
+    owners = np.unique(np.repeat(np.arange(len(keys)), counts)[hit])
+    mapped = node_map.apply(flat)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    collapsed = []
+    # 置き換えが必要な要素だけリストを作り直す
+    for index in owners.tolist():
+        elem = elements[keys[index]]
+        before = set(elem.nodes)
+        elem.nodes = mapped[offsets[index]:offsets[index + 1]].tolist()
+        if len(set(elem.nodes)) < len(before):
+            collapsed.append(keys[index])
+    return len(owners), collapsed
+
+
+def merge_model(model_data, node_map):
+    """解析データの節点を併合（要素・結合要素・セット・境界条件・荷重のIDも置き換え）"""
+    for node_id in node_map.old.tolist():
+        model_data.nodes.pop(node_id, None)
+    changed, collapsed = merge_elements(model_data.elements, node_map)
+
+    for table in getattr(model_data, 'connectors', {}).values():
+        if len(table):
+            table.nodes = node_map.apply(table.nodes)
+    for set_data in getattr(model_data, 'sets', []):
+        if set_data.type.upper() in ('NODE', 'GRNOD'):
+            set_data.members = RadiossSets.IdSet(node_map.apply(set_data.members.ids))
+    node_sets = getattr(model_data, 'node_sets', {})
+    for set_id, members in node_sets.items():
+        node_sets[set_id] = np.unique(node_map.apply(members))
+    for name in ('constraints', 'boundary_conditions', 'loads'):
+        for item in getattr(model_data, name, []):
+            if getattr(item, 'nodes', None):
+                item.nodes = list(dict.fromkeys(node_map.apply(item.nodes).tolist()))
+    return changed, collapsed
+
+
+def _listing(values):
+    text = ", ".join(values[:REPORT_LIMIT])
+    return text + (", ..." if len(values) > REPORT_LIMIT else "")
+
+
+def report(duplicate_ids, result, merged=None):
+    """検出結果をコンソールに出力"""
+    if len(duplicate_ids):
+        FreeCAD.Console.PrintWarning(
+            f"{len(duplicate_ids)} node ids defined more than once (last definition kept): "
+            f"{_listing([str(i) for i in duplicate_ids.tolist()])}\n")
+    if result is not None and len(result.first):
+        FreeCAD.Console.PrintWarning(
+            f"{len(result.first)} coincident node pairs within {result.tolerance:g}: "
+            f"{_listing([f'{a}-{b} ({d:.3g})' for a, b, d in zip(result.first.tolist(), result.second.tolist(), result.distance.tolist())])}\n")
+    if merged is not None:
+        changed, collapsed = merged
+        FreeCAD.Console.PrintMessage(
+            f"Merged {len(result.node_map)} nodes into {len(np.unique(result.node_map.new))}, "
+            f"{changed} elements updated\n")
+        if collapsed:
+            FreeCAD.Console.PrintWarning(
+                f"{len(collapsed)} elements lost a node by merging: "
+                f"{_listing([str(i) for i in collapsed])}\n")
+
+
+def check_model(model_data, arrays=None, context=None):
+    """重複ID・一致節点を調べて報告し、設定がMergeなら併合する -> 結果（Offならなし）
+
+    arrays: (節点ID, 座標)。省略すればmodel_data.nodesから作る（パイプライン
+    インポートでは節点の辞書が無いので配列を渡す。その場合は報告のみ）。
+    報告のみの場合、一致節点はノードセットCoincidentNodesにまとめる。
+    """
+    mode, tolerance = settings()
+    if mode == 'Off':
+        return None
+    if context is not None:
+        context.report("Checking nodes")
+    duplicates = np.unique(np.asarray(getattr(model_data, 'duplicate_node_ids', []), dtype=np.int64))
+    if arrays is None:
+        arrays = node_arrays(model_data.nodes)
+    ids, coords = arrays
+    order = np.argsort(ids, kind='stable')
+    if np.any(order != np.arange(len(ids))):
+        ids, coords = ids[order], coords[order]
+    last = np.concatenate([ids[1:] != ids[:-1], [True]])
+    if not last.all():
+        # 重複IDは最後の定義だけ残す（パーサー・FemMeshと同じ）
+        duplicates = np.union1d(duplicates, ids[:-1][~last[:-1]])
+        ids, coords = ids[last], coords[last]
+    result = find_coincident(ids, coords, tolerance)
+
+    merged = None
+    if mode == 'Merge' and model_data.nodes and len(result.node_map):
+        merged = merge_model(model_data, result.node_map)
+    elif len(result.first) and hasattr(model_data, 'sets'):
+        model_data.sets.append(SimpleNamespace(
+            name="CoincidentNodes", type="NODE",
+            members=RadiossSets.IdSet(np.concatenate([result.first, result.second]))))
+    report(duplicates, result, merged)
+    model_data.node_check = result
+    return result
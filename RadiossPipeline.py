@@ -0,0 +1,272 @@
+"""読み込み・解析・FemMesh構築を並行させるRadiossインポートのパイプライン
+
+読み込みスレッドがセクション単位のデータ行ブロックをキューに流し、
+節点・要素のブロックはワーカー（プロセスまたはスレッド）で配列に変換する。
+呼び出し側のスレッドは完了したブロックから順にFemMeshへ追加する。
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import FreeCAD
+import Fem
+import numpy as np
+
+import RadiossBlocks
+import RadiossMeshTools
+import RadiossSets
+import RadiossTasks
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+
+class BlockReader(threading.Thread):
+    """ファイルを読み、(セクションヘッダー, データ行)のブロックをキューに送る"""
+    def __init__(self, filepath, out_queue, stop_event, block_lines=50000):
+        super().__init__(daemon=True)
+        self.filepath = filepath
+        self.queue = out_queue
+        self.stop_event = stop_event
+        self.block_lines = block_lines
+        self.bytes_read = 0
+        self.error = None
+
+    def put(self, item):
+        """キューが空くまで待つ（停止要求があれば中断）"""
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self):
+        try:
+            header = None
+            lines = []
+            with open(self.filepath, 'r') as f:
+                for line in f:
+                    self.bytes_read += len(line)
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    if line.startswith('/'):
+                        if header is not None and not self.put((header, lines)):
+                            return
+                        header, lines = line, []
+                        continue
+                    lines.append(line)
+                    if len(lines) >= self.block_lines and RadiossBlocks.bulk_kind(header):
+                        if not self.put((header, lines)):
+                            return
+                        lines = []
+            if header is not None:
+                self.put((header, lines))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.put(None)
+
+
+class SortedIds:
+    """追加済みIDの集合（昇順の配列の列）
+
+    IDの最大値に比例するビットマップは使わない（IDが1e9程度でも節点数分のメモリ）。
+    新しい配列が直前の配列以上の長さになったら併合するので、配列の数はlog(n)程度、
+    併合の合計はO(n log n)。
+    """
+    def __init__(self):
+        self.runs = []
+
+    def add(self, ids):
+        run = np.unique(ids)
+        while self.runs and len(self.runs[-1]) <= len(run):
+            run = np.union1d(self.runs.pop(), run)
+        self.runs.append(run)
+
+    def contains(self, ids):
+        found = np.zeros(np.shape(ids), dtype=bool)
+        for run in self.runs:
+            found |= RadiossSets.sorted_isin(ids, run)
+        return found
+
+
+class MeshBuilder:
+    """配列化された節点・要素ブロックを順次FemMeshに追加"""
+    def __init__(self, keep_nodes=False):
+        self.mesh = Fem.FemMesh()
+        self.present = SortedIds()  # 追加済み節点ID
+        self.duplicate_ids = []  # 2回以上現れた節点IDの配列
+        self.node_blocks = [] if keep_nodes else None  # 重複節点の検査用の(ID, 座標)
+        self.deferred = []
+        self.elem_ids = []
+        self.elem_types = []
+        self.elem_parts = []
+        self.node_count = 0
+        self.element_count = 0
+
+    def add_nodes(self, ids, coords):
+        if len(ids) == 0:
+            return
+        repeated = ids[self.present.contains(ids)]
+        if not np.all(ids[1:] > ids[:-1]):
+            ordered = np.sort(ids)
+            repeated = np.concatenate([repeated, ordered[1:][ordered[1:] == ordered[:-1]]])
+        if len(repeated):
+            self.duplicate_ids.append(repeated)
+        if self.node_blocks is not None:
+            self.node_blocks.append((ids, coords))
+        for node_id, (x, y, z) in zip(ids.tolist(), coords.tolist()):
+            try:
+                self.mesh.addNode(x, y, z, node_id)
+            except Exception as e:
+                FreeCAD.Console.PrintError(f"Error adding node {node_id}: {str(e)}\n")
+        self.present.add(ids)
+        self.node_count += len(ids)
+
+    def add_elements(self, elem_type, part_id, ids, conn):
+        self.elem_ids.append(ids)
+        self.elem_types.append(np.full(len(ids), elem_type))
+        self.elem_parts.append(np.full(len(ids), part_id or 0, dtype=np.int64))
+        # 節点が揃っていない要素は最後に回す
+        ready = np.all(self.present.contains(conn) | (conn < 0), axis=1)
+        add = self.add_volumes if elem_type == 'SOLID' else self.add_faces
+        if not ready.all():
+            self.deferred.append((add, ids[~ready], conn[~ready]))
+        add(ids[ready], conn[ready])
+
+    def add_faces(self, ids, conn):
+        for elem_id, nodes in zip(ids.tolist(), conn.tolist()):
+            nodes = [n for n in nodes if n >= 0]
+            if len(nodes) < 3:
+                continue
+            try:
+                self.mesh.addFace(nodes, elem_id)
+                self.element_count += 1
+            except Exception as e:
+                FreeCAD.Console.PrintError(f"Error adding element {elem_id}: {str(e)}\n")
+
+    def add_volumes(self, ids, conn):
+        for elem_id, nodes in zip(ids.tolist(), conn.tolist()):
+            nodes = RadiossMeshTools.volume_nodes(nodes)
+            if nodes is None:
+                continue
+            try:
+                self.mesh.addVolume(nodes, elem_id)
+                self.element_count += 1
+            except Exception as e:
+                FreeCAD.Console.PrintError(f"Error adding element {elem_id}: {str(e)}\n")
+
+    def finish(self):
+        """保留していた要素を追加し、要素のID・タイプ・パート配列を返す"""
+        for add, ids, conn in self.deferred:
+            add(ids, conn)
+        self.deferred = []
+        if not self.elem_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=str), np.empty(0, dtype=np.int64)
+        return (np.concatenate(self.elem_ids), np.concatenate(self.elem_types),
+                np.concatenate(self.elem_parts))
+
+    def node_arrays(self):
+        """保持した節点ブロック -> (ID, 座標)（keep_nodesのときのみ）"""
+        if not self.node_blocks:
+            return np.empty(0, dtype=np.int64), np.empty((0, 3))
+        return (np.concatenate([ids for ids, _ in self.node_blocks]),
+                np.concatenate([coords for _, coords in self.node_blocks]))
+
+
+def make_executor(workers):
+    """デコード用のエグゼキューター（プロセスが使えない場合はスレッド）"""
+    if workers > 0:
+        # FreeCAD本体ではなく同梱のPythonでワーカーを起動する
+        exe_dir = os.path.dirname(sys.executable)
+        for name in ('python', 'python3', 'python.exe'):
+            python = os.path.join(exe_dir, name)
+            if os.path.isfile(python):
+                context = multiprocessing.get_context('spawn')
+                context.set_executable(python)
+                return ProcessPoolExecutor(workers, mp_context=context)
+        FreeCAD.Console.PrintLog("No Python executable found for worker processes, using a thread\n")
+    return ThreadPoolExecutor(1)
+
+
+def default_workers():
+    return FreeCAD.ParamGet(PARAMS).GetInt("PipelineWorkers", max(1, min(4, (os.cpu_count() or 2) - 1)))
+
+
+def run_import(filepath, parser, workers=None, context=None, keep_nodes=False):
+    """パイプラインでファイルを読み込み、(FemMesh, 要素ID, 要素タイプ, 要素パート)を返す
+
+    節点・要素以外のセクションはparserに渡して逐次解析する。
+    contextには読み込みバイト数と節点・要素数を報告する。
+    重複した節点IDはparser.duplicate_node_idsに追加し、keep_nodesなら全節点の
+    (ID, 座標)をparser.node_arraysに残す。
+    """
+    if workers is None:
+        workers = default_workers()
+    if context is None:
+        context = RadiossTasks.TaskContext(os.path.getsize(filepath))
+    total = os.path.getsize(filepath)
+    blocks = queue.Queue(maxsize=4 * max(workers, 1))
+    stop_event = threading.Event()
+    reader = BlockReader(filepath, blocks, stop_event)
+    builder = MeshBuilder(keep_nodes)
+    pending = deque()
+
+    def build_finished(wait):
+        while pending and (wait or pending[0][3].done()):
+            kind, part_id, _, future = pending.popleft()
+            ids, values = future.result()
+            if kind == 'NODE':
+                builder.add_nodes(ids, values)
+            else:
+                builder.add_elements(kind, part_id, ids, values)
+        context.report("Importing", bytes=reader.bytes_read, nodes=builder.node_count,
+                       elements=builder.element_count)
+
+    start = time.perf_counter()
+    executor = make_executor(workers)
+    try:
+        reader.start()
+        while True:
+            try:
+                item = blocks.get(timeout=0.05)
+            except queue.Empty:
+                build_finished(False)
+                continue
+            if item is None:
+                break
+            header, lines = item
+            bulk = RadiossBlocks.bulk_kind(header)
+            if bulk:
+                kind, width = bulk
+                part_id = RadiossBlocks.header_id(header) if kind != 'NODE' else None
+                pending.append((kind, part_id, len(lines),
+                                executor.submit(RadiossBlocks.decode_block, kind, width, lines)))
+            else:
+                parser.parse_section_lines(header, lines)
+            build_finished(False)
+        build_finished(True)
+        if reader.error:
+            raise reader.error
+        elem_ids, elem_types, elem_parts = builder.finish()
+        parser.duplicate_node_ids.extend(np.concatenate(builder.duplicate_ids).tolist()
+                                         if builder.duplicate_ids else [])
+        if keep_nodes:
+            parser.node_arrays = builder.node_arrays()
+    finally:
+        stop_event.set()
+        executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    FreeCAD.Console.PrintMessage(
+        f"Pipelined import: {total / 1.0e6:.1f} MB in {elapsed:.2f} s "
+        f"({total / 1.0e6 / max(elapsed, 1.0e-9):.1f} MB/s), "
+        f"{builder.node_count} nodes, {builder.element_count} elements\n")
+    return builder.mesh, elem_ids, elem_types, elem_parts
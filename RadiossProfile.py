@@ -0,0 +1,239 @@
+"""インポート・エクスポートの段階ごとの計測（時間・メモリ・cProfile）
+
+コマンドの開始時にbegin()で計測を始め、各段階をstage()で囲む。計測して
+いないときstage()は何もしないので、処理の中に置いたままでよい。
+終了時（finish）に段階ごとの表をレポートビューに出し、同じ内容をJSONで保存する。
+
+設定（Mod/Radioss）:
+    ProfileCommands   計測するか（既定: しない）
+    ProfileMemory     "tracemalloc"（Pythonの確保量とピーク）/ "rss" / "off"
+    ProfileCProfile   cProfileも実行して.profと上位の関数を出力
+    ProfileDirectory  出力先（既定: ユーザーデータのRadiossProfiles）
+"""
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import FreeCAD
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# 実行中の計測（同時に走るコマンドは1つ）
+_active = None
+_lock = threading.Lock()
+
+
+def current_rss():
+    """現在の常駐メモリ（バイト）。/procが無い環境では最大常駐メモリ"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Stage:
+    """1段階の計測値"""
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.memory_delta = None
+        self.memory_peak = None
+        self.thread = threading.current_thread().name
+
+    def record(self):
+        return {'name': self.name, 'depth': self.depth, 'seconds': self.seconds,
+                'cpu_seconds': self.cpu_seconds, 'memory_delta': self.memory_delta,
+                'memory_peak': self.memory_peak, 'thread': self.thread}
+
+
+class Profiler:
+    """1回のコマンド実行の計測"""
+    def __init__(self, command, path=None, memory="tracemalloc", use_cprofile=False, directory=None):
+        self.command = command
+        self.path = path
+        self.memory = memory
+        self.directory = directory
+        self.stages = []
+        self.open_stages = []
+        self.status = "done"
+        self.finished = False
+        self.started = datetime.datetime.now()
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.profile = cProfile.Profile() if use_cprofile else None
+        self.started_tracemalloc = False
+        if memory == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def _memory(self):
+        if self.memory == "tracemalloc" and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()
+        if self.memory == "rss":
+            rss = current_rss()
+            return (rss, rss) if rss is not None else None
+        return None
+
+    @contextmanager
+    def stage(self, name):
+        """段階の時間とメモリを計測（入れ子にできる）"""
+        record = Stage(name, len(self.open_stages))
+        self.stages.append(record)
+        parent = self.open_stages[-1] if self.open_stages else None
+        before = self._memory()
+        if before is not None and self.memory == "tracemalloc":
+            # 親のピークを確定させてから、この段階のピークを測り直す
+            if parent is not None:
+                parent.memory_peak = max(parent.memory_peak or 0, before[1])
+            tracemalloc.reset_peak()
+        profiling = self.profile is not None and parent is None
+        if profiling:
+            self.profile.enable()
+        self.open_stages.append(record)
+        start, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            record.cpu_seconds = time.thread_time() - cpu
+            self.open_stages.pop()
+            if profiling:
+                self.profile.disable()
+            after = self._memory()
+            if before is not None and after is not None:
+                record.memory_delta = after[0] - before[0]
+                record.memory_peak = max(record.memory_peak or 0, after[1])
+                if parent is not None:
+                    parent.memory_peak = max(parent.memory_peak or 0, record.memory_peak)
+
+    def top_functions(self, count=15):
+        """cProfileの累積時間の上位 [(関数, 呼び出し回数, 自身の時間, 累積時間)]"""
+        if self.profile is None:
+            return []
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append((f"{os.path.basename(filename)}:{line}({function})", calls, total, cumulative))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows[:count]
+
+    def record(self):
+        return {
+            'command': self.command,
+            'path': self.path,
+            'file_bytes': os.path.getsize(self.path) if self.path and os.path.exists(self.path) else None,
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': self.seconds,
+            'status': self.status,
+            'memory': self.memory,
+            'stages': [stage.record() for stage in self.stages],
+            'top_functions': [{'function': f, 'calls': c, 'seconds': t, 'cumulative_seconds': cum}
+                              for f, c, t, cum in self.top_functions()],
+        }
+
+    def format_table(self):
+        """レポートビュー用の段階ごとの表"""
+        total = max(self.seconds or 0.0, 1.0e-9)
+        name = os.path.basename(self.path) if self.path else ""
+        lines = [f"{self.command} {name}: {total:.2f} s ({self.status})",
+                 f"{'Stage':<32}{'Time [s]':>10}{'%':>7}{'CPU [s]':>10}{'Peak [MB]':>11}{'Delta [MB]':>12}"]
+        for stage in self.stages:
+            label = "  " * stage.depth + stage.name
+            peak = "" if stage.memory_peak is None else f"{stage.memory_peak / 1.0e6:.1f}"
+            delta = "" if stage.memory_delta is None else f"{stage.memory_delta / 1.0e6:+.1f}"
+            lines.append(f"{label:<32}{stage.seconds:>10.3f}{100.0 * stage.seconds / total:>7.1f}"
+                         f"{stage.cpu_seconds:>10.3f}{peak:>11}{delta:>12}")
+        functions = self.top_functions(10)
+        if functions:
+            lines.append(f"{'Function':<60}{'Calls':>10}{'Self [s]':>10}{'Cum. [s]':>10}")
+            for function, calls, seconds, cumulative in functions:
+                lines.append(f"{function[-60:]:<60}{calls:>10}{seconds:>10.3f}{cumulative:>10.3f}")
+        return "\n".join(lines) + "\n"
+
+    def output_base(self):
+        directory = self.directory or os.path.join(FreeCAD.getUserAppDataDir(), "RadiossProfiles")
+        os.makedirs(directory, exist_ok=True)
+        slug = self.command.lower().replace(" ", "_")
+        return os.path.join(directory, f"{slug}_{self.started.strftime('%Y%m%d_%H%M%S')}")
+
+    def finish(self, status=None):
+        """計測を終えて表とJSON（cProfileがあれば.profも）を出力 -> JSONのパス"""
+        global _active
+        with _lock:
+            if self.finished:
+                return None
+            self.finished = True
+            if _active is self:
+                _active = None
+        if status is not None:
+            self.status = status
+        self.seconds = time.perf_counter() - self.start
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        FreeCAD.Console.PrintMessage(self.format_table())
+        try:
+            base = self.output_base()
+            with open(base + ".json", 'w') as f:
+                json.dump(self.record(), f, indent=1)
+            if self.profile is not None:
+                self.profile.dump_stats(base + ".prof")
+            FreeCAD.Console.PrintLog(f"Profile written to {base}.json\n")
+            return base + ".json"
+        except OSError as e:
+            FreeCAD.Console.PrintWarning(f"Could not write profile: {str(e)}\n")
+            return None
+
+
+def enabled():
+    return FreeCAD.ParamGet(PARAMS).GetBool("ProfileCommands", False)
+
+
+def begin(command, path=None):
+    """設定で計測が有効なら計測を始める -> Profiler（無効ならNone）"""
+    global _active
+    if not enabled():
+        return None
+    params = FreeCAD.ParamGet(PARAMS)
+    profiler = Profiler(command, path,
+                        memory=params.GetString("ProfileMemory", "tracemalloc"),
+                        use_cprofile=params.GetBool("ProfileCProfile", False),
+                        directory=params.GetString("ProfileDirectory", "") or None)
+    with _lock:
+        previous, _active = _active, profiler
+    if previous is not None:
+        previous.finish("interrupted")
+    return profiler
+
+
+@contextmanager
+def stage(name):
+    """実行中の計測があれば段階として計測（無ければ何もしない）"""
+    profiler = _active
+    if profiler is None:
+        yield None
+        return
+    with profiler.stage(name) as record:
+        yield record
+
+
+def finish(profiler, status=None):
+    if profiler is not None:
+        return profiler.finish(status)
+    return None
@@ -0,0 +1,327 @@
+"""メッシュ品質のチェック（アスペクト比・ワーページ・スキュー・ヤコビアン・最小長さ）
+
+すべての指標は接続配列と座標配列の一括演算で計算する。
+シェル（SHELL/SH3N）は要素そのもの、ソリッド（BRICK/TETRA）は辺・面・頂点から求める。
+結果はメッシュ内容のハッシュごとにキャッシュする。
+"""
+import hashlib
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossModel
+import RadiossMeshTools
+from RadiossMeshTools import HEXA_FACES, TETRA_FACES, _norm
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# 一度に計算する要素数（中間配列のメモリを抑える）
+CHUNK = 500000
+
+HEXA_EDGES = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6],
+                       [6, 7], [7, 4], [0, 4], [1, 5], [2, 6], [3, 7]])
+TETRA_EDGES = np.array([[0, 1], [1, 2], [2, 0], [0, 3], [1, 3], [2, 3]])
+# 6面体の各頂点から出る3辺（右手系で行列式が正になる順）
+HEXA_CORNERS = np.array([[0, 1, 3, 4], [1, 2, 0, 5], [2, 3, 1, 6], [3, 0, 2, 7],
+                         [4, 7, 5, 0], [5, 4, 6, 1], [6, 5, 7, 2], [7, 6, 4, 3]])
+
+# (名前, 表示名, 悪い方向, 既定のしきい値)
+METRICS = (
+    ('aspect', 'Aspect ratio', 'max', 5.0),
+    ('warpage', 'Warpage (deg)', 'max', 10.0),
+    ('skew', 'Skew (deg)', 'max', 60.0),
+    ('jacobian', 'Jacobian', 'min', 0.6),
+    ('length', 'Min length', 'min', 0.0),
+)
+
+_cache = OrderedDict()
+_CACHE_SIZE = 8
+
+
+def _line_angles(u, v):
+    """2直線のなす角（0～90度）"""
+    cosine = np.abs(np.einsum('...i,...i->...', u, v)) / np.maximum(_norm(u) * _norm(v), 1.0e-300)
+    return np.degrees(np.arccos(np.clip(cosine, 0.0, 1.0)))
+
+
+def _normal_angles(u, v):
+    """2つの法線のなす角（0～180度）"""
+    cosine = np.einsum('...i,...i->...', u, v) / np.maximum(_norm(u) * _norm(v), 1.0e-300)
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def _edge_aspect(points, edges, valid=None):
+    """最長辺/最短辺（validがFalseの辺は除く）"""
+    lengths = _norm(points[..., edges[:, 1], :] - points[..., edges[:, 0], :])
+    if valid is None:
+        valid = np.ones(lengths.shape, dtype=bool)
+    longest = np.where(valid, lengths, -np.inf).max(axis=-1)
+    shortest = np.where(valid, lengths, np.inf).min(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(shortest > 0.0, longest / shortest, np.inf)
+
+
+def face_metrics(points, tri):
+    """4角形/3角形の面のワーページ・スキュー・ヤコビアン points: (..., 4, 3)
+
+    3角形は4番目の点が3番目と同じで、ワーページ0、ヤコビアン1とする。
+    """
+    p0, p1, p2, p3 = (points[..., k, :] for k in range(4))
+    # ワーページ: 2本の対角線それぞれで分割した3角形の法線のなす角の大きい方
+    warpage = np.maximum(
+        _normal_angles(np.cross(p1 - p0, p2 - p0), np.cross(p2 - p0, p3 - p0)),
+        _normal_angles(np.cross(p1 - p0, p3 - p0), np.cross(p2 - p1, p3 - p1)))
+
+    # スキュー: 4角形は対辺の中点を結ぶ2直線、3角形は中線と対辺のなす角の90度からのずれ
+    quad_skew = 90.0 - _line_angles((p2 + p3) - (p0 + p1), (p3 + p0) - (p1 + p2))
+    medians = np.stack([(p1 + p2) * 0.5 - p0, (p2 + p0) * 0.5 - p1, (p0 + p1) * 0.5 - p2], axis=-2)
+    opposite = np.stack([p2 - p1, p0 - p2, p1 - p0], axis=-2)
+    tri_skew = 90.0 - _line_angles(medians, opposite).min(axis=-1)
+
+    # ヤコビアン: 頂点での行列式（面の法線方向）の最小/最大
+    normal = np.cross(p2 - p0, p3 - p1)
+    corners = np.stack([p0, p1, p2, p3], axis=-2)
+    det = np.einsum('...i,...ki->...k', normal,
+                    np.cross(np.roll(corners, -1, axis=-2) - corners,
+                             np.roll(corners, 1, axis=-2) - corners))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jacobian = det.min(axis=-1) / np.abs(det).max(axis=-1)
+    return SimpleNamespace(
+        warpage=np.where(tri, 0.0, warpage),
+        skew=np.where(tri, tri_skew, quad_skew),
+        jacobian=np.where(tri, 1.0, np.nan_to_num(jacobian, nan=0.0)),
+    )
+
+
+def shell_quality(coords, shells):
+    """シェル要素の品質指標"""
+    conn, tri = RadiossMeshTools.closed_shells(shells)
+    points = coords[conn]
+    # 3角形の3番目の辺（3番目と4番目の点の間）は長さ0なので除く
+    valid = np.ones((len(conn), 4), dtype=bool)
+    valid[tri, 2] = False
+    quality = face_metrics(points, tri)
+    quality.aspect = _edge_aspect(points, np.array([[0, 1], [1, 2], [2, 3], [3, 0]]), valid)
+    quality.length = RadiossMeshTools.shell_geometry(coords, shells).length
+    quality.triangle = tri
+    return quality
+
+
+def solid_quality(coords, solids):
+    """ソリッド要素の品質指標（面の指標は6面の最悪値）"""
+    count = len(solids)
+    quality = SimpleNamespace(**{name: np.zeros(count) for name, *_ in METRICS})
+    tetra = solids[:, 4] < 0 if count else np.zeros(0, dtype=bool)
+    quality.tetra = tetra
+
+    hexa = ~tetra
+    if hexa.any():
+        points = coords[solids[hexa]]
+        faces = face_metrics(points[:, HEXA_FACES], np.zeros((1, 6), dtype=bool))
+        quality.aspect[hexa] = _edge_aspect(points, HEXA_EDGES)
+        quality.warpage[hexa] = faces.warpage.max(axis=1)
+        quality.skew[hexa] = faces.skew.max(axis=1)
+        edges = points[:, HEXA_CORNERS[:, 1:]] - points[:, HEXA_CORNERS[:, :1]]
+        det = np.einsum('nki,nki->nk', edges[:, :, 0], np.cross(edges[:, :, 1], edges[:, :, 2]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quality.jacobian[hexa] = np.nan_to_num(det.min(axis=1) / np.abs(det).max(axis=1), nan=0.0)
+    if tetra.any():
+        points = coords[solids[tetra][:, :4]]
+        faces = face_metrics(points[:, TETRA_FACES], np.ones((1, 4), dtype=bool))
+        quality.aspect[tetra] = _edge_aspect(points, TETRA_EDGES)
+        quality.skew[tetra] = faces.skew.max(axis=1)
+        # 4面体のヤコビアンは一定（裏返っていれば-1）。節点1-2-3が節点4から見て
+        # 反時計回りの向きでtetra_volumesは負になる
+        volume = RadiossMeshTools.tetra_volumes(points[:, 0], points[:, 1], points[:, 2], points[:, 3])
+        quality.jacobian[tetra] = np.where(volume > 0.0, -1.0, 1.0)
+    quality.length = RadiossMeshTools.solid_geometry(coords, solids).length
+    return quality
+
+
+def _chunked(function, coords, conn):
+    """要素をCHUNKごとに分けて計算し、結果を連結"""
+    parts = [function(coords, conn[start:start + CHUNK]) for start in range(0, max(len(conn), 1), CHUNK)]
+    return SimpleNamespace(**{name: np.concatenate([vars(p)[name] for p in parts])
+                              for name in vars(parts[0])})
+
+
+def content_hash(arrays):
+    """節点座標と接続配列のハッシュ"""
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (arrays.node_ids, arrays.coords, arrays.shell_ids, arrays.shells,
+                   arrays.solid_ids, arrays.solids):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def element_quality(arrays):
+    """全シェル・ソリッド要素の品質指標（メッシュ内容ごとにキャッシュ）"""
+    key = content_hash(arrays)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    shell = _chunked(shell_quality, arrays.coords, arrays.shells)
+    solid = _chunked(solid_quality, arrays.coords, arrays.solids)
+    quality = SimpleNamespace(
+        ids=np.concatenate([arrays.shell_ids, arrays.solid_ids]),
+        kinds=np.concatenate([np.where(shell.triangle, 'SH3N', 'SHELL'),
+                              np.where(solid.tetra, 'TETRA', 'BRICK')]),
+        triangle_count=int(shell.triangle.sum()),
+        tetra_count=int(solid.tetra.sum()),
+        shell_count=len(arrays.shell_ids),
+        solid_count=len(arrays.solid_ids),
+    )
+    for name, *_ in METRICS:
+        setattr(quality, name, np.concatenate([getattr(shell, name), getattr(solid, name)]))
+
+    _cache[key] = quality
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return quality
+
+
+def thresholds():
+    """しきい値（設定で変更可能）"""
+    params = FreeCAD.ParamGet(PARAMS)
+    return {name: params.GetFloat(f"Quality{name.capitalize()}", default)
+            for name, _, _, default in METRICS}
+
+
+def failures(quality, limits):
+    """指標ごとのしきい値を超える要素のマスク（長さのしきい値0はチェックしない）"""
+    result = {}
+    for name, _, worse, _ in METRICS:
+        values = getattr(quality, name)
+        if worse == 'max':
+            result[name] = ~(values <= limits[name])
+        elif limits[name] > 0.0 or name == 'jacobian':
+            result[name] = ~(values >= limits[name])
+        else:
+            result[name] = np.zeros(len(values), dtype=bool)
+    return result
+
+
+def worst_elements(values, worse, count):
+    """悪い順にcount個の要素の行番号"""
+    order = np.argsort(-values if worse == 'max' else values, kind='stable')
+    return order[:count]
+
+
+def check(analysis, worst=10):
+    """解析内の全メッシュの品質をチェック"""
+    return check_arrays([RadiossModel.mesh_arrays(obj) for obj in RadiossModel.mesh_objects(analysis)], worst)
+
+
+def check_arrays(mesh_arrays, worst=10):
+    """メッシュごとの配列（femmesh_arraysの形）の品質をチェック（ワーカースレッドから呼べる）"""
+    qualities = [element_quality(arrays) for arrays in mesh_arrays]
+    if not qualities or not sum(len(q.ids) for q in qualities):
+        return None
+
+    quality = SimpleNamespace(
+        ids=np.concatenate([q.ids for q in qualities]),
+        kinds=np.concatenate([q.kinds for q in qualities]),
+    )
+    for name, *_ in METRICS:
+        setattr(quality, name, np.concatenate([getattr(q, name) for q in qualities]))
+    limits = thresholds()
+    failed = failures(quality, limits)
+
+    summary = []
+    for name, label, worse, _ in METRICS:
+        values = getattr(quality, name)
+        rows = worst_elements(values, worse, worst)
+        bad = failed[name]
+        failed_order = worst_elements(values[bad], worse, int(bad.sum()))
+        summary.append(SimpleNamespace(
+            name=name, label=label, worse=worse, limit=limits[name],
+            failed=int(bad.sum()), worst_value=float(values[rows[0]]),
+            worst_ids=quality.ids[rows], worst_values=values[rows],
+            failed_ids=quality.ids[bad][failed_order], failed_values=values[bad][failed_order]))
+
+    shells = sum(q.shell_count for q in qualities)
+    solids = sum(q.solid_count for q in qualities)
+    triangles = sum(q.triangle_count for q in qualities)
+    tetras = sum(q.tetra_count for q in qualities)
+    return SimpleNamespace(
+        element_count=len(quality.ids),
+        tria_percent=100.0 * triangles / shells if shells else 0.0,
+        tetra_percent=100.0 * tetras / solids if solids else 0.0,
+        any_failed=np.any(np.stack(list(failed.values())), axis=0),
+        metrics=summary,
+    )
+
+
+def format_report(result):
+    """品質チェックのテキストレポート"""
+    lines = [f"Mesh quality: {result.element_count} elements, "
+             f"{int(result.any_failed.sum())} failing at least one check",
+             f"Triangles: {result.tria_percent:.2f} % of shells, "
+             f"tetrahedra: {result.tetra_percent:.2f} % of solids",
+             f"{'Check':16s} {'Limit':>10s} {'Failed':>9s} {'Worst':>12s}"]
+    for metric in result.metrics:
+        sign = '<' if metric.worse == 'max' else '>'
+        lines.append(f"{metric.label:16s} {sign}{metric.limit:9.4g} {metric.failed:9d} "
+                     f"{metric.worst_value:12.5g}")
+    for metric in result.metrics:
+        if metric.failed:
+            shown = " ".join(f"{i}({v:.3g})" for i, v in zip(metric.failed_ids[:10].tolist(),
+                                                              metric.failed_values[:10].tolist()))
+            lines.append(f"Worst {metric.label}: {shown}{' ...' if metric.failed > 10 else ''}")
+    return "\n".join(lines) + "\n"
+
+
+def worst_count():
+    """最悪要素のセットに入れる要素数"""
+    return FreeCAD.ParamGet(PARAMS).GetInt("QualityWorstCount", 100)
+
+
+def update_worst_sets(analysis, result, count=None):
+    """指標ごとに最悪の要素の要素セット（Quality_<指標>）を作成・更新
+
+    しきい値を満たしていても悪い順にcount個（resultはcheck(analysis, count)で作る）。
+    """
+    if count is None:
+        count = worst_count()
+    existing = {obj.Name: obj for obj in analysis.Group if hasattr(obj, "SetType")}
+    sets = []
+    for metric in result.metrics:
+        name = f"Quality_{metric.name}"
+        members = metric.worst_ids[:count]
+        set_obj = existing.get(name)
+        if not len(members):
+            if set_obj is not None:
+                RadiossModel.store_members(set_obj, [])
+            continue
+        if set_obj is None:
+            set_obj = RadiossModel.make_set(analysis.Document, name, "ELEM", members)
+            analysis.addObject(set_obj)
+        else:
+            RadiossModel.store_members(set_obj, members)
+        sets.append(set_obj)
+    return sets
+
+
+def report(result):
+    """チェック結果をレポートビューに出力（不合格の要素があれば警告）"""
+    if result is None:
+        FreeCAD.Console.PrintWarning("No shell or solid elements to check\n")
+        return None
+    text = format_report(result)
+    if result.any_failed.any():
+        FreeCAD.Console.PrintWarning(text)
+    else:
+        FreeCAD.Console.PrintMessage(text)
+    return result
+
+
+def check_and_report(analysis, create_sets=True):
+    """品質をチェックしてレポートビューに出力し、create_setsなら最悪要素のセットを更新"""
+    count = worst_count()
+    result = report(check(analysis, max(10, count) if create_sets else 10))
+    if result is not None and create_sets:
+        update_worst_sets(analysis, result, count)
+    return result
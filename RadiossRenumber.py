@@ -0,0 +1,198 @@
+"""書き出し時の節点・要素IDの振り直し（詰め直しと帯幅を小さくする並べ替え）
+
+旧ID -> 新IDの対応はIdMapとして保持し、デッキと一緒に保存して
+結果を元のIDに戻すときに使う。並べ替えは次から選ぶ。
+  Compact: 旧IDの順に1から詰める
+  RCM: 要素の辺でつながる節点グラフの逆Cuthill-McKee順
+  Morton: 座標のZ曲線（空間充填曲線）順
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+import RadiossMeshTools
+from RadiossSpatialIndex import expand_ranges
+
+METHODS = ("Compact", "RCM", "Morton")
+
+# 要素の辺（4角形・6面体・4面体）
+QUAD_EDGES = np.array([[0, 1], [1, 2], [2, 3], [3, 0]])
+HEXA_EDGES = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6],
+                       [6, 7], [7, 4], [0, 4], [1, 5], [2, 6], [3, 7]])
+TETRA_EDGES = np.array([[0, 1], [1, 2], [2, 0], [0, 3], [1, 3], [2, 3]])
+
+
+class IdMap:
+    """旧ID <-> 新IDの対応"""
+    def __init__(self, old_ids, new_ids):
+        old_ids = np.asarray(old_ids, dtype=np.int64)
+        new_ids = np.asarray(new_ids, dtype=np.int64)
+        order = np.argsort(old_ids, kind='stable')
+        self.old = old_ids[order]
+        self.new = new_ids[order]
+
+    def __len__(self):
+        return len(self.old)
+
+    def to_new(self, ids):
+        """旧ID配列 -> 新ID配列（対応の無いIDと-1は-1）"""
+        ids = np.asarray(ids, dtype=np.int64)
+        result = np.full(ids.shape, -1, dtype=np.int64)
+        if len(self.old) == 0 or ids.size == 0:
+            return result
+        pos = np.clip(np.searchsorted(self.old, ids), 0, len(self.old) - 1)
+        found = self.old[pos] == ids
+        result[found] = self.new[pos[found]]
+        return result
+
+    def to_old(self, ids):
+        """新ID配列 -> 旧ID配列"""
+        inverse = IdMap(self.new, self.old)
+        return inverse.to_new(ids)
+
+
+def save_maps(path, nodes, elements):
+    """節点・要素のIdMapをnpzで保存"""
+    np.savez_compressed(path, node_old=nodes.old, node_new=nodes.new,
+                        elem_old=elements.old, elem_new=elements.new)
+
+
+def load_maps(path):
+    """save_mapsで保存した(節点IdMap, 要素IdMap)"""
+    with np.load(path) as data:
+        return (IdMap(data['node_old'], data['node_new']),
+                IdMap(data['elem_old'], data['elem_new']))
+
+
+def element_edges(arrays):
+    """シェル・ソリッド要素の辺（節点行番号の組、重複あり）"""
+    edges = []
+    if len(arrays.shells):
+        shells = RadiossMeshTools.closed_shells(arrays.shells)[0]
+        edges.append(shells[:, QUAD_EDGES].reshape(-1, 2))
+    if len(arrays.solids):
+        tetra = arrays.solids[:, 4] < 0
+        edges.append(arrays.solids[~tetra][:, HEXA_EDGES].reshape(-1, 2))
+        edges.append(arrays.solids[tetra][:, TETRA_EDGES].reshape(-1, 2))
+    if not edges:
+        return np.empty((0, 2), dtype=np.int64)
+    edges = np.concatenate(edges)
+    return edges[edges[:, 0] != edges[:, 1]]
+
+
+def adjacency(count, edges):
+    """無向グラフのCSR表現 -> (indptr, indices)"""
+    # 組を1つの整数にまとめ、ソートして重複を除く（行単位のuniqueより速い）
+    keys = np.sort(np.concatenate([edges[:, 0] * count + edges[:, 1],
+                                   edges[:, 1] * count + edges[:, 0]]))
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // count, minlength=count), out=indptr[1:])
+    return indptr, keys % count
+
+
+def rcm_order(count, edges):
+    """逆Cuthill-McKee順（節点行番号の並び）
+
+    幅優先探索はレベル単位でベクトル化する。各レベルの節点は
+    親の順、同じ親なら次数の小さい順に並べる。連結成分ごとに
+    最小次数の節点から始め、孤立節点は最後にまとめる。
+    """
+    indptr, indices = adjacency(count, edges)
+    degree = np.diff(indptr)
+    visited = degree == 0
+    levels = []
+    candidates = np.argsort(degree, kind='stable')
+    next_start = 0
+    while True:
+        while next_start < count and visited[candidates[next_start]]:
+            next_start += 1
+        if next_start >= count:
+            break
+        frontier = candidates[next_start:next_start + 1]
+        visited[frontier] = True
+        while len(frontier):
+            levels.append(frontier)
+            counts = degree[frontier]
+            neighbors = indices[expand_ranges(indptr[frontier], counts)]
+            parents = np.repeat(np.arange(len(frontier)), counts)
+            fresh = ~visited[neighbors]
+            neighbors, first = np.unique(neighbors[fresh], return_index=True)
+            parents = parents[fresh][first]
+            frontier = neighbors[np.lexsort((degree[neighbors], parents))]
+            visited[frontier] = True
+    connected = np.concatenate(levels)[::-1] if levels else np.empty(0, dtype=np.int64)
+    return np.concatenate([connected, np.flatnonzero(degree == 0)])
+
+
+def _spread_bits(values):
+    """21ビットの整数の各ビットの間に2ビットずつ空ける"""
+    v = values.astype(np.uint64) & np.uint64(0x1FFFFF)
+    for shift, mask in ((32, 0x1F00000000FFFF), (16, 0x1F0000FF0000FF), (8, 0x100F00F00F00F00F),
+                        (4, 0x10C30C30C30C30C3), (2, 0x1249249249249249)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton_codes(coords):
+    """座標を21ビットに量子化したZ曲線の符号"""
+    lo, hi = RadiossMeshTools.bounding_box(coords)
+    scale = (2 ** 21 - 1) / np.maximum(hi - lo, 1.0e-300)
+    q = np.clip(((coords - lo) * scale).astype(np.int64), 0, 2 ** 21 - 1)
+    return _spread_bits(q[:, 0]) | (_spread_bits(q[:, 1]) << np.uint64(1)) | \
+        (_spread_bits(q[:, 2]) << np.uint64(2))
+
+
+def bandwidth(edges, rank):
+    """節点の並び順rank（行番号 -> 順位）での最大帯幅"""
+    if len(edges) == 0:
+        return 0
+    return int(np.abs(rank[edges[:, 0]] - rank[edges[:, 1]]).max())
+
+
+def renumber(arrays, method="Compact"):
+    """節点・要素の書き出し順と新IDを決める
+
+    要素はパートごと、シェルは4角形/3角形ごとにまとめ（Radiossのセクション単位）、
+    その中を並べ替えの方法に応じた順にする。
+    戻り値: nodes/elements（IdMap）、node_order（書き出す節点行番号の順）、
+    shell_order/solid_order（書き出す要素行番号の順）、帯幅の前後
+    """
+    count = len(arrays.node_ids)
+    edges = element_edges(arrays)
+    if method == "RCM":
+        node_order = rcm_order(count, edges)
+    elif method == "Morton":
+        node_order = np.argsort(morton_codes(arrays.coords), kind='stable')
+    else:
+        node_order = np.arange(count)
+    rank = np.empty(count, dtype=np.int64)
+    rank[node_order] = np.arange(count)
+
+    def element_order(conn, ids, parts, split):
+        if len(conn) == 0:
+            return np.empty(0, dtype=np.int64)
+        if method == "Compact":
+            locality = ids
+        else:
+            # 要素の最小の新節点番号順（節点と同じ並びに沿わせる）
+            locality = np.where(conn >= 0, rank[np.maximum(conn, 0)], count).min(axis=1)
+        return np.lexsort((locality, split, parts))
+
+    shell_parts = getattr(arrays, 'shell_parts', np.zeros(len(arrays.shell_ids), dtype=np.int64))
+    solid_parts = getattr(arrays, 'solid_parts', np.zeros(len(arrays.solid_ids), dtype=np.int64))
+    shell_order = element_order(arrays.shells, arrays.shell_ids, shell_parts,
+                                RadiossMeshTools.is_triangle(arrays.shells))
+    solid_order = element_order(arrays.solids, arrays.solid_ids, solid_parts, arrays.solids[:, 4] < 0
+                                if len(arrays.solids) else np.zeros(0, dtype=bool))
+
+    elem_old = np.concatenate([arrays.shell_ids[shell_order], arrays.solid_ids[solid_order]])
+    return SimpleNamespace(
+        nodes=IdMap(arrays.node_ids[node_order], np.arange(1, count + 1)),
+        elements=IdMap(elem_old, np.arange(1, len(elem_old) + 1)),
+        node_order=node_order,
+        shell_order=shell_order,
+        solid_order=solid_order,
+        bandwidth_before=bandwidth(edges, np.arange(count)),
+        bandwidth_after=bandwidth(edges, rank),
+    )
@@ -0,0 +1,420 @@
+"""OpenRadiossの結果（アニメーションA00x、タイムヒストリーT01）の読み込み
+
+開くときは各ファイルのヘッダーだけを読み、配列ごとの位置（オフセット・型・形）を
+索引にする。配列はnp.memmapで必要なフレーム・フィールドだけを読むので、
+多数のフレームを切り替えても全フレームがメモリに載ることはない。
+どちらの形式もビッグエンディアン（XDR）で書かれている。
+
+書き出し時に節点・要素IDを振り直している場合は<デッキ名>_idmap.npzを使って
+元のIDに戻し、FemMeshの節点に結果を対応させる。
+"""
+import glob
+import os
+import re
+from types import SimpleNamespace
+
+import numpy as np
+
+# アニメーションファイルの先頭の識別子
+ANIM_MAGIC = 0x542c
+
+INT = np.dtype('>i4')
+FLOAT = np.dtype('>f4')
+SHORT = np.dtype('>i2')
+CHAR = np.dtype('S1')
+
+
+class AnimFormatError(Exception):
+    """アニメーションファイルとして読めない"""
+
+
+class _HeaderReader:
+    """ヘッダーを読み進め、大きな配列は読まずに位置だけを記録する"""
+    def __init__(self, f):
+        self.f = f
+        self.blocks = {}
+
+    def ints(self, count):
+        return np.frombuffer(self.f.read(4 * count), dtype=INT).astype(np.int64)
+
+    def int(self):
+        return int(self.ints(1)[0])
+
+    def float(self):
+        return float(np.frombuffer(self.f.read(4), dtype=FLOAT)[0])
+
+    def texts(self, count, width):
+        raw = self.f.read(count * width)
+        return [raw[i * width:(i + 1) * width].split(b"\0")[0].decode('latin-1').strip()
+                for i in range(count)]
+
+    def block(self, name, dtype, shape):
+        """配列の位置を記録して読み飛ばす"""
+        shape = tuple(int(s) for s in shape)
+        size = int(np.prod(shape)) * dtype.itemsize
+        if size:
+            self.blocks[name] = (self.f.tell(), dtype, shape)
+            self.f.seek(size, os.SEEK_CUR)
+
+
+class AnimFrame:
+    """A00xファイル1つ（1フレーム）の索引"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._read_header(_HeaderReader(f), os.fstat(f.fileno()).st_size)
+
+    def _read_header(self, r, file_size):
+        if r.int() != ANIM_MAGIC:
+            raise AnimFormatError(f"{self.path} is not a Radioss animation file")
+        self.time = r.float()
+        self.time_text, self.mod_anim, self.run_name = r.texts(3, 81)
+        flags = r.ints(10)
+        (self.node_count, self.facet_count, self.part_count, nfunc, nefunc,
+         nvect, ntens, nskew) = r.ints(8).tolist()
+
+        r.block('skew', SHORT, (nskew, 6))
+        r.block('coords', FLOAT, (self.node_count, 3))
+        r.block('facets', INT, (self.facet_count, 4))
+        r.block('facet_deleted', CHAR, (self.facet_count,))
+        r.block('facet_part_end', INT, (self.part_count,))
+        self.part_names = r.texts(self.part_count, 50)
+        r.block('normals', SHORT, (self.node_count, 3))
+        names = r.texts(nfunc + nefunc, 81)
+        self.node_scalars, self.facet_scalars = names[:nfunc], names[nfunc:]
+        r.block('node_scalar', FLOAT, (nfunc, self.node_count))
+        r.block('facet_scalar', FLOAT, (nefunc, self.facet_count))
+        self.node_vectors = r.texts(nvect, 81)
+        r.block('node_vector', FLOAT, (nvect, self.node_count, 3))
+        self.facet_tensors = r.texts(ntens, 81)
+        r.block('facet_tensor', FLOAT, (ntens, self.facet_count, 3))
+        if flags[0] == 1:
+            # 面ごとの要素質量、節点質量
+            r.block('facet_mass', FLOAT, (self.facet_count,))
+            r.block('node_mass', FLOAT, (self.node_count,))
+        if flags[1]:
+            r.block('node_ids', INT, (self.node_count,))
+            r.block('facet_ids', INT, (self.facet_count,))
+        if flags[4]:
+            r.block('part_hierarchy', INT, (3, self.part_count))
+
+        # 3次元要素
+        self.solid_count = 0
+        self.solid_scalars, self.solid_tensors = [], []
+        if flags[2]:
+            self.solid_count, solid_parts, nefunc3d, ntens3d = r.ints(4).tolist()
+            r.block('solids', INT, (self.solid_count, 8))
+            r.block('solid_deleted', CHAR, (self.solid_count,))
+            r.block('solid_part_end', INT, (solid_parts,))
+            self.solid_part_names = r.texts(solid_parts, 50)
+            self.solid_scalars = r.texts(nefunc3d, 81)
+            r.block('solid_scalar', FLOAT, (nefunc3d, self.solid_count))
+            self.solid_tensors = r.texts(ntens3d, 81)
+            r.block('solid_tensor', FLOAT, (ntens3d, self.solid_count, 6))
+            if flags[0] == 1:
+                r.block('solid_mass', FLOAT, (self.solid_count,))
+            if flags[1]:
+                r.block('solid_ids', INT, (self.solid_count,))
+        self.blocks = r.blocks
+        if r.f.tell() > file_size:
+            raise AnimFormatError(f"{self.path} is truncated")
+
+    def has(self, name):
+        return name in self.blocks
+
+    def array(self, name):
+        """配列をmemmapで返す（読み込みは参照した部分だけ）"""
+        if name not in self.blocks:
+            return None
+        offset, dtype, shape = self.blocks[name]
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    def field(self, block, names, name):
+        """名前（大文字小文字・前後の空白は無視）で選んだフィールド1つ"""
+        wanted = name.strip().upper()
+        for i, candidate in enumerate(names):
+            if candidate.upper() == wanted or wanted in candidate.upper():
+                return self.array(block)[i]
+        return None
+
+
+def frame_number(path):
+    match = re.search(r"A(\d{3,})(?:\.gz)?$", path)
+    return int(match.group(1)) if match else -1
+
+
+def animation_files(path):
+    """A00xファイル（または共通の名前）から同じ解析の全フレームのパス（番号順）"""
+    root = re.sub(r"A\d{3,}$", "", path)
+    files = [p for p in glob.glob(glob.escape(root) + "A[0-9][0-9][0-9]*") if frame_number(p) >= 0]
+    return sorted(files, key=frame_number)
+
+
+def find_idmap(path):
+    """結果ファイルの名前から書き出し時のIDの対応ファイルを探す"""
+    root = re.sub(r"(A\d{3,}|\.T\d+|T\d{2,})$", "", path)
+    for candidate in (root, re.sub(r"_\d{4}$", "", root)):
+        if os.path.exists(candidate + "_idmap.npz"):
+            return candidate + "_idmap.npz"
+    return None
+
+
+def von_mises_2d(t):
+    sx, sy, sxy = t[:, 0], t[:, 1], t[:, 2]
+    return np.sqrt(np.maximum(sx * sx - sx * sy + sy * sy + 3.0 * sxy * sxy, 0.0))
+
+
+def von_mises_3d(t):
+    sx, sy, sz, sxy, syz, szx = (t[:, i] for i in range(6))
+    return np.sqrt(np.maximum(0.5 * ((sx - sy) ** 2 + (sy - sz) ** 2 + (sz - sx) ** 2)
+                              + 3.0 * (sxy * sxy + syz * syz + szx * szx), 0.0))
+
+
+def element_to_nodes(conn, values, node_count):
+    """要素の値を節点に平均（縮退した重複節点は1回だけ数える）"""
+    conn = np.asarray(conn, dtype=np.int64)
+    unique = np.ones(conn.shape, dtype=bool)
+    unique[:, 1:] = conn[:, 1:] != conn[:, :-1]
+    unique &= conn >= 0
+    nodes = conn[unique]
+    weights = np.broadcast_to(np.asarray(values, dtype=float)[:, None], conn.shape)[unique]
+    total = np.bincount(nodes, weights=weights, minlength=node_count)
+    count = np.bincount(nodes, minlength=node_count)
+    return np.divide(total, count, out=np.zeros(node_count), where=count > 0)
+
+
+class AnimResults:
+    """解析のアニメーション結果（全フレームの索引）
+
+    形状（節点ID・接続）は最初のフレームのものを使う。
+    """
+    def __init__(self, path, idmap_path=None):
+        files = animation_files(path)
+        if not files:
+            raise AnimFormatError(f"No animation files found for {path}")
+        self.frames = [AnimFrame(p) for p in files]
+        self.times = np.array([frame.time for frame in self.frames])
+        first = self.frames[0]
+        node_ids = first.array('node_ids')
+        self.node_ids = (np.asarray(node_ids, dtype=np.int64) if node_ids is not None
+                         else np.arange(1, first.node_count + 1))
+        idmap_path = idmap_path or find_idmap(files[0])
+        if idmap_path is not None:
+            import RadiossRenumber
+            nodes, _ = RadiossRenumber.load_maps(idmap_path)
+            old = nodes.to_old(self.node_ids)
+            self.node_ids = np.where(old >= 0, old, self.node_ids)
+        self.reference = np.array(first.array('coords'), dtype=float)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def coords(self, index):
+        return np.asarray(self.frames[index].array('coords'), dtype=float)
+
+    def displacement(self, index):
+        """最初のフレームからの節点変位"""
+        frame = self.frames[index]
+        vector = frame.field('node_vector', frame.node_vectors, "DISPLACEMENT")
+        if vector is not None:
+            return np.asarray(vector, dtype=float)
+        return self.coords(index) - self.reference
+
+    def von_mises(self, index):
+        """節点のvon Mises応力（要素の値の平均、応力が無ければNone）"""
+        frame = self.frames[index]
+        values = np.zeros(frame.node_count)
+        found = False
+        for kind, conn_name, scalars, tensors, block, equivalent in (
+                ('facet', 'facets', frame.facet_scalars, frame.facet_tensors, 'facet_tensor', von_mises_2d),
+                ('solid', 'solids', frame.solid_scalars, frame.solid_tensors, 'solid_tensor', von_mises_3d)):
+            element = frame.field(f'{kind}_scalar', scalars, "VON MISES")
+            if element is None:
+                tensor = frame.field(block, tensors, "STRESS")
+                element = equivalent(np.asarray(tensor, dtype=float)) if tensor is not None else None
+            if element is None:
+                continue
+            nodal = element_to_nodes(self.frames[0].array(conn_name), element, frame.node_count)
+            values = np.maximum(values, nodal)
+            found = True
+        return values if found else None
+
+    def summary(self):
+        first = self.frames[0]
+        return SimpleNamespace(
+            frames=len(self.frames),
+            nodes=first.node_count,
+            shells=first.facet_count,
+            solids=first.solid_count,
+            times=self.times,
+            node_scalars=first.node_scalars,
+            node_vectors=first.node_vectors,
+            element_scalars=first.facet_scalars + first.solid_scalars,
+            tensors=first.facet_tensors + first.solid_tensors,
+        )
+
+
+class FortranRecords:
+    """Fortran順編成（レコードの前後に長さ）ファイルのレコード位置の索引"""
+    def __init__(self, path):
+        self.path = path
+        self.offsets, self.lengths = [], []
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            self.endian = self._detect_endian(f.read(4), size)
+            marker = np.dtype(self.endian + 'i4')
+            f.seek(0)
+            position = 0
+            while position + 8 <= size:
+                head = f.read(4)
+                length = int(np.frombuffer(head, dtype=marker)[0])
+                if length < 0 or position + 8 + length > size:
+                    break
+                self.offsets.append(position + 4)
+                self.lengths.append(length)
+                f.seek(length + 4, os.SEEK_CUR)
+                position += length + 8
+        self.offsets = np.array(self.offsets, dtype=np.int64)
+        self.lengths = np.array(self.lengths, dtype=np.int64)
+
+    @staticmethod
+    def _detect_endian(head, size):
+        for endian in ('>', '<'):
+            length = int(np.frombuffer(head, dtype=np.dtype(endian + 'i4'))[0]) if len(head) == 4 else -1
+            if 0 <= length <= size - 8:
+                return endian
+        raise AnimFormatError("Not a Fortran sequential file")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read(self, index, dtype='f4'):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[index])
+            return np.frombuffer(f.read(self.lengths[index]), dtype=np.dtype(self.endian + dtype))
+
+
+class TimeHistory:
+    """タイムヒストリー（T01）
+
+    ヘッダーの後は、時刻1つだけのレコードに続けて、その時刻の変数の
+    レコードが並ぶ。時刻のレコードを区切りとしてステップを索引にし、
+    変数1つの時系列は各ステップから該当する4バイトだけを読む。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = FortranRecords(path)
+        lengths = self.records.lengths
+        starts = np.flatnonzero(lengths == 4)
+        # 変数のレコードが続かない1値のレコードはヘッダー側の値とみなす
+        starts = starts[np.isin(starts + 1, np.flatnonzero(lengths > 4))] if len(starts) else starts
+        if len(starts) == 0:
+            raise AnimFormatError(f"No time steps found in {path}")
+        ends = np.append(starts[1:], len(lengths))
+        self.header_records = int(starts[0])
+        sizes = np.array([lengths[s + 1:e].sum() for s, e in zip(starts, ends)])
+        self.variable_count = int(sizes.min()) // 4
+        complete = sizes >= self.variable_count * 4
+        self.step_records = starts[complete]
+        self.step_ends = ends[complete]
+        self.dtype = np.dtype(self.records.endian + 'f4')
+
+    def __len__(self):
+        return len(self.step_records)
+
+    def _gather(self, offsets):
+        data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        index = np.asarray(offsets, dtype=np.int64)[:, None] + np.arange(4)
+        return np.ascontiguousarray(data[index]).view(self.dtype).ravel().astype(float)
+
+    @property
+    def times(self):
+        return self._gather(self.records.offsets[self.step_records])
+
+    def variable_offsets(self, column):
+        """各ステップで変数columnが置かれている位置"""
+        offsets = np.empty(len(self.step_records), dtype=np.int64)
+        for i, (start, end) in enumerate(zip(self.step_records, self.step_ends)):
+            cumulative = np.cumsum(self.records.lengths[start + 1:end]) // 4
+            record = int(np.searchsorted(cumulative, column, side='right'))
+            before = int(cumulative[record - 1]) if record else 0
+            offsets[i] = self.records.offsets[start + 1 + record] + 4 * (column - before)
+        return offsets
+
+    def series(self, column):
+        """変数columnの時系列"""
+        return self._gather(self.variable_offsets(column))
+
+    def step(self, index):
+        """1ステップの全変数"""
+        start, end = self.step_records[index], self.step_ends[index]
+        values = [self.records.read(r) for r in range(start + 1, end)]
+        return np.concatenate(values)[:self.variable_count].astype(float)
+
+
+# 開いた結果の索引（ファイルが変わらない間は作り直さない）
+_opened = {}  # 結果の名前 -> (ファイルの署名, AnimResults)
+
+
+def _signature(path):
+    """全フレームのファイルの(パス, 更新時刻, サイズ)（再実行で上書き・追加されると変わる）"""
+    signature = []
+    for frame in animation_files(path):
+        stat = os.stat(frame)
+        signature.append((frame, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def open_results(path):
+    key = os.path.abspath(re.sub(r"A\d{3,}$", "", path))
+    signature = _signature(path)
+    cached = _opened.get(key)
+    if cached is None or cached[0] != signature:
+        _opened[key] = (signature, AnimResults(path))
+    return _opened[key][1]
+
+
+def attach_results(path, mesh_obj, analysis=None):
+    """アニメーション結果を開き、FemResultObjectとしてメッシュに関連付ける"""
+    import FreeCAD
+    import ObjectsFem
+
+    results = open_results(path)
+    doc = mesh_obj.Document
+    result_obj = ObjectsFem.makeResultMechanical(doc, "RadiossResult")
+    result_obj.Mesh = mesh_obj
+    result_obj.addProperty("App::PropertyFile", "ResultFile", "Radioss", "Animation file")
+    result_obj.addProperty("App::PropertyInteger", "Frame", "Radioss", "Displayed frame")
+    result_obj.addProperty("App::PropertyInteger", "FrameCount", "Radioss", "Number of frames")
+    result_obj.ResultFile = os.path.abspath(path)
+    result_obj.FrameCount = len(results)
+    if analysis is not None:
+        analysis.addObject(result_obj)
+    show_frame(result_obj, len(results) - 1)
+    FreeCAD.Console.PrintMessage(
+        f"Opened {len(results)} frames ({results.frames[0].node_count} nodes) from {path}\n")
+    return result_obj
+
+
+def show_frame(result_obj, index):
+    """結果オブジェクトに1フレーム分の変位とvon Mises応力を読み込む"""
+    import FreeCAD
+
+    results = open_results(result_obj.ResultFile)
+    index = int(np.clip(index, 0, len(results) - 1))
+    mesh_nodes = np.fromiter(result_obj.Mesh.FemMesh.Nodes.keys(), dtype=np.int64)
+    order = np.argsort(results.node_ids)
+    pos = np.clip(np.searchsorted(results.node_ids[order], mesh_nodes), 0, len(order) - 1)
+    found = results.node_ids[order][pos] == mesh_nodes
+    rows = order[pos[found]]
+
+    displacement = results.displacement(index)[rows]
+    result_obj.NodeNumbers = mesh_nodes[found].tolist()
+    result_obj.DisplacementVectors = [FreeCAD.Vector(*d) for d in displacement.tolist()]
+    result_obj.DisplacementLengths = np.linalg.norm(displacement, axis=1).tolist()
+    stress = results.von_mises(index)
+    if stress is not None:
+        result_obj.vonMises = stress[rows].tolist()
+    result_obj.Time = float(results.times[index])
+    result_obj.Frame = index
+    return index
@@ -0,0 +1,313 @@
+"""OpenRadioss（Starter/Engine）のローカル実行と並列ジョブキュー
+
+書き出した.rad/.D00の組をジョブとしてキューに積み、使用コア数
+（スレッド数 x MPIプロセス数）の合計が上限を超えない範囲で同時に実行する。
+ソルバーの標準出力は行ごとにリスナーへ渡しつつ<デッキ名>_run.logに保存し、
+ジョブごとの経過時間・サイクル数・終了コードを記録する。
+
+実行ファイルは設定（StarterExecutable, EngineExecutable, MpiExecutable）で
+指定するので、テスト用の代替スクリプト（tests/solver_stub.py）に差し替えて
+動作を確認できる（tests/test_run_manager.py）。
+"""
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+import FreeCAD
+
+PARAMS = "User parameter:BaseApp/Preferences/Mod/Radioss"
+
+# Engine出力のサイクル行（サイクル番号と時刻で始まる行）
+CYCLE_LINE = re.compile(r"^\s*(\d+)\s+([-+]?\d*\.?\d+(?:[EeDd][-+]?\d+)?)\s")
+NORMAL_TERMINATION = "NORMAL TERMINATION"
+
+# ジョブの状態
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "Queued", "Running", "Done", "Failed", "Cancelled"
+
+
+def solver_settings():
+    """実行ファイルと既定の並列数（設定から）"""
+    params = FreeCAD.ParamGet(PARAMS)
+    return {
+        'starter': params.GetString("StarterExecutable", "starter_linux64_gf"),
+        'engine': params.GetString("EngineExecutable", "engine_linux64_gf"),
+        'mpi': params.GetString("MpiExecutable", "mpiexec"),
+        'threads': params.GetInt("RunThreads", 1),
+        'domains': params.GetInt("RunDomains", 1),
+        'max_cores': params.GetInt("RunMaxCores", os.cpu_count() or 1),
+    }
+
+
+class RunJob:
+    """1つの解析（Starter -> Engine）の実行"""
+    def __init__(self, starter_deck, engine_deck=None, threads=1, domains=1, name=None, settings=None):
+        self.starter_deck = os.path.abspath(starter_deck)
+        self.engine_deck = os.path.abspath(engine_deck or os.path.splitext(starter_deck)[0] + ".D00")
+        self.threads = max(threads, 1)
+        self.domains = max(domains, 1)
+        self.name = name or os.path.splitext(os.path.basename(starter_deck))[0]
+        self.settings = settings or solver_settings()
+        self.directory = os.path.dirname(self.starter_deck)
+        self.log_path = os.path.splitext(self.starter_deck)[0] + "_run.log"
+        self.status = QUEUED
+        self.stage = ""
+        self.returncode = None
+        self.cycles = 0
+        self.time = 0.0
+        self.normal_termination = False
+        self.start_time = None
+        self.wall_time = 0.0
+        self.process = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def cores(self):
+        return self.threads * self.domains
+
+    def commands(self):
+        """(段階名, コマンド)の並び"""
+        s = self.settings
+        threads = ["-nt", str(self.threads)]
+        starter = [s['starter'], "-i", self.starter_deck, "-np", str(self.domains)] + threads
+        engine = [s['engine'], "-i", self.engine_deck] + threads
+        if self.domains > 1:
+            engine = [s['mpi'], "-n", str(self.domains)] + engine
+        return [("Starter", starter), ("Engine", engine)]
+
+    def environment(self):
+        env = dict(os.environ)
+        env["OMP_NUM_THREADS"] = str(self.threads)
+        env.setdefault("KMP_STACKSIZE", "400m")
+        return env
+
+    def parse_line(self, line):
+        """Engine出力の1行からサイクル数・時刻・正常終了を拾う"""
+        if self.stage == "Engine":
+            match = CYCLE_LINE.match(line)
+            if match:
+                self.cycles = int(match.group(1))
+                self.time = float(match.group(2).replace('D', 'E').replace('d', 'E'))
+        if NORMAL_TERMINATION in line:
+            self.normal_termination = True
+
+    def run(self, listener=None):
+        """StarterとEngineを順に実行（ブロックする）。listener(job, line)に各行を渡す"""
+        self.status = RUNNING
+        self.start_time = time.time()
+        started = time.perf_counter()
+        try:
+            with open(self.log_path, 'w') as log:
+                for stage, command in self.commands():
+                    self.stage = stage
+                    self.normal_termination = False
+                    log.write(f"### {stage}: {' '.join(command)}\n")
+                    self.returncode = self._run_stage(command, log, listener)
+                    if self.cancel_event.is_set():
+                        self.status = CANCELLED
+                        break
+                    if self.returncode != 0:
+                        self.status = FAILED
+                        break
+                else:
+                    self.status = DONE
+        except OSError as e:
+            self.status = FAILED
+            self.stage = f"{self.stage}: {e}"
+        finally:
+            self.process = None
+            self.wall_time = time.perf_counter() - started
+        return self.status
+
+    def _run_stage(self, command, log, listener):
+        self.process = subprocess.Popen(command, cwd=self.directory, env=self.environment(),
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        stdin=subprocess.DEVNULL, text=True, errors='replace',
+                                        bufsize=1)
+        if self.cancel_event.is_set():
+            self.process.terminate()
+        for line in self.process.stdout:
+            log.write(line)
+            self.parse_line(line)
+            if listener is not None:
+                listener(self, line)
+        self.process.stdout.close()
+        return self.process.wait()
+
+    def cancel(self):
+        self.cancel_event.set()
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def record(self):
+        """実行記録（JSONに書き出す内容）"""
+        return {
+            'name': self.name,
+            'starter_deck': self.starter_deck,
+            'engine_deck': self.engine_deck,
+            'threads': self.threads,
+            'domains': self.domains,
+            'status': self.status,
+            'returncode': self.returncode,
+            'cycles': self.cycles,
+            'time': self.time,
+            'normal_termination': self.normal_termination,
+            'start': self.start_time,
+            'wall_time': self.wall_time,
+            'log': self.log_path,
+        }
+
+
+class RunQueue:
+    """使用コア数の上限内でジョブを並列に実行するキュー
+
+    先頭から順に、空きコアで実行できるジョブを起動する（上限より多い
+    コアを使うジョブは、他に実行中のジョブが無いときに単独で実行する）。
+    """
+    def __init__(self, max_cores=None, listener=None, on_finished=None, record_path=None):
+        self.max_cores = max_cores or solver_settings()['max_cores']
+        self.listener = listener
+        self.on_finished = on_finished
+        self.record_path = record_path
+        self.jobs = []
+        self.active = set()  # 実行スレッドが終わっていない（記録を書き終えていない）ジョブ
+        self.lock = threading.Condition()
+        self.scheduling = False
+
+    def submit(self, job):
+        with self.lock:
+            self.jobs.append(job)
+            self.lock.notify_all()
+            if not self.scheduling:
+                self.scheduling = True
+                threading.Thread(target=self._schedule, daemon=True).start()
+        return job
+
+    def running(self):
+        return [job for job in self.jobs if job.status == RUNNING]
+
+    def queued(self):
+        return [job for job in self.jobs if job.status == QUEUED]
+
+    def busy_cores(self):
+        return sum(job.cores for job in self.running())
+
+    def _schedule(self):
+        with self.lock:
+            while True:
+                queued = self.queued()
+                if not queued and not self.running():
+                    self.scheduling = False
+                    return
+                free = self.max_cores - self.busy_cores()
+                for job in queued:
+                    if job.cores <= free or not self.running():
+                        job.status = RUNNING
+                        free -= job.cores
+                        self.active.add(job)
+                        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+                self.lock.wait(1.0)
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+        else:
+            job.run(self.listener)
+        self._save_record(job)
+        if self.on_finished is not None:
+            self.on_finished(job)
+        with self.lock:
+            self.active.discard(job)
+            self.lock.notify_all()
+
+    def _save_record(self, job):
+        path = self.record_path or os.path.join(job.directory, "radioss_runs.jsonl")
+        try:
+            with open(path, 'a') as f:
+                f.write(json.dumps(job.record()) + "\n")
+        except OSError as e:
+            FreeCAD.Console.PrintWarning(f"Could not write run record {path}: {e}\n")
+
+    def cancel_all(self):
+        with self.lock:
+            for job in self.jobs:
+                if job.status in (QUEUED, RUNNING):
+                    job.cancel()
+                    if job.status == QUEUED:
+                        job.status = CANCELLED
+            self.lock.notify_all()
+
+    def wait(self, timeout=None):
+        """全ジョブの終了（実行記録の書き出しまで）を待つ"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            with self.lock:
+                if not self.queued() and not self.active:
+                    return True
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.lock.wait(0.1 if remaining is None else min(remaining, 0.1))
+
+
+def format_summary(jobs):
+    lines = [f"{'Job':<24} {'Status':<10} {'Cores':>5} {'Cycles':>9} {'Time':>12} {'Wall (s)':>10}"]
+    for job in jobs:
+        lines.append(f"{job.name[:24]:<24} {job.status:<10} {job.cores:5d} {job.cycles:9d} "
+                     f"{job.time:12.5E} {job.wall_time:10.1f}")
+    return "\n".join(lines) + "\n"
+
+
+# GUIから使う共通のキュー
+_queue = None
+
+
+def gui_queue():
+    """ソルバー出力をレポートビューに流す共通のキュー（GUIスレッドへ通知を渡す）"""
+    global _queue
+    if _queue is None:
+        from PySide2 import QtCore
+
+        class Signals(QtCore.QObject):
+            line = QtCore.Signal(str)
+            finished = QtCore.Signal(object)
+
+        signals = Signals()
+        signals.line.connect(FreeCAD.Console.PrintLog)
+        signals.finished.connect(lambda job: FreeCAD.Console.PrintMessage(
+            f"Radioss run {job.name}: {job.status} after {job.wall_time:.1f} s, {job.cycles} cycles\n"))
+        _queue = RunQueue(listener=lambda job, line: signals.line.emit(f"[{job.name}] {line}"),
+                          on_finished=signals.finished.emit)
+        _queue.signals = signals
+    return _queue
+
+
+def manifest_jobs(path, threads=None, domains=None, settings=None):
+    """DOEのマニフェスト（<名前>_doe.json）の全バリアントのジョブ"""
+    import RadiossDOE
+    settings = settings or solver_settings()
+    manifest = RadiossDOE.load_manifest(path)
+    return [RunJob(variant['starter'], variant['engine'], threads or settings['threads'],
+                   domains or settings['domains'], settings=settings)
+            for variant in manifest['variants']]
+
+
+def submit_decks(paths, threads=None, domains=None):
+    """.radデッキ（またはDOEのマニフェスト）をGUIのキューに積む"""
+    settings = solver_settings()
+    queue = gui_queue()
+    queue.max_cores = settings['max_cores']
+    jobs = []
+    for path in paths:
+        if path.endswith(".json"):
+            jobs.extend(manifest_jobs(path, threads, domains, settings))
+        else:
+            jobs.append(RunJob(path, threads=threads or settings['threads'],
+                               domains=domains or settings['domains'], settings=settings))
+    for job in jobs:
+        queue.submit(job)
+    FreeCAD.Console.PrintMessage(f"Queued {len(jobs)} Radioss runs on {queue.max_cores} cores\n")
+    return jobs
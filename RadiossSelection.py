@@ -0,0 +1,281 @@
+"""幾何条件による節点・要素の選択（箱・球・半空間・パート・面の法線）
+
+解析内の全メッシュの配列と節点の空間インデックス（NodeIndex）を一度作って
+キャッシュし、以降の検索は候補セルの節点だけを調べる。結果はIdSetで返し、
+update_set()でセットオブジェクトを作成・更新する。
+
+検索条件の文字列（1行1条件、同じ対象の条件は積になる）:
+    box x0 y0 z0 x1 y1 z1
+    sphere cx cy cz r
+    plane px py pz nx ny nz      (法線の向きの側、境界を含む)
+    part id [id ...]
+    normal nx ny nz angle        (面の法線と方向のなす角がangle度以内の要素)
+"""
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossMeshTools
+import RadiossModel
+import RadiossSets
+import RadiossSpatialIndex
+
+# 条件の種類 -> 値の数（Noneは1個以上）
+QUERIES = OrderedDict([
+    ('box', 6),
+    ('sphere', 4),
+    ('plane', 6),
+    ('part', None),
+    ('normal', 4),
+])
+
+# 要素の選び方: all（全節点が範囲内）/ any（1節点以上）
+ELEMENT_MODES = ('all', 'any')
+
+# セットの更新方法
+UPDATE_MODES = ('replace', 'add', 'remove', 'intersect')
+
+_cache = OrderedDict()
+_CACHE_SIZE = 2
+
+
+class MeshSelector:
+    """メッシュ配列（merged_arraysの形）に対する選択"""
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._index = None
+        self._normals = None
+        self._node_elements = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = RadiossSpatialIndex.NodeIndex(self.arrays.coords)
+        return self._index
+
+    # 節点（座標配列の行番号）
+    def box_rows(self, lo, hi):
+        lo, hi = np.minimum(lo, hi), np.maximum(lo, hi)
+        return self.index.query_box(lo, hi)
+
+    def sphere_rows(self, center, radius):
+        return self.index.query_sphere(center, radius)
+
+    def half_space_rows(self, point, normal):
+        normal = np.asarray(normal, dtype=np.float64)
+        distance = (self.arrays.coords - np.asarray(point, dtype=np.float64)) @ normal
+        return np.flatnonzero(distance >= 0.0)
+
+    def part_rows(self, part_ids):
+        return self.element_node_rows(self.part_mask('shell', part_ids), self.part_mask('solid', part_ids))
+
+    def element_node_rows(self, shell_mask, solid_mask):
+        """要素の節点行番号（昇順）"""
+        used = np.zeros(len(self.arrays.coords) + 1, dtype=bool)
+        used[self.arrays.shells[shell_mask]] = True
+        used[self.arrays.solids[solid_mask]] = True
+        return np.flatnonzero(used[:-1])
+
+    # 要素（シェル・ソリッドの行のマスク）
+    def part_mask(self, kind, part_ids):
+        parts = getattr(self.arrays, kind + '_parts', None)
+        if parts is None:
+            return np.zeros(len(getattr(self.arrays, kind + '_ids')), dtype=bool)
+        return RadiossSets.sorted_isin(parts, np.unique(np.asarray(part_ids, dtype=np.int64)))
+
+    def node_elements(self):
+        """節点 -> 要素の逆引き（CSR）。要素はシェル、ソリッドの順の通し番号"""
+        if self._node_elements is None:
+            shells, solids = self.arrays.shells, self.arrays.solids
+            rows = np.concatenate([shells.ravel(), solids.ravel()])
+            elements = np.concatenate([np.repeat(np.arange(len(shells)), shells.shape[1]),
+                                       len(shells) + np.repeat(np.arange(len(solids)), solids.shape[1])])
+            used = rows >= 0
+            rows, elements = rows[used], elements[used]
+            order = np.argsort(rows, kind='stable')
+            counts = np.bincount(rows, minlength=len(self.arrays.coords))
+            self._node_elements = (np.concatenate([[0], np.cumsum(counts)]), elements[order])
+        return self._node_elements
+
+    def element_masks(self, rows, mode='all'):
+        """節点行番号から(シェルのマスク, ソリッドのマスク)。空欄（-1）は末尾の要素で判定
+
+        節点が少なければ節点 -> 要素の逆引きで候補の要素だけを調べる。
+        """
+        selected = np.zeros(len(self.arrays.coords) + 1, dtype=bool)
+        selected[rows] = True
+        selected[-1] = mode == 'all'
+        shells, solids = self.arrays.shells, self.arrays.solids
+        if len(rows) * 64 >= len(self.arrays.coords):
+            masks = []
+            for conn in (shells, solids):
+                inside = selected[conn]
+                masks.append(inside.all(axis=1) if mode == 'all' else inside.any(axis=1))
+            return masks
+
+        offsets, elements = self.node_elements()
+        rows = np.asarray(rows, dtype=np.int64)
+        candidates = np.unique(elements[RadiossSpatialIndex.expand_ranges(
+            offsets[rows], offsets[rows + 1] - offsets[rows])])
+        masks = [np.zeros(len(shells), dtype=bool), np.zeros(len(solids), dtype=bool)]
+        for mask, conn, first in ((masks[0], shells, 0), (masks[1], solids, len(shells))):
+            local = candidates[(candidates >= first) & (candidates < first + len(conn))] - first
+            if mode == 'all':
+                local = local[selected[conn[local]].all(axis=1)]
+            mask[local] = True
+        return masks
+
+    def normal_masks(self, direction, angle):
+        """面の法線とdirectionのなす角がangle度以内の(シェルのマスク, ソリッドのマスク)
+
+        ソリッドは外表面の面の外向き法線で判定する。
+        """
+        if self._normals is None:
+            coords = self.arrays.coords
+            shells, _ = RadiossMeshTools.closed_shells(self.arrays.shells)
+            faces, owners = RadiossMeshTools.solid_skin_faces(self.arrays.solids, return_owner=True)
+
+            def unit_normals(faces):
+                if not len(faces):
+                    return np.empty((0, 3))
+                points = coords[faces]
+                normal = np.cross(points[:, 2] - points[:, 0], points[:, 3] - points[:, 1])
+                return normal / np.maximum(RadiossMeshTools._norm(normal), 1.0e-300)[:, None]
+
+            self._normals = SimpleNamespace(shell=unit_normals(shells), skin=unit_normals(faces),
+                                            owners=owners)
+        direction = np.asarray(direction, dtype=np.float64)
+        direction = direction / max(float(np.linalg.norm(direction)), 1.0e-300)
+        limit = np.cos(np.radians(angle))
+        shell_mask = self._normals.shell @ direction >= limit
+        solid_mask = np.zeros(len(self.arrays.solid_ids), dtype=bool)
+        solid_mask[self._normals.owners[self._normals.skin @ direction >= limit]] = True
+        return shell_mask, solid_mask
+
+    # IdSetへの変換
+    def node_set(self, rows):
+        """節点行番号（昇順） -> 節点IDのIdSet（節点IDは昇順なのでソート不要）"""
+        return RadiossSets.IdSet(self.arrays.node_ids[rows], assume_sorted=True)
+
+    def element_set(self, shell_mask, solid_mask):
+        # シェルとソリッドはそれぞれID順のことが多いので、別々に作って併合する
+        return (RadiossSets.IdSet(self.arrays.shell_ids[shell_mask])
+                | RadiossSets.IdSet(self.arrays.solid_ids[solid_mask]))
+
+    def select(self, queries, target='NODE', mode='all'):
+        """条件の並び[(種類, 値), ...]をすべて満たす節点または要素 -> IdSet"""
+        result = None
+        for kind, values in queries:
+            if target == 'NODE':
+                if kind == 'normal':
+                    found = self.node_set(self.element_node_rows(*self.normal_masks(values[:3], values[3])))
+                else:
+                    found = self.node_set(self.query_rows(kind, values))
+            else:
+                if kind == 'normal':
+                    found = self.element_set(*self.normal_masks(values[:3], values[3]))
+                elif kind == 'part':
+                    found = self.element_set(self.part_mask('shell', values), self.part_mask('solid', values))
+                else:
+                    found = self.element_set(*self.element_masks(self.query_rows(kind, values), mode))
+            result = found if result is None else result & found
+        return result if result is not None else RadiossSets.IdSet()
+
+    def query_rows(self, kind, values):
+        if kind == 'box':
+            return self.box_rows(values[:3], values[3:6])
+        if kind == 'sphere':
+            return self.sphere_rows(values[:3], values[3])
+        if kind == 'plane':
+            return self.half_space_rows(values[:3], values[3:6])
+        if kind == 'part':
+            return self.part_rows(values)
+        raise ValueError(f"Unknown query: {kind}")
+
+
+def parse_queries(text):
+    """検索条件の文字列 -> [(種類, 値配列), ...]（不正な行はValueError）"""
+    queries = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        fields = line.replace(',', ' ').split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        kind = fields[0].lower()
+        if kind not in QUERIES:
+            raise ValueError(f"Line {number}: unknown query '{fields[0]}' (use {', '.join(QUERIES)})")
+        try:
+            values = np.array([float(v) for v in fields[1:]])
+        except ValueError:
+            raise ValueError(f"Line {number}: values must be numbers: {line}")
+        count = QUERIES[kind]
+        if (count is None and not len(values)) or (count is not None and len(values) != count):
+            raise ValueError(f"Line {number}: '{kind}' needs {count or 'at least 1'} values")
+        if kind == 'part':
+            values = values.astype(np.int64)
+        queries.append((kind, values))
+    return queries
+
+
+def mesh_key(analysis):
+    """キャッシュのキー（解析と、メッシュオブジェクトごとのFemMeshの変更回数）
+
+    配列をまとめる前に引けるので、メッシュが変わっていなければ検索の時間だけで済む。
+    """
+    document = analysis.Document.Name if hasattr(analysis, 'Document') else None
+    return (document, analysis.Name) + tuple(RadiossModel.mesh_generation(obj)
+                                             for obj in RadiossModel.mesh_objects(analysis))
+
+
+def selector(analysis):
+    """解析のメッシュに対するMeshSelector（メッシュが変わらなければ空間インデックスごと再利用）"""
+    key = mesh_key(analysis)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    result = MeshSelector(RadiossModel.merged_arrays(analysis))
+    _cache[key] = result
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+
+def update_set(analysis, name, set_type, members, mode='replace'):
+    """ラベルがnameのセットを作成・更新 -> セットオブジェクト
+
+    mode: replace（置き換え）/ add（追加）/ remove（除く）/ intersect（共通部分だけ残す）
+    """
+    kind = 'NODE' if set_type.upper() in ('NODE', 'GRNOD') else 'ELEM'
+    set_obj = next((obj for obj in analysis.Group if hasattr(obj, "SetType") and obj.Label == name), None)
+    if set_obj is None:
+        if mode in ('remove', 'intersect'):
+            members = RadiossSets.IdSet()
+        set_obj = RadiossModel.make_set(analysis.Document, name, set_type, members)
+        set_obj.Label = name
+        analysis.addObject(set_obj)
+        return set_obj
+
+    old_kind, current = RadiossModel.set_ids(set_obj)
+    if mode != 'replace' and old_kind != kind:
+        raise ValueError(f"{name} is a {old_kind.lower()} set")
+    if mode == 'add':
+        members = current | members
+    elif mode == 'remove':
+        members = current - members
+    elif mode == 'intersect':
+        members = current & members
+    else:
+        set_obj.SetType = set_type
+    RadiossModel.store_members(set_obj, members)
+    return set_obj
+
+
+def select_to_set(analysis, text, name, target='NODE', mode='all', update='replace'):
+    """検索条件の文字列で選択してセットを作成・更新 -> (セットオブジェクト, 選択数)"""
+    queries = parse_queries(text)
+    found = selector(analysis).select(queries, target, mode)
+    set_obj = update_set(analysis, name, target, found, update)
+    FreeCAD.Console.PrintMessage(f"{name}: {len(found)} {'nodes' if target == 'NODE' else 'elements'} "
+                                 f"selected ({update}), {len(RadiossModel.set_ids(set_obj)[1])} in set\n")
+    return set_obj, len(found)
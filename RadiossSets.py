@@ -0,0 +1,184 @@
+"""節点・要素セット（ソート済みの重複の無い整数配列）と集合演算
+
+セットのIDは常に昇順・重複なしのint64配列（IdSet）として持ち、和・積・差は
+配列のまま計算する。数百万個のメンバーでもPythonのintのリストを作らない。
+
+ドキュメントには連続したIDの範囲（開始, 終了）で圧縮して保存し、/SETの
+書き出しでも範囲は RANGE 開始 終了 の1行にまとめる。
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+# この長さ以上の連続したIDはRANGE行にする（短い範囲はIDを並べた方が短い）
+MIN_RANGE = 3
+IDS_PER_LINE = 8
+
+
+class IdSet:
+    """昇順・重複なしのID配列"""
+    def __init__(self, ids=None, assume_sorted=False):
+        ids = np.asarray(ids if ids is not None else [], dtype=np.int64).ravel()
+        if not assume_sorted and not np.all(ids[1:] > ids[:-1]):
+            ids = np.unique(ids)
+        self.ids = ids
+
+    @classmethod
+    def from_ranges(cls, starts, ends):
+        """閉区間[start, end]の並びから作成"""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        valid = ends >= starts
+        starts, ends = starts[valid], ends[valid]
+        lengths = ends - starts + 1
+        if not len(lengths):
+            return cls()
+        # 各範囲の先頭からの連番を一度に作る
+        ids = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + \
+            np.arange(lengths.sum())
+        return cls(ids, assume_sorted=bool(np.all(starts[1:] > ends[:-1])))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __eq__(self, other):
+        return isinstance(other, IdSet) and np.array_equal(self.ids, other.ids)
+
+    def __repr__(self):
+        return f"IdSet({len(self.ids)} ids, {len(self.ranges()[0])} ranges)"
+
+    def contains(self, ids):
+        """各IDがセットに含まれるか（bool配列）"""
+        return sorted_isin(ids, self.ids)
+
+    def __contains__(self, elem_id):
+        return bool(self.contains([elem_id])[0])
+
+    def union(self, *others):
+        # ソート済みの並びの連結なので安定ソートは並びの併合になる
+        ids = np.sort(np.concatenate([self.ids] + [o.ids for o in others]), kind='stable')
+        if len(ids):
+            ids = ids[np.concatenate([[True], ids[1:] != ids[:-1]])]
+        return IdSet(ids, assume_sorted=True)
+
+    def intersection(self, *others):
+        ids = self.ids
+        for other in others:
+            small, large = (ids, other.ids) if len(ids) <= len(other.ids) else (other.ids, ids)
+            ids = small[sorted_isin(small, large)]
+        return IdSet(ids, assume_sorted=True)
+
+    def difference(self, *others):
+        ids = self.ids
+        for other in others:
+            ids = ids[~sorted_isin(ids, other.ids)]
+        return IdSet(ids, assume_sorted=True)
+
+    def symmetric_difference(self, other):
+        return self.union(other).difference(self.intersection(other))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+    def ranges(self):
+        """連続したIDの範囲 -> (開始配列, 終了配列)"""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        breaks = np.flatnonzero(np.diff(self.ids) != 1) + 1
+        return (self.ids[np.concatenate([[0], breaks])],
+                self.ids[np.concatenate([breaks - 1, [len(self.ids) - 1]])])
+
+    def map(self, id_map):
+        """IdMap（旧ID -> 新ID）で変換 -> (新しいセット, 対応の無かったIDの数)"""
+        new = id_map.to_new(self.ids)
+        return IdSet(new[new >= 0]), int((new < 0).sum())
+
+
+def sorted_isin(ids, sorted_ids):
+    """np.isinと同じ結果（sorted_idsは昇順）。二分探索なのでO(n log m)"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(sorted_ids) or not ids.size:
+        return np.zeros(ids.shape, dtype=bool)
+    pos = np.clip(np.searchsorted(sorted_ids, ids), 0, len(sorted_ids) - 1)
+    return sorted_ids[pos] == ids
+
+
+def encode(id_set):
+    """ドキュメント保存用: 範囲が少なければ[開始, 終了, ...]、そうでなければNone"""
+    starts, ends = id_set.ranges()
+    if 2 * len(starts) >= len(id_set):
+        return None
+    return np.column_stack([starts, ends]).ravel()
+
+
+def decode(flat_ranges):
+    """[開始, 終了, ...] -> IdSet"""
+    flat = np.asarray(flat_ranges, dtype=np.int64)
+    pairs = flat[:len(flat) // 2 * 2].reshape(-1, 2)
+    return IdSet.from_ranges(pairs[:, 0], pairs[:, 1])
+
+
+def format_lines(id_set, min_range=MIN_RANGE, per_line=IDS_PER_LINE):
+    """/SETのデータ行（長い範囲はRANGE行、残りは1行にper_line個）"""
+    starts, ends = id_set.ranges()
+    long = ends - starts + 1 >= min_range
+    lines = [f"RANGE {s:10d} {e:10d}\n" for s, e in zip(starts[long].tolist(), ends[long].tolist())]
+    singles = IdSet.from_ranges(starts[~long], ends[~long]).ids
+    full = len(singles) // per_line * per_line
+    if full:
+        rows = singles[:full].reshape(-1, per_line)
+        fmt = " ".join(["%8d"] * per_line) + "\n"
+        lines.extend(fmt % tuple(row) for row in rows.tolist())
+    if full < len(singles):
+        lines.append(" ".join(f"{i:8d}" for i in singles[full:].tolist()) + "\n")
+    return lines
+
+
+class SetSection:
+    """/SETセクションの解析
+
+    1行目: 名前 [ID...]、以降: ID... または RANGE 開始 終了 [開始 終了 ...]。
+    数値でもRANGEでもない語で始まる行は次のセットの名前とする（1行1セットの旧形式）。
+    行は貯めておき、セットの終わりでまとめて配列に変換する。
+    """
+    def __init__(self, sets, set_type):
+        self.sets = sets
+        self.set_type = set_type
+        self.name = None
+        self.id_text = []
+        self.range_text = []
+
+    def __call__(self, line):
+        fields = line.replace(',', ' ').split(None, 1)
+        if not fields:
+            return
+        first, rest = fields[0], fields[1] if len(fields) > 1 else ""
+        if first.upper() == 'RANGE':
+            self.range_text.append(rest)
+        elif first.lstrip('-').isdigit() and self.name is not None:
+            self.id_text.append(line.replace(',', ' '))
+        else:
+            self.close()
+            self.name = first
+            self.id_text.append(rest)
+
+    def close(self):
+        if self.name is None:
+            return
+        try:
+            members = IdSet(np.array(" ".join(self.id_text).split(), dtype=np.int64))
+            if self.range_text:
+                members = members | decode(np.array(" ".join(self.range_text).split(), dtype=np.int64))
+        except ValueError as e:
+            import FreeCAD
+            FreeCAD.Console.PrintWarning(f"Set {self.name}: invalid id ({e}), set skipped\n")
+        else:
+            self.sets.append(SimpleNamespace(name=self.name, type=self.set_type, members=members))
+        self.name = None
+        self.id_text = []
+        self.range_text = []
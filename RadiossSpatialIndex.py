@@ -0,0 +1,272 @@
+"""節点と面セグメントの空間インデックス
+
+節点は一様格子（空間ハッシュ）に、面セグメントは包含箱（AABB）が重なる
+格子セルに登録する。木構造の探索はNumPyでベクトル化しにくいため、
+検索はセル単位の候補展開と点-3角形距離の一括計算で行う。
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+import RadiossMeshTools
+
+# 一度に処理する検索点の数（候補ペアの配列サイズを抑える）
+CHUNK = 50000
+
+
+def expand_ranges(starts, counts):
+    """[starts[i], starts[i] + counts[i])を連結したインデックス配列"""
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.repeat(np.asarray(starts, dtype=np.int64) - np.cumsum(counts) + counts, counts)
+    return np.arange(counts.sum(), dtype=np.int64) + offsets
+
+
+class CellGrid:
+    """一様格子のセル番号"""
+    def __init__(self, lo, hi, cell_size):
+        self.cell_size = float(cell_size)
+        self.origin = np.asarray(lo, dtype=np.float64)
+        self.dims = np.maximum(
+            np.floor((np.asarray(hi) - self.origin) / self.cell_size).astype(np.int64) + 1, 1)
+
+    def cells(self, points):
+        ijk = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(ijk, 0, self.dims - 1)
+
+    def keys(self, ijk):
+        return (ijk[..., 0] * self.dims[1] + ijk[..., 1]) * self.dims[2] + ijk[..., 2]
+
+    def box_cells(self, lo, hi):
+        """箱ごとに重なるセルを展開 -> (箱番号, セルキー)"""
+        first = self.cells(lo)
+        extent = self.cells(hi) - first + 1
+        counts = extent.prod(axis=1)
+        boxes = np.repeat(np.arange(len(lo)), counts)
+        local = expand_ranges(np.zeros(len(lo), dtype=np.int64), counts)
+        ext = extent[boxes]
+        ijk = np.stack([local // (ext[:, 1] * ext[:, 2]),
+                        (local // ext[:, 2]) % ext[:, 1],
+                        local % ext[:, 2]], axis=1)
+        return boxes, self.keys(first[boxes] + ijk)
+
+
+class Buckets:
+    """セルキーでまとめた値（キーでソートし、範囲をsearchsortedで引く）"""
+    def __init__(self, keys, values):
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.values = values[order]
+
+    def lookup(self, query_keys):
+        """キーごとの値を展開 -> (キー番号, 値)"""
+        start = np.searchsorted(self.keys, query_keys, side='left')
+        counts = np.searchsorted(self.keys, query_keys, side='right') - start
+        return (np.repeat(np.arange(len(query_keys)), counts),
+                self.values[expand_ranges(start, counts)])
+
+
+def default_cell_size(coords):
+    """節点1つあたりの体積から格子サイズを決める"""
+    lo, hi = RadiossMeshTools.bounding_box(coords)
+    size = np.maximum(hi - lo, 1.0e-9)
+    return float(max((size.prod() / max(len(coords), 1)) ** (1.0 / 3.0) * 2.0,
+                     size.max() / 1.0e6))
+
+
+class NodeIndex:
+    """節点座標の空間ハッシュ"""
+    def __init__(self, coords, cell_size=None):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        lo, hi = RadiossMeshTools.bounding_box(self.coords)
+        self.grid = CellGrid(lo, hi, cell_size or default_cell_size(self.coords))
+        self.buckets = Buckets(self.grid.keys(self.grid.cells(self.coords)),
+                               np.arange(len(self.coords), dtype=np.int64))
+
+    def query_pairs(self, points, radius):
+        """各点から距離radius以内の節点 -> (点番号, 節点行番号, 距離)"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        found = []
+        for start in range(0, len(points), CHUNK):
+            block = points[start:start + CHUNK]
+            boxes, keys = self.grid.box_cells(block - radius, block + radius)
+            key_index, rows = self.buckets.lookup(keys)
+            query = boxes[key_index]
+            distance = RadiossMeshTools._norm(block[query] - self.coords[rows])
+            keep = distance <= radius
+            found.append((query[keep] + start, rows[keep], distance[keep]))
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return tuple(np.concatenate(column) for column in zip(*found))
+
+    def box_rows(self, lo, hi):
+        """箱に重なるセルの節点行番号（候補）。セルが節点数に比べて多ければNone"""
+        first, last = self.grid.cells(lo[None, :]), self.grid.cells(hi[None, :])
+        if (last - first + 1).prod() > max(len(self.coords) // 8, 64):
+            return None
+        _, keys = self.grid.box_cells(lo[None, :], hi[None, :])
+        return self.buckets.lookup(keys)[1]
+
+    def query_box(self, lo, hi):
+        """箱の中の節点行番号（昇順）"""
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        rows = self.box_rows(lo, hi)
+        if rows is None:
+            # 大きな箱はセルを展開するより全節点を調べる方が速い
+            return np.flatnonzero(np.all((self.coords >= lo) & (self.coords <= hi), axis=1))
+        inside = np.all((self.coords[rows] >= lo) & (self.coords[rows] <= hi), axis=1)
+        return np.sort(rows[inside])
+
+    def query_sphere(self, center, radius):
+        """球の中の節点行番号（昇順）"""
+        center = np.asarray(center, dtype=np.float64)
+        rows = self.box_rows(center - radius, center + radius)
+        if rows is None:
+            return np.flatnonzero(RadiossMeshTools._norm(self.coords - center) <= radius)
+        inside = RadiossMeshTools._norm(self.coords[rows] - center) <= radius
+        return np.sort(rows[inside])
+
+
+def closest_points_on_triangles(p, a, b, c):
+    """点pから3角形abcへの最近点（行ごとにベクトル化）
+
+    最近点を a + v*(b-a) + w*(c-a) の(v, w)で領域ごとに求め、最後に1回だけ座標にする。
+    """
+    ab, ac = b - a, c - a
+    ap, bp, cp = p - a, p - b, p - c
+    d1, d2 = np.einsum('ij,ij->i', ab, ap), np.einsum('ij,ij->i', ac, ap)
+    d3, d4 = np.einsum('ij,ij->i', ab, bp), np.einsum('ij,ij->i', ac, bp)
+    d5, d6 = np.einsum('ij,ij->i', ab, cp), np.einsum('ij,ij->i', ac, cp)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 面の内部 -> 辺 -> 頂点の順に、優先度の高い領域で上書きする
+        denom = va + vb + vc
+        v, w = vb / denom, vc / denom
+        e4, e5 = d4 - d3, d5 - d6
+        t = e4 / (e4 + e5)
+        mask = (va <= 0) & (e4 >= 0) & (e5 >= 0)
+        v, w = np.where(mask, 1.0 - t, v), np.where(mask, t, w)
+        mask = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        v, w = np.where(mask, 0.0, v), np.where(mask, d2 / (d2 - d6), w)
+        mask = (d6 >= 0) & (d5 <= d6)
+        v, w = np.where(mask, 0.0, v), np.where(mask, 1.0, w)
+        mask = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        v, w = np.where(mask, d1 / (d1 - d3), v), np.where(mask, 0.0, w)
+        mask = (d3 >= 0) & (d4 <= d3)
+        v, w = np.where(mask, 1.0, v), np.where(mask, 0.0, w)
+        mask = (d1 <= 0) & (d2 <= 0)
+        v, w = np.where(mask, 0.0, v), np.where(mask, 0.0, w)
+    # 縮退した3角形は頂点aで代用
+    v = np.where(np.isfinite(v), v, 0.0)
+    w = np.where(np.isfinite(w), w, 0.0)
+    return a + ab * v[:, None] + ac * w[:, None]
+
+
+def point_segment_distances(points, coords, faces):
+    """点と面セグメント（幅4、3角形は4番目が3番目と同じ）の距離（行ごと）"""
+    a, b, c, d = (coords[faces[:, k]] for k in range(4))
+    first = RadiossMeshTools._norm(points - closest_points_on_triangles(points, a, b, c))
+    second = RadiossMeshTools._norm(points - closest_points_on_triangles(points, a, c, d))
+    return np.minimum(first, second)
+
+
+class SegmentIndex:
+    """面セグメントの包含箱を格子セルに登録した索引"""
+    def __init__(self, coords, faces, margin=0.0):
+        self.coords = coords
+        self.faces = RadiossMeshTools.closed_shells(faces)[0] if len(faces) else \
+            np.empty((0, 4), dtype=np.int64)
+        self.margin = float(margin)
+        points = coords[self.faces] if len(self.faces) else np.zeros((0, 4, 3))
+        self.lo = points.min(axis=1) - self.margin
+        self.hi = points.max(axis=1) + self.margin
+        size = (self.hi - self.lo).max(axis=1) if len(self.faces) else np.ones(1)
+        # セルが小さいほど1点あたりの候補は減り、登録数は増える。
+        # 大きなセグメントがあっても登録セル数が爆発しないよう下限を設ける
+        cell_size = max(float(np.median(size)) * 0.5, float(size.max()) / 64.0, 1.0e-9)
+        lo, hi = (self.lo.min(axis=0), self.hi.max(axis=0)) if len(self.faces) else \
+            (np.zeros(3), np.ones(3))
+        self.grid = CellGrid(lo, hi, cell_size)
+        segments, keys = self.grid.box_cells(self.lo, self.hi)
+        self.buckets = Buckets(keys, segments)
+
+    def candidates(self, points, radius):
+        """包含箱までの距離がradius以下のセグメント -> (点番号, セグメント番号)"""
+        query, segments = self.buckets.lookup(self.grid.keys(self.grid.cells(points)))
+        # 登録用の余裕を除いた包含箱までの距離
+        outside = np.maximum(np.maximum(self.lo[segments] - points[query],
+                                        points[query] - self.hi[segments]) + self.margin, 0.0)
+        near = np.einsum('ij,ij->i', outside, outside) <= radius * radius
+        return query[near], segments[near]
+
+    def query_pairs(self, rows, radius=None, exclude_own=True):
+        """節点行番号rowsから距離radius（既定はmargin、margin以下）以内のセグメント
+
+        exclude_ownがTrueならその節点を含むセグメントは除外する。
+        戻り値は(rowsの番号, セグメント番号, 距離)
+        """
+        radius = self.margin if radius is None else min(radius, self.margin)
+        rows = np.asarray(rows, dtype=np.int64)
+        found = []
+        for start in range(0, len(rows), CHUNK):
+            block = rows[start:start + CHUNK]
+            points = self.coords[block]
+            query, segments = self.candidates(points, radius)
+            if exclude_own:
+                own = np.any(self.faces[segments] == block[query][:, None], axis=1)
+                query, segments = query[~own], segments[~own]
+            distance = point_segment_distances(points[query], self.coords, self.faces[segments])
+            keep = distance <= radius
+            found.append((query[keep] + start, segments[keep], distance[keep]))
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return tuple(np.concatenate(column) for column in zip(*found))
+
+
+def nearest_per_point(query, segments, distance, count):
+    """点ごとの最も近いセグメント -> (セグメント番号, 距離)（無ければ-1, inf）"""
+    nearest = np.full(count, -1, dtype=np.int64)
+    best = np.full(count, np.inf)
+    if len(query):
+        order = np.lexsort((distance, query))
+        points, first = np.unique(query[order], return_index=True)
+        nearest[points] = segments[order[first]]
+        best[points] = distance[order[first]]
+    return nearest, best
+
+
+def contact_precheck(coords, slave_rows, master_faces, search, gap=0.0,
+                     node_thickness=None, face_thickness=None):
+    """スレーブ節点とマスターセグメントの初期距離を調べる
+
+    gapが0以下ならシェル厚さから節点ごとのギャップ
+    0.5 * (スレーブ節点の厚さ + 最寄りセグメントの厚さ) を使う（/INTER/TYPE7の可変ギャップ）。
+    search: 検索距離（これより遠い節点の距離はinf）
+    """
+    slave_rows = np.asarray(slave_rows, dtype=np.int64)
+    index = SegmentIndex(coords, master_faces, margin=search)
+    query, segments, distance = index.query_pairs(slave_rows)
+    nearest, best = nearest_per_point(query, segments, distance, len(slave_rows))
+
+    if gap > 0.0 or node_thickness is None or face_thickness is None:
+        gaps = np.full(len(slave_rows), float(gap))
+    else:
+        gaps = 0.5 * (node_thickness[slave_rows] +
+                      np.where(nearest >= 0, face_thickness[np.maximum(nearest, 0)], 0.0))
+    return SimpleNamespace(
+        slave_rows=slave_rows,
+        nearest=nearest,
+        distance=best,
+        gap=gaps,
+        penetrating=best < gaps,
+        pairs=len(query),
+        min_distance=float(best.min()) if len(best) else np.inf,
+    )
+
+
+def suggested_gap(min_distance, gap, factor=0.9):
+    """初期貫通が無くなるギャップ（min_distanceがgap以上ならgapのまま）"""
+    if not np.isfinite(min_distance) or min_distance >= gap:
+        return float(gap)
+    return factor * min_distance
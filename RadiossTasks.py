@@ -0,0 +1,186 @@
+"""重い処理（インポート・エクスポート）をバックグラウンドで実行するタスク管理
+
+ワーカースレッドはTaskContextを通じて進捗を報告し、キャンセルを確認する。
+ドキュメントへの反映（on_finished）は必ずGUIスレッドで実行される。
+"""
+import threading
+import time
+import traceback
+
+import FreeCAD
+from PySide2 import QtCore
+
+# 実行中のタスク（GCで破棄されないよう保持）
+_running = set()
+
+
+class TaskCancelled(BaseException):
+    """ユーザーによるキャンセル
+
+    既存の`except Exception`による警告処理で握りつぶされないよう、
+    KeyboardInterruptと同様にBaseExceptionから派生させる。
+    """
+
+
+class TaskContext:
+    """ワーカーからの進捗報告とキャンセル確認"""
+    def __init__(self, total_bytes=0):
+        self.cancel_event = threading.Event()
+        self.total_bytes = total_bytes
+        self.stage = ""
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.listener = None
+        self.last_emit = 0.0
+        self.profiler = None  # RadiossProfile.Profiler（タスク終了時に出力する）
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check(self):
+        """キャンセルされていればTaskCancelledを送出"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, stage=None, **counts):
+        """進捗を更新（bytes, nodes, elements, linesなど）し、キャンセルを確認"""
+        if stage is not None:
+            self.stage = stage
+        self.counters.update(counts)
+        now = time.perf_counter()
+        if self.listener is not None and now - self.last_emit > 0.1:
+            self.last_emit = now
+            self.listener(self.summary())
+        self.check()
+
+    def fraction(self):
+        if self.total_bytes <= 0:
+            return None
+        return min(self.counters.get('bytes', 0) / self.total_bytes, 1.0)
+
+    def summary(self):
+        """進捗表示用の文字列"""
+        elapsed = max(time.perf_counter() - self.start, 1.0e-9)
+        text = [self.stage] if self.stage else []
+        done = self.counters.get('bytes')
+        if done is not None:
+            text.append(f"{done / 1.0e6:.0f} / {self.total_bytes / 1.0e6:.0f} MB "
+                        f"({done / 1.0e6 / elapsed:.1f} MB/s)")
+        counts = [f"{name.capitalize()}: {value}" for name, value in self.counters.items()
+                  if name != 'bytes']
+        if counts:
+            text.append("  ".join(counts))
+        return "\n".join(text)
+
+
+def run_task(title, work, on_finished, context=None):
+    """work(context)をバックグラウンドで実行し、結果をon_finished(result)に渡す
+
+    GUIが無い場合は同期的に実行する。キャンセル時はon_finishedを呼ばない。
+    """
+    context = context or TaskContext()
+    if not FreeCAD.GuiUp:
+        status = "failed"
+        try:
+            on_finished(work(context))
+            status = "done"
+        except TaskCancelled:
+            status = "cancelled"
+            FreeCAD.Console.PrintWarning(f"{title} cancelled\n")
+        finally:
+            finish_profile(context, status)
+        return context
+
+    task = _BackgroundTask(title, work, on_finished, context)
+    _running.add(task)
+    task.start()
+    return context
+
+
+def finish_profile(context, status):
+    """タスクに付けた計測を終えて出力"""
+    if context.profiler is not None:
+        import RadiossProfile
+        RadiossProfile.finish(context.profiler, status)
+
+
+class TaskSignals(QtCore.QObject):
+    """ワーカースレッドからGUIスレッドへの通知"""
+    progress = QtCore.Signal(str)
+    done = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+
+class _BackgroundTask:
+    """ワーカースレッドと進捗ダイアログ"""
+    def __init__(self, title, work, on_finished, context):
+        import FreeCADGui
+        from PySide2.QtWidgets import QProgressDialog
+
+        self.title = title
+        self.work = work
+        self.on_finished = on_finished
+        self.context = context
+        self.signals = TaskSignals()
+        self.signals.progress.connect(self.show_progress)
+        self.signals.done.connect(self.finished)
+        self.signals.failed.connect(self.failed)
+        context.listener = self.signals.progress.emit
+
+        # ドキュメントの編集はブロックし、表示とキャンセルは受け付ける
+        self.dialog = QProgressDialog(title, "Cancel", 0, 1000, FreeCADGui.getMainWindow())
+        self.dialog.setWindowModality(QtCore.Qt.WindowModal)
+        self.dialog.setMinimumDuration(0)
+        self.dialog.setAutoClose(False)
+        self.dialog.setAutoReset(False)
+        self.dialog.canceled.connect(context.cancel)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.dialog.show()
+        self.thread.start()
+
+    def run(self):
+        try:
+            result = self.work(self.context)
+            self.signals.done.emit(result)
+        except TaskCancelled:
+            self.signals.failed.emit("")
+        except Exception as e:
+            FreeCAD.Console.PrintLog(traceback.format_exc())
+            self.signals.failed.emit(str(e))
+
+    def show_progress(self, text):
+        self.dialog.setLabelText(f"{self.title}\n{text}")
+        fraction = self.context.fraction()
+        if fraction is None:
+            self.dialog.setMaximum(0)  # 不定表示
+        else:
+            self.dialog.setValue(int(1000 * fraction))
+
+    def close(self, status="done"):
+        self.dialog.close()
+        _running.discard(self)
+        finish_profile(self.context, status)
+
+    def finished(self, result):
+        self.dialog.setLabelText(f"{self.title}\nUpdating document...")
+        status = "failed"
+        try:
+            self.on_finished(result)
+            status = "done"
+        except Exception as e:
+            FreeCAD.Console.PrintError(f"{self.title} error: {str(e)}\n")
+        finally:
+            self.close(status)
+
+    def failed(self, message):
+        self.close("failed" if message else "cancelled")
+        if message:
+            FreeCAD.Console.PrintError(f"{self.title} error: {message}\n")
+        else:
+            FreeCAD.Console.PrintWarning(f"{self.title} cancelled\n")
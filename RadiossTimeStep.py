@@ -0,0 +1,114 @@
+"""メッシュからの安定時間増分（臨界タイムステップ）の推定
+
+シェル: dt = L / sqrt(E / (rho (1 - nu^2)))
+ソリッド: dt = L / sqrt(E (1 - nu) / (rho (1 + nu) (1 - 2 nu)))
+Lは要素の特性長さ（RadiossMeshTools.shell_geometry / solid_geometry）。
+"""
+from types import SimpleNamespace
+
+import FreeCAD
+import numpy as np
+
+import RadiossModel
+import RadiossMeshTools
+
+
+def shell_wave_speed(E, nu, rho):
+    """平面応力の縦波速度"""
+    return np.sqrt(E / (rho * (1.0 - nu * nu)))
+
+
+def solid_wave_speed(E, nu, rho):
+    """3次元の縦波速度"""
+    return np.sqrt(E * (1.0 - nu) / (rho * (1.0 + nu) * (1.0 - 2.0 * nu)))
+
+
+def element_time_steps(arrays, props):
+    """全シェル・ソリッド要素の臨界時間増分 -> (要素ID, タイプ, dt)"""
+    shell = RadiossMeshTools.shell_geometry(arrays.coords, arrays.shells)
+    solid = RadiossMeshTools.solid_geometry(arrays.coords, arrays.solids)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shell_dt = shell.length / shell_wave_speed(props.shell.E, props.shell.nu, props.shell.rho)
+        solid_dt = solid.length / solid_wave_speed(props.solid.E, props.solid.nu, props.solid.rho)
+    kinds = np.concatenate([np.where(shell.triangle, 'SH3N', 'SHELL'),
+                            np.where(solid.tetra, 'TETRA', 'BRICK')])
+    return (np.concatenate([arrays.shell_ids, arrays.solid_ids]), kinds,
+            np.concatenate([shell_dt, solid_dt]))
+
+
+def estimate(analysis, worst=10, bins=12):
+    """解析内の全メッシュについて臨界時間増分を推定
+
+    戻り値: 最小値・最悪要素・log10(dt)のヒストグラム
+    """
+    return estimate_meshes(RadiossModel.mesh_snapshots(analysis), RadiossModel.analysis_materials(analysis),
+                           worst, bins)
+
+
+def estimate_meshes(snapshots, materials, worst=10, bins=12):
+    """メッシュのスナップショットと材料表から推定（ワーカースレッドから呼べる）"""
+    ids, kinds, dts, meshes = [], [], [], []
+    for snapshot in snapshots:
+        arrays = RadiossModel.snapshot_arrays(snapshot)
+        props = RadiossModel.element_properties(snapshot, arrays, materials)
+        elem_ids, elem_kinds, elem_dt = element_time_steps(arrays, props)
+        ids.append(elem_ids)
+        kinds.append(elem_kinds)
+        dts.append(elem_dt)
+        meshes.append(np.full(len(elem_ids), snapshot.name))
+    if not ids:
+        return None
+
+    elem_ids = np.concatenate(ids)
+    elem_kinds = np.concatenate(kinds)
+    elem_dt = np.concatenate(dts)
+    mesh_names = np.concatenate(meshes)
+    valid = np.isfinite(elem_dt) & (elem_dt > 0.0)
+    if not valid.any():
+        return None
+
+    order = np.flatnonzero(valid)[np.argsort(elem_dt[valid], kind='stable')[:worst]]
+    counts, edges = np.histogram(np.log10(elem_dt[valid]), bins=bins)
+    return SimpleNamespace(
+        dt_min=float(elem_dt[order[0]]),
+        element_count=int(valid.sum()),
+        invalid_count=int((~valid).sum()),
+        worst_ids=elem_ids[order],
+        worst_kinds=elem_kinds[order],
+        worst_dt=elem_dt[order],
+        worst_meshes=mesh_names[order],
+        histogram=(counts, 10.0 ** edges)
+    )
+
+
+def format_report(result, dt_scale=0.9):
+    """推定結果のテキストレポート"""
+    lines = [f"Critical time step: {result.dt_min:12.5E} "
+             f"(x {dt_scale:g} = {result.dt_min * dt_scale:12.5E})",
+             f"Elements: {result.element_count}"]
+    if result.invalid_count:
+        lines.append(f"Elements without valid material or geometry: {result.invalid_count}")
+    lines.append("Worst elements:")
+    for elem_id, kind, dt, mesh in zip(result.worst_ids, result.worst_kinds, result.worst_dt,
+                                       result.worst_meshes):
+        lines.append(f"  {mesh} {kind:5s} {elem_id:10d} {dt:12.5E}")
+    lines.append("Histogram:")
+    counts, edges = result.histogram
+    width = max(counts.max(), 1)
+    for count, low, high in zip(counts, edges[:-1], edges[1:]):
+        lines.append(f"  {low:10.3E} - {high:10.3E} {count:9d} {'#' * int(40 * count / width)}")
+    return "\n".join(lines) + "\n"
+
+
+def estimate_and_report(analysis, properties=None):
+    """推定してレポートビューに出力し、最小時間増分を返す"""
+    return report(estimate(analysis), properties.DTScale if properties is not None else 0.9)
+
+
+def report(result, dt_scale=0.9):
+    """推定結果をレポートビューに出力（結果が無ければ警告してNone）"""
+    if result is None:
+        FreeCAD.Console.PrintWarning("No elements with valid material data for time step estimation\n")
+        return None
+    FreeCAD.Console.PrintMessage(format_report(result, dt_scale))
+    return result
@@ -0,0 +1,238 @@
+"""ベンチマーク用の合成デッキ（Radioss / LS-DYNA）の生成
+
+シェルの板（4節点と3節点が混在、複数パート）とブリックのブロックからなる
+モデルを、節点数を指定して作る。材料・プロパティ・セット・境界条件・荷重
+（時間関数付き）も付け、各形式のパーサーが読むカードの並びで書き出す。
+モデルには書いた値も持たせ、ラウンドトリップの比較に使う。
+
+FreeCADを必要としないので、単体でも大きなデッキの作成に使える:
+    python generate_decks.py --nodes 1000000 --format radioss -o big.rad
+"""
+import argparse
+import math
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+# ブロックのIDはシェルと離して、書き出し時の詰め直しも測定対象にする
+SOLID_ID_OFFSET = 1000000
+
+
+def _grid_nodes(nx, ny, nz, origin, h):
+    """格子状の節点座標（x方向が最も速く変わる順）"""
+    k, j, i = np.meshgrid(np.arange(nz), np.arange(ny), np.arange(nx), indexing='ij')
+    return np.column_stack([i.ravel(), j.ravel(), k.ravel()]) * h + np.asarray(origin, dtype=float)
+
+
+def build_model(nodes=10000, tri_fraction=0.2, solid_fraction=0.3, parts=4, seed=0):
+    """節点数がおおよそnodesの合成モデル
+
+    tri_fraction: 3節点シェルに分割する板のセルの割合
+    solid_fraction: ブリックのブロックに割り当てる節点の割合
+    """
+    rng = np.random.default_rng(seed)
+    h = 1.0
+
+    # シェルの板（z = 0）
+    plate_nodes = max(int(nodes * (1.0 - solid_fraction)), 4)
+    nx = max(int(math.sqrt(plate_nodes)), 2)
+    ny = max(plate_nodes // nx, 2)
+    plate = _grid_nodes(nx, ny, 1, (0.0, 0.0, 0.0), h)
+    cells = np.arange((nx - 1) * (ny - 1))
+    ci, cj = cells % (nx - 1), cells // (nx - 1)
+    a = ci + nx * cj
+    quads = np.column_stack([a, a + 1, a + 1 + nx, a + nx])
+    split = rng.random(len(quads)) < tri_fraction
+    tri = np.concatenate([quads[split][:, [0, 1, 2]], quads[split][:, [0, 2, 3]]])
+    shells = np.concatenate([quads[~split], np.column_stack([tri, np.full(len(tri), -1)])])
+    # パートはx方向の帯（3節点シェルも元のセルの位置のパートに入る）
+    strip = np.concatenate([ci[~split], ci[split], ci[split]])
+    shell_parts = 1 + np.minimum(strip * max(parts, 1) // max(nx - 1, 1), max(parts, 1) - 1)
+    order = np.argsort(shell_parts, kind='stable')
+    shells, shell_parts = shells[order], shell_parts[order]
+
+    # ブリックのブロック（板の上に離して置く）
+    block_nodes = int(nodes * solid_fraction)
+    n = int(round(block_nodes ** (1.0 / 3.0)))
+    if n >= 2:
+        block = _grid_nodes(n, n, n, (0.0, 0.0, 10.0 * h), h)
+        hexa = np.arange((n - 1) ** 3)
+        bi, bj, bk = hexa % (n - 1), (hexa // (n - 1)) % (n - 1), hexa // (n - 1) ** 2
+        b = bi + n * bj + n * n * bk
+        bottom = np.column_stack([b, b + 1, b + 1 + n, b + n])
+        solids = np.concatenate([bottom, bottom + n * n], axis=1)
+    else:
+        block = np.empty((0, 3))
+        solids = np.empty((0, 8), dtype=np.int64)
+
+    node_ids = np.concatenate([np.arange(1, len(plate) + 1),
+                               SOLID_ID_OFFSET + np.arange(1, len(block) + 1)])
+    coords = np.concatenate([plate, block])
+    solid_rows = solids + len(plate)
+    solid_part = max(parts, 1) + 1
+
+    # 板の左端を固定し、右端の節点に荷重（左右の端とブロックの要素はセット）
+    left = np.flatnonzero(plate[:, 0] == 0.0)
+    right = np.flatnonzero(plate[:, 0] == plate[:, 0].max())
+    part_ids = list(range(1, max(parts, 1) + 1)) + ([solid_part] if len(solids) else [])
+    return SimpleNamespace(
+        node_ids=node_ids,
+        coords=coords,
+        shell_ids=np.arange(1, len(shells) + 1),
+        shells=np.where(shells >= 0, node_ids[np.maximum(shells, 0)], -1),
+        shell_parts=shell_parts,
+        solid_ids=SOLID_ID_OFFSET + np.arange(1, len(solids) + 1),
+        solids=node_ids[solid_rows] if len(solids) else solids,
+        solid_parts=np.full(len(solids), solid_part),
+        parts=part_ids,
+        solid_part=solid_part,
+        # 材料ID = パートID（デッキの単位系: t, mm, s）
+        materials={part: SimpleNamespace(rho=7.85e-9, E=210000.0, nu=0.3, yield_stress=250.0 + part,
+                                         hardening=500.0) for part in part_ids},
+        sets=[("EDGE_LEFT", "NODE", node_ids[left]),
+              ("EDGE_RIGHT", "NODE", node_ids[right]),
+              ("BLOCK", "ELEM", SOLID_ID_OFFSET + np.arange(1, len(solids) + 1))],
+        fixed=node_ids[left],
+        loaded=node_ids[right],
+        # 右端の節点の合計でx方向1000 N、時間関数1（ランプ）
+        load_force=1000.0,
+        load_direction=(1.0, 0.0, 0.0),
+        load_curve=(1, np.array([0.0, 1.0e-3, 1.0]), np.array([0.0, 1.0, 1.0])),
+    )
+
+
+def _write_rows(f, rows, fmt, chunk=100000):
+    """整数/実数の行列をfmtで書き出す"""
+    for start in range(0, len(rows), chunk):
+        f.write("".join(fmt % tuple(row) for row in rows[start:start + chunk].tolist()))
+
+
+def _id_lines(ids, per_line=8):
+    ids = [int(i) for i in ids]
+    return "".join(" ".join(f"{i:10d}" for i in ids[k:k + per_line]) + "\n"
+                   for k in range(0, len(ids), per_line))
+
+
+def write_radioss(model, path):
+    """RadiossFileParserが読むStarterデッキとして書き出し"""
+    with open(path, 'w') as f:
+        f.write("/RADIOSS STARTER\n# Synthetic benchmark deck\n")
+        f.write("/NODE\n")
+        _write_rows(f, np.column_stack([model.node_ids, model.coords]),
+                    "%10d %19.11E %19.11E %19.11E\n")
+
+        # パートごとの/SHELL, /SH3N, /BRICK
+        triangle = model.shells[:, 3] < 0
+        for part in np.unique(model.shell_parts):
+            for keyword, mask, width in (("SHELL", ~triangle, 4), ("SH3N", triangle, 3)):
+                selected = (model.shell_parts == part) & mask
+                if not selected.any():
+                    continue
+                f.write(f"/{keyword}/{part}\n")
+                _write_rows(f, np.column_stack([model.shell_ids[selected], model.shells[selected, :width]]),
+                            "%10d" + " %10d" * width + "\n")
+        if len(model.solid_ids):
+            f.write(f"/BRICK/{model.solid_part}\n")
+            _write_rows(f, np.column_stack([model.solid_ids, model.solids]), "%10d" + " %10d" * 8 + "\n")
+
+        # パート・プロパティ・材料（プロパティIDと材料IDはパートIDと同じ）
+        for part in model.parts:
+            mat = model.materials[part]
+            solid = part == model.solid_part
+            f.write(f"/PART/{part}\nPART_{part}\n{part:10d}{part:10d}\n")
+            if solid:
+                f.write(f"/PROP/SOLID/{part}\nPROP_{part}\n{14:10d}{0:10d}\n")
+            else:
+                f.write(f"/PROP/SHELL/{part}\nPROP_{part}\n"
+                        f"#   Ishell    Ismstr     Ish3n\n{24:10d}{0:10d}{0:10d}\n"
+                        f"{0.0:20.6E}{0.0:20.6E}{0.0:20.6E}\n"
+                        f"{5:10d}{0:10d}{1.0 + 0.1 * part:20.6E}\n")
+            f.write(f"/MAT/LAW2/{part}\nSTEEL_{part}\n{mat.rho:20.6E}\n{mat.E:20.6E}{mat.nu:20.6E}\n"
+                    f"{mat.yield_stress:20.6E}{mat.hardening:20.6E}{0.3:20.6E}\n")
+
+        for name, kind, ids in model.sets:
+            f.write(f"/SET/{kind}\n{name} " + " ".join(str(int(i)) for i in ids) + "\n")
+        f.write("/BOUNDARY\n")
+        for k in range(0, len(model.fixed), 8):
+            f.write(f"{k // 8 + 1:10d} " + " ".join(f"{int(i):10d}" for i in model.fixed[k:k + 8]) + "\n")
+        # 荷重: 右端の節点グループにx方向の/CLOAD（節点あたりの値）
+        curve_id, x, y = model.load_curve
+        f.write(f"/FUNCT/{curve_id}\nRAMP\n" + "".join(f"{a:20.6E}{b:20.6E}\n" for a, b in zip(x, y)))
+        f.write("/GRNOD/NODE/1\nEDGE_RIGHT\n" + "".join(
+            "".join(f"{int(i):10d}" for i in model.loaded[k:k + 10]) + "\n" for k in range(0, len(model.loaded), 10)))
+        f.write(f"/CLOAD/1\nFORCE_RIGHT\n{curve_id:10d}{'X':>10s}{0:10d}{0:10d}{1:10d}{1.0:20.6E}"
+                f"{model.load_force / len(model.loaded):20.6E}\n")
+        f.write("/END\n")
+    return path
+
+
+def write_lsdyna(model, path):
+    """LsDynaParserが読むキーワードファイルとして書き出し"""
+    with open(path, 'w') as f:
+        f.write("*KEYWORD\n$ Synthetic benchmark deck\n*NODE\n")
+        _write_rows(f, np.column_stack([model.node_ids, model.coords]),
+                    "%10d %19.11E %19.11E %19.11E\n")
+
+        # 3節点シェルはLS-DYNAの慣例どおり4番目の節点に3番目を繰り返す
+        shells = np.where(model.shells[:, 3:] < 0, model.shells[:, 2:3], model.shells[:, 3:])
+        f.write("*ELEMENT_SHELL\n")
+        _write_rows(f, np.column_stack([model.shell_ids, model.shell_parts, model.shells[:, :3], shells]),
+                    "%10d %10d" + " %10d" * 4 + "\n")
+        if len(model.solid_ids):
+            f.write("*ELEMENT_SOLID\n")
+            _write_rows(f, np.column_stack([model.solid_ids, model.solid_parts, model.solids]),
+                        "%10d %10d" + " %10d" * 8 + "\n")
+
+        for part in model.parts:
+            mat = model.materials[part]
+            f.write(f"*PART\nPART_{part}\n{part:10d}{part:10d}{part:10d}\n")
+            # LsDynaParserの材料行: ID E nu rho [降伏応力 接線係数]
+            f.write(f"*MAT_PIECEWISE_LINEAR_PLASTICITY\n{part:10d} {mat.E:.6E} {mat.nu:.6E} "
+                    f"{mat.rho:.6E} {mat.yield_stress:.6E} {mat.hardening:.6E}\n")
+
+        for index, (name, kind, ids) in enumerate(model.sets, start=1):
+            keyword = "SET_NODE_LIST" if kind == "NODE" else "SET_SOLID"
+            f.write(f"*{keyword}\n$ {name}\n{index:10d}\n" + _id_lines(ids))
+        f.write("*BOUNDARY_SPC_NODE\n")
+        for k in range(0, len(model.fixed), 8):
+            f.write(f"{k // 8 + 1:10d} " + " ".join(f"{int(i):10d}" for i in model.fixed[k:k + 8]) + "\n")
+        curve_id, x, y = model.load_curve
+        f.write(f"*DEFINE_CURVE\n{curve_id:10d}\n" + "".join(f"{a:20.6E}{b:20.6E}\n" for a, b in zip(x, y)))
+        # LsDynaParserの荷重行: ID 節点 大きさ 方向(x,y,z) [曲線ID]
+        f.write("*LOAD_NODE_POINT\n")
+        direction = " ".join(f"{v:.1f}" for v in model.load_direction)
+        for k, node in enumerate(model.loaded, start=1):
+            f.write(f"{k:10d} {int(node):10d} {model.load_force / len(model.loaded):.6E} {direction} {curve_id}\n")
+        f.write("*END\n")
+    return path
+
+
+WRITERS = {'radioss': (write_radioss, ".rad"), 'lsdyna': (write_lsdyna, ".k")}
+
+
+def generate(path, fmt="radioss", **options):
+    """モデルを作ってfmt形式で書き出す -> (パス, モデル)"""
+    model = build_model(**options)
+    return WRITERS[fmt][0](model, path), model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Radioss / LS-DYNA decks")
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--format", choices=sorted(WRITERS), default="radioss")
+    parser.add_argument("--tri-fraction", type=float, default=0.2)
+    parser.add_argument("--solid-fraction", type=float, default=0.3)
+    parser.add_argument("--parts", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+    output = args.output or f"synthetic_{args.nodes}{WRITERS[args.format][1]}"
+    path, model = generate(output, args.format, nodes=args.nodes, tri_fraction=args.tri_fraction,
+                           solid_fraction=args.solid_fraction, parts=args.parts, seed=args.seed)
+    print(f"{path}: {len(model.node_ids)} nodes, {len(model.shell_ids)} shells, "
+          f"{len(model.solid_ids)} bricks, {os.path.getsize(path) / 1.0e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
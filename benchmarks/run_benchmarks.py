@@ -0,0 +1,399 @@
+"""インポート・エクスポートの処理速度とラウンドトリップのベンチマーク
+
+合成デッキ（generate_decks）を作り、形式と節点数の組み合わせごとに
+    - 解析速度（MB/s, 行/s）とその間のピークメモリ（tracemalloc, RSS）
+    - FemMeshの構築時間
+    - Radiossデッキの書き出し速度
+    - インポート -> エクスポート -> インポートで、生成したモデルとメッシュ（ソリッドを
+      含む）・材料定数・荷重と時間関数が一致するか
+    - 読み直した材料定数の単位（鋼の縦波速度がデッキの単位系で約5.2e6 mm/s）
+    - パラメータスタディのバリアントのデッキを読み直して、シェルの厚さが変わっているか
+を測ってJSONに保存する。前回の結果（--baseline）と比べて、許容幅を超えて
+遅く・大きくなった指標があれば回帰として報告し、終了コード1を返す。
+
+RadiossCommandsがFemGuiとビュープロバイダーを使うので、GUI版のFreeCADで実行する:
+    freecad benchmarks/run_benchmarks.py
+引数はPythonコンソールから渡す:
+    import run_benchmarks
+    run_benchmarks.main(["--nodes", "10000,1000000", "--baseline", "baseline.json"])
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for path in (HERE, os.path.dirname(HERE)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import FreeCAD
+import ObjectsFem
+import numpy as np
+
+import generate_decks
+import RadiossMeshTools
+import RadiossRenumber
+
+# 回帰判定に使う指標と良い方向（+1: 大きいほど良い, -1: 小さいほど良い）
+METRICS = {
+    'parse_mb_per_second': +1,
+    'parse_peak_mb': -1,
+    'femmesh_seconds': -1,
+    'export_mb_per_second': +1,
+}
+
+
+def rss_peak_mb():
+    """プロセスの最大常駐メモリ（取得できない環境ではNone）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト
+    return peak / (1.0e6 if sys.platform == "darwin" else 1.0e3)
+
+
+def best_time(function, repeat):
+    """repeat回実行して最短の時間と最後の戻り値"""
+    best, result = None, None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def parse_deck(fmt, path):
+    """デッキを読んで解析 -> パーサー（Radiossはread_radiossと同じく行単位で読む）"""
+    from RadiossCommands import LsDynaParser, RadiossFileParser
+    if fmt == 'lsdyna':
+        return LsDynaParser().parse_file(path)
+    with open(path, 'r') as f:
+        lines = f.readlines()
+    return RadiossFileParser().parse(lines)
+
+
+def entity_counts(parser):
+    """材料・セット・境界条件・荷重の数"""
+    if hasattr(parser, 'boundary_conditions'):
+        # LsDynaParserはセットを読まない
+        return {'materials': len(parser.materials), 'sets': 0,
+                'constraints': len(parser.boundary_conditions), 'loads': len(parser.loads)}
+    return {'materials': len(parser.materials), 'sets': len(parser.sets),
+            'constraints': len(parser.constraints), 'loads': len(parser.loads)}
+
+
+# 生成デッキの材料（鋼）の棒の縦波速度 sqrt(E/rho)（mm/s）
+STEEL_WAVE_SPEED = 5.2e6
+
+
+def wave_speeds(materials):
+    """材料表（E, rhoの配列）の縦波速度 sqrt(E/rho)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(materials.E / materials.rho)
+
+
+def doe_thickness_differences(model, workdir, name, thickness=2.5):
+    """厚さを変えたバリアントを書き出して読み直し、厚さが違うシェルのプロパティの数
+
+    メッシュのインクルードの/PARTがバリアントのプロパティを参照していないシェルの
+    パートも数える（参照されなければソルバーは厚さを使わない）。
+    """
+    import RadiossDOE
+    base = os.path.join(workdir, f"{name}_doe")
+    parameters = [RadiossDOE.Parameter("Thickness", thickness, thickness, 1)]
+    path = RadiossDOE.export_doe(model, base, parameters, workers=1)
+    manifest = RadiossDOE.load_manifest(path)
+    reread = parse_deck('radioss', manifest['variants'][0]['starter'])
+    include = parse_deck('radioss', os.path.join(os.path.dirname(path), manifest['mesh_include']))
+    shells = {prop.id: prop for prop in reread.properties.values() if prop.type == "SHELL"}
+    shell_parts = {elem.part for elem in include.elements.values() if elem.type in ("SHELL", "SH3N")}
+    referenced = {include.parts[part].prop for part in shell_parts if part in include.parts}
+    return len(shell_parts - set(include.parts)) + len(referenced ^ set(shells)) + \
+        sum(abs(prop.thickness - thickness) > 1.0e-6 * thickness for prop in shells.values())
+
+
+def _sorted_elements(ids, conn, parts):
+    order = np.argsort(ids, kind='stable')
+    return ids[order], conn[order], parts[order]
+
+
+def mesh_differences(model, parser, node_map, elem_map):
+    """生成したモデルと、書き出したデッキを読み直した結果のメッシュの違い
+
+    model: generate_decksのモデル（節点・要素のID、節点IDの接続）
+    parser: 書き出したデッキのRadiossFileParser
+    node_map, elem_map: 書き出し時に保存したIdMap（新ID -> 元のID）
+    戻り値: {項目: 一致しない数}（全て0なら一致）
+    """
+    second = RadiossMeshTools.parser_arrays(parser.nodes, parser.elements)
+    differences = {}
+
+    old_nodes = node_map.to_old(second.node_ids)
+    order = np.argsort(old_nodes, kind='stable')
+    node_order = np.argsort(model.node_ids, kind='stable')
+    differences['nodes'] = int(len(np.setxor1d(old_nodes, model.node_ids)))
+    if differences['nodes'] == 0:
+        coords = model.coords[node_order]
+        scale = max(float(np.abs(coords).max(initial=0.0)), 1.0)
+        error = np.abs(second.coords[order] - coords).max(axis=1, initial=0.0)
+        differences['coordinates'] = int((error > 1.0e-9 * scale).sum())
+
+    for kind in ('shell', 'solid'):
+        conn = getattr(model, f"{kind}s")
+        conn = np.pad(conn, ((0, 0), (0, max(0, (4 if kind == 'shell' else 8) - conn.shape[1]))),
+                      constant_values=-1)
+        first = _sorted_elements(getattr(model, f"{kind}_ids"), conn, getattr(model, f"{kind}_parts"))
+
+        second_ids = getattr(second, f"{kind}_ids")
+        second_conn = getattr(second, f"{kind}s")
+        second_conn = np.where(second_conn >= 0, old_nodes[np.maximum(second_conn, 0)], -1)
+        second_parts = np.array([parser.elements[i].part or 0 for i in second_ids.tolist()], dtype=np.int64)
+        other = _sorted_elements(elem_map.to_old(second_ids), second_conn, second_parts)
+
+        if not np.array_equal(first[0], other[0]):
+            differences[f"{kind}s"] = int(len(np.setxor1d(first[0], other[0])))
+            continue
+        differences[f"{kind}s"] = int((first[1] != other[1]).any(axis=1).sum())
+        differences[f"{kind}_parts"] = int((first[2] != other[2]).sum())
+    return differences
+
+
+def _close(a, b, rtol=1.0e-5):
+    return abs(a - b) <= rtol * max(abs(a), abs(b), 1.0e-30)
+
+
+def material_differences(model, parser):
+    """生成した材料と読み直した材料（ID, E, nu, rho, 降伏応力）の違いの数"""
+    reread = parser.materials
+    count = len(set(model.materials) ^ set(reread))
+    for mat_id, expected in model.materials.items():
+        mat = reread.get(mat_id)
+        if mat is None:
+            continue
+        count += sum(not _close(getattr(mat, name, 0.0), getattr(expected, name))
+                     for name in ('E', 'nu', 'rho', 'yield_stress'))
+    return count
+
+
+def load_differences(model, parser, node_map):
+    """生成した荷重と読み直した荷重の違いの数
+
+    合計の荷重ベクトル、荷重の節点（元のID）、各荷重が参照する時間関数の値を比べる。
+    """
+    loads = parser.loads
+    total = np.zeros(3)
+    nodes = []
+    count = 0
+    curve_id, x, y = model.load_curve
+    for load in loads:
+        total += load.magnitude * np.asarray(load.direction, dtype=np.float64)
+        nodes.extend(getattr(load, 'nodes', []))
+        curve = getattr(load, 'curve', 0)
+        if curve not in parser.curves:
+            count += 1
+            continue
+        reread_x, reread_y = parser.curves.curve(curve)
+        count += int(len(reread_x) != len(x) or not np.allclose(reread_x, x) or not np.allclose(reread_y, y))
+    expected = model.load_force * np.asarray(model.load_direction)
+    count += int(not np.allclose(total, expected, rtol=1.0e-5))
+    old_nodes = node_map.to_old(np.asarray(nodes, dtype=np.int64))
+    count += int(len(np.setxor1d(old_nodes, model.loaded)))
+    return count
+
+
+def roundtrip(fmt, generated, parser, mesh, workdir, name):
+    """最初のインポート結果をドキュメントに作り、書き出して読み直して生成したモデルと比べる"""
+    from RadiossCommands import LsDynaImport, RadiossExport, RadiossImport
+    doc = FreeCAD.newDocument(name)
+    try:
+        analysis = ObjectsFem.makeAnalysis(doc, "Analysis")
+        parser.femmesh = mesh
+        if fmt == 'lsdyna':
+            LsDynaImport().convert_to_radioss(analysis, parser)
+        else:
+            RadiossImport().create_freecad_objects(analysis, parser)
+        doc.recompute()
+
+        output = os.path.join(workdir, f"{name}_export.rad")
+        exporter = RadiossExport()
+        start = time.perf_counter()
+        model = exporter.snapshot(analysis)
+        exporter.export_radioss_starter(model, output)
+        export_seconds = time.perf_counter() - start
+        thickness_differences = doe_thickness_differences(model, workdir, name)
+        export_bytes = os.path.getsize(output)
+
+        reread = parse_deck('radioss', output)
+        node_map, elem_map = RadiossRenumber.load_maps(os.path.splitext(output)[0] + "_idmap.npz")
+        differences = mesh_differences(generated, reread, node_map, elem_map)
+        # 単位は読み直した材料で確かめる（書き出しで換算を誤っても検出する）
+        speeds = wave_speeds(SimpleNamespace(
+            E=np.array([mat.E for mat in reread.materials.values()], dtype=np.float64),
+            rho=np.array([mat.rho for mat in reread.materials.values()], dtype=np.float64)))
+        return {
+            'export_seconds': export_seconds,
+            'export_mb_per_second': export_bytes / 1.0e6 / max(export_seconds, 1.0e-9),
+            'export_mb': export_bytes / 1.0e6,
+            'mesh_differences': differences,
+            'mesh_equal': not any(differences.values()),
+            'wave_speed': float(speeds.min()) if len(speeds) else None,
+            'doe_thickness_ok': thickness_differences == 0,
+            'material_differences': material_differences(generated, reread),
+            'load_differences': load_differences(generated, reread, node_map),
+            'units_ok': bool(len(speeds)) and bool(np.all(np.abs(speeds / STEEL_WAVE_SPEED - 1.0) < 0.05)),
+            'entities_after': entity_counts(reread),
+        }
+    finally:
+        FreeCAD.closeDocument(doc.Name)
+
+
+def run_case(fmt, nodes, workdir, repeat=3, keep=False):
+    """1つの形式・規模のベンチマーク -> 結果の辞書"""
+    from RadiossCommands import LsDynaImport, RadiossImport
+    name = f"{fmt}_{nodes}"
+    path = os.path.join(workdir, name + generate_decks.WRITERS[fmt][1])
+    _, model = generate_decks.generate(path, fmt, nodes=nodes)
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        line_count = sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+
+    parse_seconds, parser = best_time(lambda: parse_deck(fmt, path), repeat)
+
+    # メモリは計測のオーバーヘッドが大きいので時間とは別に測る
+    tracemalloc.start()
+    parse_deck(fmt, path)
+    parse_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    importer = LsDynaImport() if fmt == 'lsdyna' else RadiossImport()
+    femmesh_seconds, mesh = best_time(lambda: importer.build_femmesh(parser.nodes, parser.elements), repeat)
+
+    result = {
+        'name': name,
+        'format': fmt,
+        'nodes': int(len(model.node_ids)),
+        'shells': int(len(model.shell_ids)),
+        'solids': int(len(model.solid_ids)),
+        'file_mb': size / 1.0e6,
+        'lines': line_count,
+        'parse_seconds': parse_seconds,
+        'parse_mb_per_second': size / 1.0e6 / max(parse_seconds, 1.0e-9),
+        'parse_lines_per_second': line_count / max(parse_seconds, 1.0e-9),
+        'parse_peak_mb': parse_peak / 1.0e6,
+        'femmesh_seconds': femmesh_seconds,
+        'femmesh_elements': len(mesh.Faces) + len(mesh.Volumes),
+        'entities_before': entity_counts(parser),
+    }
+    result.update(roundtrip(fmt, model, parser, mesh, workdir, name))
+    result['rss_peak_mb'] = rss_peak_mb()
+    if not keep:
+        for suffix in ("", "_export.rad", "_export_idmap.npz", "_doe_mesh.inc", "_doe_mesh_idmap.npz",
+                       "_doe_0001.rad", "_doe_0001.D00", "_doe_doe.json"):
+            target = path if not suffix else os.path.join(workdir, name + suffix)
+            if os.path.exists(target):
+                os.remove(target)
+    return result
+
+
+def compare(results, baseline, tolerance=0.15):
+    """基準の結果と比べて、許容幅を超えて悪化した指標 -> [(ケース, 指標, 基準値, 今回の値)]"""
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+        for metric, direction in METRICS.items():
+            before, after = old.get(metric), case.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * direction
+            if change < -tolerance:
+                regressions.append((case['name'], metric, before, after))
+    return regressions
+
+
+def format_case(case):
+    status = "equal" if case['mesh_equal'] else f"DIFFERENT {case['mesh_differences']}"
+    if not case['doe_thickness_ok']:
+        status += ", DOE thickness not read back"
+    if case['material_differences']:
+        status += f", {case['material_differences']} material values changed"
+    if case['load_differences']:
+        status += f", {case['load_differences']} load differences"
+    if not case['units_ok']:
+        status += f", wave speed {case['wave_speed']} mm/s (expected {STEEL_WAVE_SPEED:.2g})"
+    return (f"{case['name']:>16}: parse {case['parse_mb_per_second']:7.1f} MB/s "
+            f"({case['parse_lines_per_second'] / 1.0e3:7.0f} klines/s, peak {case['parse_peak_mb']:7.1f} MB)  "
+            f"FemMesh {case['femmesh_seconds']:7.2f} s  export {case['export_mb_per_second']:7.1f} MB/s  "
+            f"round trip {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radioss workbench import/export benchmarks")
+    parser.add_argument("--nodes", default="10000,100000",
+                        help="comma separated node counts")
+    parser.add_argument("--formats", default="radioss,lsdyna")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(HERE, "benchmark_results.json"))
+    parser.add_argument("--baseline", help="previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--workdir", help="directory for the generated decks (default: temporary)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated and exported decks")
+    # FreeCADから実行した場合は自身の引数が混ざるので、知らない引数は無視する
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="radioss_bench_")
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'freecad': ".".join(FreeCAD.Version()[:3]),
+        'numpy': np.__version__,
+        'cases': [],
+    }
+    for fmt in args.formats.split(","):
+        for nodes in args.nodes.split(","):
+            case = run_case(fmt.strip(), int(nodes), workdir, args.repeat, args.keep)
+            results['cases'].append(case)
+            FreeCAD.Console.PrintMessage(format_case(case) + "\n")
+            if case['entities_before'] != case['entities_after']:
+                FreeCAD.Console.PrintWarning(
+                    f"{case['name']}: entity counts changed in the round trip "
+                    f"{case['entities_before']} -> {case['entities_after']}\n")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    FreeCAD.Console.PrintMessage(f"Results written to {args.output}\n")
+
+    failed = [case['name'] for case in results['cases'] if not case['mesh_equal']]
+    wrong_units = [case['name'] for case in results['cases'] if not case['units_ok']]
+    failed += [case['name'] for case in results['cases']
+               if not case['doe_thickness_ok'] or case['material_differences'] or case['load_differences']]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, metric, before, after in regressions:
+            FreeCAD.Console.PrintWarning(f"Regression {name} {metric}: {before:.4g} -> {after:.4g}\n")
+    if failed:
+        FreeCAD.Console.PrintError(f"Round trip changed the mesh, materials, loads or DOE thickness: "
+                                   f"{', '.join(sorted(set(failed)))}\n")
+    if wrong_units:
+        FreeCAD.Console.PrintError(f"Material wave speed is not that of steel in mm/s: {', '.join(wrong_units)}\n")
+    return 1 if failed or wrong_units or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
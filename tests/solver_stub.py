@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""OpenRadiossのStarter/Engineの代わりに使うテスト用のスクリプト
+
+RunJobと同じ引数（-i <デッキ> -np <ドメイン数> -nt <スレッド数>）を受け取り、
+デッキ中の「#stub」行の指定に従って本物に似た出力をする:
+    #stub cycles=5 delay=0.05 exit=0
+    cycles: Engineが出力するサイクル行の数（Starterは出力しない）
+    delay:  1行ごとの待ち時間（秒。キャンセルや並列実行の確認用）
+    exit:   終了コード（0以外なら正常終了の行を出さない）
+Starterは.rad、Engineは.D00を読むので、段階ごとに振る舞いを変えられる。
+"""
+import sys
+import time
+
+
+def options(deck):
+    values = {'cycles': 5, 'delay': 0.0, 'exit': 0}
+    with open(deck) as f:
+        for line in f:
+            if line.startswith("#stub"):
+                for item in line.split()[1:]:
+                    key, value = item.split("=")
+                    values[key] = float(value) if key == 'delay' else int(value)
+    return values
+
+
+def main(argv):
+    deck = argv[argv.index("-i") + 1]
+    values = options(deck)
+    engine = not deck.endswith(".rad")
+    print(f" STUB {'ENGINE' if engine else 'STARTER'} INPUT {deck}", flush=True)
+    if engine:
+        print("    CYCLE    TIME      TIME-STEP  ELEMENT          ERROR  I-ENERGY    K-ENERGY", flush=True)
+        for cycle in range(1, values['cycles'] + 1):
+            time.sleep(values['delay'])
+            print(f"  {cycle:7d}  {cycle * 1.0e-3:.4E}  1.0000E-03 SHELL        1   0.0%"
+                  f"  1.000  0.000  0.000  1.000", flush=True)
+    else:
+        time.sleep(values['delay'])
+    if values['exit'] == 0:
+        print(" NORMAL TERMINATION", flush=True)
+    return values['exit']
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
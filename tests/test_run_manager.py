@@ -0,0 +1,144 @@
+"""RadiossRunManagerのテスト（ソルバーの代わりにsolver_stub.pyを実行する）
+
+FreeCADのPython（FreeCADCmd）から実行する:
+    freecadcmd -c "import sys; sys.path.insert(0, 'tests'); import unittest, test_run_manager; \
+unittest.main(module=test_run_manager, argv=['test'], exit=False)"
+FreeCADモジュールが読めるPythonなら python -m unittest discover tests でもよい。
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for path in (HERE, os.path.dirname(HERE)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import RadiossRunManager as rm
+
+STUB = os.path.join(HERE, "solver_stub.py")
+
+
+@unittest.skipIf(os.name == 'nt', "the stub solver is started through its #! line")
+class RunManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = {'starter': STUB, 'engine': STUB, 'mpi': "mpiexec",
+                         'threads': 1, 'domains': 1, 'max_cores': 2}
+        self.record_path = os.path.join(self.directory, "runs.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def job(self, name, starter="", engine="", threads=1):
+        """#stub行を書いたデッキ（<name>_0000.rad, <name>_0001.D00）のジョブ"""
+        root = os.path.join(self.directory, name)
+        for suffix, stub in (("_0000.rad", starter), ("_0001.D00", engine)):
+            with open(root + suffix, 'w') as f:
+                f.write(f"#stub {stub}\n/END\n")
+        return rm.RunJob(root + "_0000.rad", root + "_0001.D00", threads=threads,
+                         name=name, settings=self.settings)
+
+    def queue(self, **kwargs):
+        return rm.RunQueue(max_cores=2, record_path=self.record_path, **kwargs)
+
+    def records(self):
+        with open(self.record_path) as f:
+            return {record['name']: record for record in map(json.loads, f)}
+
+    def test_run_record(self):
+        job = self.job("ok", engine="cycles=7")
+        lines = []
+        queue = self.queue(listener=lambda job, line: lines.append(line))
+        queue.submit(job)
+        self.assertTrue(queue.wait(30))
+
+        self.assertEqual(job.status, rm.DONE)
+        self.assertEqual(job.returncode, 0)
+        self.assertEqual(job.cycles, 7)
+        self.assertAlmostEqual(job.time, 7.0e-3)
+        self.assertTrue(job.normal_termination)
+        self.assertTrue(any("STUB STARTER" in line for line in lines))
+        with open(job.log_path) as f:
+            log = f.read()
+        self.assertIn("### Starter", log)
+        self.assertIn("### Engine", log)
+
+        record = self.records()["ok"]
+        self.assertEqual(record['status'], rm.DONE)
+        self.assertEqual(record['cycles'], 7)
+        self.assertEqual(record['returncode'], 0)
+        self.assertTrue(record['normal_termination'])
+        self.assertEqual(record['log'], job.log_path)
+        self.assertGreater(record['wall_time'], 0.0)
+
+    def test_failed_starter_skips_engine(self):
+        job = self.job("bad", starter="exit=3")
+        queue = self.queue()
+        queue.submit(job)
+        self.assertTrue(queue.wait(30))
+
+        self.assertEqual(job.status, rm.FAILED)
+        self.assertEqual(job.returncode, 3)
+        self.assertEqual(job.stage, "Starter")
+        self.assertEqual(self.records()["bad"]['status'], rm.FAILED)
+
+    def test_core_limit(self):
+        jobs = [self.job(f"j{i}", engine="cycles=10 delay=0.02") for i in range(4)]
+        big = self.job("big", engine="cycles=5 delay=0.02", threads=3)
+        queue = self.queue()
+        busy = []
+        for job in jobs + [big]:
+            queue.submit(job)
+        deadline = time.perf_counter() + 30
+        while (queue.queued() or queue.running()) and time.perf_counter() < deadline:
+            with queue.lock:
+                running = queue.running()
+            busy.append((sum(job.cores for job in running), [job.name for job in running]))
+            time.sleep(0.005)
+        self.assertTrue(queue.wait(30))
+
+        self.assertTrue(all(job.status == rm.DONE for job in jobs + [big]))
+        # 上限（2コア）を超えるのは、上限より大きいジョブを単独で実行するときだけ
+        for cores, names in busy:
+            if "big" in names:
+                self.assertEqual(names, ["big"])
+            else:
+                self.assertLessEqual(cores, 2)
+        self.assertEqual(max(len(names) for _, names in busy), 2)
+        self.assertEqual(set(self.records()), {"j0", "j1", "j2", "j3", "big"})
+
+    def test_cancel(self):
+        slow = self.job("slow", engine="cycles=1000 delay=0.05", threads=2)
+        waiting = self.job("waiting")
+        finished = threading.Event()
+        queue = self.queue(on_finished=lambda job: finished.set())
+        queue.submit(slow)
+        queue.submit(waiting)
+        deadline = time.perf_counter() + 30
+        while slow.cycles < 2 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(waiting.status, rm.QUEUED)
+
+        started = time.perf_counter()
+        queue.cancel_all()
+        self.assertTrue(queue.wait(30))
+        self.assertLess(time.perf_counter() - started, 10)
+        self.assertTrue(finished.is_set())
+
+        self.assertEqual(slow.status, rm.CANCELLED)
+        self.assertLess(slow.cycles, 1000)
+        self.assertFalse(slow.normal_termination)
+        self.assertEqual(waiting.status, rm.CANCELLED)
+        # 実行したジョブだけが記録される
+        self.assertEqual(self.records()["slow"]['status'], rm.CANCELLED)
+        self.assertNotIn("waiting", self.records())
+
+
+if __name__ == "__main__":
+    unittest.main()